@@ -1,6 +1,6 @@
 import logging
 import gspread
-from google.oauth2.service_account import Credentials
+import sheets_session
 from pathlib import Path
 from datetime import datetime
 
@@ -10,6 +10,7 @@ from datetime import datetime
 
 BASE_PATH = Path(r"C:\Users\cmarroquin\Music\RuntPro")
 GOOGLE_CREDS = BASE_PATH / "prueba-de-gmail-486215-345473339c47.json"
+sheets_session.configurar(GOOGLE_CREDS)
 LOGS_FOLDER = BASE_PATH / "Log_duplicados"
 LOGS_FOLDER.mkdir(parents=True, exist_ok=True)
 
@@ -32,22 +33,9 @@ logging.basicConfig(
 # ═════════════════════════════════════════════════════════════
 
 def conectar_sheets(sheet_id):
-    """Conecta con Google Sheets"""
+    """Conecta con Google Sheets (spreadsheet cacheado en la sesión compartida)"""
     try:
-        SCOPES = [
-            "https://spreadsheets.google.com/feeds",
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive"
-        ]
-
-        creds = Credentials.from_service_account_file(
-            str(GOOGLE_CREDS),
-            scopes=SCOPES
-        )
-
-        client = gspread.authorize(creds)
-        sheet = client.open_by_key(sheet_id)
-        return sheet
+        return sheets_session.abrir_spreadsheet(sheet_id)
 
     except Exception as e:
         logging.error(f"❌ Error conectando a Sheets: {e}")
@@ -70,7 +58,7 @@ def limpiar_duplicados_datos_runt():
         return
     
     try:
-        worksheet = sheet.worksheet("Datos Runt")
+        worksheet = sheets_session.obtener_worksheet(sheet.id, "Datos Runt")
         logging.info("✅ Hoja 'Datos Runt' encontrada")
     except gspread.WorksheetNotFound:
         logging.error("❌ Hoja 'Datos Runt' no encontrada")
@@ -178,7 +166,7 @@ def limpiar_duplicados_datos_vehiculo():
         return
     
     try:
-        worksheet = sheet.worksheet("Datos Vehiculo")
+        worksheet = sheets_session.obtener_worksheet(sheet.id, "Datos Vehiculo")
         logging.info("✅ Hoja 'Datos Vehiculo' encontrada")
     except gspread.WorksheetNotFound:
         logging.error("❌ Hoja 'Datos Vehiculo' no encontrada")
@@ -276,7 +264,7 @@ def limpiar_duplicados_resultados():
         return
     
     try:
-        worksheet = sheet.worksheet("Resultados")
+        worksheet = sheets_session.obtener_worksheet(sheet.id, "Resultados")
         logging.info("✅ Hoja 'Resultados' encontrada")
     except gspread.WorksheetNotFound:
         logging.error("❌ Hoja 'Resultados' no encontrada")
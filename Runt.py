@@ -1,9 +1,10 @@
+import functools
 import logging
 import os
+import shutil
+import sys
 import time
 import cv2
-import numpy as np
-import pytesseract
 from datetime import datetime
 from PIL import Image
 from selenium import webdriver
@@ -12,14 +13,27 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.common.exceptions import WebDriverException, TimeoutException, NoSuchElementException
 from webdriver_manager.chrome import ChromeDriverManager
-from typing import Optional
+from typing import Optional, Tuple
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 import gspread
-from google.oauth2.service_account import Credentials
 import io
 import json
 from pathlib import Path
+import estado_db
+import archivo_captchas
+import carga_incremental
+import captura_red
+import clasificador_glifos
+import escritor_sheets
+import esperas
+import indice_filas
+import ocr_captcha
+import ocr_templates
+import pool_consultas
+import pool_ocr
+import sesion_portal
+import sheets_session
 
 # ═════════════════════════════════════════════════════════════
 # CONFIGURACIÓN DE RUTAS MODERNA
@@ -27,96 +41,165 @@ from pathlib import Path
 
 BASE_PATH = Path(r"C:\Users\cmarroquin\Music\RuntPro")
 CAPTCHA_FOLDER = BASE_PATH / "captchas"
-CAPTCHA_FOLDER.mkdir(parents=True, exist_ok=True)
-
 CAPTCHA_LEIDOS_FOLDER = BASE_PATH / "captchas_leidos"
-CAPTCHA_LEIDOS_FOLDER.mkdir(parents=True, exist_ok=True)
-
+ARCHIVO_CAPTCHAS_FOLDER = BASE_PATH / "archivo_captchas"  # Shards append-only con cada captcha y su veredicto
 TEMPLATE_FOLDER = BASE_PATH / "templates"
-TEMPLATE_FOLDER.mkdir(parents=True, exist_ok=True)
-
 LOGS_FOLDER = BASE_PATH / "Escritura_Runt_principal"
-LOGS_FOLDER.mkdir(parents=True, exist_ok=True)
 
 TESSERACT_PATH = r"C:\Users\cmarroquin\AppData\Local\Programs\Tesseract-OCR\tesseract.exe"
-pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+RUTA_MODELO_GLIFOS = BASE_PATH / "modelo_glifos.npz"  # python clasificador_glifos.py lo genera
+BACKEND_OCR = "auto"  # "tesserocr" (en proceso), "pytesseract", "auto" (Tesseract disponible) o "clasificador" (opt-in)
 
 GOOGLE_CREDS = BASE_PATH / "prueba-de-gmail-486215-345473339c47.json"
-ESTADO_FILE = str(LOGS_FOLDER / "estado_runt.json")
-
 
-REGISTROS_ANTES_REINICIO = 6  # Reiniciar sesión cada 6 registros
+SHEET_ID_MOTOS = "1saIDw37nd-rnzZvvKjxUQP41LhXJvSiayYgFRR78N7o"            # Motos 0_5 ... Motos 16_25
+SHEET_ID_RESULTADOS = "1hYwf3AMdUWY6Lk6VjeGKPiDnR003ftkybv79b_pUN64"       # Datos Runt, Resultados, Datos Vehiculo
+SHEET_ID_DATOS_VEHICULO = "1oc6vcS6Y7i1IyxuEoFwsQAdPTMQCBJbixpmP8c-oOVw"   # Datos Vehiculo (copia histórica)
+ESTADO_FILE = str(LOGS_FOLDER / "estado_runt.json")           # Solo para importar estado antiguo
+ESTADO_JOURNAL_FILE = str(LOGS_FOLDER / "estado_runt.jsonl")  # Solo para importar estado antiguo
+
+
+# ═══ REINICIO DE SESIÓN (ver sesion_portal.py) ═══
+REGISTROS_ANTES_REINICIO = 25          # Tope duro: reiniciar aunque la sesión se vea sana
+RACHA_CAPTCHAS_REINICIO = 3            # Captchas rechazados seguidos que disparan el reinicio
+VENTANA_MODALES = 5                    # Últimas consultas observadas...
+MAX_MODALES_EN_VENTANA = 3             # ...y cuántas con modal de error disparan el reinicio
+
+# ═══ LLENADO DEL FORMULARIO ═══
+MODO_LLENADO = "js"                    # "js": placa, documento y captcha en un solo execute_script
+                                       # "teclado": send_keys carácter por carácter (lento, para cuando el portal rechace el JS)
+
+# ═══ CAPTURA DE RED (ver captura_red.py) ═══
+CAPTURA_RED = False                    # Leer vehículo / SOAT / RTM del JSON del portal (performance log);
+                                       # lo que no se reconozca se sigue leyendo del DOM
+
+# ═══ CAPTCHA ═══
+UMBRAL_CONFIANZA_CAPTCHA = 0.6         # Por debajo se pide otro captcha en vez de enviar la lectura
+MAX_REFRESCOS_CAPTCHA = 3              # Captchas nuevos a pedir por intento antes de enviar la mejor lectura
+TAMANO_POOL_OCR = 2                    # Procesos OCR compartidos por todos los navegadores (ver pool_ocr.py);
+                                       # independiente de NUM_WORKERS. 0 = OCR en el mismo hilo del navegador
+TIMEOUT_OCR_SEGUNDOS = 30              # Espera máxima por la lectura de un captcha en el pool
+
+# ═══ CHROME / CHROMEDRIVER ═══
+CHROMEDRIVER_VERSION = None            # Fijar versión (ej: "131.0.6778.85"); None = la que resuelva webdriver_manager
+CHROMEDRIVER_CACHE_FILE = BASE_PATH / "chromedriver_cache.json"  # Ruta ya resuelta (evita la consulta de red)
+USAR_PERFIL_PERSISTENTE = False        # Reutilizar un user-data-dir ya "caliente" entre arranques
+PERFILES_CHROME_FOLDER = BASE_PATH / "perfiles_chrome"
+
+MODO_HEADLESS = False                  # Chrome sin ventana (menos RAM/CPU por instancia)
+TAMANO_VIEWPORT = (1366, 900)          # Viewport fijo: las capturas del captcha salen idénticas en cada sesión
+FACTOR_ESCALA = 1                      # deviceScaleFactor fijo (1 píxel CSS = 1 píxel de captura)
+BLOQUEAR_IMAGENES = False              # Ojo: el captcha es una imagen; activar solo si se verificó que sigue cargando
+URLS_BLOQUEADAS = [                    # Recursos que la consulta no necesita (Network.setBlockedURLs)
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*hotjar.com*", "*facebook.net*", "*clarity.ms*",
+]
+LIMITE_PROCESOS_RENDERER = 2           # --renderer-process-limit
+MEMORIA_MAXIMA_MB = 512                # Presupuesto de heap JS por sesión; al superarlo se recicla el navegador
+
+# ═══ POOL DE NAVEGADORES (ver pool_consultas.py) ═══
+NUM_WORKERS = 1                        # Navegadores en paralelo, cada uno en su proceso (1 = secuencial)
+CONSULTAS_POR_MINUTO_POR_WORKER = 0    # Límite de consultas por navegador (0 = sin límite)
+MAX_CONSULTAS_SIMULTANEAS = None       # Tope global de consultas en curso (None = NUM_WORKERS)
 
 # ═════════════════════════════════════════════════════════════
 # LOGGING
 # ═════════════════════════════════════════════════════════════
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler(str(LOGS_FOLDER / "automatizacion.log"), encoding='utf-8')
-    ]
-)
-
 captcha_logger = logging.getLogger('captcha_logger')
 captcha_logger.setLevel(logging.INFO)
 captcha_logger.propagate = False
-file_handler_captcha = logging.FileHandler(str(LOGS_FOLDER / "captcha_retroalimentacion.log"), encoding='utf-8')
-formatter_captcha = logging.Formatter('%(message)s')
-file_handler_captcha.setFormatter(formatter_captcha)
-captcha_logger.addHandler(file_handler_captcha)
 
+def configurar_logging(sufijo=""):
+    """
+    Log general y log de retroalimentación de captchas.
+    Cada worker del pool escribe en sus propios archivos (sufijo "_worker_N"):
+    varios procesos anexando al mismo archivo mezclan los bloques por placa.
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(str(LOGS_FOLDER / f"automatizacion{sufijo}.log"), encoding='utf-8')
+        ]
+    )
+
+    file_handler_captcha = logging.FileHandler(str(LOGS_FOLDER / f"captcha_retroalimentacion{sufijo}.log"), encoding='utf-8')
+    file_handler_captcha.setFormatter(logging.Formatter('%(message)s'))
+    captcha_logger.addHandler(file_handler_captcha)
 
-def reiniciar_sesion_periodico(driver, contador):
+
+monitor_sesion = sesion_portal.MonitorSesion(
+    REGISTROS_ANTES_REINICIO, RACHA_CAPTCHAS_REINICIO, VENTANA_MODALES, MAX_MODALES_EN_VENTANA
+)
+
+def reiniciar_sesion_periodico(driver):
     """
-    Reinicia la sesión cada 5 registros procesados
-    VERSIÓN AGRESIVA: Entra a otra URL y vuelve
+    Reinicia la sesión del portal SOLO si monitor_sesion lo pide
+    (captchas rechazados, modales frecuentes, recargas o tope de consultas).
+    Reinicio en el mismo sitio: borra cookies / storage del origen y recarga la SPA.
     """
+    motivo = monitor_sesion.motivo_reinicio()
+    if not motivo:
+        return False
     
-    if contador > 0 and contador % 5 == 0:
-        logging.info(f"\n{'='*70}")
-        logging.info(f"⏸️  PAUSA PROGRAMADA: {contador} registros procesados")
-        logging.info(f"{'='*70}")
-        logging.info(f"⏱️  Esperando 10 segundos antes de refrescar...")
+    logging.info(f"\n{'='*70}")
+    logging.info(f"🔄 REINICIANDO SESIÓN: {motivo}")
+    logging.info(f"{'='*70}")
+    try:
+        sesion_portal.limpiar_datos_origen(driver)
+        driver.refresh()
+        if not esperas.esperar_formulario_listo(driver):
+            esperas.cargar_formulario(driver)
+        limpiar_todos_los_campos(driver)
         
-        for segundo in range(10, 0, -1):
-            if segundo % 5 == 0 or segundo <= 3:
-                logging.info(f"   ⏳ {segundo} segundos restantes...")
-            time.sleep(1)
+        logging.info(f"✅ SESIÓN REINICIADA - Listo para continuar")
+        logging.info(f"{'='*70}\n")
+        return True
         
-        logging.info(f"🔄 RECARGANDO PÁGINA (CAMBIO DE URL VISIBLE)...")
-        try:
-            # Paso 1: Ir a Google (visible)
-            logging.info(f"   → Yendo a Google...")
-            driver.get("https://www.google.com")
-            time.sleep(2)
-            
-            # Paso 2: Volver a RUNT
-            logging.info(f"   → Volviendo a RUNT...")
-            driver.get("https://portalpublico.runt.gov.co/#/consulta-vehiculo/consulta/consulta-ciudadana")
-            time.sleep(5)
-            
-            # Paso 3: Limpiar
-            logging.info(f"   → Limpiando campos...")
-            limpiar_todos_los_campos(driver)
-            time.sleep(2)
-            
-            logging.info(f"✅ SESIÓN REINICIADA - Listo para continuar")
-            logging.info(f"{'='*70}\n")
-            return True
-            
-        except Exception as e:
-            logging.error(f"❌ Error en reinicio: {e}")
-            logging.info(f"{'='*70}\n")
-            return False
-    
-    return False
+    except Exception as e:
+        logging.error(f"❌ Error en reinicio: {e}")
+        logging.info(f"{'='*70}\n")
+        return False
+    finally:
+        monitor_sesion.reiniciada()
 
-# ═══════════════════════════��═════════════════════════════════
+# ═════════════════════════════════════════════════════════════
 # MANEJO DE ESTADO (REANUDACIÓN)
 # ═════════════════════════════════════════════════════════════
+#
+# El estado vive en la base SQLite compartida (estado_db.py), proceso "runt".
+# estado_runt.json / estado_runt.jsonl (snapshot + journal de versiones
+# anteriores) se importan una sola vez a la base y ya no se escriben.
+
+PROCESO_ESTADO = "runt"
+
+# Con NUM_WORKERS > 1 los procesos worker NO escriben en Sheets ni en el estado:
+# las escrituras decoradas con @_escritura_centralizada se acumulan en esta lista
+# y viajan con el resultado al proceso principal, que es el único escritor.
+_escrituras_diferidas = None
+
+def _escritura_centralizada(funcion):
+    """En un worker del pool, difiere la escritura al proceso principal"""
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        if _escrituras_diferidas is not None:
+            _escrituras_diferidas.append((funcion.__name__, args, kwargs))
+            return None
+        return funcion(*args, **kwargs)
+    return envoltura
+
+def aplicar_escrituras_diferidas(escrituras):
+    """Ejecuta en el proceso principal las escrituras recibidas de un worker"""
+    modulo = sys.modules[__name__]
+    for nombre, args, kwargs in escrituras:
+        try:
+            getattr(modulo, nombre)(*args, **kwargs)
+        except Exception as e:
+            logging.error(f"❌ Error aplicando escritura diferida {nombre}: {e}")
+
 
 def estructura_estado_inicial():
     """Crea la estructura inicial del archivo de estado - SIMPLIFICADO"""
@@ -125,96 +208,121 @@ def estructura_estado_inicial():
             "placas_procesadas": {},  # {"PLACA001": "Exitoso", "PLACA002": "Pendiente"}
             "ultima_actualizacion": datetime.now().isoformat()
         },
-        "historial_completo": [],  # Mantiene todos los detalles históricos
+        "total_historial": 0,  # El historial completo vive en la tabla 'intentos'
         "last_execution": None,
         "current_index": 0,
         "total_records": 0
     }
 
-def cargar_estado():
-    """Carga el estado del archivo JSON"""
+def _normalizar_estado_resumen(status):
+    """Normalizar status a Exitoso/Pendiente para el resumen"""
+    return "Exitoso" if "Exitoso" in status else "Pendiente"
+
+def _importar_estado_legacy():
+    """
+    Importa a SQLite el estado de versiones anteriores:
+    snapshot estado_runt.json (+ historial_completo si es el formato viejo)
+    y las líneas del journal estado_runt.jsonl.
+    """
+    if not estado_db.proceso_vacio(PROCESO_ESTADO):
+        return
+    if not os.path.exists(ESTADO_FILE) and not os.path.exists(ESTADO_JOURNAL_FILE):
+        return
+
+    snapshot = {}
     if os.path.exists(ESTADO_FILE):
         try:
             with open(ESTADO_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
+                snapshot = json.load(f)
         except json.JSONDecodeError:
-            logging.warning("⚠️ Archivo de estado corrupto, creando nuevo...")
-            return estructura_estado_inicial()
-    return estructura_estado_inicial()
+            logging.warning("⚠️ estado_runt.json corrupto, se importa solo el journal")
+
+    registros = list(snapshot.get("historial_completo", []))
+    if os.path.exists(ESTADO_JOURNAL_FILE):
+        with open(ESTADO_JOURNAL_FILE, "r", encoding="utf-8") as f:
+            for linea in f:
+                try:
+                    registros.append(json.loads(linea))
+                except json.JSONDecodeError:
+                    continue
+
+    logging.info(f"🔄 Importando estado antiguo a SQLite: {len(registros)} registros de historial")
 
+    with estado_db.transaccion() as conexion:
+        for registro in registros:
+            placa = registro.get("placa")
+            if not placa:
+                continue
+            if registro.get("tipo") == "resumen":
+                estado_db.actualizar_resultado(PROCESO_ESTADO, placa, registro["estado"], conexion=conexion)
+                continue
+            conexion.execute(
+                "INSERT INTO intentos (proceso, placa, cedula, status, indice, total, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (PROCESO_ESTADO, placa, registro.get("cedula"), registro.get("status", ""),
+                 registro.get("index"), registro.get("total"), registro.get("timestamp", datetime.now().isoformat()))
+            )
+            estado_db.registrar_placa(conexion, placa, registro.get("cedula"))
+            estado_db.actualizar_resultado(
+                PROCESO_ESTADO, placa, _normalizar_estado_resumen(registro.get("status", "")),
+                registro.get("cedula"), conexion=conexion
+            )
+
+        # El resumen del snapshot manda sobre lo reconstruido (incluye Sin_Personas)
+        for placa, estado_resumen in snapshot.get("resumen", {}).get("placas_procesadas", {}).items():
+            estado_db.actualizar_resultado(PROCESO_ESTADO, placa, estado_resumen, conexion=conexion)
+
+        for clave in ("last_execution", "current_index", "total_records"):
+            if snapshot.get(clave) is not None:
+                estado_db.guardar_meta(PROCESO_ESTADO, clave, snapshot[clave], conexion=conexion)
+
+    logging.info("✅ Estado antiguo importado a SQLite")
+
+def cargar_estado():
+    """Carga el estado desde SQLite con la misma forma que el JSON original"""
+    _importar_estado_legacy()
+
+    estado = estructura_estado_inicial()
+    estado["resumen"]["placas_procesadas"] = estado_db.resumen_placas(PROCESO_ESTADO)
+    estado["total_historial"] = estado_db.contar_intentos(PROCESO_ESTADO)
+    for clave in ("last_execution", "current_index", "total_records"):
+        estado[clave] = estado_db.obtener_meta(PROCESO_ESTADO, clave, estado[clave])
+    return estado
+
+@_escritura_centralizada
 def guardar_estado(cedula, placa, status, index, total, datos_vehiculo=None, datos_soat=None, datos_tecnica=None):
     """Guarda el estado actual - Actualiza RESUMEN e HISTORIAL"""
-    estado_anterior = cargar_estado()
-    
-    # Normalizar status a Exitoso/Pendiente para el resumen
-    estado_resumen = "Exitoso" if "Exitoso" in status else "Pendiente"
-    
-    # Actualizar RESUMEN con la placa y estado
-    estado_anterior["resumen"]["placas_procesadas"][placa] = estado_resumen
-    estado_anterior["resumen"]["ultima_actualizacion"] = datetime.now().isoformat()
-    
-    # Agregar al HISTORIAL COMPLETO
-    registro_actual = {
-        "timestamp": datetime.now().isoformat(),
-        "cedula": cedula,
-        "placa": placa,
-        "status": status,
-        "datos_vehiculo": datos_vehiculo or {},
-        "datos_soat": datos_soat or [],
-        "datos_tecnica": datos_tecnica or []
-    }
-    
-    estado_anterior["historial_completo"].append(registro_actual)
-    
-    # Actualizar índices
-    estado_anterior["last_execution"] = datetime.now().isoformat()
-    estado_anterior["current_index"] = index
-    estado_anterior["total_records"] = total
-    
-    # Guardar en archivo
-    with open(ESTADO_FILE, "w", encoding="utf-8") as f:
-        json.dump(estado_anterior, f, indent=2, ensure_ascii=False)
-    
-    total_historial = len(estado_anterior["historial_completo"])
-    logging.info(f"💾 Estado guardado: {placa} - {estado_resumen} (Total historial: {total_historial} registros)")
+    estado_resumen = _normalizar_estado_resumen(status)
+
+    estado_db.registrar_intento(
+        PROCESO_ESTADO, cedula, placa, status,
+        estado_resultado=estado_resumen, indice=index, total=total,
+        datos_vehiculo=datos_vehiculo, datos_soat=datos_soat, datos_rtm=datos_tecnica
+    )
+
+    with estado_db.transaccion() as conexion:
+        estado_db.guardar_meta(PROCESO_ESTADO, "last_execution", datetime.now().isoformat(), conexion=conexion)
+        estado_db.guardar_meta(PROCESO_ESTADO, "current_index", index, conexion=conexion)
+        estado_db.guardar_meta(PROCESO_ESTADO, "total_records", total, conexion=conexion)
 
+    logging.info(f"💾 Estado guardado: {placa} - {estado_resumen} (registro {index}/{total})")
 
 
+
+@_escritura_centralizada
 def agregar_registro_procesado(cedula, placa, status, datos_vehiculo=None, datos_soat=None, datos_tecnica=None):
     """Agrega un registro a la lista de procesados - Mantiene RESUMEN + HISTORIAL"""
-    estado = cargar_estado()
-    
-    # Normalizar status a Exitoso/Pendiente para el resumen
-    estado_resumen = "Exitoso" if "Exitoso" in status else "Pendiente"
-    
-    # Actualizar RESUMEN
-    if "resumen" not in estado:
-        estado["resumen"] = {"placas_procesadas": {}, "ultima_actualizacion": None}
-    
-    estado["resumen"]["placas_procesadas"][placa] = estado_resumen
-    estado["resumen"]["ultima_actualizacion"] = datetime.now().isoformat()
-    
-    # Agregar al HISTORIAL COMPLETO
-    registro = {
-        "timestamp": datetime.now().isoformat(),
-        "cedula": cedula,
-        "placa": placa,
-        "status": status,
-        "datos_vehiculo": datos_vehiculo or {},
-        "datos_soat": datos_soat or [],
-        "datos_tecnica": datos_tecnica or []
-    }
-    
-    if "historial_completo" not in estado:
-        estado["historial_completo"] = []
-    
-    estado["historial_completo"].append(registro)
-    
-    # Guardar
-    with open(ESTADO_FILE, "w", encoding="utf-8") as f:
-        json.dump(estado, f, indent=2, ensure_ascii=False)
+    estado_db.registrar_intento(
+        PROCESO_ESTADO, cedula, placa, status,
+        estado_resultado=_normalizar_estado_resumen(status),
+        datos_vehiculo=datos_vehiculo, datos_soat=datos_soat, datos_rtm=datos_tecnica
+    )
 
 
+@_escritura_centralizada
+def actualizar_estado_resumen(placa, estado_resumen):
+    """Cambia directamente el estado de una placa en el resumen (sin historial)"""
+    estado_db.actualizar_resultado(PROCESO_ESTADO, placa, estado_resumen)
+
 
 
 
@@ -226,36 +334,76 @@ def agregar_registro_procesado(cedula, placa, status, datos_vehiculo=None, datos
 
 templates = {}
 diccionario_caracteres = {}
+banco_templates = None
 
-if os.path.exists(TEMPLATE_FOLDER):
-    for file in os.listdir(TEMPLATE_FOLDER):
-        if file.endswith(".png"):
-            nombre_sin_extension = file.split(".")[0]
-            
-            if "_" in nombre_sin_extension:
-                char_real = nombre_sin_extension.split("_")[0]
-            else:
-                char_real = nombre_sin_extension
+def cargar_templates():
+    """Carga las imágenes de TEMPLATE_FOLDER en templates / diccionario_caracteres / banco_templates"""
+    global banco_templates
 
-            path = TEMPLATE_FOLDER / file
-            template_img = cv2.imread(str(path), 0)
+    if os.path.exists(TEMPLATE_FOLDER):
+        for file in os.listdir(TEMPLATE_FOLDER):
+            if file.endswith(".png"):
+                nombre_sin_extension = file.split(".")[0]
 
-            if template_img is not None:
-                templates[file] = (char_real, template_img)
-                
-                if char_real not in diccionario_caracteres:
-                    diccionario_caracteres[char_real] = []
-                diccionario_caracteres[char_real].append(file)
+                if "_" in nombre_sin_extension:
+                    char_real = nombre_sin_extension.split("_")[0]
+                else:
+                    char_real = nombre_sin_extension
 
-    logging.info(f"✅ Diccionario cargado: {len(templates)} variaciones para {len(diccionario_caracteres)} caracteres")
-    logging.info(f"   Caracteres disponibles: {sorted(diccionario_caracteres.keys())}")
-else:
-    logging.error(f"❌ La carpeta de templates no existe en: {TEMPLATE_FOLDER}")
+                path = TEMPLATE_FOLDER / file
+                template_img = cv2.imread(str(path), 0)
+
+                if template_img is not None:
+                    templates[file] = (char_real, template_img)
+
+                    if char_real not in diccionario_caracteres:
+                        diccionario_caracteres[char_real] = []
+                    diccionario_caracteres[char_real].append(file)
+
+        logging.info(f"✅ Diccionario cargado: {len(templates)} variaciones para {len(diccionario_caracteres)} caracteres")
+        logging.info(f"   Caracteres disponibles: {sorted(diccionario_caracteres.keys())}")
+    else:
+        logging.error(f"❌ La carpeta de templates no existe en: {TEMPLATE_FOLDER}")
+
+    # Las imágenes ya cargadas, normalizadas para template matching (ver ocr_templates.py)
+    banco_templates = ocr_templates.BancoTemplates(templates.values())
+
+# ═════════════════════════════════════════════════════════════
+# CONFIGURACIÓN DEL PROCESO
+# ═════════════════════════════════════════════════════════════
+
+def configurar_proceso(worker=None):
+    """
+    Carpetas, logging, módulos auxiliares y templates.
+    No corre al importar: con multiprocessing "spawn" cada worker vuelve a importar
+    este módulo, así que main(), inicializar_worker() y los scripts que importan
+    de Runt la llaman explícitamente (una vez por proceso).
+    worker: número del worker del pool, o None en el proceso principal
+    """
+    for carpeta in (CAPTCHA_FOLDER, CAPTCHA_LEIDOS_FOLDER, TEMPLATE_FOLDER, LOGS_FOLDER):
+        carpeta.mkdir(parents=True, exist_ok=True)
+
+    configurar_logging("" if worker is None else f"_worker_{worker}")
+
+    archivo_captchas.configurar(CAPTCHA_FOLDER, CAPTCHA_LEIDOS_FOLDER, ARCHIVO_CAPTCHAS_FOLDER)
+    ocr_captcha.configurar(TESSERACT_PATH)
+    clasificador_glifos.configurar(RUTA_MODELO_GLIFOS)
+    sheets_session.configurar(GOOGLE_CREDS)
+    if worker is not None:
+        # Sin esto el worker hereda el origen del script y su flush de salida
+        # (atexit) drenaría la cola de escrituras del proceso principal
+        escritor_sheets.configurar(f"worker_{worker}")
+
+    cargar_templates()
 
 # ═════════════════════════════════════════════════════════════
 # GOOGLE SHEETS
 # ═════════════════════════════════════════════════════════════
 
+def _celda(fila, indice):
+    """Valor de la columna `indice` de una fila leída por la API ("" si la fila viene recortada)"""
+    return str(fila[indice]).strip() if len(fila) > indice else ""
+
 def obtener_datos_unicos():
     """
     Obtiene datos de MÚLTIPLES SHEETS:
@@ -269,20 +417,6 @@ def obtener_datos_unicos():
     Retorna: [(cedula_asociado, cedula_propietario, placa, numero_fila, nombre_sheet), ...]
     """
     try:
-        SCOPES = [
-            "https://spreadsheets.google.com/feeds",
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive"
-        ]
-
-        creds = Credentials.from_service_account_file(
-            str(GOOGLE_CREDS),
-            scopes=SCOPES
-        )
-
-        client = gspread.authorize(creds)
-        sheet = client.open_by_key("1saIDw37nd-rnzZvvKjxUQP41LhXJvSiayYgFRR78N7o")
-        
         nombres_sheets = ["Motos 0_5", "Motos 6_10", "Motos 11_15", "Motos 16_25"]
         datos = []
         # vistos = set()
@@ -290,13 +424,26 @@ def obtener_datos_unicos():
         estadisticas_sheets = {}
         total_recopilado = 0
         
+        # ═══ A:F DE LAS 4 HOJAS, DESDE LA COPIA LOCAL SI NO CAMBIARON ═══
+        # El bot no escribe en este spreadsheet: si el modifiedTime de Drive es el mismo
+        # de la última carga no se descarga nada; si cambió, una sola values_batch_get.
+        # (la reanudación es por posición desde el último exitoso: se necesitan todas las filas)
+        cargas = carga_incremental.cargar_hojas(
+            SHEET_ID_MOTOS, {nombre: "A:F" for nombre in nombres_sheets}, solo_lectura=True
+        )
+        filas_por_sheet = {nombre: carga["filas"] for nombre, carga in cargas.items()}
+        for nombre, carga in cargas.items():
+            if not carga["sin_cambios"] and carga["cambiadas"]:
+                logging.info(f"🆕 {nombre}: {len(carga['cambiadas'])} filas nuevas o modificadas desde la última carga")
+        
         for nombre_sheet in nombres_sheets:
             try:
-                worksheet = sheet.worksheet(nombre_sheet)
-                logging.info(f"📊 Leyendo sheet: {nombre_sheet}")
+                if nombre_sheet not in filas_por_sheet:
+                    estadisticas_sheets[nombre_sheet] = 0
+                    continue
                 
-                # ═══ OBTENER TODAS LAS FILAS ═══
-                todas_filas = worksheet.get_all_values()
+                logging.info(f"📊 Leyendo sheet: {nombre_sheet}")
+                todas_filas = filas_por_sheet[nombre_sheet]
                 logging.info(f"   📍 Total de filas en sheet: {len(todas_filas)}")
                 
                 if len(todas_filas) <= 1:
@@ -304,29 +451,24 @@ def obtener_datos_unicos():
                     estadisticas_sheets[nombre_sheet] = 0
                     continue
                 
-                # ═══ DIAGNÓSTICO: MOSTRAR PRIMERAS FILAS ═══
+                # ═══ DIAGNÓSTICO: MOSTRAR PRIMERAS FILAS (del mismo lote) ═══
                 logging.info(f"   🔍 DIAGNÓSTICO - Primeras 3 filas del sheet:")
                 for row_idx, fila in enumerate(todas_filas[:3]):
                     logging.info(f"      Fila {row_idx}: {fila}")
                 
-                # ═══ LEER COLUMNAS CON VALIDACIÓN ═══
-                cedulas_asociado = worksheet.col_values(2)   # Columna B (índice 1)
-                cedulas_propietario = worksheet.col_values(4) # Columna D (índice 3)
-                placas = worksheet.col_values(6)              # Columna F (índice 5)
-                
-                logging.info(f"   📋 Columna B (Cédula Asociado): {cedulas_asociado[:3]}")
-                logging.info(f"   📋 Columna D (Cédula Propietario): {cedulas_propietario[:3]}")
-                logging.info(f"   📋 Columna F (Placa): {placas[:3]}")
+                # ═══ COLUMNAS B, D y F (la API recorta celdas vacías al final de cada fila) ═══
+                logging.info(f"   📋 Columna B (Cédula Asociado): {[_celda(f, 1) for f in todas_filas[:3]]}")
+                logging.info(f"   📋 Columna D (Cédula Propietario): {[_celda(f, 3) for f in todas_filas[:3]]}")
+                logging.info(f"   📋 Columna F (Placa): {[_celda(f, 5) for f in todas_filas[:3]]}")
                 
                 registros_sheet = 0
                 
                 # ═══ PROCESAR FILAS (saltando encabezado en fila 0) ═══
-                min_len = min(len(cedulas_asociado), len(cedulas_propietario), len(placas))
-                
-                for i in range(1, min_len):  # Comienza en 1 para saltar encabezado
-                    cedula_asoc = str(cedulas_asociado[i]).strip()
-                    cedula_prop = str(cedulas_propietario[i]).strip()
-                    placa = str(placas[i]).strip()
+                for i in range(1, len(todas_filas)):
+                    fila = todas_filas[i]
+                    cedula_asoc = _celda(fila, 1)
+                    cedula_prop = _celda(fila, 3)
+                    placa = _celda(fila, 5)
                     
                     # ═══ VALIDACIÓN BÁSICA ═══
                     if not placa or placa.lower() == "nan":
@@ -348,10 +490,6 @@ def obtener_datos_unicos():
                 
                 logging.info(f"   ✅ {registros_sheet} registros únicos de {nombre_sheet}")
                 
-            except gspread.WorksheetNotFound:
-                logging.warning(f"⚠️  Sheet '{nombre_sheet}' no encontrada")
-                estadisticas_sheets[nombre_sheet] = 0
-                continue
             except Exception as e:
                 logging.error(f"❌ Error leyendo sheet '{nombre_sheet}': {e}")
                 estadisticas_sheets[nombre_sheet] = 0
@@ -534,11 +672,8 @@ def procesar_reintentos_finales_pendientes(driver, datos_validos, max_intentos=5
     NO toca Exitoso ni Sin_Personas
     """
     
-    estado = cargar_estado()
-    placas_procesadas = estado.get("resumen", {}).get("placas_procesadas", {})
-    
-    # Obtener SOLO los Pendiente
-    pendientes = {placa: est for placa, est in placas_procesadas.items() if est == "Pendiente"}
+    # Obtener SOLO los Pendiente (consulta indexada)
+    pendientes = {placa: "Pendiente" for placa in estado_db.placas_con_estado(PROCESO_ESTADO, "Pendiente")}
     
     if not pendientes:
         logging.info(f"\n✅ No hay registros 'Pendiente' por reintentar")
@@ -664,10 +799,7 @@ def procesar_reintentos_finales_pendientes(driver, datos_validos, max_intentos=5
             logging.error(f"❌ {placa}: Sin personas (CONFIRMADO)")
             
             # Cambiar estado de Pendiente → Sin_Personas
-            estado = cargar_estado()
-            estado["resumen"]["placas_procesadas"][placa] = "Sin_Personas"
-            with open(ESTADO_FILE, "w", encoding="utf-8") as f:
-                json.dump(estado, f, indent=2, ensure_ascii=False)
+            actualizar_estado_resumen(placa, "Sin_Personas")
             
             guardar_resultado_en_resultados(cedula_a, cedula_p, placa, cedula_a, "Falló - Sin personas")
 
@@ -852,6 +984,7 @@ def generar_reporte_final(tracking):
 # GUARDAR EN HOJA "RESULTADOS"
 # ═════════════════════════════════════════════════════════════
 
+@_escritura_centralizada
 def guardar_resultado_en_resultados(cedula_asociado, cedula_propietario, placa, cedula_usada, estado_final):
     """
     Guarda el resultado en la hoja 'Resultados':
@@ -866,49 +999,17 @@ def guardar_resultado_en_resultados(cedula_asociado, cedula_propietario, placa,
     ⭐ SI NO EXISTE, CREA UNA NUEVA
     """
     try:
-        SCOPES = [
-            "https://spreadsheets.google.com/feeds",
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive"
-        ]
-
-        creds = Credentials.from_service_account_file(
-            str(GOOGLE_CREDS),
-            scopes=SCOPES
-        )
-
-        client = gspread.authorize(creds)
-        sheet = client.open_by_key("1hYwf3AMdUWY6Lk6VjeGKPiDnR003ftkybv79b_pUN64")
-        
-        # ═══ OBTENER WORKSHEET ═══
+        # ═══ VERIFICAR QUE LA HOJA EXISTA (worksheet cacheada en la sesión) ═══
         try:
-            worksheet = sheet.worksheet("Resultados")
-            logging.info("✅ Hoja 'Resultados' encontrada")
+            sheets_session.obtener_worksheet(SHEET_ID_RESULTADOS, "Resultados")
         except gspread.WorksheetNotFound:
             logging.error(f"❌ Hoja 'Resultados' NO encontrada. Debes crearla manualmente con los encabezados en la fila 1")
             return
         
-        # ═══ OBTENER TODAS LAS FILAS ═══
-        todas_filas = worksheet.get_all_values()
-        logging.info(f"📊 Total de filas en Resultados: {len(todas_filas)}")
-        
-        # ═══ BUSCAR SI YA EXISTE ESTA PLACA + CÉDULA ASOCIADO ═══
-        fila_existente = None
-        numero_fila_existente = None
-        
-        for idx, fila in enumerate(todas_filas[1:], start=2):  # Comienza desde fila 2 (saltando encabezado)
-            # Columna C (índice 2) es la placa
-            # Columna A (índice 0) es la cédula asociado
-            if len(fila) > 2:
-                placa_en_fila = fila[2].strip() if len(fila) > 2 else ""
-                cedula_en_fila = fila[0].strip() if len(fila) > 0 else ""
-                
-                if placa_en_fila == placa.strip() and cedula_en_fila == cedula_asociado.strip():
-                    fila_existente = fila
-                    numero_fila_existente = idx
-                    logging.info(f"🔍 Fila existente encontrada en fila {numero_fila_existente}")
-                    logging.info(f"   Contenido actual: {fila}")
-                    break
+        # ═══ BUSCAR SI YA EXISTE ESTA PLACA + CÉDULA ASOCIADO (índice en memoria) ═══
+        indice = indice_filas.obtener_indice(SHEET_ID_RESULTADOS, "Resultados", columnas_clave=(1, 3),
+                                             primera_fila_datos=2, fila_minima_nueva=2)
+        numero_fila, existia = indice.buscar_o_reservar(cedula_asociado, placa)
         
         # ═══ PREPARAR DATOS ═══
         estado_texto = "Funcionó" if estado_final == "Exitoso" else "Falló"
@@ -921,42 +1022,23 @@ def guardar_resultado_en_resultados(cedula_asociado, cedula_propietario, placa,
             cedula_usada
         ]
         
-        # ═══ ACTUALIZAR O CREAR NUEVA ═══
-        if numero_fila_existente:
-            # ⭐ ACTUALIZAR FILA EXISTENTE (SIN DUPLICAR)
-            logging.info(f"\n🔄 ACTUALIZANDO fila {numero_fila_existente}")
-            logging.info(f"   Anterior: {fila_existente}")
-            logging.info(f"   Nuevo:    {nueva_fila}")
-            
-            rango = f"A{numero_fila_existente}:F{numero_fila_existente}"
-            worksheet.update([nueva_fila], range_name=rango, value_input_option="RAW")
-            
-            logging.info(f"✅ Resultado ACTUALIZADO en 'Resultados' (fila {numero_fila_existente}):")
-            logging.info(f"   Cédula Asociado: {cedula_asociado}")
-            logging.info(f"   Cédula Propietario: {cedula_propietario}")
-            logging.info(f"   Placa: {placa}")
-            logging.info(f"   Estado: {estado_texto}")
-            logging.info(f"   Cédula Usada: {cedula_usada}")
-            
+        # ═══ ACTUALIZAR O CREAR NUEVA (un solo rango A:F, enviado en lote) ═══
+        if existia:
+            logging.info(f"\n🔄 ACTUALIZANDO fila {numero_fila}")
         else:
-            # ⭐ CREAR NUEVA FILA (al final, sin duplicados)
-            fila_nueva = len(todas_filas) + 1
-            
-            if fila_nueva < 2:
-                fila_nueva = 2
-            
-            logging.info(f"\n📝 CREANDO nueva fila {fila_nueva}")
+            logging.info(f"\n📝 CREANDO nueva fila {numero_fila}")
             logging.info(f"   (No existía previamente)")
-            
-            rango = f"A{fila_nueva}:F{fila_nueva}"
-            worksheet.update([nueva_fila], range_name=rango, value_input_option="RAW")
-            
-            logging.info(f"✅ Resultado INSERTADO en 'Resultados' (fila {fila_nueva}):")
-            logging.info(f"   Cédula Asociado: {cedula_asociado}")
-            logging.info(f"   Cédula Propietario: {cedula_propietario}")
-            logging.info(f"   Placa: {placa}")
-            logging.info(f"   Estado: {estado_texto}")
-            logging.info(f"   Cédula Usada: {cedula_usada}")
+        logging.info(f"   Nuevo:    {nueva_fila}")
+        
+        escritor_sheets.encolar_fila(SHEET_ID_RESULTADOS, "Resultados", numero_fila, nueva_fila)
+        
+        accion = "ACTUALIZADO" if existia else "INSERTADO"
+        logging.info(f"✅ Resultado {accion} en 'Resultados' (fila {numero_fila}):")
+        logging.info(f"   Cédula Asociado: {cedula_asociado}")
+        logging.info(f"   Cédula Propietario: {cedula_propietario}")
+        logging.info(f"   Placa: {placa}")
+        logging.info(f"   Estado: {estado_texto}")
+        logging.info(f"   Cédula Usada: {cedula_usada}")
         
     except Exception as e:
         logging.error(f"❌ Error escribiendo en 'Resultados': {e}", exc_info=True)
@@ -969,32 +1051,19 @@ def guardar_resultado_en_resultados(cedula_asociado, cedula_propietario, placa,
 
 
 
+_hojas_con_encabezados = set()  # (sheet_id, hoja) cuyo encabezado ya se verificó en este proceso
+
+@_escritura_centralizada
 def escribir_datos_vehiculo_sheets(datos_vehiculo, fila_destino=None):
     """
     Escribe los datos del vehículo en la hoja 'Datos Vehiculo' de Google Sheets.
     Si no se especifica fila, busca la primera fila vacía.
     """
     try:
-        SCOPES = [
-            "https://spreadsheets.google.com/feeds",
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive"
-        ]
-
-        creds = Credentials.from_service_account_file(
-            str(GOOGLE_CREDS),
-            scopes=SCOPES
+        # Acceder a la hoja "Datos Vehiculo" (la crea si no existe)
+        worksheet = sheets_session.obtener_worksheet(
+            SHEET_ID_DATOS_VEHICULO, "Datos Vehiculo", crear_si_no_existe=True, rows=1000, cols=40
         )
-
-        client = gspread.authorize(creds)
-        sheet = client.open_by_key("1oc6vcS6Y7i1IyxuEoFwsQAdPTMQCBJbixpmP8c-oOVw")
-        
-        # Acceder a la hoja "Datos Vehiculo"
-        try:
-            worksheet = sheet.worksheet("Datos Vehiculo")
-        except gspread.WorksheetNotFound:
-            worksheet = sheet.add_worksheet(title="Datos Vehiculo", rows=1000, cols=40)
-            logging.info("📝 Hoja 'Datos Vehiculo' creada")
         
         # Definir el orden de las columnas
         encabezados = [
@@ -1009,19 +1078,20 @@ def escribir_datos_vehiculo_sheets(datos_vehiculo, fila_destino=None):
             "REPOTENCIADO", "PUERTAS"
         ]
         
-        # Verificar si la hoja tiene encabezados
-        primera_fila = worksheet.row_values(1)
-        if not primera_fila or primera_fila[0] != "PLACA":
-            logging.info("📝 Escribiendo encabezados en 'Datos Vehiculo'")
-            for col_num, encabezado in enumerate(encabezados, start=1):
-                worksheet.update_cell(1, col_num, encabezado)
-            fila_datos = 2
+        # Verificar si la hoja tiene encabezados (una vez por proceso)
+        if (SHEET_ID_DATOS_VEHICULO, "Datos Vehiculo") not in _hojas_con_encabezados:
+            primera_fila = worksheet.row_values(1)
+            if not primera_fila or primera_fila[0] != "PLACA":
+                logging.info("📝 Escribiendo encabezados en 'Datos Vehiculo'")
+                escritor_sheets.escribir_fila(worksheet, 1, encabezados)
+            _hojas_con_encabezados.add((SHEET_ID_DATOS_VEHICULO, "Datos Vehiculo"))
+        
+        if fila_destino:
+            fila_datos = fila_destino
         else:
-            if fila_destino:
-                fila_datos = fila_destino
-            else:
-                todas_placas = worksheet.col_values(1)
-                fila_datos = len(todas_placas) + 1
+            indice = indice_filas.obtener_indice(SHEET_ID_DATOS_VEHICULO, "Datos Vehiculo", columnas_clave=(1,),
+                                                 primera_fila_datos=2, fila_minima_nueva=2)
+            fila_datos = indice.reservar_fila_nueva(datos_vehiculo.get("PLACA", ""))
         
         # Preparar los datos
         fila_valores = []
@@ -1029,9 +1099,8 @@ def escribir_datos_vehiculo_sheets(datos_vehiculo, fila_destino=None):
             valor = datos_vehiculo.get(encabezado, "No disponible")
             fila_valores.append(valor)
         
-        # Escribir los datos
-        for col_num, valor in enumerate(fila_valores, start=1):
-            worksheet.update_cell(fila_datos, col_num, valor)
+        # Escribir los datos (una sola fila A:AE, enviada en lote)
+        escritor_sheets.encolar_fila(SHEET_ID_DATOS_VEHICULO, "Datos Vehiculo", fila_datos, fila_valores)
         
         logging.info(f"✅ Datos de vehículo escritos en fila {fila_datos} de 'Datos Vehiculo'")
         return fila_datos
@@ -1042,6 +1111,7 @@ def escribir_datos_vehiculo_sheets(datos_vehiculo, fila_destino=None):
 
 # ==================== FUNCIÓN MODIFICADA: guardar_en_sheets ====================
 
+@_escritura_centralizada
 def guardar_en_sheets(resultados, actualizar_existente=False):
     """
     Guarda los resultados en Google Sheets - Cilindraje en columna D
@@ -1050,20 +1120,8 @@ def guardar_en_sheets(resultados, actualizar_existente=False):
     Si actualizar_existente=False: Agrega nueva fila al final
     """
     try:
-        SCOPES = [
-            "https://spreadsheets.google.com/feeds",
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive"
-        ]
-
-        creds = Credentials.from_service_account_file(
-            str(GOOGLE_CREDS),
-            scopes=SCOPES
-        )
-
-        client = gspread.authorize(creds)
-        sheet = client.open_by_key("1hYwf3AMdUWY6Lk6VjeGKPiDnR003ftkybv79b_pUN64")
-        worksheet = sheet.worksheet("Datos Runt")
+        indice = indice_filas.obtener_indice(SHEET_ID_RESULTADOS, "Datos Runt", columnas_clave=(3,),
+                                             primera_fila_datos=1, fila_minima_nueva=3)
 
         # ═══ PROCESAR CADA RESULTADO ═══
         for r in resultados:
@@ -1095,21 +1153,10 @@ def guardar_en_sheets(resultados, actualizar_existente=False):
             
             placa = r["placa"]
             
-            # ═══ OBTENER TODAS LAS FILAS PARA BUSCAR PLACA ═══
-            todas_filas = worksheet.get_all_values()
-            logging.info(f"📊 Buscando placa {placa} en {len(todas_filas)} filas...")
-            
-            # ═══ BUSCAR LA FILA DONDE ESTÁ ESTA PLACA (columna C = índice 2) ═══
-            numero_fila_existente = None
-            
-            for idx, fila in enumerate(todas_filas):
-                if len(fila) > 2:  # Asegurar que tiene al menos 3 columnas
-                    placa_en_fila = fila[2].strip() if fila[2] else ""
-                    
-                    if placa_en_fila == placa.strip():
-                        numero_fila_existente = idx + 1  # +1 porque Google Sheets es 1-indexed
-                        logging.info(f"🔍 ¡PLACA ENCONTRADA en fila {numero_fila_existente}!")
-                        break
+            # ═══ BUSCAR LA FILA DE ESTA PLACA (columna C) EN EL ÍNDICE ═══
+            numero_fila_existente = indice.buscar(placa)
+            if numero_fila_existente:
+                logging.info(f"🔍 ¡PLACA ENCONTRADA en fila {numero_fila_existente}!")
             
             # ═══ ACTUALIZAR O CREAR NUEVA ═══
             if numero_fila_existente and actualizar_existente:
@@ -1119,34 +1166,16 @@ def guardar_en_sheets(resultados, actualizar_existente=False):
                 logging.info(f"   Tiempo: {r['Tiempo ejecucion']}")
                 logging.info(f"   Estado: {r['estado']}")
                 
-                # Calcular el rango dinámicamente (A:S o más allá si hay más columnas)
-                num_columnas = len(fila_valores)
-                col_final = chr(64 + num_columnas)  # A=65, B=66, etc.
-                
-                rango = f"A{numero_fila_existente}:{col_final}{numero_fila_existente}"
+                # Rango calculado según la cantidad de columnas (A:S, o más allá de Z si crece)
+                rango = escritor_sheets.encolar_fila(SHEET_ID_RESULTADOS, "Datos Runt",
+                                                     numero_fila_existente, fila_valores)
                 
-                try:
-                    worksheet.update([fila_valores], range_name=rango, value_input_option="RAW")
-                    logging.info(f"✅ FILA ACTUALIZADA en {rango}")
-                    logging.info(f"   ✓ Tiempo ejecucion: {r['Tiempo ejecucion']}")
-                    logging.info(f"   ✓ Cedula: {r['cedula']}")
-                    logging.info(f"   ✓ Placa: {placa}")
-                    logging.info(f"   ✓ Cilindraje: {r.get('cilindraje', 'No disponible')}")
-                    logging.info(f"   ✓ Estado: {r['estado']}")
-                    
-                except Exception as e:
-                    logging.error(f"❌ Error en update: {e}")
-                    logging.warning("🔄 Intentando método alternativo...")
-                    
-                    # Método alternativo: actualizar celda por celda
-                    for col_num, valor in enumerate(fila_valores, start=1):
-                        try:
-                            worksheet.update_cell(numero_fila_existente, col_num, valor)
-                            time.sleep(0.05)
-                        except Exception as cell_error:
-                            logging.warning(f"⚠️ Error actualizando celda ({numero_fila_existente},{col_num}): {cell_error}")
-                    
-                    logging.info(f"✅ Fila actualizada (método celda por celda)")
+                logging.info(f"✅ FILA ACTUALIZADA en {rango} (en cola de envío)")
+                logging.info(f"   ✓ Tiempo ejecucion: {r['Tiempo ejecucion']}")
+                logging.info(f"   ✓ Cedula: {r['cedula']}")
+                logging.info(f"   ✓ Placa: {placa}")
+                logging.info(f"   ✓ Cilindraje: {r.get('cilindraje', 'No disponible')}")
+                logging.info(f"   ✓ Estado: {r['estado']}")
             
             elif numero_fila_existente and not actualizar_existente:
                 # ⭐ SI LA PLACA EXISTE PERO NO QUEREMOS ACTUALIZAR
@@ -1155,37 +1184,16 @@ def guardar_en_sheets(resultados, actualizar_existente=False):
             
             else:
                 # ⭐ CREAR NUEVA FILA (NO EXISTE LA PLACA)
-                fila_nueva = len(todas_filas) + 1
-                
-                if fila_nueva < 3:
-                    fila_nueva = 3
+                fila_nueva = indice.reservar_fila_nueva(placa)
                 
                 logging.info(f"\n📝 CREANDO NUEVA FILA {fila_nueva}")
                 logging.info(f"   (Placa {placa} no existía previamente)")
                 
-                num_columnas = len(fila_valores)
-                col_final = chr(64 + num_columnas)
+                rango = escritor_sheets.encolar_fila(SHEET_ID_RESULTADOS, "Datos Runt", fila_nueva, fila_valores)
                 
-                rango = f"A{fila_nueva}:{col_final}{fila_nueva}"
-                
-                try:
-                    worksheet.update([fila_valores], range_name=rango, value_input_option="RAW")
-                    logging.info(f"✅ NUEVA FILA INSERTADA en {rango}")
-                    logging.info(f"   ✓ Placa: {placa}")
-                    logging.info(f"   ✓ Estado: {r['estado']}")
-                    
-                except Exception as e:
-                    logging.error(f"❌ Error en insert: {e}")
-                    logging.warning("🔄 Intentando método alternativo...")
-                    
-                    for col_num, valor in enumerate(fila_valores, start=1):
-                        try:
-                            worksheet.update_cell(fila_nueva, col_num, valor)
-                            time.sleep(0.05)
-                        except Exception as cell_error:
-                            logging.warning(f"⚠️ Error insertando en ({fila_nueva},{col_num}): {cell_error}")
-                    
-                    logging.info(f"✅ Nueva fila insertada (método celda por celda)")
+                logging.info(f"✅ NUEVA FILA INSERTADA en {rango} (en cola de envío)")
+                logging.info(f"   ✓ Placa: {placa}")
+                logging.info(f"   ✓ Estado: {r['estado']}")
 
         logging.info(f"\n✅ PROCESO DE GUARDADO COMPLETADO")
 
@@ -1199,8 +1207,69 @@ def guardar_en_sheets(resultados, actualizar_existente=False):
 # DRIVER - MANTIENE FUNCIÓN ORIGINAL
 # ═════════════════════════════════════════════════════════════
 
-def iniciar_driver(max_attempts=3):
-    """Inicia el driver de Chrome"""
+_ruta_chromedriver = None  # Memo en el proceso: se resuelve una sola vez
+
+def _leer_cache_chromedriver():
+    try:
+        with open(CHROMEDRIVER_CACHE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+def invalidar_cache_chromedriver():
+    """Olvida la ruta resuelta (ej: Chrome se actualizó y el driver ya no sirve)"""
+    global _ruta_chromedriver
+    _ruta_chromedriver = None
+    try:
+        os.remove(CHROMEDRIVER_CACHE_FILE)
+    except OSError:
+        pass
+
+def resolver_chromedriver():
+    """
+    Ruta del chromedriver SIN consultar la red en cada arranque:
+    1. memo del proceso
+    2. chromedriver_cache.json (si el archivo existe y coincide con CHROMEDRIVER_VERSION)
+    3. ChromeDriverManager().install() y se guarda en la caché
+    4. Sin red: la ruta en caché aunque no coincida la versión, o chromedriver del PATH
+    Devuelve None si no hay ninguna (Selenium intentará resolverlo por su cuenta).
+    """
+    global _ruta_chromedriver
+
+    if _ruta_chromedriver and os.path.exists(_ruta_chromedriver):
+        return _ruta_chromedriver
+
+    cache = _leer_cache_chromedriver()
+    ruta_cache = cache.get("ruta")
+    if ruta_cache and os.path.exists(ruta_cache) and cache.get("version") == CHROMEDRIVER_VERSION:
+        _ruta_chromedriver = ruta_cache
+        return _ruta_chromedriver
+
+    try:
+        ruta = ChromeDriverManager(driver_version=CHROMEDRIVER_VERSION).install()
+        with open(CHROMEDRIVER_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump({"ruta": ruta, "version": CHROMEDRIVER_VERSION,
+                       "resuelto": datetime.now().isoformat()}, f, ensure_ascii=False)
+        logging.info(f"✅ Chromedriver resuelto y guardado en caché: {ruta}")
+        _ruta_chromedriver = ruta
+        return _ruta_chromedriver
+    except Exception as e:
+        logging.warning(f"⚠️ No se pudo resolver chromedriver en línea: {e}")
+
+    # Sin red: usar lo que haya
+    ruta_local = ruta_cache if ruta_cache and os.path.exists(ruta_cache) else shutil.which("chromedriver")
+    if ruta_local:
+        logging.warning(f"⚠️ Usando chromedriver local sin verificar versión: {ruta_local}")
+        _ruta_chromedriver = ruta_local
+    return _ruta_chromedriver
+
+def iniciar_driver(max_attempts=3, perfil=None):
+    """
+    Inicia el driver de Chrome.
+
+    perfil: nombre del user-data-dir persistente en PERFILES_CHROME_FOLDER
+            (por defecto "principal" si USAR_PERFIL_PERSISTENTE está activo)
+    """
     for attempt in range(max_attempts):
         try:
             options = webdriver.ChromeOptions()
@@ -1209,18 +1278,105 @@ def iniciar_driver(max_attempts=3):
             options.add_argument("--no-sandbox")
             options.add_argument("--disable-blink-features=AutomationControlled")
 
-            service = ChromeService(ChromeDriverManager().install())
+            # Arranque más liviano: sin tareas de fondo, primera ejecución ni sincronización
+            options.add_argument("--no-first-run")
+            options.add_argument("--no-default-browser-check")
+            options.add_argument("--disable-extensions")
+            options.add_argument("--disable-background-networking")
+            options.add_argument("--disable-component-update")
+            options.add_argument("--disable-default-apps")
+            options.add_argument("--disable-sync")
+            options.add_argument("--disable-dev-shm-usage")
+            options.add_argument("--metrics-recording-only")
+            options.add_argument("--password-store=basic")
+
+            # Presupuesto de recursos por sesión (para poner muchos workers por servidor)
+            options.add_argument(f"--renderer-process-limit={LIMITE_PROCESOS_RENDERER}")
+            options.add_argument(f"--js-flags=--max-old-space-size={MEMORIA_MAXIMA_MB}")
+            if MODO_HEADLESS:
+                ancho, alto = TAMANO_VIEWPORT
+                options.add_argument("--headless=new")
+                options.add_argument(f"--window-size={ancho},{alto}")
+                options.add_argument(f"--force-device-scale-factor={FACTOR_ESCALA}")
+                options.add_argument("--hide-scrollbars")
+                options.add_argument("--mute-audio")
+            if CAPTURA_RED:
+                captura_red.opciones_driver(options)
+            if BLOQUEAR_IMAGENES:
+                options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+
+            if perfil or USAR_PERFIL_PERSISTENTE:
+                carpeta_perfil = PERFILES_CHROME_FOLDER / (perfil or "principal")
+                carpeta_perfil.mkdir(parents=True, exist_ok=True)
+                options.add_argument(f"--user-data-dir={carpeta_perfil}")
+
+            ruta_driver = resolver_chromedriver()
+            service = ChromeService(ruta_driver) if ruta_driver else ChromeService()
             driver = webdriver.Chrome(service=service, options=options)
 
             return driver
 
         except WebDriverException as e:
             logging.error(f"Intento {attempt + 1} fallido al iniciar driver: {e}")
+            # Puede ser un chromedriver en caché que ya no coincide con Chrome
+            invalidar_cache_chromedriver()
             time.sleep(2)
 
     logging.error("❌ No se pudo iniciar el driver tras varios intentos.")
     return None
 
+def preparar_ventana(driver):
+    """
+    Reemplaza a driver.maximize_window():
+    - En headless, viewport y escala fijos (Emulation.setDeviceMetricsOverride) → capturas idénticas;
+      con ventana visible se maximiza (un viewport forzado no coincide con la ventana real)
+    - Bloqueo de fuentes / analítica (Network.setBlockedURLs)
+    - En headless, user-agent sin "HeadlessChrome"
+    """
+    if not MODO_HEADLESS:
+        driver.maximize_window()
+
+    try:
+        if MODO_HEADLESS:
+            ancho, alto = TAMANO_VIEWPORT
+            driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", {
+                "width": ancho, "height": alto, "deviceScaleFactor": FACTOR_ESCALA, "mobile": False
+            })
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": URLS_BLOQUEADAS})
+        driver.execute_cdp_cmd("Performance.enable", {})
+        esperas.instalar_monitor_red(driver)
+
+        if MODO_HEADLESS:
+            agente = driver.execute_cdp_cmd("Browser.getVersion", {}).get("userAgent", "")
+            driver.execute_cdp_cmd("Network.setUserAgentOverride",
+                                   {"userAgent": agente.replace("HeadlessChrome", "Chrome")})
+    except Exception as e:
+        logging.warning(f"⚠️ No se pudo ajustar la ventana por CDP: {e}")
+
+def memoria_excedida(driver):
+    """True si el heap JS de la sesión superó MEMORIA_MAXIMA_MB (Performance.getMetrics)"""
+    try:
+        metricas = driver.execute_cdp_cmd("Performance.getMetrics", {}).get("metrics", [])
+    except Exception:
+        return False
+
+    heap = next((m["value"] for m in metricas if m["name"] == "JSHeapUsedSize"), 0)
+    heap_mb = heap / (1024 * 1024)
+    if heap_mb > MEMORIA_MAXIMA_MB:
+        logging.warning(f"🧠 Heap JS en {heap_mb:.0f} MB (presupuesto {MEMORIA_MAXIMA_MB} MB)")
+        return True
+    return False
+
+def reciclar_driver(driver, perfil=None):
+    """Cierra el navegador y abre uno nuevo ya preparado (None si no se pudo)"""
+    logging.info("♻️  Reciclando navegador...")
+    cerrar_driver(driver)
+    nuevo = iniciar_driver(perfil=perfil)
+    if nuevo:
+        preparar_ventana(nuevo)
+    return nuevo
+
 def cerrar_driver(driver):
     """Cierra el driver de Chrome"""
     try:
@@ -1237,25 +1393,12 @@ def cerrar_driver(driver):
 def limpiar_campo_input(driver, element, campo_nombre=""):
     """Limpia un campo de input de forma AGRESIVA"""
     try:
+        # send_keys es síncrono: no hace falta dormir entre acciones
         element.click()
-        time.sleep(0.3)
-        
         element.clear()
-        time.sleep(0.3)
-        
         element.send_keys(Keys.CONTROL + "a")
-        time.sleep(0.2)
         element.send_keys(Keys.DELETE)
-        time.sleep(0.3)
-        
-        for _ in range(20):
-            element.send_keys(Keys.BACKSPACE)
-            time.sleep(0.05)
-        
-        time.sleep(0.3)
-        
-        driver.execute_script("arguments[0].value = '';", element)
-        time.sleep(0.2)
+        element.send_keys(Keys.BACKSPACE * 20)
         
         driver.execute_script("""
             arguments[0].value = '';
@@ -1263,7 +1406,7 @@ def limpiar_campo_input(driver, element, campo_nombre=""):
             arguments[0].dispatchEvent(new Event('change', { bubbles: true }));
             arguments[0].dispatchEvent(new Event('blur', { bubbles: true }));
         """, element)
-        time.sleep(0.3)
+        esperas.pausa("tras_limpiar")
         
         logging.info(f"✅ Campo '{campo_nombre}' limpiado")
         
@@ -1281,20 +1424,14 @@ def limpiar_todos_los_campos(driver):
             try:
                 if inp.is_displayed():
                     inp.click()
-                    time.sleep(0.1)
                     inp.clear()
-                    time.sleep(0.1)
                     inp.send_keys(Keys.CONTROL + "a")
-                    time.sleep(0.05)
                     inp.send_keys(Keys.DELETE)
-                    time.sleep(0.1)
-                    
                     driver.execute_script("arguments[0].value = '';", inp)
-                    time.sleep(0.05)
             except:
                 pass
         
-        time.sleep(0.5)
+        esperas.pausa("tras_limpiar")
         logging.info(f"✅ Se limpiaron {len(todos_los_inputs)} campos")
         
     except Exception as e:
@@ -1306,7 +1443,6 @@ def limpiar_campos_individuales_validado(driver, cedula, placa):
         logging.info("🔧 Iniciando limpieza individual y validada de campos...")
         
         driver.execute_script("window.scrollTo(0, 0);")
-        time.sleep(1)
         
         # ═══ LIMPIAR CAMPO PLACA ═══
         try:
@@ -1316,14 +1452,12 @@ def limpiar_campos_individuales_validado(driver, cedula, placa):
             )
             
             driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", placa_input)
-            time.sleep(0.5)
             limpiar_campo_input(driver, placa_input, "PLACA")
             logging.info(f"   ✅ Campo PLACA limpiado correctamente")
             
         except Exception as e:
             logging.error(f"   ⚠️ Error limpiando PLACA: {e}")
         
-        time.sleep(0.5)
         
         # ═══ LIMPIAR CAMPO CÉDULA ═══
         try:
@@ -1333,21 +1467,18 @@ def limpiar_campos_individuales_validado(driver, cedula, placa):
             )
             
             driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", cedula_input)
-            time.sleep(0.5)
             limpiar_campo_input(driver, cedula_input, "CÉDULA")
             logging.info(f"   ✅ Campo CÉDULA limpiado correctamente")
             
         except Exception as e:
             logging.error(f"   ⚠️ Error limpiando CÉDULA: {e}")
         
-        time.sleep(0.5)
         
         # ═══ LIMPIAR CAMPO CAPTCHA ═══
         try:
             logging.info("🧹 Limpiando campo CAPTCHA...")
             
             driver.execute_script("window.scrollBy(0, 300);")
-            time.sleep(1)
             
             captcha_inputs = driver.find_elements(By.TAG_NAME, "input")
             captcha_field = None
@@ -1373,6 +1504,109 @@ def limpiar_campos_individuales_validado(driver, cedula, placa):
         logging.error(f"❌ Error en limpieza individual: {e}")
         return False
 
+# ═════════════════════════════════════════════════════════════
+# LLENADO DEL FORMULARIO
+# ═════════════════════════════════════════════════════════════
+
+# Asigna los valores con el setter nativo de HTMLInputElement (el que Angular
+# no intercepta) y dispara input / change / blur para que el formulario
+# reactivo valide. Devuelve lo que quedó en cada campo para verificarlo.
+SCRIPT_LLENAR_FORMULARIO = """
+var valores = arguments[0];
+var setter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;
+var visibles = Array.prototype.filter.call(document.querySelectorAll('input'), function (e) {
+    return !!(e.offsetWidth || e.offsetHeight || e.getClientRects().length);
+});
+var campos = {
+    placa: document.querySelector('input[formcontrolname="placa"]'),
+    documento: document.querySelector('input[formcontrolname="documento"]'),
+    captcha: visibles.length ? visibles[visibles.length - 1] : null
+};
+var escritos = {};
+Object.keys(valores).forEach(function (nombre) {
+    var campo = campos[nombre];
+    if (!campo) { escritos[nombre] = null; return; }
+    campo.focus();
+    setter.call(campo, valores[nombre]);
+    campo.dispatchEvent(new Event('input', {bubbles: true}));
+    campo.dispatchEvent(new Event('change', {bubbles: true}));
+    campo.dispatchEvent(new Event('blur', {bubbles: true}));
+    escritos[nombre] = campo.value;
+});
+return escritos;
+"""
+
+def llenar_formulario_js(driver, valores):
+    """
+    Llena varios campos en UN solo execute_script.
+
+    Args:
+        valores: {"placa": ..., "documento": ..., "captcha": ...} (cualquier subconjunto)
+
+    Returns:
+        True si todos los campos quedaron con el valor pedido
+    """
+    try:
+        pedidos = {nombre: str(valor).strip() for nombre, valor in valores.items()}
+        escritos = driver.execute_script(SCRIPT_LLENAR_FORMULARIO, pedidos) or {}
+        
+        for nombre, valor in pedidos.items():
+            escrito = escritos.get(nombre)
+            if escrito is None or escrito.strip().upper() != valor.upper():
+                logging.warning(f"⚠️ Campo '{nombre}' quedó con '{escrito}' (esperado '{valor}')")
+                return False
+        
+        logging.info(f"✅ Formulario llenado por JS: {', '.join(pedidos)}")
+        return True
+    except Exception as e:
+        logging.error(f"⚠️ Error llenando formulario por JS: {e}")
+        return False
+
+def llenar_placa_y_cedula_teclado(driver, placa, cedula):
+    """Camino lento: limpia y escribe placa y cédula carácter por carácter"""
+    for nombre, selector, valor in (("PLACA", 'input[formcontrolname="placa"]', placa),
+                                    ("CÉDULA", 'input[formcontrolname="documento"]', cedula)):
+        try:
+            campo = WebDriverWait(driver, 10).until(
+                EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
+            )
+            logging.info(f"📝 Llenando {nombre.lower()}...")
+            
+            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", campo)
+            limpiar_campo_input(driver, campo, nombre)
+            
+            for char in str(valor).strip():
+                campo.send_keys(char)
+                esperas.pausa("tecla")
+            
+            logging.info(f"✅ {nombre.capitalize()} escrita: {valor}")
+        except Exception as e:
+            logging.error(f"❌ Error al llenar {nombre.lower()}: {e}")
+            return False
+    return True
+
+def escribir_captcha_teclado(driver, texto):
+    """Camino lento: escribe el captcha en el último input visible"""
+    captcha_field = None
+    for inp in driver.find_elements(By.TAG_NAME, "input"):
+        if inp.is_displayed():
+            captcha_field = inp
+    
+    if not captcha_field:
+        logging.error("❌ No se encontró el campo de captcha")
+        return False
+    
+    logging.info("🧹 Limpiando campo de captcha...")
+    limpiar_campo_input(driver, captcha_field, "CAPTCHA")
+    
+    logging.info(f"⌨️ Escribiendo: {texto}")
+    for char in texto:
+        captcha_field.send_keys(char)
+        esperas.pausa("tecla_captcha")
+    
+    logging.info("✅ Captcha escrito")
+    return True
+
 # ═════════════════════════════════════════════════════════════
 # FUNCIONES ANGULAR MATERIAL - ⭐ MEJORADAS
 # ════════════════════��════════════════════════════════════════
@@ -1392,9 +1626,9 @@ def abrir_seccion_angular(driver, texto_del_titulo):
             return True
 
         driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", header)
-        time.sleep(0.5)
         driver.execute_script("arguments[0].click();", header)
-        time.sleep(2)
+        if not esperas.esperar_panel_expandido(driver, header):
+            logging.warning(f"⚠️ El panel '{texto_del_titulo}' no confirmó la apertura a tiempo")
         return True
     except Exception as e:
         logging.error(f"❌ No se pudo abrir {texto_del_titulo}: {e}")
@@ -1415,7 +1649,8 @@ def cerrar_todos_los_paneles(driver):
         
         cantidad = driver.execute_script(script_cerrar)
         logging.info(f"✅ Se cerraron {cantidad} paneles")
-        time.sleep(1)
+        if cantidad:
+            esperas.esperar_paneles_cerrados(driver)
         return True
     except Exception as e:
         logging.error(f"⚠️ Error cerrando paneles: {e}")
@@ -1425,12 +1660,43 @@ def cerrar_todos_los_paneles(driver):
 # CAPTCHA
 # ═════════════════════════════════════════════════════════════
 
-def capturar_captcha(driver, placa, carpeta_temp=CAPTCHA_FOLDER):
-    """Captura la imagen del captcha"""
+XPATH_CAPTCHA_IMAGEN = "/html/body/host-runt-root/app-layout/app-theme-runt2/mat-sidenav-container/mat-sidenav-content/div/ng-component/div/div[2]/div[1]/form/div[2]/div/mat-card/mat-card-content/div[7]/div[3]/img"
+
+# Pide otro captcha sin enviar el formulario: busca junto a la imagen un
+# control de recarga (botón / ícono refresh, title o aria-label "nuevo",
+# "recargar", "actualizar") y si no hay, clickea la imagen misma.
+# Devuelve el src anterior para esperar a que cambie.
+SCRIPT_REFRESCAR_CAPTCHA = """
+var img = document.evaluate(arguments[0], document, null,
+                            XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (!img) {
+    img = Array.from(document.querySelectorAll('img')).find(function (i) { return i.offsetParent !== null; });
+}
+if (!img) { return null; }
+
+var patron = /refresh|autorenew|cached|replay|recarg|actualiz|nuevo|otro|cambiar/i;
+var contenedor = img.parentElement;
+var control = null;
+for (var nivel = 0; nivel < 3 && contenedor && !control; nivel++) {
+    control = Array.from(contenedor.querySelectorAll('button, a, mat-icon, i, [role=button]')).find(function (e) {
+        var texto = [e.textContent, e.getAttribute('title'), e.getAttribute('aria-label'),
+                     e.getAttribute('mattooltip'), e.className].join(' ');
+        return e.offsetParent !== null && patron.test(texto);
+    }) || null;
+    contenedor = contenedor.parentElement;
+}
+
+// Sin control de refresco no se clickea nada: el llamador envía la lectura actual
+if (control) { (control.closest('button, a, [role=button]') || control).click(); }
+return {control: !!control, src: img.src};
+"""
+
+def capturar_png_captcha(driver):
+    """PNG crudo del <img> del captcha (None si no hay imagen)"""
     try:
         logging.info("🔍 Buscando imagen del captcha...")
         
-        xpath_imagen = "/html/body/host-runt-root/app-layout/app-theme-runt2/mat-sidenav-container/mat-sidenav-content/div/ng-component/div/div[2]/div[1]/form/div[2]/div/mat-card/mat-card-content/div[7]/div[3]/img"
+        xpath_imagen = XPATH_CAPTCHA_IMAGEN
         
         try:
             captcha_img_element = WebDriverWait(driver, 10).until(
@@ -1448,32 +1714,35 @@ def capturar_captcha(driver, placa, carpeta_temp=CAPTCHA_FOLDER):
             
             if not captcha_img_element:
                 logging.error("❌ No hay imagen visible del captcha")
-                return None, None
+                return None
         
         driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", captcha_img_element)
-        time.sleep(1)
+        esperas.esperar_imagen_cargada(driver, captcha_img_element)
+        esperas.pausa("tras_scroll")
 
-        captcha_screenshot = captcha_img_element.screenshot_as_png
-        
-        nparr = np.frombuffer(captcha_screenshot, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE)
-        
-        _, img_bin = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        img_pil = Image.fromarray(img_bin)
+        return captcha_img_element.screenshot_as_png
 
-        timestamp = datetime.now().strftime('%H%M%S')
-        nombre_archivo = f"captcha_{str(placa).strip()}_{timestamp}.png"
-        temp_filename = carpeta_temp / nombre_archivo
+    except Exception as e:
+        logging.error(f"❌ Error al capturar captcha: {e}")
+        return None
 
-        img_pil.save(str(temp_filename))
-        
-        return temp_filename, img_pil
+def guardar_captcha(img_bin, placa, carpeta_temp=CAPTCHA_FOLDER, captura=None, lectura=None):
+    """Encola el captcha para el archivo (lo escribe archivo_captchas) → (id del captcha, imagen PIL)"""
+    try:
+        img_pil = Image.fromarray(img_bin)
+        return archivo_captchas.guardar_intento(img_bin, placa, captura, lectura, carpeta_temp), img_pil
 
     except Exception as e:
-        logging.error(f"❌ Error al capturar captcha: {e}")
+        logging.error(f"❌ Error al guardar captcha: {e}")
         return None, None
 
+def capturar_captcha(driver, placa, carpeta_temp=CAPTCHA_FOLDER):
+    """Captura la imagen del captcha (binarizada con Otsu, en este hilo)"""
+    captcha_png = capturar_png_captcha(driver)
+    if not captcha_png:
+        return None, None
+    return guardar_captcha(pool_ocr.binarizar(captcha_png), placa, carpeta_temp, captura=captcha_png)
+
 def verificar_caracter_en_templates(caracter):
     """Verifica si un carácter está en el diccionario de templates"""
     return caracter in diccionario_caracteres
@@ -1488,61 +1757,172 @@ def obtener_caracter_del_diccionario(caracter):
         logging.warning(f"   ⚠️ '{caracter}' NO está en templates, usando como está")
         return caracter
 
-def resolver_captcha(img_pil: Image.Image, placa: str) -> Optional[str]:
-    """Resuelve el captcha con verificación de templates"""
+def _estado_ocr_local():
+    """Estado de pool_ocr.leer_captcha reutilizando el backend y el banco de este proceso"""
+    return {"backend": ocr_captcha.obtener_backend(BACKEND_OCR), "banco": banco_templates}
+
+# OCR de este proceso: en el hilo (ClienteLocal) hasta que main() arranque el pool
+cliente_ocr = pool_ocr.ClienteLocal(_estado_ocr_local, ())
+
+def inicializar_worker(numero, clientes):
+    """En el proceso worker del pool de navegadores: configurarlo y conectar su cliente del pool OCR"""
+    configurar_proceso(worker=numero)
+    conectar_cliente_ocr(numero, clientes)
+
+def conectar_cliente_ocr(numero, clientes):
+    """En el proceso worker del pool de navegadores: usar su cliente del pool OCR"""
+    global cliente_ocr
+    if clientes:
+        cliente_ocr = clientes[numero - 1]
+
+# Se apaga con el primer refresco fallido: el portal no ofrece uno y no vale la pena buscarlo en cada placa
+_refresco_captcha_disponible = True
+
+def refrescar_captcha(driver):
+    """
+    Pide otro captcha al portal (sin clickear Consultar); True si la imagen cambió.
+    Si no hay control de refresco o la imagen no cambia, devuelve False y no
+    se vuelve a intentar en esta ejecución.
+    """
+    global _refresco_captcha_disponible
+    if not _refresco_captcha_disponible:
+        return False
+    try:
+        refresco = driver.execute_script(SCRIPT_REFRESCAR_CAPTCHA, XPATH_CAPTCHA_IMAGEN)
+        if refresco is None:
+            logging.warning("⚠️ No hay imagen de captcha para refrescar")
+            return False
+        if not refresco["control"]:
+            logging.warning("⚠️ No se encontró el control para pedir otro captcha")
+            cambio = False
+        else:
+            cambio = esperas.esperar_captcha_nuevo(driver, XPATH_CAPTCHA_IMAGEN, refresco["src"])
+    except Exception as e:
+        logging.error(f"⚠️ Error refrescando captcha: {e}")
+        cambio = False
+
+    if not cambio:
+        logging.warning("⚠️ Refresco de captcha desactivado por el resto de la ejecución")
+        _refresco_captcha_disponible = False
+    return cambio
+
+def obtener_captcha_confiable(driver, placa, mientras_ocr=None):
+    """
+    Captura y resuelve el captcha; si la lectura no llega a UMBRAL_CONFIANZA_CAPTCHA
+    pide otro (hasta MAX_REFRESCOS_CAPTCHA veces) en lugar de gastar un envío.
+
+    El OCR corre en el pool (cliente_ocr): mientras tanto se ejecuta
+    mientras_ocr() en este hilo (ej: llenar placa y cédula).
+
+    Returns:
+        (id_captcha, captcha_img, texto, confianza); texto None si no hubo lectura
+        válida del captcha que está en pantalla
+    """
+    id_captcha = captcha_img = texto = None
+    confianza = 0.0
+    for refresco in range(MAX_REFRESCOS_CAPTCHA + 1):
+        captcha_png = capturar_png_captcha(driver)
+        if not captcha_png:
+            break
+
+        futuro = cliente_ocr.enviar(captcha_png)
+        if mientras_ocr is not None and refresco == 0:
+            mientras_ocr()
+        try:
+            img_bin, lectura = futuro.result(timeout=TIMEOUT_OCR_SEGUNDOS)
+        except Exception as e:
+            futuro.cancel()  # Tras un timeout: que el cliente no lo retenga esperando una respuesta tardía
+            logging.error(f"❌ Error OCR: {e}")
+            break
+
+        id_captcha, captcha_img = guardar_captcha(img_bin, placa, captura=captcha_png, lectura=lectura)
+        if not captcha_img:
+            break
+
+        texto, confianza = registrar_lectura_captcha(lectura, placa)
+        if texto and confianza is None:
+            return id_captcha, captcha_img, texto, confianza  # El motor no da confianza: no se filtra
+        if texto and confianza >= UMBRAL_CONFIANZA_CAPTCHA:
+            return id_captcha, captcha_img, texto, confianza
+
+        if refresco == MAX_REFRESCOS_CAPTCHA or not _refresco_captcha_disponible:
+            break
+        logging.info(f"🔁 Lectura dudosa ('{texto}', confianza {confianza:.2f} < {UMBRAL_CONFIANZA_CAPTCHA}), "
+                     f"pidiendo otro captcha [{refresco + 1}/{MAX_REFRESCOS_CAPTCHA}]...")
+        if not refrescar_captcha(driver):
+            # El captcha en pantalla sigue siendo el leído: se envía esa lectura
+            break
+        captcha_logger.info(f"         DESCARTADO: {texto} (confianza {confianza:.2f}, se pidió otro captcha)")
+        archivo_captchas.registrar_veredicto(id_captcha, "descartado")
+        # La lectura anterior ya no corresponde a lo que está en pantalla: si el próximo
+        # intento falla (captura u OCR) no debe enviarse ni recibir otro veredicto
+        id_captcha = captcha_img = texto = None
+        confianza = 0.0
+
+    # Solo la lectura del captcha que está en pantalla sirve (las anteriores ya se reemplazaron)
+    if texto:
+        logging.warning(f"⚠️ Ningún captcha superó el umbral, se envía la última lectura ('{texto}', {confianza:.2f})")
+    return id_captcha, captcha_img, texto, confianza
+
+def resolver_captcha(img_pil: Image.Image, placa: str) -> Tuple[Optional[str], Optional[float]]:
+    """
+    Resuelve el captcha con verificación de templates (una sola lectura OCR por captcha)
+
+    Returns:
+        (texto o None, confianza 0..1 o None si el motor no la da)
+    """
     
-    custom_config = r'--oem 3 --psm 8 -c tessedit_char_whitelist=abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+    try:
+        lectura = ocr_captcha.resolver_texto(img_pil, ocr_captcha.obtener_backend(BACKEND_OCR), banco_templates)
+    except Exception as e:
+        logging.error(f"❌ Error OCR: {e}")
+        return None, 0.0
+    return registrar_lectura_captcha(lectura, placa)
 
+def registrar_lectura_captcha(lectura, placa):
+    """Loguea una lectura de ocr_captcha.resolver_texto → (texto o None, confianza)"""
     try:
-        img_array = np.array(img_pil)
-        texto_imagen_original = pytesseract.image_to_string(img_array, config=custom_config).strip()
-        
-        text_tesseract = pytesseract.image_to_string(img_pil, config=custom_config).strip()
+        text_tesseract = lectura["ocr"]
+        confianza_ocr = lectura["confianza_ocr"]
 
-        logging.info(f"📝 Tesseract extrajo: '{text_tesseract}'")
+        logging.info(f"📝 Tesseract extrajo: '{text_tesseract}'"
+                     + (f" (confianza {confianza_ocr:.2f})" if confianza_ocr is not None else ""))
         
-        captcha_logger.info(f"Placa: {placa} | TEXTO IMAGEN: {texto_imagen_original} | TESSERACT LEYÓ: {text_tesseract}")
+        reconocidos_templates = lectura["templates"]
+        texto_templates = "".join(c for c, _ in reconocidos_templates)
+        logging.info(f"🧩 Templates: '{texto_templates}' "
+                     f"(confianzas {', '.join(f'{conf:.2f}' for _, conf in reconocidos_templates)})")
+        
+        # TEXTO IMAGEN = lectura final (OCR + templates); TESSERACT LEYÓ = OCR crudo (lo que parsea benchmark_captchas)
+        captcha_logger.info(f"Placa: {placa} | TEXTO IMAGEN: {lectura['texto'] or ''} | TESSERACT LEYÓ: {text_tesseract}")
 
-        if text_tesseract and all(c.isalnum() for c in text_tesseract):
-            
-            reemplazos = {
-                "O": "0",
-                "l": "1",
-                "I": "1",
-            }
-            
-            texto_corregido = ""
-            for c in text_tesseract:
-                texto_corregido += reemplazos.get(c, c)
+        if lectura["origen"] == "ocr":
+            logging.info(f"📝 Después limpieza básica: '{lectura['corregido']}'")
             
-            logging.info(f"📝 Después limpieza básica: '{texto_corregido}'")
-            
-            logging.info(f"🔍 Verificando caracteres contra diccionario...")
-            texto_final = ""
-            
-            for i, char in enumerate(texto_corregido):
-                logging.info(f"   Carácter {i+1}: '{char}'")
-                
-                if verificar_caracter_en_templates(char):
-                    char_confirmado = obtener_caracter_del_diccionario(char)
-                    texto_final += char_confirmado
+            logging.info(f"🔍 Comparando glifos contra templates...")
+            for i, (char, confianza, origen) in enumerate(lectura["detalle"]):
+                if origen == "template":
+                    logging.info(f"   Carácter {i+1}: '{char}' por template ({confianza:.2f})")
+                    captcha_logger.info(f"      → '{char}' TEMPLATE ({confianza:.2f})")
                 else:
-                    logging.info(f"   ⚠️ '{char}' NO en diccionario, manteniendo...")
-                    captcha_logger.info(f"      → '{char}' NO en diccionario")
-                    texto_final += char
-            
-            logging.info(f"✅ Captcha después verificación: '{texto_final}'")
-            captcha_logger.info(f"         CORREGIDO: {texto_final}")
+                    logging.info(f"   Carácter {i+1}: '{char}' de Tesseract (template {confianza:.2f})")
             
-            return texto_final
+            logging.info(f"✅ Captcha después verificación: '{lectura['texto']}'")
+            captcha_logger.info(f"         CORREGIDO: {lectura['texto']}")
+            return lectura["texto"], lectura["confianza"]
+
+        if lectura["origen"] == "templates":
+            logging.info(f"✅ Captcha solo por templates: '{lectura['texto']}'")
+            captcha_logger.info(f"         CORREGIDO: {lectura['texto']} (solo templates)")
+            return lectura["texto"], lectura["confianza"]
 
         logging.warning(f"⚠️ Tesseract extrajo algo inválido: {text_tesseract}")
-        captcha_logger.info(f"Placa: {placa} | TEXTO IMAGEN: {texto_imagen_original} | RESULTADO: ❌ NO LEGIBLE")
-        return None
+        captcha_logger.info(f"Placa: {placa} | TEXTO IMAGEN: {text_tesseract} | RESULTADO: ❌ NO LEGIBLE")
+        return None, 0.0
 
     except Exception as e:
         logging.error(f"❌ Error OCR: {e}")
-        return None
+        return None, 0.0
 
 def detectar_mensaje_error(driver):
     """Detecta el tipo de mensaje de error usando XPath específicos"""
@@ -1559,11 +1939,11 @@ def detectar_mensaje_error(driver):
             )
             
             logging.info("✅ Modal detectado")
-            time.sleep(1)
             
             try:
-                mensaje_element = driver.find_element(By.XPATH, xpath_mensaje_texto)
-                texto_mensaje = mensaje_element.text.strip()
+                texto_mensaje = esperas.esperar_texto_modal(driver)
+                if texto_mensaje is None:
+                    texto_mensaje = driver.find_element(By.XPATH, xpath_mensaje_texto).text.strip()
                 
                 logging.info(f"📄 Mensaje capturado: {texto_mensaje[:100]}")
                 
@@ -1640,6 +2020,47 @@ def limpiar_texto_celda(texto):
 # EXTRACCIÓN DE DATOS - ⭐ MEJORADA CON CIERRE DE PANELES
 # ═════════════════════════════════════════════════════════════
 
+def fila_soat(textos_celdas):
+    """Celdas de la fila más reciente de SOAT → 7 columnas limpias"""
+    datos_soat = [limpiar_texto_celda(texto) for texto in textos_celdas]
+    
+    if not datos_soat or not datos_soat[0]:
+        return ["No disponible"] * 7
+
+    # Asegurar que tenemos 7 elementos
+    while len(datos_soat) < 7:
+        datos_soat.append("No disponible")
+        
+    return datos_soat[:7]  # Solo 7 columnas
+
+def fila_rtm(textos_celdas):
+    """Celdas de la fila más reciente de RTM → 7 columnas en el orden de Google Sheets (None si la fila está incompleta)"""
+    datos_crudos = [texto.strip() for texto in textos_celdas]
+
+    # Mapeo de columnas según la imagen:
+    # [0] Tipo Revisión
+    # [1] Fecha Expedición
+    # [2] Fecha Vigencia
+    # [3] CDA expide RTM
+    # [4] Vigente ⬅️ ESTO DEBE IR EN LA POSICIÓN 6 DE GOOGLE SHEETS
+    # [5] Nro. certificado
+    # [6] Información consistente
+    if len(datos_crudos) < 7:
+        return None  # Fila incompleta: no es la tabla esperada
+    if not datos_crudos[0]:
+        return ["No disponible"] * 7
+
+    # Reordenar para que coincida con Google Sheets
+    return [
+        datos_crudos[0],  # Tipo Revisión
+        datos_crudos[1],  # Fecha Expedición
+        datos_crudos[2],  # Fecha Vigencia
+        datos_crudos[3],  # CDA expide RTM
+        datos_crudos[5],  # Nro. certificado ⬅️ Intercambiado
+        datos_crudos[4],  # Vigente ⬅️ Intercambiado
+        datos_crudos[6]   # Información consistente
+    ]
+
 def extraer_datos_soat(driver):
     """⭐ Extrae datos del SOAT - SOLO 7 COLUMNAS (sin cilindraje)"""
     try:
@@ -1647,28 +2068,16 @@ def extraer_datos_soat(driver):
         logging.info("="*70)
         
         cerrar_todos_los_paneles(driver)
-        time.sleep(1)
         
         if abrir_seccion_angular(driver, "Póliza SOAT"):
-            time.sleep(2)
-            
             try:
                 xpath_primera_fila = "//mat-table//mat-row[1]"
-                fila_mas_reciente = WebDriverWait(driver, 5).until(
-                    EC.visibility_of_element_located((By.XPATH, xpath_primera_fila))
-                )
+                fila_mas_reciente = esperas.esperar_filas_tabla(driver, xpath_primera_fila)
+                if fila_mas_reciente is None:
+                    raise TimeoutException("sin filas de SOAT")
                 
                 celdas = fila_mas_reciente.find_elements(By.TAG_NAME, "mat-cell")
-                datos_soat = [limpiar_texto_celda(celda.text) for celda in celdas]
-                
-                if not datos_soat or not datos_soat[0]:
-                    return ["No disponible"] * 7
-
-                # Asegurar que tenemos 7 elementos
-                while len(datos_soat) < 7:
-                    datos_soat.append("No disponible")
-                    
-                return datos_soat[:7]  # Solo 7 columnas
+                return fila_soat([celda.text for celda in celdas])
 
             except Exception as e:
                 logging.warning(f"⚠️ No se encontró tabla de SOAT: {e}")
@@ -1690,44 +2099,23 @@ def extraer_datos_rtm(driver):
         
         # Cerramos paneles previos para evitar que se tapen los elementos
         cerrar_todos_los_paneles(driver)
-        time.sleep(1)
         
         if abrir_seccion_angular(driver, "(RTM)"):
-            time.sleep(2)
-            
             try:
                 # Cambiado: Selecciona el primer mat-row sin filtrar por texto "VIGENTE"
                 xpath_primera_fila = "//mat-expansion-panel[.//mat-panel-title[contains(., '(RTM)')]]//mat-table//mat-row[contains(@class, 'mat-row')][1]"
+                xpath_sin_datos = "//mat-expansion-panel[.//mat-panel-title[contains(., '(RTM)')]]//div[contains(text(), 'No se encontró información registrada')]"
                 
-                fila_mas_reciente = WebDriverWait(driver, 10).until(
-                    EC.visibility_of_element_located((By.XPATH, xpath_primera_fila))
-                )
+                fila_mas_reciente = esperas.esperar_filas_tabla(driver, xpath_primera_fila, xpath_sin_datos)
+                if fila_mas_reciente is None:
+                    raise TimeoutException("sin filas de RTM")
                 
                 celdas = fila_mas_reciente.find_elements(By.TAG_NAME, "mat-cell")
-                datos_crudos = [celda.text.strip() for celda in celdas]
-
-                # Mapeo de columnas según la imagen:
-                # [0] Tipo Revisión
-                # [1] Fecha Expedición
-                # [2] Fecha Vigencia
-                # [3] CDA expide RTM
-                # [4] Vigente ⬅️ ESTO DEBE IR EN LA POSICIÓN 6 DE GOOGLE SHEETS
-                # [5] Nro. certificado
-                # [6] Información consistente
-
-                # Reordenar para que coincida con Google Sheets
-                datos = [
-                    datos_crudos[0],  # Tipo Revisión
-                    datos_crudos[1],  # Fecha Expedición
-                    datos_crudos[2],  # Fecha Vigencia
-                    datos_crudos[3],  # CDA expide RTM
-                    datos_crudos[5],  # Nro. certificado ⬅️ Intercambiado
-                    datos_crudos[4],  # Vigente ⬅️ Intercambiado
-                    datos_crudos[6]   # Información consistente
-                ]
-                
-                if not datos or not datos[0]:
-                    return ["No disponible"] * 7
+                datos = fila_rtm([celda.text for celda in celdas])
+                if datos is None:
+                    raise ValueError("fila de RTM incompleta")
+                if datos[0] == "No disponible":
+                    return datos
 
                 logging.info(f"✅ Datos RTM encontrados (Fila 1)")
                 return datos
@@ -1744,6 +2132,58 @@ def extraer_datos_rtm(driver):
         return ["No disponible"] * 7
 
 
+# ═══ MAPEO CORRECTO - ORDEN IMPORTA ═══
+MAPEO_LABELS_VEHICULO = [
+        ("PLACA DEL VEHÍCULO", "PLACA"),
+        ("NRO. DE LICENCIA DE TRÁNSITO", "NRO_LICENCIA_TRANSITO"),
+        ("ESTADO DEL VEHÍCULO", "ESTADO_VEHICULO"),
+        ("TIPO DE SERVICIO", "TIPO_SERVICIO"),
+        ("CLASE DE VEHÍCULO", "CLASE_VEHICULO"),
+        ("MARCA", "MARCA"),
+        ("LÍNEA", "LINEA"),
+        ("MODELO", "MODELO"),
+        ("COLOR", "COLOR"),
+        ("NÚMERO DE SERIE", "NUMERO_SERIE"),
+        ("NÚMERO DE MOTOR", "NUMERO_MOTOR"),
+        ("NÚMERO DE CHASIS", "NUMERO_CHASIS"),
+        ("NÚMERO DE VIN", "NUMERO_VIN"),
+        ("CILINDRAJE", "CILINDRAJE"),
+        ("TIPO DE CARROCERÍA", "TIPO_CARROCERIA"),
+        ("TIPO COMBUSTIBLE", "TIPO_COMBUSTIBLE"),
+        ("FECHA DE MATRICULA INICIAL", "FECHA_MATRICULA_INICIAL"),
+        ("AUTORIDAD DE TRÁNSITO", "AUTORIDAD_TRANSITO"),
+        ("GRAVÁMENES A LA PROPIEDAD", "GRAVAMENES_PROPIEDAD"),
+        ("CLÁSICO O ANTIGUO", "CLASICO_ANTIGUO"),
+        ("REPOTENCIADO", "REPOTENCIADO"),
+        ("REGRABACIÓN MOTOR (SI/NO)", "REGRABACION_MOTOR"),
+        ("NRO. REGRABACIÓN MOTOR", "NRO_REGRABACION_MOTOR"),
+        ("REGRABACIÓN CHASIS (SI/NO)", "REGRABACION_CHASIS"),
+        ("NRO. REGRABACIÓN CHASIS", "NRO_REGRABACION_CHASIS"),
+        ("REGRABACIÓN SERIE (SI/NO)", "REGRABACION_SERIE"),
+        ("NRO. REGRABACIÓN SERIE", "NRO_REGRABACION_SERIE"),
+        ("REGRABACIÓN VIN (SI/NO)", "REGRABACION_VIN"),
+        ("NRO. REGRABACIÓN VIN", "NRO_REGRABACION_VIN"),
+        ("VEHÍCULO ENSEÑANZA (SI/NO)", "VEHICULO_ENSENANZA"),
+        ("PUERTAS", "PUERTAS"),
+]
+
+def validar_valor_vehiculo(valor, etiquetas_completas):
+    """None si el valor leído es en realidad otra etiqueta o un número suelto de un dígito"""
+    if not valor:
+        return None
+    
+    # 🔥 Rechazar SOLO si es EXACTAMENTE otra etiqueta
+    if valor.upper().strip() in etiquetas_completas:
+        logging.warning(f"   ❌ Valor rechazado (es otra etiqueta): '{valor}'")
+        return None
+    
+    # TAMBIÉN rechazar si es SOLO números muy pequeños (como 1, 2, 3)
+    if valor.isdigit() and len(valor) < 2:
+        logging.warning(f"   ❌ Valor rechazado (número inválido): '{valor}'")
+        return None
+    
+    return valor
+
 def extraer_datos_vehiculo_optimizado(driver):
     """
     ⭐ ESTRATEGIA MEJORADA: Extrae labels en orden y busca valores consecutivos
@@ -1760,42 +2200,8 @@ def extraer_datos_vehiculo_optimizado(driver):
         
         logging.info("✅ Panel de contenido encontrado")
         
-        # ═══ MAPEO CORRECTO - ORDEN IMPORTA ═══
-        mapeo_labels = [
-            ("PLACA DEL VEHÍCULO", "PLACA"),
-            ("NRO. DE LICENCIA DE TRÁNSITO", "NRO_LICENCIA_TRANSITO"),
-            ("ESTADO DEL VEHÍCULO", "ESTADO_VEHICULO"),
-            ("TIPO DE SERVICIO", "TIPO_SERVICIO"),
-            ("CLASE DE VEHÍCULO", "CLASE_VEHICULO"),
-            ("MARCA", "MARCA"),
-            ("LÍNEA", "LINEA"),
-            ("MODELO", "MODELO"),
-            ("COLOR", "COLOR"),
-            ("NÚMERO DE SERIE", "NUMERO_SERIE"),
-            ("NÚMERO DE MOTOR", "NUMERO_MOTOR"),
-            ("NÚMERO DE CHASIS", "NUMERO_CHASIS"),
-            ("NÚMERO DE VIN", "NUMERO_VIN"),
-            ("CILINDRAJE", "CILINDRAJE"),
-            ("TIPO DE CARROCERÍA", "TIPO_CARROCERIA"),
-            ("TIPO COMBUSTIBLE", "TIPO_COMBUSTIBLE"),
-            ("FECHA DE MATRICULA INICIAL", "FECHA_MATRICULA_INICIAL"),
-            ("AUTORIDAD DE TRÁNSITO", "AUTORIDAD_TRANSITO"),
-            ("GRAVÁMENES A LA PROPIEDAD", "GRAVAMENES_PROPIEDAD"),
-            ("CLÁSICO O ANTIGUO", "CLASICO_ANTIGUO"),
-            ("REPOTENCIADO", "REPOTENCIADO"),
-            ("REGRABACIÓN MOTOR (SI/NO)", "REGRABACION_MOTOR"),
-            ("NRO. REGRABACIÓN MOTOR", "NRO_REGRABACION_MOTOR"),
-            ("REGRABACIÓN CHASIS (SI/NO)", "REGRABACION_CHASIS"),
-            ("NRO. REGRABACIÓN CHASIS", "NRO_REGRABACION_CHASIS"),
-            ("REGRABACIÓN SERIE (SI/NO)", "REGRABACION_SERIE"),
-            ("NRO. REGRABACIÓN SERIE", "NRO_REGRABACION_SERIE"),
-            ("REGRABACIÓN VIN (SI/NO)", "REGRABACION_VIN"),
-            ("NRO. REGRABACIÓN VIN", "NRO_REGRABACION_VIN"),
-            ("VEHÍCULO ENSEÑANZA (SI/NO)", "VEHICULO_ENSENANZA"),
-            ("PUERTAS", "PUERTAS"),
-        ]
         
-        datos_vehiculo = {campo: "No disponible" for etiqueta, campo in mapeo_labels}
+        datos_vehiculo = {campo: "No disponible" for etiqueta, campo in MAPEO_LABELS_VEHICULO}
         
         # ═══ OBTENER TODOS LOS LABELS ═══
         logging.info("🔍 Obteniendo todos los labels...")
@@ -1811,12 +2217,12 @@ def extraer_datos_vehiculo_optimizado(driver):
                 logging.info(f"   [{i}] {label_text}")
         
         # 🔥 CREAR LISTA DE ETIQUETAS COMPLETAS (para rechazar correctamente)
-        etiquetas_completas = [etiqueta.upper() for etiqueta, _ in mapeo_labels]
+        etiquetas_completas = [etiqueta.upper() for etiqueta, _ in MAPEO_LABELS_VEHICULO]
         
         # ═══ PROCESAR CADA LABEL EN ORDEN ═══
         logging.info("\n🔍 EXTRAYENDO PARES LABEL-VALOR...")
         
-        for etiqueta_buscada, campo_normalizado in mapeo_labels:
+        for etiqueta_buscada, campo_normalizado in MAPEO_LABELS_VEHICULO:
             logging.info(f"\n📌 Buscando: {etiqueta_buscada}")
             
             # Buscar coincidencia flexible del label
@@ -1882,26 +2288,9 @@ def extraer_datos_vehiculo_optimizado(driver):
                 logging.warning(f"   ⚠️ Error en búsqueda confinada: {e}")
             
             # ═══ VALIDAR QUE EL VALOR SEA REALMENTE VÁLIDO ═══
+            valor = validar_valor_vehiculo(valor, etiquetas_completas)
             if valor:
-                valor_upper = valor.upper().strip()
-                
-                # 🔥 NUEVA VALIDACIÓN: Rechazar SOLO si es EXACTAMENTE otra etiqueta
-                es_etiqueta_exacta = valor_upper in etiquetas_completas
-                
-                # TAMBIÉN rechazar si es SOLO números muy pequeños (como 1, 2, 3)
-                es_numero = valor.isdigit()
-                es_numero_valido = not (es_numero and len(valor) < 2)
-                
-                # RECHAZAR: Si es exactamente otra etiqueta O si es un número muy pequeño
-                if es_etiqueta_exacta:
-                    logging.warning(f"   ❌ Valor rechazado (es otra etiqueta): '{valor}'")
-                    valor = None
-                elif not es_numero_valido:
-                    logging.warning(f"   ❌ Valor rechazado (número inválido): '{valor}'")
-                    valor = None
-                # ACEPTAR: Todo lo demás
-                else:
-                    logging.info(f"   ✅ Valor aceptado: {valor}")
+                logging.info(f"   ✅ Valor aceptado: {valor}")
             
             # ═══ GUARDAR RESULTADO FINAL ═══
             if valor:
@@ -1928,8 +2317,193 @@ def extraer_datos_vehiculo_optimizado(driver):
     except Exception as e:
         logging.error(f"❌ Error grave: {e}", exc_info=True)
         # ... (retorno de diccionario con "No disponible")
-        return {campo: "No disponible" for etiqueta, campo in mapeo_labels}
+        return {campo: "No disponible" for etiqueta, campo in MAPEO_LABELS_VEHICULO}
+
+# ═════════════════════════════════════════════════════════════
+# EXTRACCIÓN EN UNA SOLA LLAMADA
+# ═════════════════════════════════════════════════════════════
+# Las funciones de arriba hacen cientos de idas y vueltas a WebDriver
+# (find_element por label, abrir / cerrar paneles, una lectura por celda).
+# SCRIPT_EXTRAER_RESULTADO recorre div.panel-content y las tablas de SOAT y
+# RTM en un solo execute_script. Las celdas de un panel cerrado no se ven
+# (innerText vacío), así que se leen sus nodos de texto sin abrirlo.
+# Si una tabla no está en el DOM (el panel no renderizó su contenido), esa
+# sección sale en null y se usa el extractor de arriba solo para ella.
+
+SCRIPT_EXTRAER_RESULTADO = r"""
+function texto(e) {
+    if (!e) { return ''; }
+    if (e.offsetParent !== null) { return (e.innerText || '').trim(); }
+    var partes = [], nodos = document.createTreeWalker(e, NodeFilter.SHOW_TEXT), n;
+    while ((n = nodos.nextNode())) {
+        var t = n.nodeValue.trim();
+        if (t) { partes.push(t); }
+    }
+    return partes.join('\n');
+}
+
+function siguienteDiv(e) {
+    for (var sig = e.nextElementSibling; sig; sig = sig.nextElementSibling) {
+        if (sig.tagName === 'DIV') { return sig; }
+    }
+    return null;
+}
+
+// Mismas estrategias que extraer_datos_vehiculo_optimizado
+function valorDeLabel(label) {
+    var padre = label.parentElement, b, valor = null;
+    if (!padre) { return null; }
+
+    b = padre.querySelector('b');
+    if (b) { valor = texto(b); }
+
+    if (!valor) {
+        var sig = siguienteDiv(padre);
+        if (sig) {
+            b = sig.querySelector('b');
+            if (b) {
+                valor = texto(b);
+            } else {
+                var t = texto(sig);
+                if (t && t.length < 100 && !/[:()]/.test(t)) { valor = t; }
+            }
+        }
+    }
+
+    if (!valor && padre.parentElement && padre.parentElement.nextElementSibling) {
+        b = padre.parentElement.nextElementSibling.querySelector('b');
+        if (b) { valor = texto(b); }
+    }
+    return valor;
+}
+
+function panel(titulo) {
+    return Array.from(document.querySelectorAll('mat-expansion-panel')).find(function (p) {
+        var t = p.querySelector('mat-panel-title');
+        return t && t.textContent.indexOf(titulo) !== -1;
+    }) || null;
+}
+
+function tabla(titulo) {
+    var p = panel(titulo);
+    if (!p) { return null; }
+    var fila = p.querySelector('mat-table mat-row, mat-row');
+    if (fila) {
+        return {celdas: Array.from(fila.querySelectorAll('mat-cell')).map(texto), mensaje: null};
+    }
+    var sinDatos = Array.from(p.querySelectorAll('div')).find(function (d) {
+        return d.textContent.indexOf('No se encontró información registrada') !== -1 && !d.querySelector('div');
+    });
+    return sinDatos ? {celdas: null, mensaje: texto(sinDatos) || 'No disponible'} : null;
+}
+
+var contenido = document.querySelector('div.panel-content');
+return {
+    vehiculo: contenido ? Array.from(contenido.querySelectorAll('label')).map(function (l) {
+        return [texto(l), valorDeLabel(l)];
+    }).filter(function (par) { return par[0]; }) : null,
+    soat: tabla('Póliza SOAT'),
+    rtm: tabla('(RTM)')
+};
+"""
+
+def mapear_labels_vehiculo(pares):
+    """[(texto_label, valor), ...] del script → dict de MAPEO_LABELS_VEHICULO (misma coincidencia flexible)"""
+    label_dict = {}
+    for label_text, valor in pares:
+        label_dict[label_text] = valor
+
+    etiquetas_completas = [etiqueta.upper() for etiqueta, _ in MAPEO_LABELS_VEHICULO]
+    datos_vehiculo = {campo: "No disponible" for _, campo in MAPEO_LABELS_VEHICULO}
+
+    for etiqueta_buscada, campo_normalizado in MAPEO_LABELS_VEHICULO:
+        for label_text, valor in label_dict.items():
+            if etiqueta_buscada.upper() in label_text.upper() or label_text.upper() in etiqueta_buscada.upper():
+                valor = validar_valor_vehiculo((valor or "").strip(), etiquetas_completas)
+                if valor:
+                    datos_vehiculo[campo_normalizado] = valor
+                break
+
+    return datos_vehiculo
+
+def extraer_resultado_consulta(driver, placa=None):
+    """
+    Datos del vehículo, SOAT y RTM de una consulta exitosa.
+
+    Por sección, lo primero que funcione:
+    1. JSON capturado de la red (solo con CAPTURA_RED)
+    2. UN execute_script sobre el DOM (SCRIPT_EXTRAER_RESULTADO)
+    3. Extractores por elemento (abren / cierran paneles)
+
+    Returns:
+        (datos_vehiculo, datos_soat, datos_rtm) — mismo formato que
+        extraer_datos_vehiculo_optimizado / extraer_datos_soat / extraer_datos_rtm
+    """
+    logging.info("\n" + "="*70)
+    logging.info("📊 LEYENDO VEHÍCULO, SOAT Y RTM (una sola llamada)...")
+    logging.info("="*70)
+
+    red = {"vehiculo": None, "soat": None, "rtm": None}
+    if CAPTURA_RED:
+        esperas.esperar_red_inactiva(driver)
+        try:
+            red = captura_red.leer_consulta(driver, placa, MAPEO_LABELS_VEHICULO)
+        except Exception as e:
+            logging.warning(f"⚠️ Captura de red falló ({e}), se lee del DOM")
+
+    datos_rtm_red = fila_rtm(red["rtm"]) if red["rtm"] is not None else None
+    if red["vehiculo"] and red["soat"] and datos_rtm_red:
+        logging.info("✅ Vehículo, SOAT y RTM leídos de la red (sin tocar el DOM)")
+        return red["vehiculo"], fila_soat(red["soat"]), datos_rtm_red
+
+    try:
+        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.panel-content")))
+        resultado = driver.execute_script(SCRIPT_EXTRAER_RESULTADO) or {}
+    except Exception as e:
+        logging.warning(f"⚠️ Extractor en una llamada falló ({e}), usando extractores por elemento")
+        resultado = {}
+
+    # ═══ VEHÍCULO ═══
+    if red["vehiculo"]:
+        datos_vehiculo = red["vehiculo"]
+        logging.info("✅ Vehículo leído de la red")
+    elif resultado.get("vehiculo"):
+        datos_vehiculo = mapear_labels_vehiculo(resultado["vehiculo"])
+        campos_llenos = sum(1 for v in datos_vehiculo.values() if v != "No disponible")
+        logging.info(f"✅ Vehículo: {campos_llenos}/{len(datos_vehiculo)} campos ({len(resultado['vehiculo'])} labels)")
+    else:
+        logging.warning("⚠️ Labels del vehículo no leídos en bloque, usando extractor por elemento")
+        datos_vehiculo = extraer_datos_vehiculo_optimizado(driver)
+
+    # ═══ SOAT ═══
+    soat = resultado.get("soat")
+    if red["soat"]:
+        datos_soat = fila_soat(red["soat"])
+        logging.info(f"✅ SOAT (red): {datos_soat}")
+    elif soat and soat.get("celdas") is not None:
+        datos_soat = fila_soat(soat["celdas"])
+        logging.info(f"✅ SOAT: {datos_soat}")
+    else:
+        logging.warning("⚠️ Tabla SOAT no leída en bloque, abriendo el panel...")
+        datos_soat = extraer_datos_soat(driver)
+
+    # ═══ RTM ═══
+    rtm = resultado.get("rtm")
+    datos_rtm = datos_rtm_red
+    if datos_rtm is None and rtm and rtm.get("celdas") is not None:
+        datos_rtm = fila_rtm(rtm["celdas"])
+    if datos_rtm is not None:
+        logging.info(f"✅ RTM: {datos_rtm}")
+    elif rtm and rtm.get("mensaje"):
+        logging.info(f"ℹ️ RTM sin registros: {rtm['mensaje']}")
+        datos_rtm = [rtm["mensaje"]] * 7
+    else:
+        logging.warning("⚠️ Tabla RTM no leída en bloque, abriendo el panel...")
+        datos_rtm = extraer_datos_rtm(driver)
+
+    return datos_vehiculo, datos_soat, datos_rtm
 
+@_escritura_centralizada
 def escribir_datos_vehiculo_en_sheets(datos_vehiculo, cedula, placa):
     """
     ⭐ ESCRIBE en Google Sheets hoja 'Datos Vehiculo'
@@ -1941,28 +2515,10 @@ def escribir_datos_vehiculo_en_sheets(datos_vehiculo, cedula, placa):
         logging.info("💾 ESCRIBIENDO DATOS EN SHEETS 'Datos Vehiculo'...")
         logging.info("="*70)
         
-        SCOPES = [
-            "https://spreadsheets.google.com/feeds",
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive"
-        ]
-
-        creds = Credentials.from_service_account_file(
-            str(GOOGLE_CREDS),
-            scopes=SCOPES
+        # MISMA ID donde están SOAT y RTM - obtener o crear worksheet "Datos Vehiculo"
+        worksheet = sheets_session.obtener_worksheet(
+            SHEET_ID_RESULTADOS, "Datos Vehiculo", crear_si_no_existe=True, rows=1000, cols=40
         )
-
-        client = gspread.authorize(creds)
-        # MISMA ID donde están SOAT y RTM
-        sheet = client.open_by_key("1hYwf3AMdUWY6Lk6VjeGKPiDnR003ftkybv79b_pUN64")
-        
-        # Obtener o crear worksheet "Datos Vehiculo"
-        try:
-            worksheet = sheet.worksheet("Datos Vehiculo")
-            logging.info("✅ Hoja 'Datos Vehiculo' encontrada")
-        except gspread.WorksheetNotFound:
-            worksheet = sheet.add_worksheet(title="Datos Vehiculo", rows=1000, cols=40)
-            logging.info("📝 Hoja 'Datos Vehiculo' creada")
         
         # Orden de columnas (31 campos)
         encabezados = [
@@ -1977,22 +2533,24 @@ def escribir_datos_vehiculo_en_sheets(datos_vehiculo, cedula, placa):
             "REPOTENCIADO", "PUERTAS"
         ]
         
-        # ═══ VERIFICAR ENCABEZADOS ═══
-        try:
-            primera_fila = worksheet.row_values(1)
-        except:
-            primera_fila = []
+        # ═══ VERIFICAR ENCABEZADOS (una vez por proceso) ═══
+        if (SHEET_ID_RESULTADOS, "Datos Vehiculo") not in _hojas_con_encabezados:
+            try:
+                primera_fila = worksheet.row_values(1)
+            except:
+                primera_fila = []
+            
+            if not primera_fila or primera_fila[0] != "PLACA":
+                logging.info("📝 Escribiendo encabezados...")
+                escritor_sheets.encolar_fila(SHEET_ID_RESULTADOS, "Datos Vehiculo", 1, encabezados)
+                logging.info(f"✅ {len(encabezados)} encabezados en cola para la fila 1")
+            _hojas_con_encabezados.add((SHEET_ID_RESULTADOS, "Datos Vehiculo"))
         
-        if not primera_fila or primera_fila[0] != "PLACA":
-            logging.info("📝 Escribiendo encabezados...")
-            worksheet.update([encabezados], range_name="A1", value_input_option="RAW")
-            fila_datos = 2
-            logging.info(f"✅ {len(encabezados)} encabezados escritos en fila 1")
-        else:
-            # Buscar primera fila vacía
-            todas_placas = worksheet.col_values(1)
-            fila_datos = len(todas_placas) + 1
-            logging.info(f"✅ Encabezados ya existen, escribiendo en fila {fila_datos}")
+        # ═══ SIGUIENTE FILA LIBRE (índice en memoria, sin leer la columna A cada vez) ═══
+        indice = indice_filas.obtener_indice(SHEET_ID_RESULTADOS, "Datos Vehiculo", columnas_clave=(1,),
+                                             primera_fila_datos=2, fila_minima_nueva=2)
+        fila_datos = indice.reservar_fila_nueva(placa)
+        logging.info(f"✅ Escribiendo en fila {fila_datos}")
         
         # ═══ PREPARAR VALORES EN ORDEN ═══
         fila_valores = []
@@ -2000,30 +2558,14 @@ def escribir_datos_vehiculo_en_sheets(datos_vehiculo, cedula, placa):
             valor = datos_vehiculo.get(encabezado, "No disponible")
             fila_valores.append(valor)
         
-        # ═══ ESCRIBIR EN SHEETS ═══
-        rango = f"A{fila_datos}:AF{fila_datos}"  # A a AF (32 columnas)
+        # ═══ ESCRIBIR EN SHEETS (en cola, se envía en lote) ═══
+        escritor_sheets.encolar_fila(SHEET_ID_RESULTADOS, "Datos Vehiculo", fila_datos, fila_valores)  # A:AE
         
-        try:
-            worksheet.update([fila_valores], range_name=rango, value_input_option="RAW")
-            logging.info(f"✅ {len(fila_valores)} datos escritos en fila {fila_datos}")
-            logging.info(f"   Placa: {datos_vehiculo.get('PLACA', 'N/A')}")
-            logging.info(f"   Marca: {datos_vehiculo.get('MARCA', 'N/A')}")
-            logging.info(f"   Modelo: {datos_vehiculo.get('MODELO', 'N/A')}")
-            return fila_datos
-            
-        except Exception as e:
-            logging.error(f"❌ Error en update: {e}")
-            logging.warning("🔄 Intentando método alternativo...")
-            
-            for col_num, valor in enumerate(fila_valores, start=1):
-                try:
-                    worksheet.update_cell(fila_datos, col_num, valor)
-                    time.sleep(0.05)
-                except:
-                    pass
-            
-            logging.info(f"✅ Datos escritos (método alternativo) en fila {fila_datos}")
-            return fila_datos
+        logging.info(f"✅ {len(fila_valores)} datos en cola para la fila {fila_datos}")
+        logging.info(f"   Placa: {datos_vehiculo.get('PLACA', 'N/A')}")
+        logging.info(f"   Marca: {datos_vehiculo.get('MARCA', 'N/A')}")
+        logging.info(f"   Modelo: {datos_vehiculo.get('MODELO', 'N/A')}")
+        return fila_datos
         
     except Exception as e:
         logging.error(f"❌ Error escribiendo en Sheets: {e}", exc_info=True)
@@ -2124,7 +2666,6 @@ def detectar_y_cerrar_modal_universal(driver, timeout_max=5, max_intentos=4):
                             
                             # Scroll al botón
                             driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", boton)
-                            time.sleep(0.3)
                             
                             # Intento 1: Click normal
                             try:
@@ -2149,7 +2690,6 @@ def detectar_y_cerrar_modal_universal(driver, timeout_max=5, max_intentos=4):
                             logging.info(f"      ✓ Elemento encontrado")
                             
                             driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", boton)
-                            time.sleep(0.3)
                             
                             try:
                                 boton.click()
@@ -2163,26 +2703,19 @@ def detectar_y_cerrar_modal_universal(driver, timeout_max=5, max_intentos=4):
                             continue
                     
                     if cerrado:
-                        time.sleep(1)
                         break  # Salir del loop de estrategias si uno funcionó
                         
                 except Exception as e:
                     continue
             
             # ═══ VERIFICAR SI EL MODAL DESAPARECIÓ ═══
-            time.sleep(1)
             try:
-                modales_actuales = []
-                for tipo, selector in selectores_modal:
-                    elementos = driver.find_elements(By.CSS_SELECTOR, selector)
-                    modales_actuales.extend([e for e in elementos if e.is_displayed()])
-                
-                if not modales_actuales:
+                selectores_css = [selector for _, selector in selectores_modal]
+                if esperas.esperar_modales_cerrados(driver, selectores_css, timeout=timeout_max):
                     logging.info("✅ [MODAL DETECTOR] ¡Modal cerrado exitosamente!")
                     return True
                 else:
                     logging.warning(f"⚠️  Modal sigue visible (intento {intento + 1}/{max_intentos})")
-                    time.sleep(1)
                     continue
                     
             except Exception as e:
@@ -2195,9 +2728,8 @@ def detectar_y_cerrar_modal_universal(driver, timeout_max=5, max_intentos=4):
         
         try:
             driver.refresh()
-            time.sleep(5)
+            esperas.esperar_formulario_listo(driver)
             limpiar_todos_los_campos(driver)
-            time.sleep(1)
             logging.info("✅ Página recargada y campos limpiados")
         except Exception as e:
             logging.error(f"❌ Error en recarga: {e}")
@@ -2209,7 +2741,7 @@ def detectar_y_cerrar_modal_universal(driver, timeout_max=5, max_intentos=4):
         logging.warning("🔄 Intentando recarga de seguridad...")
         try:
             driver.refresh()
-            time.sleep(5)
+            esperas.esperar_formulario_listo(driver)
         except:
             pass
         return False
@@ -2315,6 +2847,12 @@ def procesar_consulta_interno(driver, cedula, placa, fila_numero, es_reintento=F
     Lógica interna de procesamiento
     max_intentos_internos: Número de reintentos internos (default 2, reducir a 1 en reintentos)
     """
+    try:
+        return _procesar_consulta_interno(driver, cedula, placa, fila_numero, es_reintento, max_intentos_internos)
+    finally:
+        monitor_sesion.fin_consulta()
+
+def _procesar_consulta_interno(driver, cedula, placa, fila_numero, es_reintento, max_intentos_internos):
     max_reintentos = max_intentos_internos
     
     for reintento_general in range(max_reintentos):
@@ -2324,126 +2862,82 @@ def procesar_consulta_interno(driver, cedula, placa, fila_numero, es_reintento=F
             logging.info(f"Cédula: {cedula}, Placa: {placa}")
             logging.info(f"{'='*70}")
             
+            llenado_js = MODO_LLENADO == "js"
+            
             if reintento_general > 0:
                 logging.info(f"🔄 REINTENTANDO CON LOS MISMOS DATOS (Intento {reintento_general + 1}/{max_reintentos})")
-                driver.get("https://portalpublico.runt.gov.co/#/consulta-vehiculo/consulta/consulta-ciudadana")
-                time.sleep(4)
-                limpiar_campos_individuales_validado(driver, cedula, placa)
-                time.sleep(1)
+                esperas.cargar_formulario(driver)
+                if not llenado_js:
+                    limpiar_campos_individuales_validado(driver, cedula, placa)
             else:
-                driver.get("https://portalpublico.runt.gov.co/#/consulta-vehiculo/consulta/consulta-ciudadana")
-                time.sleep(4)
-                limpiar_todos_los_campos(driver)
-                time.sleep(1)
-
-            # ═══ LLENAR PLACA ═══
-            try:
-                placa_input = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, 'input[formcontrolname="placa"]'))
-                )
-                logging.info("📝 Llenando placa...")
-                
-                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", placa_input)
-                time.sleep(0.5)
-                
-                limpiar_campo_input(driver, placa_input, "PLACA")
-                time.sleep(0.5)
-                
-                for char in str(placa).strip():
-                    placa_input.send_keys(char)
-                    time.sleep(0.1)
-                
-                logging.info(f"✅ Placa escrita: {placa}")
-                time.sleep(0.5)
-            except Exception as e:
-                logging.error(f"❌ Error al llenar placa: {e}")
-                continue
+                esperas.cargar_formulario(driver)
+                if not llenado_js:
+                    limpiar_todos_los_campos(driver)
 
-            # ═══ LLENAR CÉDULA ═══
-            try:
-                cedula_input = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, 'input[formcontrolname="documento"]'))
-                )
-                logging.info("📝 Llenando cédula...")
-                
-                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", cedula_input)
-                time.sleep(0.5)
-                
-                limpiar_campo_input(driver, cedula_input, "CÉDULA")
-                time.sleep(0.5)
-                
-                for char in str(cedula).strip():
-                    cedula_input.send_keys(char)
-                    time.sleep(0.1)
-                
-                logging.info(f"✅ Cédula escrita: {cedula}")
-                time.sleep(1)
-            except Exception as e:
-                logging.error(f"❌ Error al llenar cédula: {e}")
+            # ═══ LLENAR PLACA Y CÉDULA ═══
+            # En modo "js" se llenan junto con el captcha (una sola llamada),
+            # así el captcha se captura antes de tocar el formulario
+            if not llenado_js and not llenar_placa_y_cedula_teclado(driver, placa, cedula):
                 continue
 
             logging.info("📜 Scrolling para ver el captcha...")
             driver.execute_script("window.scrollBy(0, 300);")
-            time.sleep(2)
 
             # ═══ RESOLVER Y ESCRIBIR CAPTCHA ═══
             for intento_captcha in range(2):
                 logging.info(f"\n🔐 Intento {intento_captcha + 1} de resolver captcha...")
                 
-                captcha_path, captcha_img = capturar_captcha(driver, placa)
+                # En modo "js", placa y cédula se llenan mientras el pool OCR lee el captcha
+                prellenado = {}
+                def prellenar():
+                    prellenado["ok"] = llenar_formulario_js(driver, {"placa": placa, "documento": cedula})
+
+                id_captcha, captcha_img, texto_final, confianza = obtener_captcha_confiable(
+                    driver, placa, mientras_ocr=prellenar if llenado_js else None
+                )
                 if not captcha_img:
                     logging.warning("⚠️ No se pudo capturar el captcha")
-                    time.sleep(2)
+                    esperas.esperar_red_inactiva(driver)
                     continue
 
-                texto_final = resolver_captcha(captcha_img, placa)
-
                 if texto_final:
-                    logging.info(f"📝 Captcha final a escribir: {texto_final}")
+                    logging.info(f"📝 Captcha final a escribir: {texto_final}"
+                                 + (f" (confianza {confianza:.2f})" if confianza is not None else ""))
                     
                     try:
-                        captcha_inputs = driver.find_elements(By.TAG_NAME, "input")
-                        captcha_field = None
-                        
-                        for inp in captcha_inputs:
-                            if inp.is_displayed():
-                                captcha_field = inp
-                        
-                        if not captcha_field:
-                            logging.error("❌ No se encontró el campo de captcha")
-                            continue
-                        
-                        logging.info("🧹 Limpiando campo de captcha...")
-                        limpiar_campo_input(driver, captcha_field, "CAPTCHA")
-                        time.sleep(0.5)
-                        
-                        logging.info(f"⌨️ Escribiendo: {texto_final}")
                         captcha_logger.info(f"         ESCRITO: {texto_final}")
                         
-                        for char in texto_final:
-                            captcha_field.send_keys(char)
-                            time.sleep(0.2)
+                        valores = {"captcha": texto_final}
+                        if not prellenado.get("ok"):
+                            valores.update(placa=placa, documento=cedula)
+                        escrito = llenado_js and llenar_formulario_js(driver, valores)
+                        
+                        if not escrito:
+                            if llenado_js:
+                                # El portal no aceptó la asignación por JS → camino lento
+                                logging.warning("⚠️ Llenado por JS no confirmado, usando teclado...")
+                                if not llenar_placa_y_cedula_teclado(driver, placa, cedula):
+                                    continue
+                            if not escribir_captcha_teclado(driver, texto_final):
+                                continue
                         
-                        logging.info("✅ Captcha escrito")
-                        time.sleep(1)
+                        esperas.pausa("antes_consultar")
                         
                         try:
                             boton_consultar = WebDriverWait(driver, 5).until(
                                 EC.element_to_be_clickable((By.XPATH, "//button[contains(., 'Consultar')]"))
                             )
+                            if CAPTURA_RED:
+                                captura_red.descartar_eventos(driver)  # Solo interesa lo que responda esta consulta
                             logging.info("🔘 Clickeando botón 'Consultar'...")
                             boton_consultar.click()
 
-                            logging.info("⏱️ Esperando respuesta del servidor (máx. 4s)...")
+                            logging.info("⏱️ Esperando respuesta del servidor...")
                             error_detectado = None
-                            for s in range(4):
-                                time.sleep(1)
-                                logging.info(f"   ({s+1}/4s) Verificando...")
-                                error_temp = detectar_mensaje_error(driver)
-                                if error_temp:
-                                    error_detectado = error_temp
+                            if esperas.esperar_respuesta_consulta(driver) == "modal":
+                                error_detectado = detectar_mensaje_error(driver)
+                                if error_detectado:
                                     logging.info(f"   ⚠️ Error detectado: {error_detectado}")
-                                    break
 
                             logging.info("🏁 Fin de la espera de respuesta.")
                             
@@ -2452,18 +2946,23 @@ def procesar_consulta_interno(driver, cedula, placa, fila_numero, es_reintento=F
                             continue
 
                         # ═══ MANEJO DE MODAL Y RESPUESTA ═══
-                        time.sleep(2)
                         
                         resultado_cierre = detectar_y_cerrar_modal_universal(driver, timeout_max=3, max_intentos=4)
 
                         if not resultado_cierre:
+                            monitor_sesion.registrar_recarga()
+                            archivo_captchas.registrar_veredicto(id_captcha, "error")
                             logging.warning("⚠️ Página fue recargada. Rompiendo ciclo de captcha...")
                             break
                         else:
                             if error_detectado == "captcha_incorrecto":
+                                monitor_sesion.registrar_captcha_rechazado()
+                                archivo_captchas.registrar_veredicto(id_captcha, "rechazado")
                                 logging.warning("❌ Captcha rechazado, reintentando...")
                                 continue
                             elif error_detectado == "no_personas":
+                                monitor_sesion.registrar_captcha_aceptado()
+                                archivo_captchas.registrar_veredicto(id_captcha, "aceptado")
                                 logging.warning("ℹ️ No hay personas asociadas a este vehículo")
                                 
                                 resultado = {
@@ -2484,27 +2983,19 @@ def procesar_consulta_interno(driver, cedula, placa, fila_numero, es_reintento=F
                                 return resultado, fila_numero
 
                             elif error_detectado == "error_desconocido":
+                                monitor_sesion.registrar_modal()
+                                archivo_captchas.registrar_veredicto(id_captcha, "error")
                                 logging.warning("⚠️ Error desconocido detectado")
                                 continue
                             else:
                                 logging.info("✅ ¡CAPTCHA ACEPTADO!")
+                                monitor_sesion.registrar_captcha_aceptado()
 
-                                try:
-                                    timestamp = datetime.now().strftime('%H%M%S')
-                                    nombre_exitoso = f"exitoso_{placa}_{texto_final}_{timestamp}.png"
-                                    ruta_exitoso = CAPTCHA_LEIDOS_FOLDER / nombre_exitoso
-                                    img_pil = Image.open(captcha_path)
-                                    img_pil.save(str(ruta_exitoso))
-                                    logging.info(f"✅ Captcha exitoso guardado")
-                                except:
-                                    pass
+                                # Etiqueta verificada en el archivo de captchas (en segundo plano)
+                                archivo_captchas.registrar_veredicto(id_captcha, "aceptado")
                                 
-                                # PASO 1: Extraer DATOS DEL VEHÍCULO
-                                logging.info("\n" + "="*70)
-                                logging.info("📊 PASO 1: LEYENDO DATOS DEL VEHÍCULO...")
-                                logging.info("="*70)
-                                datos_vehiculo = extraer_datos_vehiculo_optimizado(driver)
-                                time.sleep(2)
+                                # Vehículo, SOAT y RTM en una sola llamada (con respaldo por sección)
+                                datos_vehiculo, soat_datos, rtm_datos = extraer_resultado_consulta(driver, placa)
                                 
                                 fila_vehiculo = escribir_datos_vehiculo_en_sheets(
                                     datos_vehiculo, cedula, placa
@@ -2512,26 +3003,9 @@ def procesar_consulta_interno(driver, cedula, placa, fila_numero, es_reintento=F
                                 
                                 if fila_vehiculo:
                                     logging.info(f"✅ Datos del vehículo guardados en fila {fila_vehiculo}")
-                                
-                                time.sleep(2)
-
-                                # PASO 2: Extraer SOAT
-                                logging.info("\n" + "="*70)
-                                logging.info("📊 PASO 2: LEYENDO DATOS DE SOAT...")
-                                logging.info("="*70)
-                                soat_datos = extraer_datos_soat(driver)
-                                time.sleep(2)
-
-                                # PASO 3: Extraer RTM
-                                logging.info("\n" + "="*70)
-                                logging.info("📊 PASO 3: LEYENDO DATOS DE TÉCNOMECÁNICA...")
-                                logging.info("="*70)
-                                rtm_datos = extraer_datos_rtm(driver)
-                                time.sleep(2)
 
                                 logging.info("📜 Scrolling al inicio...")
                                 driver.execute_script("window.scrollTo(0, 0);")
-                                time.sleep(1)
 
                                 resultado = {
                                     "Tiempo ejecucion": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
@@ -2563,14 +3037,125 @@ def procesar_consulta_interno(driver, cedula, placa, fila_numero, es_reintento=F
     agregar_registro_procesado(cedula, placa, "Falló - Error técnico")
     return None, fila_numero
 
+def preparar_siguiente_consulta(driver):
+    """Deja el formulario listo para la próxima placa ('Otra consulta' o recarga)"""
+    try:
+        logging.info("🔄 Preparando siguiente consulta...")
+        limpiar_todos_los_campos(driver)
+        
+        try:
+            otra_consulta_btn = WebDriverWait(driver, 10).until(
+                EC.element_to_be_clickable((By.XPATH, "//button[contains(., 'Otra consulta')]"))
+            )
+        except:
+            logging.warning("⚠️  Recargando página...")
+            esperas.cargar_formulario(driver)
+            limpiar_todos_los_campos(driver)
+            return
+        
+        driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", otra_consulta_btn)
+        driver.execute_script("arguments[0].click();", otra_consulta_btn)
+        esperas.esperar_formulario_listo(driver)
+        limpiar_todos_los_campos(driver)
+        
+    except Exception as e:
+        logging.error(f"⚠️  Error: {e}")
+        esperas.cargar_formulario(driver)
+        limpiar_todos_los_campos(driver)
+
+def registrar_resultado_intento_1(tracking_resultados, resultado, cedula_asociado, placa, indice, total):
+    """Clasifica el resultado del intento 1 y lo guarda en estado y Sheets"""
+    if resultado:
+        estado_resultado = resultado.get("estado", "Pendiente")
+        
+        # Clasificar resultado
+        if estado_resultado == "Exitoso":
+            agregar_resultado_tracking(tracking_resultados, 1, placa, cedula_asociado, "exitoso")
+        elif estado_resultado == "Exitoso - Sin personas asociadas":
+            agregar_resultado_tracking(tracking_resultados, 1, placa, cedula_asociado, "fallo_datos", 
+                                     "No hay personas asociadas al vehículo")
+        else:
+            agregar_resultado_tracking(tracking_resultados, 1, placa, cedula_asociado, "fallo_tecnica",
+                                     "Error en consulta RUNT")
+        
+        guardar_estado(cedula_asociado, placa, estado_resultado, indice, total)
+        guardar_en_sheets([resultado])
+        
+        if "datos_vehiculo" in resultado and resultado["datos_vehiculo"]:
+            escribir_datos_vehiculo_sheets(resultado["datos_vehiculo"])
+            
+        logging.info(f"✅ Datos de {placa} guardados")
+    else:
+        agregar_resultado_tracking(tracking_resultados, 1, placa, cedula_asociado, "fallo_tecnica",
+                                 "No retornó resultado")
+        guardar_estado(cedula_asociado, placa, "Pendiente", indice, total)
+
+# ═════════════════════════════════════════════════════════════
+# WORKERS DEL POOL (NUM_WORKERS > 1)
+# ═════════════════════════════════════════════════════════════
+
+def iniciar_worker_consultas(numero):
+    """En el proceso worker: activa la escritura diferida y abre su navegador"""
+    global _escrituras_diferidas
+    _escrituras_diferidas = []
+    
+    # Cada worker usa su propio perfil (Chrome no comparte un user-data-dir entre instancias)
+    driver = iniciar_driver(perfil=_perfil_worker(numero))
+    if driver:
+        preparar_ventana(driver)
+    return driver
+
+def _perfil_worker(numero):
+    return f"worker_{numero}" if USAR_PERFIL_PERSISTENTE else None
+
+def reciclar_worker_si_corresponde(numero, driver):
+    """En el proceso worker: recicla el navegador si superó el presupuesto de memoria"""
+    if memoria_excedida(driver):
+        return reciclar_driver(driver, perfil=_perfil_worker(numero))
+    return driver
+
+def consultar_en_worker(driver, tarea, contador):
+    """En el proceso worker: procesa una placa y devuelve (resultado, escrituras para el escritor)"""
+    cedula_asociado, cedula_propietario, placa, fila_numero, sheet_origen = tarea
+    
+    reiniciar_sesion_periodico(driver)
+    
+    try:
+        resultado, _ = procesar_consulta(driver, cedula_asociado, cedula_propietario, placa, fila_numero)
+    finally:
+        escrituras = list(_escrituras_diferidas)
+        _escrituras_diferidas.clear()
+    
+    preparar_siguiente_consulta(driver)
+    return resultado, escrituras
+
 def main():
     """Función principal CON VALIDACIÓN, REINTENTOS INTELIGENTES Y REANUDACIÓN"""
-    driver = iniciar_driver()
-    if not driver:
-        logging.error("❌ No se pudo inicializar el driver")
-        return
+    usar_pool = NUM_WORKERS > 1
+    driver = None
+    
+    # Con el pool, los workers abren sus propios navegadores; este solo se abre para los reintentos
+    if not usar_pool:
+        driver = iniciar_driver()
+        if not driver:
+            logging.error("❌ No se pudo inicializar el driver")
+            return
+
+        preparar_ventana(driver)
 
-    driver.maximize_window()
+    # Escrituras a Sheets que quedaron en cola si la ejecución anterior se cortó
+    escritor_sheets.reenviar_pendientes()
+
+    # Pool OCR: un cliente para este proceso (0) y uno por worker de navegador (1..N)
+    global cliente_ocr
+    servicio_ocr = None
+    clientes_workers = None
+    if TAMANO_POOL_OCR > 0:
+        argumentos_ocr = (TESSERACT_PATH, RUTA_MODELO_GLIFOS, TEMPLATE_FOLDER, BACKEND_OCR)
+        servicio_ocr = pool_ocr.ServicioOCR(TAMANO_POOL_OCR, pool_ocr.inicializar_ocr, argumentos_ocr,
+                                            num_clientes=NUM_WORKERS + 1)
+        cliente_ocr = servicio_ocr.cliente(0)
+        clientes_workers = [servicio_ocr.cliente(numero) for numero in range(1, NUM_WORKERS + 1)]
 
     try:
         # ═══ CARGAR DATOS Y VALIDAR ═══
@@ -2629,96 +3214,77 @@ def main():
         tracking_resultados = crear_estructura_resultados()
         
         # ═══ INTENTO 1: PROCESAMIENTO INICIAL ═══
-        registros_procesados_contador = 0
-        
-        for i, (cedula_asociado, cedula_propietario, placa, fila_numero, sheet_origen) in enumerate(datos_por_procesar):
+        if usar_pool:
+            # Varios navegadores en paralelo; este proceso es el único que escribe
+            for i, tarea, resultado in pool_consultas.procesar_en_paralelo(
+                datos_por_procesar,
+                iniciar=iniciar_worker_consultas,
+                consultar=consultar_en_worker,
+                cerrar=cerrar_driver,
+                reciclar=reciclar_worker_si_corresponde,
+                aplicar_escrituras=aplicar_escrituras_diferidas,
+                num_workers=NUM_WORKERS,
+                consultas_por_minuto=CONSULTAS_POR_MINUTO_POR_WORKER,
+                max_simultaneas=MAX_CONSULTAS_SIMULTANEAS,
+                inicializar_proceso=inicializar_worker,
+                args_inicializar=(clientes_workers,)
+            ):
+                cedula_asociado, _, placa, _, _ = tarea
+                logging.info(f"📊 Resultado [{i + 1}/{len(datos_por_procesar)}]: Placa {placa}")
+                registrar_resultado_intento_1(tracking_resultados, resultado, cedula_asociado, placa,
+                                              i, len(datos_por_procesar))
+        else:
+            for i, (cedula_asociado, cedula_propietario, placa, fila_numero, sheet_origen) in enumerate(datos_por_procesar):
             
-            # 🔄 REINICIO PERIÓDICO CADA 5 REGISTROS
-            reiniciar_sesion_periodico(driver, registros_procesados_contador)
-            registros_procesados_contador += 1
+                # 🔄 REINICIO DE SESIÓN SI LAS SEÑALES LO PIDEN
+                reiniciar_sesion_periodico(driver)
             
-            logging.info(f"\n{'='*70}")
-            logging.info(f"📊 Procesando [{i + 1}/{len(datos_por_procesar)}]: Placa {placa}")
-            logging.info(f"{'='*70}")
+                logging.info(f"\n{'='*70}")
+                logging.info(f"📊 Procesando [{i + 1}/{len(datos_por_procesar)}]: Placa {placa}")
+                logging.info(f"{'='*70}")
             
-            resultado, fila = procesar_consulta(
-                driver, 
-                cedula_asociado,
-                cedula_propietario,
-                placa, 
-                fila_numero
-            )
+                resultado, fila = procesar_consulta(
+                    driver, 
+                    cedula_asociado,
+                    cedula_propietario,
+                    placa, 
+                    fila_numero
+                )
 
-            if resultado:
-                estado_resultado = resultado.get("estado", "Pendiente")
-                
-                # Clasificar resultado
-                if estado_resultado == "Exitoso":
-                    agregar_resultado_tracking(tracking_resultados, 1, placa, cedula_asociado, "exitoso")
-                elif estado_resultado == "Exitoso - Sin personas asociadas":
-                    agregar_resultado_tracking(tracking_resultados, 1, placa, cedula_asociado, "fallo_datos", 
-                                             "No hay personas asociadas al vehículo")
-                else:
-                    agregar_resultado_tracking(tracking_resultados, 1, placa, cedula_asociado, "fallo_tecnica",
-                                             "Error en consulta RUNT")
-                
-                guardar_estado(cedula_asociado, placa, estado_resultado, i, len(datos_por_procesar))
-                guardar_en_sheets([resultado])
-                
-                if "datos_vehiculo" in resultado and resultado["datos_vehiculo"]:
-                    escribir_datos_vehiculo_sheets(resultado["datos_vehiculo"])
-                    
-                logging.info(f"✅ Datos de {placa} guardados")
-            else:
-                agregar_resultado_tracking(tracking_resultados, 1, placa, cedula_asociado, "fallo_tecnica",
-                                         "No retornó resultado")
-                guardar_estado(cedula_asociado, placa, "Pendiente", i, len(datos_por_procesar))
+                registrar_resultado_intento_1(tracking_resultados, resultado, cedula_asociado, placa,
+                                              i, len(datos_por_procesar))
 
-            # Preparar siguiente consulta
-            if i < len(datos_por_procesar) - 1:
-                try:
-                    logging.info("🔄 Preparando siguiente consulta...")
-                    limpiar_todos_los_campos(driver)
-                    time.sleep(1)
-                    
-                    try:
-                        otra_consulta_btn = WebDriverWait(driver, 10).until(
-                            EC.element_to_be_clickable((By.XPATH, "//button[contains(., 'Otra consulta')]"))
-                        )
-                    except:
-                        logging.warning("⚠️  Recargando página...")
-                        driver.get("https://portalpublico.runt.gov.co/#/consulta-vehiculo/consulta/consulta-ciudadana")
-                        time.sleep(3)
-                        limpiar_todos_los_campos(driver)
-                        continue
-                    
-                    driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", otra_consulta_btn)
-                    time.sleep(1)
-                    driver.execute_script("arguments[0].click();", otra_consulta_btn)
-                    time.sleep(3)
-                    limpiar_todos_los_campos(driver)
-                    time.sleep(1)
-                    
-                except Exception as e:
-                    logging.error(f"⚠️  Error: {e}")
-                    driver.get("https://portalpublico.runt.gov.co/#/consulta-vehiculo/consulta/consulta-ciudadana")
-                    time.sleep(3)
-                    limpiar_todos_los_campos(driver)
+                # Preparar siguiente consulta (con navegador nuevo si superó el presupuesto de memoria)
+                if i < len(datos_por_procesar) - 1:
+                    if memoria_excedida(driver):
+                        driver = reciclar_driver(driver)
+                        if not driver:
+                            logging.error("❌ No se pudo reciclar el navegador")
+                            return
+                    else:
+                        preparar_siguiente_consulta(driver)
         
         # ═══ INTENTO 2: REINTENTAR SOLO FALLOS TÉCNICOS ═══
         fallos_tecnica_intento1 = tracking_resultados["intento_1"]["fallos_tecnica"]
         
+        if fallos_tecnica_intento1 and driver is None:
+            # Los reintentos van en secuencia con un solo navegador
+            driver = iniciar_driver()
+            if not driver:
+                logging.error("❌ No se pudo inicializar el driver para los reintentos")
+                generar_reporte_final(tracking_resultados)
+                return
+            preparar_ventana(driver)
+        
         if fallos_tecnica_intento1:
             logging.info(f"\n{'='*70}")
             logging.info(f"🔄 INTENTO 2 - REINTENTANDO {len(fallos_tecnica_intento1)} FALLOS TÉCNICOS")
             logging.info(f"{'='*70}\n")
             
-            contador_intento2 = 0
             for fallo in fallos_tecnica_intento1:
                 
-                # 🔄 REINICIO PERIÓDICO CADA 5 REGISTROS
-                reiniciar_sesion_periodico(driver, contador_intento2)
-                contador_intento2 += 1
+                # 🔄 REINICIO DE SESIÓN SI LAS SEÑALES LO PIDEN
+                reiniciar_sesion_periodico(driver)
                 placa_reintento = fallo["placa"]
                 cedula_reintento = fallo["cedula"]
                 
@@ -2795,12 +3361,10 @@ def main():
             logging.info(f"🔄 INTENTO 3 - SEGUNDO REINTENTO DE {len(fallos_tecnica_intento2)} REGISTROS")
             logging.info(f"{'='*70}\n")
             
-            contador_intento3 = 0
             for fallo in fallos_tecnica_intento2:
                 
-                    # 🔄 REINICIO PERIÓDICO CADA 5 REGISTROS
-                reiniciar_sesion_periodico(driver, contador_intento3)
-                contador_intento3 += 1
+                # 🔄 REINICIO DE SESIÓN SI LAS SEÑALES LO PIDEN
+                reiniciar_sesion_periodico(driver)
                 placa_reintento = fallo["placa"]
                 cedula_reintento = fallo["cedula"]
                 
@@ -2859,7 +3423,10 @@ def main():
         logging.error(f"❌ Error principal: {e}", exc_info=True)
     finally:
         cerrar_driver(driver)
+        if servicio_ocr is not None:
+            servicio_ocr.cerrar()
 
 if __name__ == "__main__":
+    configurar_proceso()
     logging.info("🚀 Iniciando Bot RUNT FINAL...")
     main()
\ No newline at end of file
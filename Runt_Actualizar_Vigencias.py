@@ -8,7 +8,8 @@ Columnas para lectura:
 - F: Estado Vigencia (filtra: No vigente, SE VENCE PRONTO, SE VENCE HOY)
 
 ESCRIBE los resultados actualizados en la hoja 'Datos Runt'
-USA SU PROPIO ARCHIVO DE ESTADO (estado_vigencias.json) - NO INTERFIERE CON Runt.py
+USA SU PROPIO ESTADO EN LA BASE SQLITE COMPARTIDA (estado_db.py, procesos "vigencias_*")
+- NO INTERFIERE CON Runt.py, que puede correr al mismo tiempo
 """
 
 import logging
@@ -21,7 +22,6 @@ from datetime import datetime
 from typing import Optional, Dict, List, Tuple
 from pathlib import Path
 import gspread
-from google.oauth2.service_account import Credentials
 
 
 # Configuración logging - USAR ARCHIVOS PROPIOS
@@ -41,9 +41,15 @@ logging.basicConfig(
 
 # Importar funciones del Runt.py
 from Runt import (
-    iniciar_driver, cerrar_driver, limpiar_todos_los_campos,
-    procesar_consulta_interno, GOOGLE_CREDS
+    iniciar_driver, cerrar_driver, preparar_ventana, limpiar_todos_los_campos,
+    procesar_consulta_interno, reiniciar_sesion_periodico, monitor_sesion, configurar_proceso
 )
+configurar_proceso()  # El logging ya está configurado arriba: Runt solo agrega su log de captchas
+import estado_db
+import sheets_session
+import carga_incremental
+import escritor_sheets
+import indice_filas
 
 
 
@@ -93,70 +99,54 @@ PAUSA_ENTRE_CICLOS = 3600  # 1 hora en segundos (ajustable)
 PAUSA_CORTA = 5            # Segundos entre consultas
 REINICIO_DRIVER_CADA_CICLOS = 10  # Reiniciar driver cada X ciclos completos
 
-# ARCHIVO DE ESTADO PROPIO (NO INTERFIERE CON Runt.py)
-ESTADO_VIGENCIAS_FILE = "estado_vigencias.json"
+# ESTADO PROPIO EN LA BASE COMPARTIDA (NO INTERFIERE CON Runt.py)
+PROCESOS_VIGENCIAS = {
+    "soat": "vigencias_soat",
+    "tecnomecanica": "vigencias_tecnomecanica"
+}
+PROCESO_ESTADISTICAS = "vigencias"
 
+# Archivo JSON de versiones anteriores (solo se importa una vez a la base)
+ESTADO_VIGENCIAS_FILE = "estado_vigencias.json"
 
-def estructura_estado_inicial():
-    """Crea la estructura inicial del archivo de estado propio"""
-    return {
-        "version": "1.0",
-        "tipo": "vigencias",
-        "soat": {
-            "procesadas": {},  # {"placa": {"estado": "exitoso", "fecha": "iso", "vigencia": "..."}}
-            "ultima_ejecucion": None,
-            "total_exitosas": 0,
-            "total_fallidas": 0,
-            "ultimo_ciclo": 0
-        },
-        "tecnomecanica": {
-            "procesadas": {},
-            "ultima_ejecucion": None,
-            "total_exitosas": 0,
-            "total_fallidas": 0,
-            "ultimo_ciclo": 0
-        },
-        "estadisticas": {
-            "total_ciclos": 0,
-            "fecha_inicio": None,
-            "fecha_ultimo_ciclo": None,
-            "total_consultas": 0
-        }
-    }
-
-
-def cargar_estado_vigencias():
-    """Carga el estado de vigencias desde archivo propio"""
-    if os.path.exists(ESTADO_VIGENCIAS_FILE):
-        try:
-            with open(ESTADO_VIGENCIAS_FILE, "r", encoding="utf-8") as f:
-                estado = json.load(f)
-                logging.debug(f"✅ Estado cargado desde {ESTADO_VIGENCIAS_FILE}")
-                return estado
-        except Exception as e:
-            logging.warning(f"⚠️ Error cargando estado: {e}, creando nuevo")
-            return estructura_estado_inicial()
-    else:
-        logging.info(f"📁 Creando nuevo archivo de estado: {ESTADO_VIGENCIAS_FILE}")
-        return estructura_estado_inicial()
 
+def importar_estado_vigencias_legacy():
+    """Importa estado_vigencias.json a la base SQLite si la base aún no tiene datos"""
+    if not os.path.exists(ESTADO_VIGENCIAS_FILE):
+        return
+    if not all(estado_db.proceso_vacio(p) for p in list(PROCESOS_VIGENCIAS.values()) + [PROCESO_ESTADISTICAS]):
+        return
 
-def guardar_estado_vigencias(estado):
-    """Guarda el estado de vigencias en archivo propio"""
     try:
-        with open(ESTADO_VIGENCIAS_FILE, "w", encoding="utf-8") as f:
-            json.dump(estado, f, indent=2, ensure_ascii=False)
-        logging.debug(f"💾 Estado guardado en {ESTADO_VIGENCIAS_FILE}")
+        with open(ESTADO_VIGENCIAS_FILE, "r", encoding="utf-8") as f:
+            estado = json.load(f)
     except Exception as e:
-        logging.error(f"❌ Error guardando estado: {e}")
+        logging.warning(f"⚠️ Error leyendo {ESTADO_VIGENCIAS_FILE}: {e}, no se importa")
+        return
+
+    with estado_db.transaccion() as conexion:
+        for tipo, proceso in PROCESOS_VIGENCIAS.items():
+            datos_tipo = estado.get(tipo, {})
+            for placa, info in datos_tipo.get("procesadas", {}).items():
+                detalle = {k: v for k, v in info.items() if k != "estado"}
+                estado_db.actualizar_resultado(proceso, placa, info.get("estado", "fallido"),
+                                               detalle=detalle, conexion=conexion)
+            for clave in ("ultima_ejecucion", "total_exitosas", "total_fallidas", "ultimo_ciclo"):
+                if datos_tipo.get(clave) is not None:
+                    estado_db.guardar_meta(proceso, clave, datos_tipo[clave], conexion=conexion)
+
+        for clave, valor in estado.get("estadisticas", {}).items():
+            if valor is not None:
+                estado_db.guardar_meta(PROCESO_ESTADISTICAS, clave, valor, conexion=conexion)
+
+    logging.info(f"✅ {ESTADO_VIGENCIAS_FILE} importado a la base de estado")
 
 
 def reiniciar_estado_vigencias():
     """Reinicia el estado (útil para pruebas)"""
-    estado = estructura_estado_inicial()
-    guardar_estado_vigencias(estado)
+    for proceso in list(PROCESOS_VIGENCIAS.values()) + [PROCESO_ESTADISTICAS]:
+        estado_db.borrar_proceso(proceso)
     logging.info("🔄 Estado de vigencias REINICIADO")
-    return estado
 
 
 class VigenciaProcessor:
@@ -170,35 +160,28 @@ class VigenciaProcessor:
         self.contador_consultas_ciclo = 0
         self.contador_ciclos = 0
         self.ejecutando = True
-        self.estado = cargar_estado_vigencias()
+        importar_estado_vigencias_legacy()
         
         # Configurar señal para cerrar gracefulmente
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
         
     def signal_handler(self, signum, frame):
-        """Maneja la señal de cierre para detener el bucle gracefulmente"""
-        logging.info(f"\n⚠️ Señal de cierre recibida. Guardando estado final...")
-        self.estado["estadisticas"]["fecha_ultimo_ciclo"] = datetime.now().isoformat()
-        guardar_estado_vigencias(self.estado)
+        """
+        Maneja la señal de cierre para detener el bucle gracefulmente.
+        Solo marca la parada: la señal puede llegar con este mismo hilo dentro de
+        un flush (lock de envío tomado, esperando una cuota 429) o de una
+        transacción SQLite. El estado y la cola se guardan en el finally de
+        ejecutar_bucle_infinito.
+        """
+        logging.info("\n⚠️ Señal de cierre recibida. Terminando la consulta en curso...")
         self.ejecutando = False
         
     def conectar_google_sheets(self):
-        """Conecta a Google Sheets"""
+        """Conecta a Google Sheets (sesión compartida del proceso, ver sheets_session.py)"""
         try:
-            SCOPES = [
-                "https://spreadsheets.google.com/feeds",
-                "https://www.googleapis.com/auth/spreadsheets",
-                "https://www.googleapis.com/auth/drive"
-            ]
-            
-            creds = Credentials.from_service_account_file(
-                str(GOOGLE_CREDS),
-                scopes=SCOPES
-            )
-            
-            self.client = gspread.authorize(creds)
-            self.sheet = self.client.open_by_key(SHEET_ID)
+            self.client = sheets_session.obtener_cliente()
+            self.sheet = sheets_session.abrir_spreadsheet(SHEET_ID)
             logging.info("✅ Conexión a Google Sheets establecida")
             return True
             
@@ -215,7 +198,8 @@ class VigenciaProcessor:
             
             self.driver = iniciar_driver()
             if self.driver:
-                self.driver.maximize_window()
+                preparar_ventana(self.driver)
+                monitor_sesion.reiniciada()  # Navegador nuevo = sesión limpia
                 logging.info("✅ Driver reiniciado correctamente")
                 return True
             else:
@@ -237,17 +221,37 @@ class VigenciaProcessor:
             Lista de tuplas (cedula_asociado, cedula_propietario, placa, numero_fila)
         """
         try:
-            worksheet = self.sheet.worksheet(sheet_name)
-            todas_filas = worksheet.get_all_values()
+            # Solo las columnas A..F que se usan (una llamada, sin descargar la hoja completa)
+            columna_final = escritor_sheets.columna_a_letra(
+                max(COL_CEDULA_ASOCIADO, COL_PLACA, COL_CEDULA_PROPIETARIO, COL_ESTADO_ACTUAL)
+            )
+            # Sonda: solo las columnas clave (C:E). Si no cambiaron no se descarga A:F y las
+            # filas salen de la copia local del ciclo anterior (carga_incremental.py)
+            columnas_clave = (COL_CEDULA_ASOCIADO, COL_PLACA, COL_CEDULA_PROPIETARIO)
+            rango_clave = (f"{escritor_sheets.columna_a_letra(min(columnas_clave))}:"
+                           f"{escritor_sheets.columna_a_letra(max(columnas_clave))}")
+            cargas = carga_incremental.cargar_hojas(SHEET_ID, {sheet_name: f"A:{columna_final}"},
+                                                    {sheet_name: rango_clave})
+            if sheet_name not in cargas:
+                raise gspread.WorksheetNotFound(sheet_name)
+            carga = cargas[sheet_name]
+            todas_filas = carga["filas"]
+            filas_cambiadas = set(carga["cambiadas"])
             
             if not todas_filas or len(todas_filas) < 2:
                 logging.warning(f"⚠️ La hoja {sheet_name} está vacía o no tiene datos")
                 return []
             
-            # Obtener placas ya procesadas exitosamente
-            procesadas = self.estado[tipo]["procesadas"]
+            proceso = PROCESOS_VIGENCIAS[tipo]
+            
+            # La cola es lo pendiente en estado_db: filas nuevas o modificadas (que se marcan
+            # "pendiente" al verlas) y las que fallaron en ciclos anteriores
+            exitosas = set(estado_db.placas_con_estado(proceso, "exitoso"))
+            pendientes = set(estado_db.placas_con_estado(proceso, "pendiente"))
+            pendientes.update(estado_db.placas_con_estado(proceso, "fallido"))
             
             registros_a_procesar = []
+            nuevas = []
             saltadas = 0
             
             for idx, fila in enumerate(todas_filas[1:], start=2):
@@ -261,17 +265,34 @@ class VigenciaProcessor:
                     continue
                 
                 # Saltar si ya fue procesada exitosamente
-                if placa in procesadas and procesadas[placa].get("estado") == "exitoso":
+                if placa in exitosas:
                     saltadas += 1
                     continue
                 
                 # Filtrar por estado
-                if estado_actual in ESTADOS_BUSCAR:
+                if estado_actual not in ESTADOS_BUSCAR:
+                    continue
+                
+                if idx in filas_cambiadas and placa not in pendientes:
+                    nuevas.append((placa, cedula_asociado))
+                    pendientes.add(placa)
+                
+                if placa in pendientes:
                     registros_a_procesar.append((cedula_asociado, cedula_propietario, placa, idx))
             
+            if nuevas:
+                # Quedan pendientes aunque el proceso se detenga antes de consultarlas
+                with estado_db.transaccion() as conexion:
+                    for placa, cedula_asociado in nuevas:
+                        estado_db.actualizar_resultado(proceso, placa, "pendiente", cedula_asociado, conexion=conexion)
+                logging.info(f"   🆕 {len(nuevas)} placas de filas nuevas o modificadas agregadas a la cola")
+            
             if saltadas > 0:
                 logging.info(f"   ⏭️ {saltadas} placas ya procesadas exitosamente (saltadas)")
             
+            if carga["sin_cambios"]:
+                logging.info(f"   ♻️ Sin cambios en {sheet_name}: solo pendientes de ciclos anteriores")
+            
             return registros_a_procesar
             
         except gspread.WorksheetNotFound:
@@ -297,70 +318,45 @@ class VigenciaProcessor:
             return "Error en consulta"
     
     def guardar_o_actualizar_en_datos_runt(self, resultado: Dict, tipo: str = "soat"):
-        """Guarda o actualiza el resultado en la hoja Datos Runt"""
+        """
+        Guarda o actualiza el resultado en la hoja Datos Runt.
+        
+        La fila se ubica con el índice en memoria (sin leer la hoja) y si ya existe
+        solo se escriben A:D, el bloque del tipo consultado (SOAT E:K o RTM L:R) y S,
+        dejando intacto el otro bloque. Las escrituras van a la cola de escritor_sheets.
+        """
         try:
-            worksheet = self.sheet.worksheet(SHEET_DATOS_RUNT)
-            todas_filas = worksheet.get_all_values()
+            indice = indice_filas.obtener_indice(SHEET_ID, SHEET_DATOS_RUNT, columnas_clave=(3,),
+                                                 primera_fila_datos=2, fila_minima_nueva=2)
             
-            placa_buscar = resultado.get("placa", "").upper()
-            numero_fila_existente = None
-            datos_existentes = None
+            numero_fila, existia = indice.buscar_o_reservar(resultado.get("placa", ""))
             
-            for idx, fila_exist in enumerate(todas_filas[1:], start=2):
-                if len(fila_exist) > 2:
-                    placa_en_fila = fila_exist[2].strip().upper() if fila_exist[2] else ""
-                    if placa_en_fila == placa_buscar:
-                        numero_fila_existente = idx
-                        datos_existentes = fila_exist
-                        break
+            datos_base = [
+                resultado.get("Tiempo ejecucion", datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+                resultado.get("cedula", "No disponible"),
+                resultado.get("placa", "No disponible"),
+                resultado.get("cilindraje", "No disponible"),
+            ]
+            estado = [resultado.get("estado", "Pendiente")]
             
             if tipo == "soat":
-                soat_data_nuevos = resultado.get("datos_soat", ["No disponible"] * 7)
-                
-                if numero_fila_existente and datos_existentes:
-                    rtm_data_actuales = datos_existentes[11:18] if len(datos_existentes) > 18 else ["No disponible"] * 7
-                    fila_completa = [
-                        resultado.get("Tiempo ejecucion", datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
-                        resultado.get("cedula", "No disponible"),
-                        resultado.get("placa", "No disponible"),
-                        resultado.get("cilindraje", "No disponible"),
-                    ] + soat_data_nuevos + rtm_data_actuales + [resultado.get("estado", "Pendiente")]
-                    rango = f"A{numero_fila_existente}:S{numero_fila_existente}"
-                    worksheet.update([fila_completa], range_name=rango, value_input_option="RAW")
-                else:
-                    fila_completa = [
-                        resultado.get("Tiempo ejecucion", datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
-                        resultado.get("cedula", "No disponible"),
-                        resultado.get("placa", "No disponible"),
-                        resultado.get("cilindraje", "No disponible"),
-                    ] + soat_data_nuevos + ["No disponible"] * 7 + [resultado.get("estado", "Pendiente")]
-                    fila_nueva = len(todas_filas) + 1
-                    rango = f"A{fila_nueva}:S{fila_nueva}"
-                    worksheet.update([fila_completa], range_name=rango, value_input_option="RAW")
-                    
+                datos_nuevos = resultado.get("datos_soat", ["No disponible"] * 7)
+                rango_bloque = f"E{numero_fila}:K{numero_fila}"
             else:
-                rtm_data_nuevos = resultado.get("datos_técnicos", ["No disponible"] * 7)
-                
-                if numero_fila_existente and datos_existentes:
-                    soat_data_actuales = datos_existentes[4:11] if len(datos_existentes) > 11 else ["No disponible"] * 7
-                    fila_completa = [
-                        resultado.get("Tiempo ejecucion", datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
-                        resultado.get("cedula", "No disponible"),
-                        resultado.get("placa", "No disponible"),
-                        resultado.get("cilindraje", "No disponible"),
-                    ] + soat_data_actuales + rtm_data_nuevos + [resultado.get("estado", "Pendiente")]
-                    rango = f"A{numero_fila_existente}:S{numero_fila_existente}"
-                    worksheet.update([fila_completa], range_name=rango, value_input_option="RAW")
+                datos_nuevos = resultado.get("datos_técnicos", ["No disponible"] * 7)
+                rango_bloque = f"L{numero_fila}:R{numero_fila}"
+            
+            if existia:
+                escritor_sheets.encolar(SHEET_ID, SHEET_DATOS_RUNT, f"A{numero_fila}:D{numero_fila}", [datos_base])
+                escritor_sheets.encolar(SHEET_ID, SHEET_DATOS_RUNT, rango_bloque, [datos_nuevos])
+                escritor_sheets.encolar(SHEET_ID, SHEET_DATOS_RUNT, f"S{numero_fila}", [estado])
+            else:
+                if tipo == "soat":
+                    fila_completa = datos_base + datos_nuevos + ["No disponible"] * 7 + estado
                 else:
-                    fila_completa = [
-                        resultado.get("Tiempo ejecucion", datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
-                        resultado.get("cedula", "No disponible"),
-                        resultado.get("placa", "No disponible"),
-                        resultado.get("cilindraje", "No disponible"),
-                    ] + ["No disponible"] * 7 + rtm_data_nuevos + [resultado.get("estado", "Pendiente")]
-                    fila_nueva = len(todas_filas) + 1
-                    rango = f"A{fila_nueva}:S{fila_nueva}"
-                    worksheet.update([fila_completa], range_name=rango, value_input_option="RAW")
+                    fila_completa = datos_base + ["No disponible"] * 7 + datos_nuevos + estado
+                rango = f"A{numero_fila}:S{numero_fila}"
+                escritor_sheets.encolar(SHEET_ID, SHEET_DATOS_RUNT, rango, [fila_completa])
             
         except Exception as e:
             logging.error(f"❌ Error guardando en Datos Runt: {e}")
@@ -408,17 +404,9 @@ class VigenciaProcessor:
             return None, False
     
     def reiniciar_sesion_periodica(self):
-        """Reinicia la sesión periódicamente cada 5 consultas"""
-        if self.contador_consultas_ciclo > 0 and self.contador_consultas_ciclo % 5 == 0 and self.driver:
-            try:
-                self.driver.get("https://www.google.com")
-                time.sleep(2)
-                self.driver.get("https://portalpublico.runt.gov.co/#/consulta-vehiculo/consulta/consulta-ciudadana")
-                time.sleep(4)
-                limpiar_todos_los_campos(self.driver)
-                time.sleep(2)
-            except Exception as e:
-                logging.error(f"❌ Error reiniciando sesión: {e}")
+        """Reinicia la sesión en el mismo sitio cuando las señales de Runt.monitor_sesion lo piden"""
+        if self.driver:
+            reiniciar_sesion_periodico(self.driver)
     
     def procesar_tipo_vigencia(self, sheet_name: str, tipo: str) -> Tuple[int, int]:
         """
@@ -456,14 +444,21 @@ class VigenciaProcessor:
                 self.guardar_o_actualizar_en_datos_runt(resultado, tipo)
                 
                 # Guardar en estado propio
-                self.estado[tipo]["procesadas"][placa] = {
-                    "estado": "exitoso",
-                    "fecha": datetime.now().isoformat(),
-                    "vigencia": nuevo_estado,
-                    "ciclo": self.contador_ciclos + 1
-                }
-                self.estado[tipo]["total_exitosas"] += 1
-                self.estado["estadisticas"]["total_consultas"] += 1
+                estado_db.registrar_intento(
+                    PROCESOS_VIGENCIAS[tipo], resultado.get("cedula", cedula_asociado), placa, "exitoso",
+                    estado_resultado="exitoso",
+                    detalle={
+                        "fecha": datetime.now().isoformat(),
+                        "vigencia": nuevo_estado,
+                        "ciclo": self.contador_ciclos + 1
+                    },
+                    datos_vehiculo=resultado.get("datos_vehiculo"),
+                    datos_soat=resultado.get("datos_soat"),
+                    datos_rtm=resultado.get("datos_técnicos"),
+                    cedula_propietario=cedula_propietario or None
+                )
+                estado_db.incrementar_meta(PROCESOS_VIGENCIAS[tipo], "total_exitosas")
+                estado_db.incrementar_meta(PROCESO_ESTADISTICAS, "total_consultas")
                 
                 exitosos += 1
                 
@@ -473,13 +468,17 @@ class VigenciaProcessor:
                 
             else:
                 # Guardar fallo en estado
-                self.estado[tipo]["procesadas"][placa] = {
-                    "estado": "fallido",
-                    "fecha": datetime.now().isoformat(),
-                    "ciclo": self.contador_ciclos + 1
-                }
-                self.estado[tipo]["total_fallidas"] += 1
-                self.estado["estadisticas"]["total_consultas"] += 1
+                estado_db.registrar_intento(
+                    PROCESOS_VIGENCIAS[tipo], cedula_asociado, placa, "fallido",
+                    estado_resultado="fallido",
+                    detalle={
+                        "fecha": datetime.now().isoformat(),
+                        "ciclo": self.contador_ciclos + 1
+                    },
+                    cedula_propietario=cedula_propietario or None
+                )
+                estado_db.incrementar_meta(PROCESOS_VIGENCIAS[tipo], "total_fallidas")
+                estado_db.incrementar_meta(PROCESO_ESTADISTICAS, "total_consultas")
                 
                 fallos += 1
                 
@@ -487,9 +486,6 @@ class VigenciaProcessor:
                 errores_logger.info(f"{tipo.upper()} - {placa} - FALLÓ")
                 logging.error(f"❌ {tipo.upper()} - {placa} FALLÓ")
             
-            # Guardar estado después de cada consulta
-            guardar_estado_vigencias(self.estado)
-            
             time.sleep(PAUSA_CORTA)
         
         return exitosos, fallos
@@ -518,17 +514,16 @@ class VigenciaProcessor:
         exitosos_rtm, fallos_rtm = self.procesar_tipo_vigencia(SHEET_TECNOMECANICA, "tecnomecanica")
         
         # Actualizar estadísticas del ciclo
-        self.estado["estadisticas"]["total_ciclos"] = ciclo_numero
-        self.estado["estadisticas"]["fecha_ultimo_ciclo"] = datetime.now().isoformat()
-        if self.estado["estadisticas"]["fecha_inicio"] is None:
-            self.estado["estadisticas"]["fecha_inicio"] = datetime.now().isoformat()
-        
-        self.estado["soat"]["ultima_ejecucion"] = datetime.now().isoformat()
-        self.estado["soat"]["ultimo_ciclo"] = ciclo_numero
-        self.estado["tecnomecanica"]["ultima_ejecucion"] = datetime.now().isoformat()
-        self.estado["tecnomecanica"]["ultimo_ciclo"] = ciclo_numero
-        
-        guardar_estado_vigencias(self.estado)
+        with estado_db.transaccion() as conexion:
+            ahora = datetime.now().isoformat()
+            estado_db.guardar_meta(PROCESO_ESTADISTICAS, "total_ciclos", ciclo_numero, conexion=conexion)
+            estado_db.guardar_meta(PROCESO_ESTADISTICAS, "fecha_ultimo_ciclo", ahora, conexion=conexion)
+            if estado_db.obtener_meta(PROCESO_ESTADISTICAS, "fecha_inicio", conexion=conexion) is None:
+                estado_db.guardar_meta(PROCESO_ESTADISTICAS, "fecha_inicio", ahora, conexion=conexion)
+            
+            for proceso in PROCESOS_VIGENCIAS.values():
+                estado_db.guardar_meta(proceso, "ultima_ejecucion", ahora, conexion=conexion)
+                estado_db.guardar_meta(proceso, "ultimo_ciclo", ciclo_numero, conexion=conexion)
         
         # Log de resumen del ciclo
         resumen = (f"CICLO #{ciclo_numero} - SOAT: ✅{exitosos_soat} ❌{fallos_soat} | "
@@ -549,7 +544,7 @@ class VigenciaProcessor:
         """Ejecuta el bucle infinito de procesamiento"""
         logging.info("="*80)
         logging.info("🚀 PROCESADOR DE VIGENCIAS - MODO BUCLE INFINITO")
-        logging.info(f"   📁 Archivo de estado propio: {ESTADO_VIGENCIAS_FILE}")
+        logging.info(f"   📁 Estado propio en base compartida: {estado_db.DB_FILE}")
         logging.info(f"   📁 Logs en carpeta: logs/")
         logging.info(f"   ⏱️  Pausa entre ciclos: {PAUSA_ENTRE_CICLOS} segundos")
         logging.info(f"   🔄 Reinicio de driver cada: {REINICIO_DRIVER_CADA_CICLOS} ciclos")
@@ -558,16 +553,20 @@ class VigenciaProcessor:
         
         # Mostrar estadísticas actuales
         logging.info(f"\n📊 ESTADÍSTICAS ACTUALES:")
-        logging.info(f"   SOAT - Exitosas: {self.estado['soat']['total_exitosas']} | Fallidas: {self.estado['soat']['total_fallidas']}")
-        logging.info(f"   RTM  - Exitosas: {self.estado['tecnomecanica']['total_exitosas']} | Fallidas: {self.estado['tecnomecanica']['total_fallidas']}")
-        logging.info(f"   Total ciclos completados: {self.estado['estadisticas']['total_ciclos']}")
-        logging.info(f"   Total consultas realizadas: {self.estado['estadisticas']['total_consultas']}\n")
+        soat, rtm = PROCESOS_VIGENCIAS["soat"], PROCESOS_VIGENCIAS["tecnomecanica"]
+        logging.info(f"   SOAT - Exitosas: {estado_db.obtener_meta(soat, 'total_exitosas', 0)} | Fallidas: {estado_db.obtener_meta(soat, 'total_fallidas', 0)}")
+        logging.info(f"   RTM  - Exitosas: {estado_db.obtener_meta(rtm, 'total_exitosas', 0)} | Fallidas: {estado_db.obtener_meta(rtm, 'total_fallidas', 0)}")
+        logging.info(f"   Total ciclos completados: {estado_db.obtener_meta(PROCESO_ESTADISTICAS, 'total_ciclos', 0)}")
+        logging.info(f"   Total consultas realizadas: {estado_db.obtener_meta(PROCESO_ESTADISTICAS, 'total_consultas', 0)}\n")
         
         # Conectar a Google Sheets
         if not self.conectar_google_sheets():
             logging.error("❌ No se pudo conectar a Google Sheets")
             return
         
+        # Escrituras que quedaron en cola si la ejecución anterior se cortó
+        escritor_sheets.reenviar_pendientes()
+        
         # Iniciar driver
         if not self.reiniciar_driver():
             logging.error("❌ No se pudo iniciar el driver")
@@ -605,6 +604,7 @@ class VigenciaProcessor:
                     # Intentar reconectar
                     try:
                         self.reiniciar_driver()
+                        sheets_session.reiniciar_sesion()
                         self.conectar_google_sheets()
                     except:
                         pass
@@ -612,8 +612,11 @@ class VigenciaProcessor:
         except KeyboardInterrupt:
             logging.info("\n⚠️ Proceso detenido por el usuario")
         finally:
-            self.estado["estadisticas"]["fecha_ultimo_ciclo"] = datetime.now().isoformat()
-            guardar_estado_vigencias(self.estado)
+            estado_db.guardar_meta(PROCESO_ESTADISTICAS, "fecha_ultimo_ciclo", datetime.now().isoformat())
+            try:
+                escritor_sheets.flush()
+            except Exception as e:
+                logging.error(f"❌ Error enviando la cola de Sheets al cerrar: {e}")
             if self.driver:
                 cerrar_driver(self.driver)
             logging.info("✅ Proceso finalizado. Estado guardado.")
@@ -5,7 +5,8 @@ Este script funciona de forma independiente pero reutiliza la lógica core de Ru
 Su objetivo es procesar EXCLUSIVAMENTE los registros que quedaron marcados como 'Falló'
 en la hoja 'Resultados' de Google Sheets.
 
-Opera en su propia carpeta 'Verificacion' con sus propios logs y estado JSON.
+Opera en su propia carpeta 'Verificacion' con sus propios logs; su estado vive en la base
+SQLite compartida (estado_db.py, proceso "verificacion"), así puede correr junto a Runt.py.
 Implementa una lógica agresiva de reintentos para distinguir entre un error técnico/captcha
 y un mensaje real de "Sin personas asociadas".
 
@@ -22,7 +23,6 @@ import os
 from datetime import datetime
 from pathlib import Path
 import gspread
-from google.oauth2.service_account import Credentials
 
 # ============================================================
 # 1. CONFIGURACIÓN Y ESTRUCTURA DE CARPETAS (EXCLUSIVA)
@@ -33,7 +33,8 @@ BASE_PATH = Path(__file__).parent / "Verificacion"
 BASE_PATH.mkdir(parents=True, exist_ok=True)
 
 # Rutas de archivos propias
-ESTADO_FILE = BASE_PATH / "estado_verificacion.json"
+ESTADO_FILE = BASE_PATH / "estado_verificacion.json"  # Solo para importar estado antiguo
+PROCESO_ESTADO = "verificacion"
 LOG_FILE = BASE_PATH / "verificacion.log"
 
 # IDs y Nombres de Hojas de Sheets
@@ -61,10 +62,14 @@ logging.basicConfig(
 # Importar funciones CORE de Runt.py (Asumiendo que Runt.py está en la misma carpeta)
 try:
     from Runt import (
-        iniciar_driver, cerrar_driver, GOOGLE_CREDS,
+        iniciar_driver, cerrar_driver, preparar_ventana,
         limpiar_todos_los_campos, procesar_consulta_interno,
-        escribir_datos_vehiculo_en_sheets, guardar_en_sheets
+        escribir_datos_vehiculo_en_sheets, guardar_en_sheets, configurar_proceso
     )
+    configurar_proceso()  # El logging ya está configurado arriba: Runt solo agrega su log de captchas
+    import escritor_sheets
+    import estado_db
+    import sheets_session
     logging.info("✅ Funciones core de Runt.py importadas correctamente")
 except ImportError as e:
     logging.error(f"❌ Error crítico: No se pudo importar Runt.py. Asegúrate de que esté en la misma carpeta. Error: {e}")
@@ -75,18 +80,9 @@ except ImportError as e:
 # ============================================================
 
 def conectar_google_sheets():
-    """Establece conexión con Google Sheets API"""
+    """Establece conexión con Google Sheets API (sesión compartida con Runt.py, ver sheets_session.py)"""
     try:
-        SCOPES = [
-            "https://spreadsheets.google.com/feeds",
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive"
-        ]
-        creds = Credentials.from_service_account_file(
-            str(GOOGLE_CREDS),
-            scopes=SCOPES
-        )
-        client = gspread.authorize(creds)
+        client = sheets_session.obtener_cliente()
         logging.info("✅ Conexión a Google Sheets establecida para Verificación")
         return client
     except Exception as e:
@@ -96,8 +92,7 @@ def conectar_google_sheets():
 def leer_registros_fallidos(client):
     """Lee registros de 'Resultados' que tengan estado 'Falló'"""
     try:
-        sheet = client.open_by_key(SHEET_ID_BASE)
-        worksheet = sheet.worksheet(NAME_RESULTADOS)
+        worksheet = sheets_session.obtener_worksheet(SHEET_ID_BASE, NAME_RESULTADOS)
         
         todas_filas = worksheet.get_all_values()
         if len(todas_filas) < 2:
@@ -134,16 +129,16 @@ def leer_registros_fallidos(client):
 def garantizar_hoja_sin_asociados(client):
     """Verifica si existe la hoja 'Sin Asociados', si no, la crea con encabezados"""
     try:
-        sheet = client.open_by_key(SHEET_ID_BASE)
-        
         try:
-            worksheet = sheet.worksheet(NAME_SIN_ASOCIADOS)
+            worksheet = sheets_session.obtener_worksheet(SHEET_ID_BASE, NAME_SIN_ASOCIADOS)
             logging.info(f"✅ Hoja '{NAME_SIN_ASOCIADOS}' detectada.")
             return worksheet
         except gspread.WorksheetNotFound:
             logging.info(f"📝 Creando hoja '{NAME_SIN_ASOCIADOS}' con encabezados...")
             # Crear hoja con 5 columnas
-            worksheet = sheet.add_worksheet(title=NAME_SIN_ASOCIADOS, rows=1000, cols=5)
+            worksheet = sheets_session.obtener_worksheet(
+                SHEET_ID_BASE, NAME_SIN_ASOCIADOS, crear_si_no_existe=True, rows=1000, cols=5
+            )
             
             # Definir encabezados A:E
             encabezados = ["Fecha", "Placa", "Cédula Asociado", "Cédula Propietario", "Estado"]
@@ -199,15 +194,10 @@ def registrar_en_sin_asociados(worksheet, datos_registro):
 def actualizar_hoja_resultados(client, numero_fila, nuevo_estado, cedula_usada=""):
     """Actualiza la fila correspondiente en la hoja Resultados"""
     try:
-        sheet = client.open_by_key(SHEET_ID_BASE)
-        worksheet = sheet.worksheet(NAME_RESULTADOS)
-        
-        # Columna E es Estado (índice 5), Columna F es CedulaUsada (índice 6)
+        worksheet = sheets_session.obtener_worksheet(SHEET_ID_BASE, NAME_RESULTADOS)
         
-        # Actualizar Estado
-        worksheet.update_cell(numero_fila, 5, nuevo_estado)
-        # Actualizar Cédula Usada
-        worksheet.update_cell(numero_fila, 6, cedula_usada)
+        # Columna E es Estado, Columna F es CedulaUsada → un solo rango E:F
+        escritor_sheets.escribir_fila(worksheet, numero_fila, [nuevo_estado, cedula_usada], columna_inicial=5)
         
         logging.info(f"✅ Hoja Resultados actualizada (Fila {numero_fila}): Estado={nuevo_estado}, Cédula={cedula_usada}")
         return True
@@ -384,28 +374,43 @@ def procesar_recuperacion_exitosa(client, resultado, cedula_exitosa, fila_result
         logging.error(f"❌ Error procesando éxito de {placa}: {e}")
 
 # ============================================================
-# 4. MANEJO DE ESTADO JSON (PROPIO)
+# 4. MANEJO DE ESTADO (BASE COMPARTIDA, PROCESO PROPIO)
 # ============================================================
 
-def cargar_estado_verificacion():
-    """Carga el estado JSON de la carpeta Verificacion"""
-    if os.path.exists(ESTADO_FILE):
-        try:
-            with open(ESTADO_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            logging.warning("⚠️ Archivo de estado JSON corrupto, creando nuevo...")
-            return {}
-    return {}
+def importar_estado_verificacion_legacy():
+    """Importa el estado_verificacion.json antiguo a la base SQLite (una sola vez)"""
+    if not os.path.exists(ESTADO_FILE) or not estado_db.proceso_vacio(PROCESO_ESTADO):
+        return
+    try:
+        with open(ESTADO_FILE, "r", encoding="utf-8") as f:
+            estado = json.load(f)
+    except json.JSONDecodeError:
+        logging.warning("⚠️ Archivo de estado JSON corrupto, no se importa")
+        return
+
+    with estado_db.transaccion() as conexion:
+        for placa, datos in estado.items():
+            estado_db.actualizar_resultado(
+                PROCESO_ESTADO, placa, datos.get('resultado_verificacion', 'desconocido'),
+                detalle=datos, conexion=conexion
+            )
+    logging.info(f"✅ {len(estado)} registros de estado_verificacion.json importados a la base")
 
-def guardar_estado_verificacion(estado):
-    """Guarda el estado JSON en la carpeta Verificacion"""
+def guardar_resultado_verificacion(registro, resultado_verificacion):
+    """Registra el intento de verificación y su resultado en la base de estado"""
     try:
-        with open(ESTADO_FILE, "w", encoding="utf-8") as f:
-            json.dump(estado, f, indent=2, ensure_ascii=False)
-        logging.debug("💾 Estado de verificación guardado en JSON.")
+        estado_db.registrar_intento(
+            PROCESO_ESTADO, registro['cedula_asociado'], registro['placa'], resultado_verificacion,
+            estado_resultado=resultado_verificacion,
+            detalle={
+                'ultimo_intento': datetime.now().isoformat(),
+                'resultado_verificacion': resultado_verificacion
+            },
+            cedula_propietario=registro['cedula_propietario'] or None
+        )
+        logging.debug("💾 Estado de verificación guardado en la base.")
     except Exception as e:
-        logging.error(f"❌ Error guardando estado JSON: {e}")
+        logging.error(f"❌ Error guardando estado de verificación: {e}")
 
 # ============================================================
 # 5. FUNCIÓN PRINCIPAL (MAIN)
@@ -419,6 +424,7 @@ def main():
     
     client = conectar_google_sheets()
     if not client: return
+    escritor_sheets.reenviar_pendientes()
     
     registros_verificar = leer_registros_fallidos(client)
     if not registros_verificar:
@@ -426,12 +432,12 @@ def main():
         return
     
     worksheet_sin_asoc = garantizar_hoja_sin_asociados(client)
-    estado_json = cargar_estado_verificacion()
+    importar_estado_verificacion_legacy()
     
     driver = iniciar_driver()
     if not driver: return
     
-    driver.maximize_window()
+    preparar_ventana(driver)
     
     # --- CAMBIO AQUÍ: Añadimos un contador ---
     contador_procesados = 0 
@@ -450,13 +456,7 @@ def main():
             # Incrementamos el contador después de cada placa
             contador_procesados += 1
             
-            # (El resto del código de guardado de estado sigue igual...)
-            datos_json_actualizados = {
-                'ultimo_intento': datetime.now().isoformat(),
-                'resultado_verificacion': resultado_verificacion
-            }
-            estado_json[registro['placa']] = datos_json_actualizados
-            guardar_estado_verificacion(estado_json)
+            guardar_resultado_verificacion(registro, resultado_verificacion)
             
             logging.info(f"✅ Avance: {i+1}/{len(registros_verificar)} | Sesión: {contador_procesados}/5")
             time.sleep(2)
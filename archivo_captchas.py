@@ -0,0 +1,550 @@
+"""
+Archivo de captchas en segundo plano
+====================================
+Cada intento se guardaba como un PNG suelto en captchas/ (y cada éxito como
+otro en captchas_leidos/): miles de archivos diminutos, con nombres que
+chocan al segundo (%H%M%S sin fecha), lentos de listar y de recorrer.
+
+Ahora cada captcha es UN registro en un archivo append-only por shards:
+
+    archivo_captchas/
+        captchas_{AAAAMMDD}_{pid}_{n}.rec     (un shard por proceso y día)
+        aceptados_{AAAAMMDD}_{pid}_{n}.rec    (solo veredicto "aceptado")
+            registro = cabecera "RCAP" + largos (<III) + meta.json +
+                       captura.png + binarizada.png, uno detrás de otro
+            meta.json       {id, placa, fecha, ocr, texto, confianza,
+                             origen, veredicto}
+            captura.png     bytes tal cual llegaron del portal (puede ir vacío)
+            binarizada.png  la imagen que leyó el OCR (Otsu)
+
+- id = {AAAAMMDD_HHMMSS_microsegundos}_{placa}: no se repite
+- guardar_intento() solo encola (el hilo del navegador no codifica ni
+  escribe); el registro queda pendiente en el escritor hasta que llega su
+  veredicto (registrar_veredicto: VEREDICTOS) o pasan
+  ESPERA_VEREDICTO_SEGUNDOS, y entonces se anexa completo al shard
+- Cada proceso escribe solo en sus shards (pid en el nombre): los workers de
+  pool_consultas no se pisan. Se rota cada MAX_REGISTROS_SHARD registros
+- Los "aceptado" (etiquetas verificadas) van a sus propios shards para que
+  la retención del archivo (RETENCION_ARCHIVO: tope de tamaño y edad
+  máxima, borrando shards enteros de los más viejos) no los venza por edad
+- Solo se agregan bytes al final (con fsync por tanda): si el proceso muere
+  escribiendo, se pierde a lo sumo el registro incompleto del final; los
+  anteriores del shard se siguen leyendo. Los .zip de la versión anterior
+  (un directorio central que se reescribe en cada tanda) se siguen leyendo
+- iterar_registros() recorre el archivo (fuente de dataset_captchas.py y
+  benchmark_captchas.py); ingerir_pngs() pasa al archivo los PNG sueltos que
+  ya existen (python dataset_captchas.py --ingerir)
+- PNG_SUELTOS = True mantiene además los PNG en captchas/ y el hardlink
+  exitoso_{placa}_{texto}_{HHMMSS}.png en captchas_leidos/, con su
+  retención (RETENCION: edad máxima y tope de tamaño por carpeta)
+- Al salir (atexit) se escribe lo que quede en la cola y lo pendiente
+"""
+
+import atexit
+import fnmatch
+import hashlib
+import io
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import struct
+import threading
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# ═════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═════════════════════════════════════════════════════════════
+
+PNG_SUELTOS = False             # True: además de los shards, escribir captchas/ y captchas_leidos/
+
+# {carpeta: (max_mb, max_dias)}; None = sin ese límite (solo PNG sueltos)
+RETENCION = {
+    "crudos": (200, 30),    # Intentos (captchas/): solo sirven para diagnóstico
+    "leidos": (1000, None), # Exitosos (captchas_leidos/): etiquetas verificadas, no vencen
+}
+# {prefijo de shard: (max_mb, max_dias)}; siempre activa, se borran shards enteros
+RETENCION_ARCHIVO = {
+    "captchas": (2000, 60),   # Rechazados, descartados, errores y sin veredicto
+    "aceptados": (5000, None), # Etiquetas verificadas: solo tope de tamaño, no vencen
+}
+INTERVALO_RETENCION_SEGUNDOS = 600
+MAX_PENDIENTES = 500            # Imágenes en cola; por encima se descarta el intento (no el veredicto)
+
+MAX_REGISTROS_SHARD = 2000      # Registros por shard antes de abrir el siguiente
+ESPERA_VEREDICTO_SEGUNDOS = 300 # Sin veredicto en este tiempo → se archiva con veredicto None
+
+VEREDICTOS = (
+    "aceptado",    # El portal validó el captcha: el texto es una etiqueta verificada
+    "rechazado",   # "Captcha incorrecto"
+    "descartado",  # Lectura dudosa: se pidió otro captcha sin enviarlo
+    "error",       # Enviado, pero el portal respondió otro error
+)
+
+# Cabecera de cada registro del shard: magia + largos de meta.json, captura y binarizada
+MAGIA_REGISTRO = b"RCAP"
+CABECERA_REGISTRO = struct.Struct("<4sIII")
+
+PATRON_EXITOSO = re.compile(r"^exitoso_(?P<placa>[^_]+)_(?P<texto>[A-Za-z0-9]+)_(?P<hora>\d{6})\.png$")
+PATRON_INTENTO = re.compile(r"^captcha_(?P<placa>.+)_(?P<hora>\d{6})\.png$")
+
+_carpetas = {}                  # {"crudos": Path, "leidos": Path, "archivo": Path}
+_cola = queue.Queue()
+_lock = threading.Lock()
+_hilo = None
+_detener = threading.Event()
+
+# Estado del escritor (solo lo toca su hilo, o ingerir_pngs en un proceso sin hilo)
+_pendientes = {}                # {id: registro esperando veredicto}
+_shards = {}                    # {prefijo: {"ruta", "registros", "fecha"}} shard actual de cada tipo
+
+
+def configurar(carpeta_crudos, carpeta_leidos, carpeta_archivo):
+    """Carpetas de PNG sueltos (intentos y exitosos) y de los shards (se crean si no existen)"""
+    _carpetas["crudos"] = Path(carpeta_crudos)
+    _carpetas["leidos"] = Path(carpeta_leidos)
+    _carpetas["archivo"] = Path(carpeta_archivo)
+    for carpeta in _carpetas.values():
+        carpeta.mkdir(parents=True, exist_ok=True)
+
+# ═════════════════════════════════════════════════════════════
+# API (hilo del navegador: solo encola)
+# ═════════════════════════════════════════════════════════════
+
+def nuevo_id(placa, momento=None):
+    momento = momento or datetime.now()
+    return f"{momento:%Y%m%d_%H%M%S_%f}_{str(placa).strip()}"
+
+def guardar_intento(img_bin, placa, captura=None, lectura=None, carpeta=None):
+    """
+    Encola un captcha leído → id del registro (para registrar_veredicto)
+
+    Args:
+        img_bin: captcha binarizado (uint8), ya en memoria
+        captura: PNG tal cual del portal (bytes) o None
+        lectura: dict de ocr_captcha.resolver_texto o None
+        carpeta: carpeta de PNG sueltos (por defecto captchas/), solo con PNG_SUELTOS
+    """
+    momento = datetime.now()
+    id_captcha = nuevo_id(placa, momento)
+    if _cola.qsize() >= MAX_PENDIENTES:
+        logging.warning(f"⚠️ Cola de captchas llena ({MAX_PENDIENTES}), no se archiva {id_captcha}")
+        return id_captcha
+
+    lectura = lectura or {}
+    meta = {
+        "id": id_captcha,
+        "placa": str(placa).strip(),
+        "fecha": momento.isoformat(timespec="seconds"),
+        "ocr": lectura.get("ocr"),
+        "texto": lectura.get("texto"),
+        "confianza": float(lectura["confianza"]) if lectura.get("confianza") is not None else None,
+        "origen": lectura.get("origen"),
+        "veredicto": None,
+    }
+    suelto = None
+    if PNG_SUELTOS:
+        suelto = Path(carpeta or _carpetas["crudos"]) / f"captcha_{meta['placa']}_{momento:%H%M%S}.png"
+    _encolar(("intento", id_captcha, {"meta": meta, "img_bin": img_bin, "captura": captura, "suelto": suelto}))
+    return id_captcha
+
+def registrar_veredicto(id_captcha, veredicto):
+    """Resultado del portal para el captcha `id_captcha` (uno de VEREDICTOS)"""
+    if veredicto not in VEREDICTOS:
+        raise ValueError(f"Veredicto desconocido: {veredicto} (válidos: {VEREDICTOS})")
+    if id_captcha:
+        _encolar(("veredicto", id_captcha, veredicto))
+
+def flush(timeout=None):
+    """Espera a que el escritor vacíe la cola (True si lo hizo dentro del timeout)"""
+    if _hilo is None:
+        return True
+    limite = time.monotonic() + timeout if timeout is not None else None
+    while _cola.unfinished_tasks:
+        if limite is not None and time.monotonic() > limite:
+            return False
+        time.sleep(0.05)
+    return True
+
+def _encolar(trabajo):
+    _iniciar_hilo()
+    _cola.put(trabajo)
+
+# ═════════════════════════════════════════════════════════════
+# SHARDS
+# ═════════════════════════════════════════════════════════════
+
+def _png(imagen):
+    buffer = io.BytesIO()
+    Image.fromarray(imagen).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def _prefijo_shard(registro):
+    return "aceptados" if registro["meta"].get("veredicto") == "aceptado" else "captchas"
+
+def _ruta_shard(carpeta, prefijo="captchas"):
+    """Shard actual de este proceso; abre uno nuevo al llenarse o al cambiar el día"""
+    fecha = datetime.now().strftime("%Y%m%d")
+    shard = _shards.setdefault(prefijo, {"ruta": None, "registros": 0, "fecha": None})
+    if (shard["ruta"] is None or shard["ruta"].parent != carpeta or shard["fecha"] != fecha
+            or shard["registros"] >= MAX_REGISTROS_SHARD):
+        numero = 1
+        while (carpeta / f"{prefijo}_{fecha}_{os.getpid()}_{numero:03d}.rec").exists():
+            numero += 1
+        shard.update(ruta=carpeta / f"{prefijo}_{fecha}_{os.getpid()}_{numero:03d}.rec", registros=0, fecha=fecha)
+    return shard["ruta"]
+
+def _serializar(registro):
+    meta = json.dumps(registro["meta"], ensure_ascii=False).encode("utf-8")
+    captura = registro.get("captura") or b""
+    binarizada = registro.get("png") or _png(registro["img_bin"])
+    return CABECERA_REGISTRO.pack(MAGIA_REGISTRO, len(meta), len(captura), len(binarizada)) + meta + captura + binarizada
+
+def _anexar(registros, carpeta=None):
+    """Agrega registros completos al final del shard actual de su tipo (un open + fsync por tanda)"""
+    if not registros:
+        return
+    carpeta = Path(carpeta or _carpetas["archivo"])
+    por_prefijo = {}
+    for registro in registros:
+        por_prefijo.setdefault(_prefijo_shard(registro), []).append(registro)
+    for prefijo, tanda in por_prefijo.items():
+        with open(_ruta_shard(carpeta, prefijo), "ab") as shard:
+            inicio = shard.tell()
+            try:
+                for registro in tanda:
+                    shard.write(_serializar(registro))
+                shard.flush()
+                os.fsync(shard.fileno())
+            except Exception:
+                # Disco lleno u otro error a mitad de la tanda: se deshace para no dejar
+                # un registro cortado delante de los que vengan después
+                shard.truncate(inicio)
+                raise
+        _shards[prefijo]["registros"] += len(tanda)
+
+def _decodificar(png):
+    return np.asarray(Image.open(io.BytesIO(png)).convert("L"))
+
+def _leer_shard(ruta, imagenes):
+    """(meta, captura, binarizada) de cada registro completo; corta en el primero truncado"""
+    with open(ruta, "rb") as shard:
+        tamano = os.fstat(shard.fileno()).st_size
+        while True:
+            inicio = shard.tell()
+            cabecera = shard.read(CABECERA_REGISTRO.size)
+            if not cabecera:
+                return
+            if len(cabecera) == CABECERA_REGISTRO.size:
+                magia, largo_meta, largo_captura, largo_binarizada = CABECERA_REGISTRO.unpack(cabecera)
+                fin = inicio + CABECERA_REGISTRO.size + largo_meta + largo_captura + largo_binarizada
+            if len(cabecera) < CABECERA_REGISTRO.size or magia != MAGIA_REGISTRO or fin > tamano:
+                # Proceso que murió escribiendo: solo se pierde este último registro
+                logging.warning(f"⚠️ Shard {ruta.name}: registro incompleto en el byte {inicio}, se ignora el resto")
+                return
+            meta = json.loads(shard.read(largo_meta))
+            if imagenes:
+                captura = shard.read(largo_captura)
+                yield meta, captura or None, shard.read(largo_binarizada)
+            else:
+                shard.seek(fin)
+                yield meta, None, None
+
+def _leer_shard_zip(ruta, imagenes):
+    """Shards .zip de la versión anterior (solo lectura)"""
+    try:
+        shard = zipfile.ZipFile(ruta)
+    except (zipfile.BadZipFile, OSError) as e:  # Shard de un proceso que murió escribiendo
+        logging.warning(f"⚠️ Shard ilegible {ruta.name}: {e}")
+        return
+    with shard:
+        nombres = set(shard.namelist())
+        for nombre in shard.namelist():
+            if not nombre.endswith("/meta.json"):
+                continue
+            meta = json.loads(shard.read(nombre))
+            if not imagenes:
+                yield meta, None, None
+                continue
+            captura = f"{meta['id']}/captura.png"
+            yield (meta, shard.read(captura) if captura in nombres else None,
+                   shard.read(f"{meta['id']}/binarizada.png"))
+
+def iterar_registros(carpeta=None, veredictos=None, imagenes=True):
+    """
+    Recorre el archivo shard por shard (en orden de fecha, aceptados y resto mezclados).
+
+    Args:
+        veredictos: solo estos veredictos (None = todos; incluye None = sin veredicto)
+        imagenes: False para leer solo meta.json (más rápido)
+
+    Yields:
+        meta.json + "imagen" (uint8 gris, la binarizada) y "captura" (bytes o None)
+    """
+    carpeta = Path(carpeta or _carpetas["archivo"])
+    shards = [ruta for prefijo in RETENCION_ARCHIVO for ruta in carpeta.glob(f"{prefijo}_*")
+              if ruta.suffix in (".rec", ".zip")]
+    for ruta in sorted(shards, key=lambda ruta: ruta.name.split("_", 1)[1]):
+        leer = _leer_shard_zip if ruta.suffix == ".zip" else _leer_shard
+        for meta, captura, binarizada in leer(ruta, imagenes):
+            if veredictos is not None and meta.get("veredicto") not in veredictos:
+                continue
+            if imagenes:
+                meta["imagen"] = _decodificar(binarizada)
+                meta["captura"] = captura
+            yield meta
+
+# ═════════════════════════════════════════════════════════════
+# ESCRITOR
+# ═════════════════════════════════════════════════════════════
+
+def _guardar_suelto(registro):
+    Image.fromarray(registro["img_bin"]).save(str(registro["suelto"]))
+
+def _enlazar_exitoso(registro):
+    """Hardlink etiquetado del PNG suelto en captchas_leidos/ (sin volver a decodificar)"""
+    meta = registro["meta"]
+    destino = _carpetas["leidos"] / f"exitoso_{meta['placa']}_{meta['texto']}_{meta['fecha'][11:].replace(':', '')}.png"
+    try:
+        os.link(registro["suelto"], destino)
+    except FileExistsError:
+        pass
+    except OSError:  # Otro volumen / FAT: copiar los bytes tal cual
+        shutil.copyfile(registro["suelto"], destino)
+
+def _procesar(trabajo, completos):
+    tipo, id_captcha, datos = trabajo
+    if tipo == "intento":
+        datos["recibido"] = time.monotonic()
+        if datos["suelto"] is not None:
+            _guardar_suelto(datos)
+        _pendientes[id_captcha] = datos
+        return
+
+    registro = _pendientes.pop(id_captcha, None)
+    if registro is None:
+        logging.warning(f"⚠️ Veredicto '{datos}' para un captcha que no está pendiente: {id_captcha}")
+        return
+    registro["meta"]["veredicto"] = datos
+    completos.append(registro)
+    if datos == "aceptado":
+        if registro["suelto"] is not None and registro["meta"]["texto"]:
+            _enlazar_exitoso(registro)
+        logging.info(f"✅ Captcha exitoso archivado: {id_captcha} ({registro['meta']['texto']})")
+
+def _vencidos(todos=False):
+    """Pendientes que ya no van a recibir veredicto → se archivan con veredicto None"""
+    limite = time.monotonic() - ESPERA_VEREDICTO_SEGUNDOS
+    vencidos = [id_captcha for id_captcha, registro in _pendientes.items()
+                if todos or registro["recibido"] < limite]
+    return [_pendientes.pop(id_captcha) for id_captcha in vencidos]
+
+def aplicar_retencion(carpeta, max_mb=None, max_dias=None, patron="*.png", en_uso=(), al_vencer=None):
+    """
+    Borra por antigüedad y luego los más viejos hasta quedar bajo max_mb → archivos borrados.
+
+    Args:
+        patron: archivos que cuentan (PNG sueltos, o los shards de un prefijo)
+        en_uso: rutas que no se borran aunque venzan (el shard que se está escribiendo);
+                su tamaño sí cuenta para el tope
+        al_vencer: se llama con la ruta antes de borrar un archivo vencido por edad
+    """
+    carpeta = Path(carpeta)
+    if not carpeta.exists() or (max_mb is None and max_dias is None):
+        return 0
+
+    en_uso = {os.path.abspath(ruta) for ruta in en_uso if ruta is not None}
+    archivos, ocupado = [], 0
+    for entrada in os.scandir(carpeta):
+        if entrada.is_file() and fnmatch.fnmatch(entrada.name, patron):
+            info = entrada.stat()
+            if os.path.abspath(entrada.path) in en_uso:
+                ocupado += info.st_size
+            else:
+                archivos.append((info.st_mtime, info.st_size, entrada.path))
+    archivos.sort()
+
+    borrar = []
+    if max_dias is not None:
+        limite = time.time() - max_dias * 86400
+        while archivos and archivos[0][0] < limite:
+            if al_vencer is not None:
+                al_vencer(archivos[0][2])
+            borrar.append(archivos.pop(0))
+    if max_mb is not None:
+        total = ocupado + sum(tamano for _, tamano, _ in archivos)
+        while archivos and total > max_mb * 1024 * 1024:
+            archivo = archivos.pop(0)
+            total -= archivo[1]
+            borrar.append(archivo)
+
+    borrados = 0
+    for _, _, ruta in borrar:
+        try:
+            os.remove(ruta)
+            borrados += 1
+        except OSError:
+            pass
+    if borrados:
+        logging.info(f"🧹 Retención {carpeta.name}/{patron}: {borrados} archivos borrados")
+    return borrados
+
+def _rescatar_aceptados(ruta):
+    """Shards captchas_ anteriores a la separación: sus "aceptado" pasan a aceptados_ antes de vencer"""
+    ruta = Path(ruta)
+    leer = _leer_shard_zip if ruta.suffix == ".zip" else _leer_shard
+    rescatados = [{"meta": meta, "captura": captura, "png": binarizada}
+                  for meta, captura, binarizada in leer(ruta, imagenes=True)
+                  if meta.get("veredicto") == "aceptado"]
+    _anexar(rescatados, ruta.parent)
+
+def _retencion():
+    if PNG_SUELTOS:
+        for nombre, (max_mb, max_dias) in RETENCION.items():
+            if nombre in _carpetas:
+                try:
+                    aplicar_retencion(_carpetas[nombre], max_mb, max_dias)
+                except Exception as e:
+                    logging.warning(f"⚠️ Error aplicando retención en {nombre}: {e}")
+    if "archivo" in _carpetas:
+        en_uso = [shard["ruta"] for shard in _shards.values()]
+        for prefijo, (max_mb, max_dias) in RETENCION_ARCHIVO.items():
+            try:
+                aplicar_retencion(_carpetas["archivo"], max_mb, max_dias, f"{prefijo}_*", en_uso,
+                                  _rescatar_aceptados if prefijo == "captchas" else None)
+            except Exception as e:
+                logging.warning(f"⚠️ Error aplicando retención en los shards {prefijo}: {e}")
+
+def _bucle_escritor():
+    proxima_retencion = 0.0
+    while not (_detener.is_set() and _cola.empty()):
+        if time.monotonic() >= proxima_retencion:
+            _retencion()
+            proxima_retencion = time.monotonic() + INTERVALO_RETENCION_SEGUNDOS
+        try:
+            trabajos = [_cola.get(timeout=1)]
+        except queue.Empty:
+            trabajos = []
+        while True:  # Lo que ya esté en cola va en la misma tanda
+            try:
+                trabajos.append(_cola.get_nowait())
+            except queue.Empty:
+                break
+
+        completos = []
+        for trabajo in trabajos:
+            try:
+                _procesar(trabajo, completos)
+            except Exception as e:
+                logging.warning(f"⚠️ No se pudo archivar {trabajo[0]} {trabajo[1]}: {e}")
+        completos.extend(_vencidos(todos=_detener.is_set() and _cola.empty()))
+        try:
+            _anexar(completos)
+        except Exception as e:
+            logging.warning(f"⚠️ No se pudieron anexar {len(completos)} captchas al archivo: {e}")
+        finally:
+            for _ in trabajos:
+                _cola.task_done()
+    _anexar(_vencidos(todos=True))
+
+def _iniciar_hilo():
+    global _hilo
+    with _lock:
+        if _hilo is None:
+            _hilo = threading.Thread(target=_bucle_escritor, name="archivo_captchas", daemon=True)
+            _hilo.start()
+
+def cerrar():
+    """Escribe lo pendiente (los que no tienen veredicto, con None) y detiene el hilo"""
+    if _hilo is None:
+        return
+    _detener.set()
+    _hilo.join(timeout=30)
+
+atexit.register(cerrar)
+
+# ═════════════════════════════════════════════════════════════
+# INGESTA DE PNG SUELTOS
+# ═════════════════════════════════════════════════════════════
+
+def _fecha_de_archivo(ruta, hora):
+    """Fecha del mtime + HHMMSS del nombre (el nombre no trae fecha)"""
+    dia = datetime.fromtimestamp(ruta.stat().st_mtime)
+    return datetime.strptime(f"{dia:%Y%m%d}{hora}", "%Y%m%d%H%M%S")
+
+def ingerir_pngs(carpeta_leidos, carpeta_crudos, carpeta_archivo, borrar=False, tanda=500):
+    """
+    Pasa al archivo los exitoso_*.png (veredicto "aceptado", texto del nombre) y
+    los captcha_*.png (sin veredicto). Los crudos con los mismos píxeles que un
+    exitoso (el mismo captcha) no se duplican. Se puede correr varias veces:
+    los ids ya archivados se saltan. Correr con el bot detenido.
+
+    Returns:
+        {"ingeridos", "ya_archivados", "duplicados", "invalidos", "borrados"}
+    """
+    Path(carpeta_archivo).mkdir(parents=True, exist_ok=True)  # Primera ingesta: el archivo aún no existe
+    existentes = {meta["id"] for meta in iterar_registros(carpeta_archivo, imagenes=False)}
+    conteo = {"ingeridos": 0, "ya_archivados": 0, "duplicados": 0, "invalidos": 0, "borrados": 0}
+    hashes = set()
+    representados = []   # Archivos que ya están en el archivo (para --borrar)
+    registros = []
+
+    fuentes = [(PATRON_EXITOSO, ruta) for ruta in sorted(Path(carpeta_leidos).glob("exitoso_*.png"))]
+    if carpeta_crudos and Path(carpeta_crudos).exists():
+        fuentes += [(PATRON_INTENTO, ruta) for ruta in sorted(Path(carpeta_crudos).glob("captcha_*.png"))]
+
+    for patron, ruta in fuentes:
+        coincidencia = patron.match(ruta.name)
+        png = ruta.read_bytes()
+        try:
+            imagen = _decodificar(png)
+        except Exception:
+            imagen = None
+        if coincidencia is None or imagen is None:
+            conteo["invalidos"] += 1
+            continue
+
+        hash_hex = hashlib.sha1(np.ascontiguousarray(imagen).tobytes()).hexdigest()
+        if hash_hex in hashes:
+            conteo["duplicados"] += 1
+            representados.append(ruta)
+            continue
+        hashes.add(hash_hex)
+
+        texto = coincidencia.groupdict().get("texto")
+        fecha = _fecha_de_archivo(ruta, coincidencia.group("hora"))
+        id_captcha = f"{fecha:%Y%m%d_%H%M%S}_{coincidencia.group('placa')}_{hash_hex[:8]}"
+        if id_captcha in existentes:
+            conteo["ya_archivados"] += 1
+            representados.append(ruta)
+            continue
+
+        registros.append({"png": png, "meta": {
+            "id": id_captcha, "placa": coincidencia.group("placa"), "fecha": fecha.isoformat(),
+            "ocr": None, "texto": texto, "confianza": None, "origen": ruta.name,
+            "veredicto": "aceptado" if texto else None,
+        }})
+        representados.append(ruta)
+        conteo["ingeridos"] += 1
+        if len(registros) >= tanda:
+            _anexar(registros, carpeta_archivo)
+            registros = []
+    _anexar(registros, carpeta_archivo)
+
+    if borrar:
+        for ruta in representados:
+            try:
+                ruta.unlink()
+                conteo["borrados"] += 1
+            except OSError:
+                pass
+    logging.info(f"📦 Ingesta en {carpeta_archivo}: {conteo}")
+    return conteo
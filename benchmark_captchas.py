@@ -0,0 +1,327 @@
+"""
+Benchmark fuera de línea del solucionador de captchas
+=====================================================
+Hasta ahora la única forma de saber cómo rendía resolver_captcha era mirar
+captcha_retroalimentacion.log en producción (gastando intentos reales en el
+portal). Este script reproduce los captchas etiquetados contra cualquier
+solucionador y reporta:
+
+- Exactitud exacta (captcha completo) y por carácter
+- Confusiones por carácter (real → leído), las más frecuentes primero
+- Latencia p50 / p95 por captcha y captchas por segundo por núcleo
+- Con --rechazos: los captchas que el portal rechazó según el archivo
+  (archivo_captchas.py) → cuántas veces el solucionador repetiría
+  exactamente la misma respuesta equivocada
+- Con --crudos: cruza los PNG sueltos de captchas/ con el log de
+  retroalimentación (intentos de antes del archivo)
+    · intentos que el portal aceptó ("NO HAY PERSONAS ASOCIADAS") → etiqueta
+      verificada extra
+    · intentos rechazados ("CAPTCHA INCORRECTO") → cuántas veces el
+      solucionador repetiría exactamente la misma respuesta equivocada
+
+Solucionadores (ver SOLUCIONADORES):
+- resolver:  lo mismo que resolver_captcha (OCR + REEMPLAZOS + templates)
+- ocr:       solo el backend OCR + REEMPLAZOS
+- clasificador: solo el clasificador de glifos (clasificador_glifos.py, --modelo)
+- templates: solo el banco de templates (mejor template por glifo)
+
+Uso:
+    python benchmark_captchas.py [--solucionador resolver templates] [--backend-ocr auto]
+                                 [--particion eval] [--rechazos] [--crudos] [--json reporte.json]
+"""
+
+import argparse
+import json
+import logging
+import re
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import archivo_captchas
+import clasificador_glifos
+import dataset_captchas
+import ocr_captcha
+import ocr_templates
+
+# ═════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═════════════════════════════════════════════════════════════
+
+BASE_PATH = dataset_captchas.BASE_PATH
+TEMPLATE_FOLDER = BASE_PATH / "templates"
+LOG_RETROALIMENTACION = BASE_PATH / "Escritura_Runt_principal" / "captcha_retroalimentacion.log"
+TESSERACT_PATH = r"C:\Users\cmarroquin\AppData\Local\Programs\Tesseract-OCR\tesseract.exe"
+
+MAX_CONFUSIONES_REPORTE = 15
+
+PATRON_BLOQUE = re.compile(r"^Placa: (?P<placa>.+?) \| TEXTO IMAGEN: .*? \| TESSERACT LEYÓ: (?P<ocr>.*)$")
+PATRON_CRUDO = re.compile(r"^captcha_(?P<placa>.+)_(?P<hora>\d{6})\.png$")
+RESULTADOS_LOG = {
+    "NO HAY PERSONAS ASOCIADAS": "aceptado",   # El portal validó el captcha
+    "CAPTCHA INCORRECTO": "rechazado",
+    "NO LEGIBLE": "no_legible",
+    "ERROR": "error",
+}
+
+SOLUCIONADORES = {}  # {nombre: fabrica(opciones) -> funcion(imagen) -> texto o None}
+
+
+def registrar_solucionador(nombre):
+    def decorador(fabrica):
+        SOLUCIONADORES[nombre] = fabrica
+        return fabrica
+    return decorador
+
+def _banco(opciones):
+    return ocr_templates.BancoTemplates.desde_carpeta(opciones.get("templates", TEMPLATE_FOLDER))
+
+@registrar_solucionador("resolver")
+def _solucionador_resolver(opciones):
+    backend = ocr_captcha.obtener_backend(opciones.get("backend_ocr", "auto"))
+    banco = _banco(opciones)
+    return lambda imagen: ocr_captcha.resolver_texto(imagen, backend, banco)["texto"]
+
+@registrar_solucionador("ocr")
+def _solucionador_ocr(opciones):
+    backend = ocr_captcha.obtener_backend(opciones.get("backend_ocr", "auto"))
+    return lambda imagen: ocr_captcha.resolver_texto(imagen, backend)["texto"]
+
+@registrar_solucionador("clasificador")
+def _solucionador_clasificador(opciones):
+    clasificador_glifos.configurar(opciones.get("modelo", clasificador_glifos.RUTA_MODELO))
+    backend = ocr_captcha.obtener_backend("clasificador")
+    return lambda imagen: ocr_captcha.resolver_texto(imagen, backend)["texto"]
+
+@registrar_solucionador("templates")
+def _solucionador_templates(opciones):
+    banco = _banco(opciones)
+    return lambda imagen: "".join(c for c, _ in banco.reconocer(imagen)) or None
+
+# ═════════════════════════════════════════════════════════════
+# CORPUS
+# ═════════════════════════════════════════════════════════════
+
+def corpus_etiquetado(carpeta_dataset=dataset_captchas.DATASET_FOLDER,
+                      carpeta_archivo=dataset_captchas.ARCHIVO_FOLDER, particion=None):
+    """
+    [(id, imagen, texto), ...] desde el dataset ya construido (mmap) o, si no
+    existe, recorriendo los captchas aceptados del archivo
+    """
+    if (Path(carpeta_dataset) / "captchas.json").exists():
+        dataset = dataset_captchas.Dataset.cargar(carpeta_dataset)
+        return [(dataset.captchas[i]["id"], np.asarray(dataset.imagenes[i]), dataset.captchas[i]["texto"])
+                for i in dataset.indices_captchas(particion)]
+
+    logging.warning(f"⚠️ No hay dataset en {carpeta_dataset}, leyendo el archivo {carpeta_archivo} (sin partición)")
+    return [(registro["id"], registro["imagen"], registro["texto"])
+            for registro in archivo_captchas.iterar_registros(carpeta_archivo, veredictos=("aceptado",))
+            if registro["texto"]]
+
+def rechazos_archivados(carpeta_archivo=dataset_captchas.ARCHIVO_FOLDER, hashes_excluidos=()):
+    """[(id, imagen, texto_rechazado), ...]: lo que se envió y el portal rechazó"""
+    return [(registro["id"], registro["imagen"], registro["texto"])
+            for registro in archivo_captchas.iterar_registros(carpeta_archivo, veredictos=("rechazado",))
+            if registro["texto"] and dataset_captchas.hash_imagen(registro["imagen"]) not in hashes_excluidos]
+
+def leer_retroalimentacion(ruta_log=LOG_RETROALIMENTACION):
+    """Bloques del log: [{"placa", "ocr", "escrito", "resultado"}, ...] en orden"""
+    bloques = []
+    with open(ruta_log, encoding="utf-8", errors="replace") as f:
+        for linea in f:
+            linea = linea.rstrip("\n")
+            coincidencia = PATRON_BLOQUE.match(linea)
+            if coincidencia:
+                bloques.append({"placa": coincidencia.group("placa"), "ocr": coincidencia.group("ocr").strip(),
+                                "escrito": None, "resultado": None})
+                continue
+            if not bloques:
+                continue
+            contenido = linea.strip()
+            if contenido.startswith("ESCRITO:"):
+                bloques[-1]["escrito"] = contenido.split(":", 1)[1].strip()
+            elif contenido.startswith("RESULTADO:"):
+                for clave, resultado in RESULTADOS_LOG.items():
+                    if clave in contenido:
+                        bloques[-1]["resultado"] = resultado
+                        break
+    return bloques
+
+def etiquetar_crudos(carpeta_crudos, bloques, hashes_excluidos=()):
+    """
+    Empareja captchas/captcha_{placa}_{HHMMSS}.png con los bloques del log de
+    la misma placa, en orden. Solo se usan las placas donde la cantidad de
+    archivos y de bloques coincide (si no, el emparejamiento sería adivinar).
+
+    Returns:
+        [(nombre, imagen, texto_escrito, "aceptado" | "rechazado"), ...]
+    """
+    bloques_por_placa = defaultdict(list)
+    for bloque in bloques:
+        bloques_por_placa[bloque["placa"]].append(bloque)
+
+    archivos_por_placa = defaultdict(list)
+    for ruta in Path(carpeta_crudos).glob("captcha_*.png"):
+        coincidencia = PATRON_CRUDO.match(ruta.name)
+        if coincidencia:
+            archivos_por_placa[coincidencia.group("placa")].append((coincidencia.group("hora"), ruta))
+
+    muestras = []
+    placas_descartadas = 0
+    for placa, archivos in archivos_por_placa.items():
+        bloques_placa = bloques_por_placa.get(placa, [])
+        if len(bloques_placa) != len(archivos):
+            placas_descartadas += 1
+            continue
+        for (_, ruta), bloque in zip(sorted(archivos), bloques_placa):
+            if bloque["resultado"] not in ("aceptado", "rechazado") or not bloque["escrito"]:
+                continue
+            imagen = cv2.imread(str(ruta), cv2.IMREAD_GRAYSCALE)
+            if imagen is None or dataset_captchas.hash_imagen(imagen) in hashes_excluidos:
+                continue
+            muestras.append((ruta.name, imagen, bloque["escrito"], bloque["resultado"]))
+
+    logging.info(f"🔗 Crudos cruzados con el log: {len(muestras)} intentos con veredicto "
+                 f"({placas_descartadas} placas sin emparejamiento exacto)")
+    return muestras
+
+# ═════════════════════════════════════════════════════════════
+# MEDICIÓN
+# ═════════════════════════════════════════════════════════════
+
+def evaluar(solucionador, muestras, rechazados=()):
+    """
+    Args:
+        muestras: [(nombre, imagen, texto_correcto), ...]
+        rechazados: [(nombre, imagen, texto_rechazado), ...]
+    """
+    latencias = []
+    exactos = 0
+    caracteres_ok = caracteres_total = 0
+    longitud_distinta = 0
+    confusiones = Counter()
+    fallos = []
+
+    for nombre, imagen, texto in muestras:
+        inicio = time.perf_counter()
+        leido = solucionador(imagen) or ""
+        latencias.append(time.perf_counter() - inicio)
+
+        if leido == texto:
+            exactos += 1
+        else:
+            fallos.append({"archivo": nombre, "real": texto, "leido": leido})
+
+        if len(leido) != len(texto):
+            longitud_distinta += 1
+            continue
+        for real, caracter in zip(texto, leido):
+            caracteres_total += 1
+            if real == caracter:
+                caracteres_ok += 1
+            else:
+                confusiones[(real, caracter)] += 1
+
+    repetidos = 0
+    for _, imagen, texto_rechazado in rechazados:
+        inicio = time.perf_counter()
+        if (solucionador(imagen) or "") == texto_rechazado:
+            repetidos += 1
+        latencias.append(time.perf_counter() - inicio)
+
+    total = len(muestras)
+    latencias_ms = np.array(latencias) * 1000 if latencias else np.zeros(1)
+    return {
+        "captchas": total,
+        "exactitud": exactos / total if total else 0.0,
+        "exactitud_caracter": caracteres_ok / caracteres_total if caracteres_total else 0.0,
+        "longitud_distinta": longitud_distinta,
+        "latencia_p50_ms": float(np.percentile(latencias_ms, 50)),
+        "latencia_p95_ms": float(np.percentile(latencias_ms, 95)),
+        "captchas_por_segundo_nucleo": len(latencias) / sum(latencias) if latencias and sum(latencias) else 0.0,
+        "confusiones": [{"real": r, "leido": l, "veces": n} for (r, l), n in confusiones.most_common()],
+        "rechazados_evaluados": len(rechazados),
+        "rechazos_repetidos": repetidos,
+        "fallos": fallos
+    }
+
+def imprimir_reporte(nombre, reporte):
+    logging.info(f"\n{'='*70}")
+    logging.info(f"📊 {nombre}: {reporte['captchas']} captchas")
+    logging.info(f"{'='*70}")
+    logging.info(f"   Exactitud (captcha):  {reporte['exactitud']:.1%}")
+    logging.info(f"   Exactitud (carácter): {reporte['exactitud_caracter']:.1%} "
+                 f"({reporte['longitud_distinta']} con longitud distinta)")
+    logging.info(f"   Latencia p50 / p95:   {reporte['latencia_p50_ms']:.1f} / {reporte['latencia_p95_ms']:.1f} ms")
+    logging.info(f"   Rendimiento:          {reporte['captchas_por_segundo_nucleo']:.1f} captchas/s por núcleo")
+    if reporte["rechazados_evaluados"]:
+        logging.info(f"   Rechazos repetidos:   {reporte['rechazos_repetidos']}/{reporte['rechazados_evaluados']} "
+                     f"(misma respuesta que el portal ya rechazó)")
+    if reporte["confusiones"]:
+        logging.info("   Confusiones más frecuentes (real → leído):")
+        for confusion in reporte["confusiones"][:MAX_CONFUSIONES_REPORTE]:
+            logging.info(f"      '{confusion['real']}' → '{confusion['leido']}': {confusion['veces']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fuera de línea del solucionador de captchas")
+    parser.add_argument("--solucionador", nargs="+", default=["resolver"], choices=sorted(SOLUCIONADORES))
+    parser.add_argument("--backend-ocr", default="auto", help="auto, clasificador, tesserocr o pytesseract")
+    parser.add_argument("--modelo", default=str(clasificador_glifos.RUTA_MODELO), help="Modelo del clasificador (.npz)")
+    parser.add_argument("--tesseract", default=TESSERACT_PATH, help="Ruta de tesseract.exe")
+    parser.add_argument("--templates", default=str(TEMPLATE_FOLDER))
+    parser.add_argument("--dataset", default=str(dataset_captchas.DATASET_FOLDER))
+    parser.add_argument("--archivo", default=str(dataset_captchas.ARCHIVO_FOLDER), help="Shards del archivo")
+    parser.add_argument("--particion", choices=["train", "eval", "todos"], default="eval")
+    parser.add_argument("--rechazos", action="store_true", help="Evaluar los rechazos del portal del archivo")
+    parser.add_argument("--crudos", action="store_true", help="Cruzar captchas/ con el log de retroalimentación")
+    parser.add_argument("--carpeta-crudos", default=str(dataset_captchas.CAPTCHA_FOLDER))
+    parser.add_argument("--log", default=str(LOG_RETROALIMENTACION))
+    parser.add_argument("--json", help="Guardar el reporte completo (confusiones y fallos) en este archivo")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    ocr_captcha.configurar(args.tesseract)
+
+    particion = None if args.particion == "todos" else args.particion
+    muestras = corpus_etiquetado(args.dataset, args.archivo, particion)
+    rechazados = []
+    hashes = {dataset_captchas.hash_imagen(imagen) for _, imagen, _ in muestras}
+
+    if args.rechazos:
+        rechazados.extend(rechazos_archivados(args.archivo, hashes))
+
+    if args.crudos:
+        for nombre, imagen, texto, veredicto in etiquetar_crudos(args.carpeta_crudos,
+                                                                 leer_retroalimentacion(args.log), hashes):
+            if veredicto == "aceptado":
+                muestras.append((nombre, imagen, texto))
+            else:
+                rechazados.append((nombre, imagen, texto))
+
+    logging.info(f"🧪 Corpus: {len(muestras)} captchas etiquetados, {len(rechazados)} rechazos conocidos")
+
+    clasificador_glifos.configurar(args.modelo)
+
+    opciones = {"backend_ocr": args.backend_ocr, "templates": args.templates, "modelo": args.modelo}
+    reportes = {}
+    for nombre in args.solucionador:
+        try:
+            solucionador = SOLUCIONADORES[nombre](opciones)
+        except Exception as e:
+            logging.error(f"❌ Solucionador '{nombre}' no disponible: {e}")
+            continue
+        reportes[nombre] = evaluar(solucionador, muestras, rechazados)
+        imprimir_reporte(nombre, reportes[nombre])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reportes, f, ensure_ascii=False, indent=1)
+        logging.info(f"💾 Reporte guardado en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Captura de las respuestas JSON del portal (CDP / performance log)
+=================================================================
+El portal es una SPA de Angular: los datos del vehículo, SOAT y RTM llegan
+como JSON por XHR antes de pintarse en los paneles. Con la captura activa
+(CAPTURA_RED en Runt.py) se leen directamente de la red:
+
+1. El driver se crea con goog:loggingPrefs {"performance": "ALL"}
+   (opciones_driver) y Network.enable (preparar_ventana)
+2. descartar_eventos() vacía el log justo antes de clickear Consultar: lo que
+   se lea después es solo de esta consulta
+3. leer_consulta() toma los Network.responseReceived de tipo XHR / Fetch con
+   cuerpo JSON, pide cada cuerpo con Network.getResponseBody y lo mapea a
+   datos_vehiculo / datos_soat / datos_técnicos por ALIAS de claves
+
+El esquema del API no está documentado: las claves se comparan normalizadas
+(minúsculas, sin tildes ni separadores) contra los alias de cada campo. Una
+sección que no se reconozca queda en None y Runt.py la extrae del DOM como
+siempre. Con GUARDAR_RESPUESTAS los cuerpos crudos se guardan en disco para
+ajustar los alias.
+"""
+
+import base64
+import json
+import logging
+import re
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+
+# ═════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═════════════════════════════════════════════════════════════
+
+TIPOS_RECURSO = ("XHR", "Fetch")
+GUARDAR_RESPUESTAS = None      # Carpeta donde volcar los JSON capturados (None = no guardar)
+MIN_CAMPOS_VEHICULO = 5        # Campos reconocidos para dar por buena la respuesta del vehículo
+
+# Alias extra por campo de MAPEO_LABELS_VEHICULO (además del label y del
+# nombre del campo, que siempre se prueban)
+ALIAS_VEHICULO = {
+    "PLACA": ["placa", "noplaca", "numeroplaca"],
+    "NRO_LICENCIA_TRANSITO": ["licenciatransito", "nolicenciatransito", "numerolicencia", "nolicencia"],
+    "ESTADO_VEHICULO": ["estadovehiculo", "estadoautomotor", "estado"],
+    "TIPO_SERVICIO": ["tiposervicio", "servicio"],
+    "CLASE_VEHICULO": ["clasevehiculo", "clase"],
+    "LINEA": ["linea"],
+    "NUMERO_SERIE": ["noserie", "serie"],
+    "NUMERO_MOTOR": ["nomotor", "motor"],
+    "NUMERO_CHASIS": ["nochasis", "chasis"],
+    "NUMERO_VIN": ["novin", "vin"],
+    "TIPO_CARROCERIA": ["carroceria"],
+    "TIPO_COMBUSTIBLE": ["combustible"],
+    "FECHA_MATRICULA_INICIAL": ["fechamatricula", "fechamatriculainicial", "fecharegistro"],
+    "AUTORIDAD_TRANSITO": ["organismotransito", "autoridadtransito"],
+    "GRAVAMENES_PROPIEDAD": ["gravamenes", "tienegravamenes"],
+    "CLASICO_ANTIGUO": ["clasicoantiguo", "esclasicoantiguo"],
+    "REPOTENCIADO": ["esrepotenciado"],
+    "REGRABACION_MOTOR": ["regrabacionmotor", "regrabadomotor"],
+    "NRO_REGRABACION_MOTOR": ["noregrabacionmotor", "numeroregrabacionmotor"],
+    "REGRABACION_CHASIS": ["regrabacionchasis", "regrabadochasis"],
+    "NRO_REGRABACION_CHASIS": ["noregrabacionchasis", "numeroregrabacionchasis"],
+    "REGRABACION_SERIE": ["regrabacionserie", "regrabadoserie"],
+    "NRO_REGRABACION_SERIE": ["noregrabacionserie", "numeroregrabacionserie"],
+    "REGRABACION_VIN": ["regrabacionvin", "regrabadovin"],
+    "NRO_REGRABACION_VIN": ["noregrabacionvin", "numeroregrabacionvin"],
+    "VEHICULO_ENSENANZA": ["ensenanza", "esensenanza", "vehiculoensenanza"],
+    "PUERTAS": ["nopuertas", "numeropuertas"],
+}
+
+# Columnas de SOAT / RTM en el orden de la mat-table (el mismo que reciben
+# fila_soat / fila_rtm de Runt.py). La lista de registros de cada tabla se
+# reconoce porque su primer registro tiene alguna clave del IDENTIFICADOR
+COLUMNAS_SOAT = [
+    ["nopoliza", "numeropoliza", "poliza"],
+    ["fechaexpedicion", "fechaexpedicionpoliza"],
+    ["fechainiciovigencia", "fechavigenciainicio", "fechainicio"],
+    ["fechafinvigencia", "fechavigenciafin", "fechavencimiento", "fechafin"],
+    ["estado", "estadopoliza", "vigente"],
+    ["entidadexpidesoat", "aseguradora", "entidad", "nombreaseguradora"],
+    ["tarifa", "codigotarifa"],
+]
+COLUMNAS_RTM = [  # Orden crudo de la tabla; fila_rtm lo reordena para Sheets
+    ["tiporevision", "tipo"],
+    ["fechaexpedicion"],
+    ["fechavigencia", "fechavencimiento"],
+    ["cdaexpidertm", "nombrecda", "cda"],
+    ["vigente", "estado"],
+    ["nrocertificado", "numerocertificado", "nocertificado", "certificado"],
+    ["informacionconsistente", "consistente"],
+]
+IDENTIFICADOR_SOAT = ["nopoliza", "numeropoliza", "poliza"]
+IDENTIFICADOR_RTM = ["nrocertificado", "numerocertificado", "nocertificado", "tiporevision"]
+
+_PATRON_FECHA_ISO = re.compile(r"^(\d{4})-(\d{2})-(\d{2})(?:[T ][\d:.]+(?:Z|[+-]\d{2}:?\d{2})?)?$")
+
+
+def normalizar_clave(texto):
+    """'NRO. DE LICENCIA DE TRÁNSITO' / 'noLicenciaTransito' → 'nrodelicenciadetransito' / 'nolicenciatransito'"""
+    sin_tildes = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]", "", sin_tildes.lower())
+
+def opciones_driver(options):
+    """Activa el performance log en las ChromeOptions (antes de crear el driver)"""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return options
+
+# ═════════════════════════════════════════════════════════════
+# LECTURA DEL LOG
+# ═════════════════════════════════════════════════════════════
+
+def descartar_eventos(driver):
+    """Vacía el performance log (llamar justo antes de enviar la consulta)"""
+    try:
+        driver.get_log("performance")
+    except Exception as e:
+        logging.debug(f"Performance log no disponible: {e}")
+
+def respuestas_json(driver):
+    """[(url, payload), ...] de las respuestas XHR / Fetch JSON desde el último descarte"""
+    try:
+        entradas = driver.get_log("performance")
+    except Exception as e:
+        logging.warning(f"⚠️ Performance log no disponible: {e}")
+        return []
+
+    respuestas = []
+    for entrada in entradas:
+        try:
+            mensaje = json.loads(entrada["message"])["message"]
+        except (KeyError, ValueError):
+            continue
+        if mensaje.get("method") != "Network.responseReceived":
+            continue
+
+        parametros = mensaje.get("params", {})
+        respuesta = parametros.get("response", {})
+        if parametros.get("type") not in TIPOS_RECURSO or "json" not in respuesta.get("mimeType", ""):
+            continue
+
+        try:
+            cuerpo = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": parametros["requestId"]})
+            texto = cuerpo.get("body", "")
+            if cuerpo.get("base64Encoded"):
+                texto = base64.b64decode(texto).decode("utf-8", errors="replace")
+            respuestas.append((respuesta.get("url", ""), json.loads(texto)))
+        except Exception as e:  # Cuerpo ya descartado por Chrome o no es JSON
+            logging.debug(f"Sin cuerpo para {respuesta.get('url', '')}: {e}")
+
+    if GUARDAR_RESPUESTAS and respuestas:
+        carpeta = Path(GUARDAR_RESPUESTAS)
+        carpeta.mkdir(parents=True, exist_ok=True)
+        ruta = carpeta / f"respuestas_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json"
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump([{"url": url, "payload": payload} for url, payload in respuestas], f, ensure_ascii=False, indent=1)
+
+    return respuestas
+
+# ═════════════════════════════════════════════════════════════
+# MAPEO DE PAYLOADS
+# ═════════════════════════════════════════════════════════════
+
+def valor_legible(valor):
+    """Escalar del JSON → texto como lo muestra el portal"""
+    if valor is None or valor == "":
+        return "No disponible"
+    if isinstance(valor, bool):
+        return "SI" if valor else "NO"
+    texto = str(valor).strip()
+    fecha = _PATRON_FECHA_ISO.match(texto)
+    if fecha:
+        return f"{fecha.group(3)}/{fecha.group(2)}/{fecha.group(1)}"
+    return texto
+
+def _escalares(nodo, profundidad=0):
+    """{clave_normalizada: valor} de los escalares de dicts anidados (lo más superficial gana)"""
+    encontrados = {}
+    pendientes = [nodo]
+    while pendientes and profundidad < 6:
+        siguientes = []
+        for actual in pendientes:
+            if isinstance(actual, dict):
+                for clave, valor in actual.items():
+                    if isinstance(valor, (dict, list)):
+                        siguientes.append(valor)
+                    else:
+                        encontrados.setdefault(normalizar_clave(clave), valor)
+            elif isinstance(actual, list) and len(actual) == 1:  # {"data": [{...}]}
+                siguientes.append(actual[0])
+        pendientes = siguientes
+        profundidad += 1
+    return encontrados
+
+def _listas_de_registros(nodo):
+    """Todas las listas de dicts dentro del payload"""
+    if isinstance(nodo, list):
+        if nodo and all(isinstance(x, dict) for x in nodo):
+            yield nodo
+        for x in nodo:
+            yield from _listas_de_registros(x)
+    elif isinstance(nodo, dict):
+        for valor in nodo.values():
+            yield from _listas_de_registros(valor)
+
+def _buscar(escalares, alias):
+    for clave in alias:
+        if clave in escalares:
+            return escalares[clave]
+    return None
+
+def mapear_vehiculo(payloads, mapeo_labels):
+    """dict como extraer_datos_vehiculo_optimizado, o None si ningún payload lo parece"""
+    mejor, mejor_llenos = None, 0
+    for payload in payloads:
+        escalares = _escalares(payload)
+        datos = {}
+        for etiqueta, campo in mapeo_labels:
+            alias = [normalizar_clave(campo), normalizar_clave(etiqueta)] + ALIAS_VEHICULO.get(campo, [])
+            datos[campo] = valor_legible(_buscar(escalares, alias))
+        llenos = sum(1 for v in datos.values() if v != "No disponible")
+        if llenos > mejor_llenos:
+            mejor, mejor_llenos = datos, llenos
+    return mejor if mejor_llenos >= MIN_CAMPOS_VEHICULO else None
+
+def mapear_tabla(payloads, columnas, identificador):
+    """Textos de las celdas del registro más reciente (el primero, como la tabla), o None"""
+    for payload in payloads:
+        for registros in _listas_de_registros(payload):
+            primero = {normalizar_clave(k): v for k, v in registros[0].items() if not isinstance(v, (dict, list))}
+            if _buscar(primero, identificador) is None:
+                continue
+            celdas = []
+            for alias in columnas:
+                valor = _buscar(primero, alias)
+                if isinstance(valor, bool) and "vigente" in alias:
+                    celdas.append("VIGENTE" if valor else "NO VIGENTE")
+                else:
+                    celdas.append(valor_legible(valor))
+            return celdas
+    return None
+
+def leer_consulta(driver, placa, mapeo_labels):
+    """
+    Datos de la consulta recién enviada, leídos de la red.
+
+    Returns:
+        {"vehiculo": dict o None, "soat": [7 celdas] o None, "rtm": [7 celdas crudas] o None}
+        (None = no reconocido; se debe extraer del DOM)
+    """
+    payloads = [payload for _, payload in respuestas_json(driver)]
+    vehiculo = mapear_vehiculo(payloads, mapeo_labels)
+
+    # Un payload de otra placa (respuesta tardía de la consulta anterior) no sirve
+    placa_red = (vehiculo or {}).get("PLACA", "No disponible").upper()
+    if placa_red not in ("NO DISPONIBLE", str(placa).strip().upper()):
+        logging.warning(f"⚠️ La red trajo la placa {vehiculo['PLACA']} en lugar de {placa}, se ignora la captura")
+        return {"vehiculo": None, "soat": None, "rtm": None}
+
+    resultado = {
+        "vehiculo": vehiculo,
+        "soat": mapear_tabla(payloads, COLUMNAS_SOAT, IDENTIFICADOR_SOAT),
+        "rtm": mapear_tabla(payloads, COLUMNAS_RTM, IDENTIFICADOR_RTM),
+    }
+    reconocidas = [seccion for seccion, datos in resultado.items() if datos is not None]
+    logging.info(f"🛰️ Captura de red: {len(payloads)} respuestas JSON, secciones reconocidas: {reconocidas or 'ninguna'}")
+    return resultado
@@ -0,0 +1,122 @@
+"""
+Carga incremental de las hojas de entrada
+=========================================
+Runt.py (hojas "Motos ...") y Runt_Actualizar_Vigencias.py (hojas
+"Vigencias ...") volvían a descargar la hoja completa en cada arranque /
+ciclo sin saber qué filas eran nuevas.
+
+Ahora se guarda en estado_runt.db una copia local de cada hoja con un hash
+por fila y un cursor (cursores_carga). Antes de descargar se hace una sonda
+barata, y solo si cambió se lee el rango completo:
+
+1. solo_lectura=True (el bot no escribe en ese spreadsheet, ej: Motos):
+   la sonda es el modifiedTime de Drive (una llamada de metadatos). Igual
+   al del cursor → "sin_cambios", las filas salen de la copia local
+2. rangos_clave (ej: C:E en Vigencias): la sonda lee solo esas columnas.
+   Sirve aunque el bot escriba en el mismo spreadsheet (la versión de Drive
+   cambia en cada ciclo) y deja fuera columnas que cambian solas, como la
+   de estado. Hash igual al del cursor → "sin_cambios", sin más lecturas
+3. Si cambió → se lee el rango completo, se comparan hashes por fila (de
+   las columnas clave si las hay) y solo las filas nuevas o modificadas se
+   escriben en la copia local y se informan como "cambiadas"
+
+Con "sin_cambios" las columnas fuera de la clave (ej: estado) son las de la
+última descarga.
+"""
+
+import hashlib
+import json
+import logging
+
+import estado_db
+import sheets_session
+
+
+def _hash_fila(valores):
+    return hashlib.sha1(json.dumps(valores, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def _hash_rango(filas):
+    return "sha1:" + _hash_fila(filas)
+
+def _desde_copia(sheet_id, nombre):
+    """Filas de la copia local en orden (fila 1 = encabezado)"""
+    copia = estado_db.filas_cargadas(sheet_id, nombre)
+    return [valores for _, (_, valores) in sorted(copia.items())]
+
+def cargar_hojas(sheet_id, rangos_por_hoja, rangos_clave=None, solo_lectura=False):
+    """
+    Devuelve las hojas comparadas con la copia local, descargando solo las que cambiaron.
+
+    Args:
+        rangos_por_hoja: {nombre_hoja: "A:F", ...} (lo que se descarga si hubo cambios)
+        rangos_clave: {nombre_hoja: "C:E", ...} columnas que deciden si una fila cambió;
+                      se leen antes como sonda. None = la fila completa, sin sonda de columnas
+        solo_lectura: True si el bot no escribe en el spreadsheet → sonda por modifiedTime de Drive
+
+    Returns:
+        {nombre_hoja: {"filas": [[...], ...],          # todas las filas (fila 1 = encabezado)
+                       "cambiadas": [numero_fila, ...], # filas nuevas o modificadas
+                       "sin_cambios": bool}}           # True si no se descargó (filas de la copia local)
+        Las hojas que no existen no aparecen.
+    """
+    resultado = {}
+    cursores = {nombre: estado_db.obtener_cursor_carga(sheet_id, nombre) for nombre in rangos_por_hoja}
+
+    def vigente(nombre):
+        return cursores[nombre] is not None and cursores[nombre]["rango"] == rangos_por_hoja[nombre]
+
+    pendientes = list(rangos_por_hoja)   # Hojas que hay que descargar
+    sin_cambios = []
+    modificado = None
+    if solo_lectura:
+        modificado = sheets_session.fecha_modificacion(sheet_id)
+        sin_cambios = [nombre for nombre in pendientes
+                       if vigente(nombre) and cursores[nombre]["modificado"] == modificado]
+        pendientes = [nombre for nombre in pendientes if nombre not in sin_cambios]
+
+    sondas = {}
+    if rangos_clave and pendientes:
+        sondas = sheets_session.leer_rangos(sheet_id, {nombre: rangos_clave[nombre] for nombre in pendientes})
+        for nombre in list(pendientes):
+            if nombre not in sondas:   # La hoja no existe
+                pendientes.remove(nombre)
+            elif vigente(nombre) and cursores[nombre]["version"] == _hash_rango(sondas[nombre]):
+                pendientes.remove(nombre)
+                sin_cambios.append(nombre)
+
+    for nombre in sin_cambios:
+        filas = _desde_copia(sheet_id, nombre)
+        cursor = cursores[nombre]
+        if solo_lectura and cursor["modificado"] != modificado:
+            # Cambió otra parte del spreadsheet, no estas columnas: se recuerda la nueva fecha
+            estado_db.guardar_carga(sheet_id, nombre, cursor["rango"], cursor["version"], modificado, [], len(filas))
+        resultado[nombre] = {"filas": filas, "cambiadas": [], "sin_cambios": True}
+        logging.info(f"♻️  '{nombre}' sin cambios desde la última carga ({len(filas)} filas de la copia local)")
+
+    if not pendientes:
+        return resultado
+
+    lectura = sheets_session.leer_rangos(sheet_id, {nombre: rangos_por_hoja[nombre] for nombre in pendientes})
+    for nombre, filas in lectura.items():
+        claves = sondas.get(nombre, filas)
+        total = max(len(filas), len(claves))
+        filas = filas + [[] for _ in range(total - len(filas))]
+        copia = estado_db.filas_cargadas(sheet_id, nombre)
+
+        escribir, cambiadas = [], []
+        for numero, valores in enumerate(filas, start=1):
+            hash_fila = _hash_fila(claves[numero - 1] if numero <= len(claves) else [])
+            anterior = copia.get(numero)
+            if anterior is None or anterior[0] != hash_fila:
+                cambiadas.append(numero)
+                escribir.append((numero, hash_fila, valores))
+            elif anterior[1] != valores:   # Misma clave, otras columnas (ej: estado): solo se refresca la copia
+                escribir.append((numero, hash_fila, valores))
+
+        estado_db.guardar_carga(sheet_id, nombre, rangos_por_hoja[nombre], _hash_rango(claves),
+                                modificado, escribir, total)
+
+        resultado[nombre] = {"filas": filas, "cambiadas": cambiadas, "sin_cambios": False}
+        logging.info(f"📥 '{nombre}': {len(filas)} filas leídas, {len(cambiadas)} nuevas o modificadas")
+
+    return resultado
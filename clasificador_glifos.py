@@ -0,0 +1,239 @@
+"""
+Clasificador de glifos entrenado con los captchas aceptados
+===========================================================
+Tesseract genérico (con lista blanca y la tabla REEMPLAZOS) se equivoca
+seguido, y cada lectura errada cuesta una ida y vuelta al portal.
+
+Este clasificador se entrena con las etiquetas verificadas de
+captchas_leidos (dataset_captchas.py) y corre en CPU con solo NumPy:
+
+- Características HOG (celdas de 8 y de 4 píxeles) sobre el glifo
+  normalizado de ocr_templates (mismo recorte que el dataset)
+- Modelo "lineal" (regresión softmax) o "knn" (vecinos por coseno)
+- Inferencia en lote: todos los glifos de uno o varios captchas en una sola
+  multiplicación de matrices
+- Se guarda en un .npz (sin pickle)
+
+Como backend de ocr_captcha ("clasificador") queda detrás de resolver_captcha.
+
+Uso:
+    python clasificador_glifos.py [--dataset DIR] [--modelo modelo_glifos.npz] [--tipo lineal|knn]
+"""
+
+import argparse
+import logging
+from pathlib import Path
+
+import numpy as np
+
+import dataset_captchas
+import ocr_captcha
+import ocr_templates
+
+# ═════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═════════════════════════════════════════════════════════════
+
+RUTA_MODELO = dataset_captchas.BASE_PATH / "modelo_glifos.npz"
+
+CELDAS_HOG = (8, 4)         # Tamaños de celda (píxeles); se concatenan
+ORIENTACIONES_HOG = 9
+VECINOS_KNN = 3
+ITERACIONES_LINEAL = 300
+TASA_APRENDIZAJE = 0.5
+REGULARIZACION = 1e-3
+
+_ruta_modelo = RUTA_MODELO
+
+
+def configurar(ruta_modelo):
+    """Ruta del .npz que usa el backend "clasificador" de este proceso"""
+    global _ruta_modelo
+    _ruta_modelo = Path(ruta_modelo)
+
+# ═════════════════════════════════════════════════════════════
+# CARACTERÍSTICAS
+# ═════════════════════════════════════════════════════════════
+
+def _hog(glifos, celda):
+    """HOG vectorizado para un lote (N, alto, ancho): bloques de 2x2 celdas normalizados L2"""
+    n, alto, ancho = glifos.shape
+    gx = np.zeros_like(glifos)
+    gy = np.zeros_like(glifos)
+    gx[:, :, 1:-1] = glifos[:, :, 2:] - glifos[:, :, :-2]
+    gy[:, 1:-1, :] = glifos[:, 2:, :] - glifos[:, :-2, :]
+
+    magnitud = np.hypot(gx, gy)
+    orientacion = np.rad2deg(np.arctan2(gy, gx)) % 180
+    bins = np.minimum((orientacion / (180 / ORIENTACIONES_HOG)).astype(np.int64), ORIENTACIONES_HOG - 1)
+
+    celdas_alto, celdas_ancho = alto // celda, ancho // celda
+    fila_celda = np.arange(alto) // celda
+    columna_celda = np.arange(ancho) // celda
+    indice_celda = (fila_celda[:, None] * celdas_ancho + columna_celda[None, :]) * ORIENTACIONES_HOG
+
+    histogramas = np.zeros((n, celdas_alto * celdas_ancho * ORIENTACIONES_HOG), np.float32)
+    destino = (indice_celda[None, :, :] + bins).reshape(n, -1)
+    filas = np.repeat(np.arange(n), alto * ancho)
+    np.add.at(histogramas, (filas, destino.ravel()), magnitud.reshape(-1))
+    histogramas = histogramas.reshape(n, celdas_alto, celdas_ancho, ORIENTACIONES_HOG)
+
+    bloques = np.concatenate([histogramas[:, :-1, :-1], histogramas[:, 1:, :-1],
+                              histogramas[:, :-1, 1:], histogramas[:, 1:, 1:]], axis=3)
+    bloques /= np.linalg.norm(bloques, axis=3, keepdims=True) + 1e-6
+    return bloques.reshape(n, -1)
+
+def caracteristicas(glifos):
+    """(N, 32, 32) float 0..1 → (N, D) características HOG"""
+    glifos = np.asarray(glifos, dtype=np.float32)
+    if glifos.ndim == 2:
+        glifos = glifos[None]
+    return np.hstack([_hog(glifos, celda) for celda in CELDAS_HOG])
+
+def _softmax(z):
+    z = z - z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+# ═════════════════════════════════════════════════════════════
+# MODELO
+# ═════════════════════════════════════════════════════════════
+
+class ClasificadorGlifos:
+    """HOG + lineal / kNN; todo el estado son arrays (se guarda en .npz)"""
+
+    def __init__(self, tipo, clases, media, escala, pesos=None, referencias=None, etiquetas_referencia=None):
+        self.tipo = tipo
+        self.clases = np.asarray(clases)
+        self.media = media
+        self.escala = escala
+        self.pesos = pesos
+        self.referencias = referencias
+        self.etiquetas_referencia = etiquetas_referencia
+
+    @classmethod
+    def entrenar(cls, glifos, etiquetas, tipo="lineal"):
+        etiquetas = np.asarray(etiquetas)
+        clases = np.array(sorted(set(etiquetas.tolist())))
+        indices = np.searchsorted(clases, etiquetas)
+
+        x = caracteristicas(glifos)
+        media = x.mean(axis=0)
+        escala = x.std(axis=0) + 1e-6
+        x = (x - media) / escala
+
+        if tipo == "knn":
+            referencias = x / np.linalg.norm(x, axis=1, keepdims=True)
+            return cls(tipo, clases, media, escala, referencias=referencias,
+                       etiquetas_referencia=indices.astype(np.int32))
+
+        if tipo != "lineal":
+            raise ValueError(f"Tipo de clasificador desconocido: {tipo}")
+
+        x = np.hstack([x, np.ones((len(x), 1), np.float32)])
+        objetivo = np.eye(len(clases), dtype=np.float32)[indices]
+        pesos = np.zeros((x.shape[1], len(clases)), np.float32)
+        for _ in range(ITERACIONES_LINEAL):
+            gradiente = x.T @ (_softmax(x @ pesos) - objetivo) / len(x) + REGULARIZACION * pesos
+            pesos -= TASA_APRENDIZAJE * gradiente
+        return cls(tipo, clases, media, escala, pesos=pesos)
+
+    def probabilidades(self, glifos):
+        """(N, clases) probabilidades para un lote de glifos normalizados"""
+        x = (caracteristicas(glifos) - self.media) / self.escala
+
+        if self.tipo == "lineal":
+            return _softmax(np.hstack([x, np.ones((len(x), 1), np.float32)]) @ self.pesos)
+
+        x = x / np.linalg.norm(x, axis=1, keepdims=True)
+        similitud = x @ self.referencias.T
+        vecinos = np.argsort(-similitud, axis=1)[:, :VECINOS_KNN]
+        votos = np.zeros((len(x), len(self.clases)), np.float32)
+        np.add.at(votos, (np.repeat(np.arange(len(x)), VECINOS_KNN), self.etiquetas_referencia[vecinos].ravel()), 1)
+        return votos / VECINOS_KNN
+
+    def predecir(self, glifos):
+        """(caracteres, confianzas) para un lote de glifos"""
+        if not len(glifos):
+            return np.array([], dtype="<U1"), np.array([], dtype=np.float32)
+        probabilidades = self.probabilidades(glifos)
+        mejores = probabilidades.argmax(axis=1)
+        return self.clases[mejores], probabilidades[np.arange(len(mejores)), mejores]
+
+    def guardar(self, ruta):
+        arrays = {"tipo": np.array(self.tipo), "clases": self.clases, "media": self.media, "escala": self.escala}
+        if self.tipo == "lineal":
+            arrays["pesos"] = self.pesos
+        else:
+            arrays["referencias"] = self.referencias
+            arrays["etiquetas_referencia"] = self.etiquetas_referencia
+        np.savez_compressed(ruta, **arrays)
+
+    @classmethod
+    def cargar(cls, ruta):
+        with np.load(ruta, allow_pickle=False) as datos:
+            return cls(
+                str(datos["tipo"]), datos["clases"], datos["media"], datos["escala"],
+                pesos=datos["pesos"] if "pesos" in datos else None,
+                referencias=datos["referencias"] if "referencias" in datos else None,
+                etiquetas_referencia=datos["etiquetas_referencia"] if "etiquetas_referencia" in datos else None
+            )
+
+# ═════════════════════════════════════════════════════════════
+# BACKEND OCR
+# ═════════════════════════════════════════════════════════════
+
+@ocr_captcha.registrar_backend("clasificador")
+class BackendClasificador(ocr_captcha.BackendOCR):
+    """Segmenta cada captcha y clasifica TODOS los glifos del lote en una sola pasada"""
+
+    nombre = "clasificador"
+    corregible = False  # Aprendió las etiquetas reales: ni REEMPLAZOS ni mezcla con templates
+
+    def __init__(self):
+        if not _ruta_modelo.exists():
+            raise RuntimeError(f"No existe el modelo {_ruta_modelo} (entrenar con clasificador_glifos.py)")
+        self.modelo = ClasificadorGlifos.cargar(_ruta_modelo)
+
+    def leer_lote(self, imagenes):
+        glifos, cortes = [], [0]
+        for imagen in imagenes:
+            glifos.extend(ocr_templates.glifos_normalizados(np.asarray(imagen)))
+            cortes.append(len(glifos))
+
+        caracteres, confianzas = self.modelo.predecir(np.array(glifos, dtype=np.float32))
+        lecturas = []
+        for inicio, fin in zip(cortes, cortes[1:]):
+            texto = "".join(caracteres[inicio:fin])
+            # El carácter más dudoso define la confianza del captcha
+            lecturas.append((texto, float(confianzas[inicio:fin].min()) if fin > inicio else 0.0))
+        return lecturas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entrena el clasificador de glifos con el dataset de captchas")
+    parser.add_argument("--dataset", default=str(dataset_captchas.DATASET_FOLDER))
+    parser.add_argument("--modelo", default=str(RUTA_MODELO))
+    parser.add_argument("--tipo", choices=["lineal", "knn"], default="lineal")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    dataset = dataset_captchas.Dataset.cargar(args.dataset)
+    glifos_train, etiquetas_train = dataset.glifos_de("train")
+    glifos_eval, etiquetas_eval = dataset.glifos_de("eval")
+
+    logging.info(f"🏋️ Entrenando '{args.tipo}' con {len(glifos_train)} glifos ({len(set(etiquetas_train))} clases)...")
+    modelo = ClasificadorGlifos.entrenar(glifos_train, etiquetas_train, args.tipo)
+
+    if len(glifos_eval):
+        predichos, _ = modelo.predecir(glifos_eval)
+        logging.info(f"📊 Exactitud por glifo en eval: {(predichos == etiquetas_eval).mean():.1%} "
+                     f"({len(glifos_eval)} glifos)")
+
+    modelo.guardar(args.modelo)
+    logging.info(f"💾 Modelo guardado en {args.modelo}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Dataset de captchas etiquetados
+===============================
+procesar_consulta_interno archiva cada captcha con el veredicto del portal
+(archivo_captchas.py): los "aceptado" traen una etiqueta verificada. Este
+script los indexa una vez en un formato compacto para que el trabajo de OCR
+(benchmark, clasificador) no recorra el archivo completo cada vez:
+
+    dataset_captchas/
+        glifos.npy         uint8 (N, 32, 32)   glifos normalizados (ocr_templates)
+        etiquetas.npy      <U1   (N,)          carácter de cada glifo
+        glifo_captcha.npy  int32 (N,)          índice del captcha de cada glifo
+        imagenes.npy       uint8 (M, alto, ancho) captchas completos
+        captchas.json      [{id, placa, texto, hash, particion}, ...] + resto sin etiqueta
+
+- Los .npy se abren con np.load(mmap_mode="r") (Dataset.cargar)
+- Se deduplica por hash de los píxeles (el mismo captcha guardado dos veces
+  cuenta una sola vez); los registros sin veredicto "aceptado" quedan
+  listados como "sin etiqueta" (con su veredicto y el texto que se envió)
+- La partición train / eval es por CAPTCHA (no por glifo) y depende solo del
+  hash: estable aunque el corpus crezca
+- Se omiten los captchas cuya segmentación no da tantos glifos como letras
+
+--ingerir pasa primero al archivo los PNG sueltos de captchas_leidos/ y
+captchas/ (los exitoso_*.png con su etiqueta del nombre); --borrar los
+elimina una vez archivados.
+
+Uso:
+    python dataset_captchas.py [--archivo DIR] [--destino DIR] [--eval 20]
+                               [--ingerir [--leidos DIR] [--crudos DIR] [--borrar]]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+import archivo_captchas
+import ocr_templates
+
+# ═════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═════════════════════════════════════════════════════════════
+
+BASE_PATH = Path(r"C:\Users\cmarroquin\Music\RuntPro")
+CAPTCHA_LEIDOS_FOLDER = BASE_PATH / "captchas_leidos"
+CAPTCHA_FOLDER = BASE_PATH / "captchas"
+ARCHIVO_FOLDER = BASE_PATH / "archivo_captchas"
+DATASET_FOLDER = BASE_PATH / "dataset_captchas"
+
+PORCENTAJE_EVAL = 20  # % de captchas que van a evaluación
+
+PATRON_EXITOSO = archivo_captchas.PATRON_EXITOSO
+
+
+def etiqueta_de_archivo(nombre_archivo):
+    """'exitoso_ABH91G_4QxfV_093809.png' → ('ABH91G', '4QxfV'); None si no es un exitoso"""
+    coincidencia = PATRON_EXITOSO.match(nombre_archivo)
+    if not coincidencia:
+        return None
+    return coincidencia.group("placa"), coincidencia.group("texto")
+
+def hash_imagen(imagen):
+    """Hash de los píxeles (no del archivo): el mismo captcha re-guardado da el mismo hash"""
+    return hashlib.sha1(np.ascontiguousarray(imagen).tobytes() + str(imagen.shape).encode()).hexdigest()
+
+def particion_de_hash(hash_hex, porcentaje_eval=PORCENTAJE_EVAL):
+    return "eval" if int(hash_hex[:8], 16) % 100 < porcentaje_eval else "train"
+
+# ═════════════════════════════════════════════════════════════
+# CONSTRUCCIÓN
+# ═════════════════════════════════════════════════════════════
+
+def construir(carpeta_archivo=ARCHIVO_FOLDER, destino=DATASET_FOLDER, porcentaje_eval=PORCENTAJE_EVAL):
+    """Indexa los captchas aceptados del archivo (y el resto sin etiqueta) en `destino`"""
+    destino = Path(destino)
+    destino.mkdir(parents=True, exist_ok=True)
+
+    captchas, imagenes, glifos, etiquetas, glifo_captcha = [], [], [], [], []
+    sin_etiqueta = []
+    vistos = set()
+    omitidos = Counter()
+
+    registros = archivo_captchas.iterar_registros(carpeta_archivo)
+    for registro in sorted(registros, key=lambda r: r.get("veredicto") != "aceptado"):  # Etiquetados primero
+        imagen = registro["imagen"]
+        hash_hex = hash_imagen(imagen)
+        if hash_hex in vistos:
+            omitidos["duplicado"] += 1
+            continue
+        vistos.add(hash_hex)
+
+        texto = registro.get("texto")
+        if registro.get("veredicto") != "aceptado" or not texto:
+            sin_etiqueta.append({"id": registro["id"], "hash": hash_hex, "veredicto": registro.get("veredicto"),
+                                 "texto": texto})
+            continue
+
+        if imagenes and imagen.shape != imagenes[0].shape:
+            omitidos[f"tamaño distinto de {imagenes[0].shape}"] += 1
+            continue
+
+        glifos_captcha = ocr_templates.glifos_normalizados(imagen, longitud=len(texto))
+        if len(glifos_captcha) != len(texto):
+            omitidos["segmentación"] += 1
+            continue
+
+        indice = len(captchas)
+        captchas.append({
+            "id": registro["id"],
+            "placa": registro["placa"],
+            "texto": texto,
+            "hash": hash_hex,
+            "particion": particion_de_hash(hash_hex, porcentaje_eval)
+        })
+        imagenes.append(imagen)
+        for glifo, caracter in zip(glifos_captcha, texto):
+            glifos.append(np.round(glifo * 255).astype(np.uint8))
+            etiquetas.append(caracter)
+            glifo_captcha.append(indice)
+
+    if not captchas:
+        logging.error(f"❌ No hay captchas aceptados en {carpeta_archivo} (¿falta --ingerir?)")
+        return None
+
+    np.save(destino / "glifos.npy", np.stack(glifos))
+    np.save(destino / "etiquetas.npy", np.array(etiquetas, dtype="<U1"))
+    np.save(destino / "glifo_captcha.npy", np.array(glifo_captcha, dtype=np.int32))
+    np.save(destino / "imagenes.npy", np.stack(imagenes))
+
+    resumen = {
+        "carpeta_archivo": str(carpeta_archivo),
+        "porcentaje_eval": porcentaje_eval,
+        "tamano_glifo": ocr_templates.TAMANO_GLIFO,
+        "captchas": captchas,
+        "sin_etiqueta": sin_etiqueta,
+        "omitidos": dict(omitidos)
+    }
+    with open(destino / "captchas.json", "w", encoding="utf-8") as f:
+        json.dump(resumen, f, ensure_ascii=False, indent=1)
+
+    por_particion = Counter(c["particion"] for c in captchas)
+    logging.info(f"✅ Dataset en {destino}: {len(captchas)} captchas "
+                 f"({por_particion['train']} train / {por_particion['eval']} eval), "
+                 f"{len(glifos)} glifos, {len(set(etiquetas))} caracteres distintos")
+    logging.info(f"   Sin etiqueta: {len(sin_etiqueta)} | Omitidos: {dict(omitidos)}")
+    return resumen
+
+# ═════════════════════════════════════════════════════════════
+# LECTURA
+# ═════════════════════════════════════════════════════════════
+
+class Dataset:
+    """Dataset ya construido, con los arrays mapeados en memoria (sin copiarlos)"""
+
+    def __init__(self, carpeta, glifos, etiquetas, glifo_captcha, imagenes, metadatos):
+        self.carpeta = Path(carpeta)
+        self.glifos = glifos
+        self.etiquetas = etiquetas
+        self.glifo_captcha = glifo_captcha
+        self.imagenes = imagenes
+        self.captchas = metadatos["captchas"]
+        self.sin_etiqueta = metadatos["sin_etiqueta"]
+        self.metadatos = metadatos
+
+    @classmethod
+    def cargar(cls, carpeta=DATASET_FOLDER):
+        carpeta = Path(carpeta)
+        with open(carpeta / "captchas.json", encoding="utf-8") as f:
+            metadatos = json.load(f)
+        return cls(
+            carpeta,
+            np.load(carpeta / "glifos.npy", mmap_mode="r"),
+            np.load(carpeta / "etiquetas.npy", mmap_mode="r"),
+            np.load(carpeta / "glifo_captcha.npy", mmap_mode="r"),
+            np.load(carpeta / "imagenes.npy", mmap_mode="r"),
+            metadatos
+        )
+
+    def __len__(self):
+        return len(self.captchas)
+
+    def indices_captchas(self, particion=None):
+        """Índices de captchas de la partición ("train", "eval" o None = todos)"""
+        return [i for i, c in enumerate(self.captchas) if particion is None or c["particion"] == particion]
+
+    def indices_glifos(self, particion=None):
+        """Índices de glifos cuyos captchas son de la partición"""
+        captchas = np.array(self.indices_captchas(particion), dtype=np.int32)
+        return np.nonzero(np.isin(self.glifo_captcha, captchas))[0]
+
+    def glifos_de(self, particion=None):
+        """(glifos float32 0..1, etiquetas) de la partición, ya en memoria"""
+        indices = self.indices_glifos(particion)
+        return np.asarray(self.glifos[indices], dtype=np.float32) / 255.0, np.asarray(self.etiquetas[indices])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construye el dataset de captchas etiquetados")
+    parser.add_argument("--archivo", default=str(ARCHIVO_FOLDER), help="Carpeta con los shards del archivo")
+    parser.add_argument("--destino", default=str(DATASET_FOLDER))
+    parser.add_argument("--eval", type=int, default=PORCENTAJE_EVAL, help="%% de captchas para evaluación")
+    parser.add_argument("--ingerir", action="store_true", help="Archivar antes los PNG sueltos")
+    parser.add_argument("--leidos", default=str(CAPTCHA_LEIDOS_FOLDER), help="Carpeta con exitoso_*.png")
+    parser.add_argument("--crudos", default=str(CAPTCHA_FOLDER), help="Carpeta con los intentos crudos")
+    parser.add_argument("--borrar", action="store_true", help="Con --ingerir: borrar los PNG ya archivados")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.ingerir:
+        Path(args.archivo).mkdir(parents=True, exist_ok=True)
+        archivo_captchas.ingerir_pngs(args.leidos, args.crudos, args.archivo, borrar=args.borrar)
+    construir(args.archivo, args.destino, args.eval)
+
+
+if __name__ == "__main__":
+    main()
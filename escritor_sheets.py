@@ -0,0 +1,237 @@
+"""
+Escritor diferido (write-behind) para Google Sheets
+===================================================
+Cada placa exitosa generaba varias llamadas sueltas ("Datos Runt",
+"Resultados", "Datos Vehiculo"). Ahora las escrituras se encolan y se
+envían juntas con UNA llamada values_batch_update por spreadsheet.
+
+- encolar() guarda primero la escritura en estado_runt.db (tabla
+  escrituras_sheets): si el proceso muere entre envíos no se pierde nada,
+  la próxima ejecución la reenvía
+- Se envía al juntar MAX_ESCRITURAS_PENDIENTES, cada INTERVALO_FLUSH_SEGUNDOS
+  (hilo en segundo plano) y al salir (atexit / Ctrl+C)
+- Cada script usa su propio "origen" para no enviar la cola de otro proceso
+- Toda escritura es de UNA fila completa por rango A1 (nunca celda por celda);
+  ante un 429 (cuota) se reintenta con espera exponencial
+"""
+
+import atexit
+import logging
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+
+from gspread.exceptions import APIError
+from gspread.utils import absolute_range_name
+
+import estado_db
+import sheets_session
+
+# ═════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═════════════════════════════════════════════════════════════
+
+MAX_ESCRITURAS_PENDIENTES = 20   # Enviar al juntar esta cantidad de rangos
+INTERVALO_FLUSH_SEGUNDOS = 30    # Enviar aunque haya pocas, cada este tiempo
+MAX_INTENTOS_ENVIO = 5           # Tras estos fallos la escritura se descarta (queda en el log)
+
+REINTENTOS_CUOTA = 6             # Reintentos ante 429 / 5xx dentro de una misma llamada
+ESPERA_BASE_SEGUNDOS = 2         # 2, 4, 8, 16... (+ azar) entre reintentos
+ESPERA_MAXIMA_SEGUNDOS = 64
+CODIGOS_REINTENTABLES = {429, 500, 502, 503}
+
+_origen = Path(sys.argv[0]).stem or "runt"
+_lock = threading.Lock()          # Contadores; nunca se retiene durante una llamada a la API
+_lock_envio = threading.Lock()    # Un solo flush enviando a la vez (no se mandan filas dos veces)
+_ultimo_flush = time.monotonic()
+_pendientes_en_memoria = 0
+_hilo = None
+_detener = threading.Event()
+
+
+def configurar(origen):
+    """Nombre con el que este proceso marca sus escrituras (por defecto, el script)"""
+    global _origen
+    _origen = origen
+
+# ═════════════════════════════════════════════════════════════
+# RANGOS Y REINTENTOS
+# ═════════════════════════════════════════════════════════════
+
+def columna_a_letra(numero):
+    """1 → A, 26 → Z, 27 → AA, 32 → AF ... (chr(64 + n) se rompe después de Z)"""
+    letras = ""
+    while numero > 0:
+        numero, resto = divmod(numero - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+def rango_fila(fila, num_valores, columna_inicial=1):
+    """Rango A1 de una fila: rango_fila(5, 19) → 'A5:S5'"""
+    inicio = columna_a_letra(columna_inicial)
+    fin = columna_a_letra(columna_inicial + max(num_valores, 1) - 1)
+    return f"{inicio}{fila}:{fin}{fila}"
+
+def _codigo_error(error):
+    respuesta = getattr(error, "response", None)
+    return getattr(respuesta, "status_code", None)
+
+def con_reintentos(funcion, *args, **kwargs):
+    """Ejecuta una llamada a la API reintentando con espera exponencial ante 429 / 5xx"""
+    for intento in range(REINTENTOS_CUOTA + 1):
+        try:
+            return funcion(*args, **kwargs)
+        except APIError as e:
+            codigo = _codigo_error(e)
+            if codigo not in CODIGOS_REINTENTABLES or intento == REINTENTOS_CUOTA:
+                raise
+            espera = min(ESPERA_BASE_SEGUNDOS * (2 ** intento), ESPERA_MAXIMA_SEGUNDOS)
+            espera += random.uniform(0, 1)
+            logging.warning(f"⏳ Sheets respondió {codigo}, reintento {intento + 1}/{REINTENTOS_CUOTA} en {espera:.1f}s")
+            time.sleep(espera)
+
+def escribir_fila(worksheet, fila, valores, columna_inicial=1):
+    """Escritura INMEDIATA de una fila en un solo rango (con reintentos ante cuota)"""
+    rango = rango_fila(fila, len(valores), columna_inicial)
+    con_reintentos(worksheet.update, [valores], range_name=rango, value_input_option="RAW")
+    return rango
+
+# ═════════════════════════════════════════════════════════════
+# ENCOLAR
+# ═════════════════════════════════════════════════════════════
+
+def encolar(sheet_id, hoja, rango, valores):
+    """
+    Agrega una escritura de rango (ej: "A15:F15", [[...]]) a la cola.
+
+    Queda persistida en SQLite antes de volver; el envío real ocurre en el
+    próximo flush.
+    """
+    global _pendientes_en_memoria
+
+    estado_db.encolar_escritura(_origen, sheet_id, hoja, rango, valores)
+
+    with _lock:
+        _pendientes_en_memoria += 1
+        _iniciar_hilo()
+        lleno = _pendientes_en_memoria >= MAX_ESCRITURAS_PENDIENTES
+
+    if lleno:
+        flush(esperar=False)  # Si otro hilo ya está enviando, no bloquear al navegador
+
+def encolar_fila(sheet_id, hoja, fila, valores, columna_inicial=1):
+    """Encola una fila completa como un solo rango y devuelve el rango usado"""
+    rango = rango_fila(fila, len(valores), columna_inicial)
+    encolar(sheet_id, hoja, rango, [valores])
+    return rango
+
+def reenviar_pendientes():
+    """Al iniciar: envía lo que quedó en cola de una ejecución anterior y arranca el flush periódico"""
+    pendientes = estado_db.escrituras_pendientes(_origen)
+    if pendientes:
+        logging.info(f"♻️  {len(pendientes)} escrituras a Sheets pendientes de la ejecución anterior")
+        flush()
+    with _lock:
+        _iniciar_hilo()
+
+def hay_pendientes(sheet_id, hoja):
+    """True si la hoja tiene escrituras sin enviar de este proceso"""
+    return bool(estado_db.escrituras_pendientes(_origen, sheet_id, hoja))
+
+# ═════════════════════════════════════════════════════════════
+# ENVIAR
+# ═════════════════════════════════════════════════════════════
+
+def flush(esperar=True):
+    """
+    Envía todas las escrituras pendientes (una llamada por spreadsheet).
+
+    Se toma la foto de la cola y se suelta el lock antes de llamar a la API
+    (con reintentos puede tardar minutos): encolar() nunca espera al envío.
+    Con esperar=False, si ya hay un flush en curso se vuelve sin enviar.
+    """
+    global _ultimo_flush, _pendientes_en_memoria
+
+    if not _lock_envio.acquire(blocking=esperar):
+        return 0
+    try:
+        with _lock:
+            _ultimo_flush = time.monotonic()
+            _pendientes_en_memoria = 0
+        pendientes = estado_db.escrituras_pendientes(_origen)
+
+        if not pendientes:
+            return 0
+
+        por_spreadsheet = {}
+        for escritura in pendientes:
+            por_spreadsheet.setdefault(escritura["sheet_id"], []).append(escritura)
+
+        enviadas = 0
+        for sheet_id, escrituras in por_spreadsheet.items():
+            ids = [e["id"] for e in escrituras]
+            cuerpo = {
+                "valueInputOption": "RAW",
+                "data": [
+                    {"range": absolute_range_name(e["hoja"], e["rango"]), "values": e["valores"]}
+                    for e in escrituras
+                ]
+            }
+
+            try:
+                spreadsheet = sheets_session.abrir_spreadsheet(sheet_id)
+                con_reintentos(spreadsheet.values_batch_update, cuerpo)
+            except Exception as e:
+                logging.error(f"❌ Error enviando {len(ids)} escrituras a Sheets ({sheet_id}): {e}")
+                estado_db.sumar_intento_escrituras(ids)
+                _descartar_agotadas(escrituras)
+                continue
+            estado_db.borrar_escrituras(ids)
+            enviadas += len(ids)
+
+        if enviadas:
+            logging.info(f"📤 {enviadas} escrituras enviadas a Google Sheets en lote")
+        return enviadas
+    finally:
+        _lock_envio.release()
+
+def _descartar_agotadas(escrituras):
+    """Saca de la cola las escrituras que ya fallaron MAX_INTENTOS_ENVIO veces"""
+    agotadas = [e for e in escrituras if e["intentos"] + 1 >= MAX_INTENTOS_ENVIO]
+    for e in agotadas:
+        logging.error(f"🗑️  Escritura descartada tras {MAX_INTENTOS_ENVIO} intentos: "
+                      f"{e['hoja']}!{e['rango']} → {e['valores']}")
+    estado_db.borrar_escrituras([e["id"] for e in agotadas])
+
+# ═════════════════════════════════════════════════════════════
+# FLUSH PERIÓDICO Y AL SALIR
+# ═════════════════════════════════════════════════════════════
+
+def _bucle_flush():
+    while not _detener.wait(min(5, INTERVALO_FLUSH_SEGUNDOS)):
+        if time.monotonic() - _ultimo_flush < INTERVALO_FLUSH_SEGUNDOS:
+            continue
+        try:
+            flush()
+        except Exception as e:
+            logging.error(f"❌ Error en flush periódico de Sheets: {e}")
+        finally:
+            estado_db.cerrar()  # Conexión SQLite propia de este hilo
+
+def _iniciar_hilo():
+    global _hilo
+    if _hilo is None or not _hilo.is_alive():
+        _hilo = threading.Thread(target=_bucle_flush, name="escritor_sheets", daemon=True)
+        _hilo.start()
+
+def cerrar():
+    """Detiene el hilo periódico y envía lo que quede (se llama también al salir)"""
+    _detener.set()
+    try:
+        flush()
+    except Exception as e:
+        logging.error(f"❌ Error en flush final de Sheets: {e}")
+
+atexit.register(cerrar)
@@ -0,0 +1,329 @@
+"""
+Esperas por condición para el portal RUNT
+=========================================
+procesar_consulta_interno dormía tiempos fijos (4s tras cargar, 0.5-2s entre
+pasos, sondeo de 1s en la detección de errores). Aquí cada paso espera una
+condición explícita con su propio presupuesto de tiempo:
+
+- Angular estable (getAllAngularTestabilities().whenStable)
+- Red inactiva (XHR / fetch en curso = 0 durante RED_INACTIVA_MS)
+- Modal swal2 visible / modales cerrados
+- Filas mat-row de las tablas SOAT / RTM
+
+Los time.sleep que quedan son PAUSAS_MINIMAS ajustadas (animaciones, scroll),
+no esperas a ciegas. Si una condición no se cumple dentro de su presupuesto,
+la función devuelve False / None y el flujo sigue como antes.
+"""
+
+import logging
+import time
+
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+# ═════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═════════════════════════════════════════════════════════════
+
+# Tiempo máximo (segundos) por paso
+PRESUPUESTOS = {
+    "carga_pagina": 15,
+    "angular": 8,
+    "red": 8,
+    "formulario": 10,
+    "imagen_captcha": 5,
+    "refresco_captcha": 5,
+    "respuesta_consulta": 10,
+    "texto_modal": 2,
+    "cierre_modal": 3,
+    "panel": 5,
+    "filas_tabla": 6,
+}
+
+# Pausas mínimas (segundos) que se mantienen aunque la condición ya se cumpla
+PAUSAS_MINIMAS = {
+    "tras_carga": 0.3,      # El formulario pinta antes de enlazar los controles
+    "tras_scroll": 0.2,     # scrollIntoView suave antes de una captura
+    "tras_limpiar": 0.1,
+    "tecla": 0.05,          # Entre caracteres de placa / cédula
+    "tecla_captcha": 0.1,   # Entre caracteres del captcha
+    "antes_consultar": 0.3,
+    "animacion_panel": 0.3, # Expansión de mat-expansion-panel
+    "tras_click": 0.2,
+}
+
+INTERVALO_SONDEO = 0.1     # Cada cuánto WebDriverWait revisa la condición
+RED_INACTIVA_MS = 300      # Tiempo sin peticiones para considerar la red inactiva
+TIMEOUT_SCRIPT_SELENIUM = 30  # Script timeout por defecto de Selenium (si el driver no informa el actual)
+
+URL_CONSULTA = "https://portalpublico.runt.gov.co/#/consulta-vehiculo/consulta/consulta-ciudadana"
+
+SELECTOR_MODAL_SWAL = "div.swal2-popup"
+XPATH_RESULTADOS = "//button[contains(., 'Otra consulta')] | //mat-expansion-panel-header"
+
+# Cuenta las peticiones XHR / fetch en curso. Se instala con CDP antes de que
+# cargue la página (instalar_monitor_red) o, si no, en la primera espera.
+_SCRIPT_MONITOR_RED = """
+if (!window.__monitorRed) {
+    var red = window.__monitorRed = {activas: 0, ultimo: Date.now()};
+    var fin = function () { red.activas = Math.max(0, red.activas - 1); red.ultimo = Date.now(); };
+    var enviar = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        red.activas++; red.ultimo = Date.now();
+        this.addEventListener('loadend', fin);
+        return enviar.apply(this, arguments);
+    };
+    if (window.fetch) {
+        var fetchOriginal = window.fetch;
+        window.fetch = function () {
+            red.activas++; red.ultimo = Date.now();
+            return fetchOriginal.apply(this, arguments).finally(fin);
+        };
+    }
+}
+"""
+
+_SCRIPT_ESTADO_RED = _SCRIPT_MONITOR_RED + """
+return [window.__monitorRed.activas, Date.now() - window.__monitorRed.ultimo,
+        performance.getEntriesByType('resource').length];
+"""
+
+_SCRIPT_ANGULAR_ESTABLE = """
+var listo = arguments[arguments.length - 1];
+try {
+    if (!window.getAllAngularTestabilities) { listo(document.readyState === 'complete'); return; }
+    var testabilities = window.getAllAngularTestabilities();
+    var pendientes = testabilities.length;
+    if (!pendientes) { listo(true); return; }
+    testabilities.forEach(function (t) {
+        t.whenStable(function () { if (--pendientes === 0) { listo(true); } });
+    });
+} catch (e) { listo(false); }
+"""
+
+
+def pausa(nombre):
+    """Duerme la pausa mínima configurada para ese paso"""
+    segundos = PAUSAS_MINIMAS.get(nombre, 0)
+    if segundos > 0:
+        time.sleep(segundos)
+
+def _espera(driver, paso, timeout=None):
+    # Angular re-renderiza el DOM entre sondeos: un elemento obsoleto se reintenta, no aborta la espera
+    return WebDriverWait(driver, timeout if timeout is not None else PRESUPUESTOS[paso],
+                         poll_frequency=INTERVALO_SONDEO,
+                         ignored_exceptions=(StaleElementReferenceException,))
+
+# ═════════════════════════════════════════════════════════════
+# PÁGINA, ANGULAR Y RED
+# ═════════════════════════════════════════════════════════════
+
+def instalar_monitor_red(driver):
+    """Registra el contador de peticiones para cada documento nuevo (CDP)"""
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": _SCRIPT_MONITOR_RED})
+    except Exception as e:
+        logging.warning(f"⚠️ Monitor de red no instalado por CDP ({e}), se inyecta al esperar")
+
+def esperar_documento_listo(driver, timeout=None):
+    try:
+        _espera(driver, "carga_pagina", timeout).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
+        )
+        return True
+    except TimeoutException:
+        logging.warning("⏱️ document.readyState no llegó a 'complete' dentro del presupuesto")
+        return False
+
+def esperar_angular_estable(driver, timeout=None):
+    """True cuando Angular no tiene tareas pendientes (zona estable)"""
+    limite = timeout if timeout is not None else PRESUPUESTOS["angular"]
+    try:
+        anterior = driver.timeouts.script
+    except (AttributeError, WebDriverException):
+        anterior = TIMEOUT_SCRIPT_SELENIUM
+
+    try:
+        driver.set_script_timeout(limite)
+        return bool(driver.execute_async_script(_SCRIPT_ANGULAR_ESTABLE))
+    except (TimeoutException, WebDriverException):
+        # Un setInterval de la página puede impedir que la zona quede estable
+        logging.warning(f"⏱️ Angular no quedó estable en {limite}s, se continúa")
+        return False
+    finally:
+        # El script timeout es de toda la sesión: no dejar el presupuesto de Angular a los demás execute_async_script
+        try:
+            driver.set_script_timeout(anterior)
+        except WebDriverException:
+            pass
+
+def esperar_red_inactiva(driver, timeout=None, inactiva_ms=RED_INACTIVA_MS):
+    """True cuando no hay XHR / fetch en curso ni recursos nuevos durante inactiva_ms"""
+    recursos_previos = None
+
+    def _inactiva(d):
+        nonlocal recursos_previos
+        activas, ms_desde_ultimo, recursos = d.execute_script(_SCRIPT_ESTADO_RED)
+        estable = recursos == recursos_previos
+        recursos_previos = recursos
+        return activas == 0 and ms_desde_ultimo >= inactiva_ms and estable
+
+    try:
+        _espera(driver, "red", timeout).until(_inactiva)
+        return True
+    except TimeoutException:
+        logging.warning("⏱️ La red no quedó inactiva dentro del presupuesto, se continúa")
+        return False
+
+def esperar_formulario_listo(driver, timeout=None):
+    """Tras driver.get: documento cargado, Angular estable y campo placa clickeable"""
+    inicio = time.monotonic()
+    esperar_documento_listo(driver)
+    esperar_angular_estable(driver)
+    try:
+        _espera(driver, "formulario", timeout).until(
+            EC.element_to_be_clickable((By.CSS_SELECTOR, 'input[formcontrolname="placa"]'))
+        )
+        listo = True
+    except TimeoutException:
+        logging.warning("⏱️ El formulario de consulta no quedó listo dentro del presupuesto")
+        listo = False
+    pausa("tras_carga")
+    logging.info(f"⏱️ Formulario listo en {time.monotonic() - inicio:.1f}s")
+    return listo
+
+def cargar_formulario(driver, url=URL_CONSULTA):
+    """driver.get + espera por condición (reemplaza el sleep(4) fijo)"""
+    driver.get(url)
+    return esperar_formulario_listo(driver)
+
+# ═════════════════════════════════════════════════════════════
+# CAPTCHA Y RESPUESTA DE LA CONSULTA
+# ═════════════════════════════════════════════════════════════
+
+def esperar_imagen_cargada(driver, elemento, timeout=None):
+    """True cuando la <img> terminó de descargarse y tiene tamaño"""
+    try:
+        _espera(driver, "imagen_captcha", timeout).until(
+            lambda d: d.execute_script(
+                "return arguments[0].complete && arguments[0].naturalWidth > 0;", elemento
+            )
+        )
+        return True
+    except TimeoutException:
+        logging.warning("⏱️ La imagen del captcha no terminó de cargar")
+        return False
+
+def esperar_captcha_nuevo(driver, xpath_imagen, src_anterior, timeout=None):
+    """True cuando la <img> del captcha cambió de src y la nueva ya cargó"""
+    script = """
+        var img = document.evaluate(arguments[0], document, null,
+                                    XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        return !!img && img.src !== arguments[1] && img.complete && img.naturalWidth > 0;
+    """
+    try:
+        _espera(driver, "refresco_captcha", timeout).until(
+            lambda d: d.execute_script(script, xpath_imagen, src_anterior)
+        )
+        return True
+    except TimeoutException:
+        logging.warning("⏱️ El captcha no cambió tras pedir uno nuevo")
+        return False
+
+def esperar_respuesta_consulta(driver, timeout=None):
+    """
+    Tras clickear 'Consultar' espera lo primero que ocurra:
+    - "modal": apareció un swal2 (captcha incorrecto, sin personas, etc.)
+    - "resultado": se pintaron los paneles de resultado / botón 'Otra consulta'
+    - None: ninguna de las dos dentro del presupuesto
+    """
+    inicio = time.monotonic()
+
+    def _respuesta(d):
+        modales = [m for m in d.find_elements(By.CSS_SELECTOR, SELECTOR_MODAL_SWAL) if m.is_displayed()]
+        if modales:
+            return "modal"
+        if any(e.is_displayed() for e in d.find_elements(By.XPATH, XPATH_RESULTADOS)):
+            return "resultado"
+        return False
+
+    try:
+        respuesta = _espera(driver, "respuesta_consulta", timeout).until(_respuesta)
+    except TimeoutException:
+        respuesta = None
+    logging.info(f"⏱️ Respuesta del servidor ({respuesta or 'sin cambios'}) en {time.monotonic() - inicio:.1f}s")
+    return respuesta
+
+def esperar_texto_modal(driver, timeout=None):
+    """Texto del swal2 en cuanto deja de estar vacío (None si no aparece)"""
+    def _texto(d):
+        elementos = d.find_elements(By.CSS_SELECTOR, "div.swal2-html-container")
+        texto = elementos[0].text.strip() if elementos else ""
+        return texto or False
+
+    try:
+        return _espera(driver, "texto_modal", timeout).until(_texto)
+    except TimeoutException:
+        return None
+
+def esperar_modales_cerrados(driver, selectores_css, timeout=None):
+    """True cuando ningún elemento de esos selectores está visible"""
+    def _cerrados(d):
+        for selector in selectores_css:
+            if any(e.is_displayed() for e in d.find_elements(By.CSS_SELECTOR, selector)):
+                return False
+        return True
+
+    try:
+        _espera(driver, "cierre_modal", timeout).until(_cerrados)
+        return True
+    except TimeoutException:
+        return False
+
+# ═════════════════════════════════════════════════════════════
+# PANELES Y TABLAS (ANGULAR MATERIAL)
+# ═════════════════════════════════════════════════════════════
+
+def esperar_panel_expandido(driver, header, timeout=None):
+    """True cuando el mat-expansion-panel-header quedó con aria-expanded='true'"""
+    try:
+        _espera(driver, "panel", timeout).until(lambda d: header.get_attribute("aria-expanded") == "true")
+        pausa("animacion_panel")
+        return True
+    except TimeoutException:
+        return False
+
+def esperar_paneles_cerrados(driver, timeout=None):
+    try:
+        _espera(driver, "panel", timeout).until(
+            lambda d: not d.find_elements(By.CSS_SELECTOR, 'mat-expansion-panel-header[aria-expanded="true"]')
+        )
+        return True
+    except TimeoutException:
+        return False
+
+def esperar_filas_tabla(driver, xpath_fila, xpath_sin_datos=None, timeout=None):
+    """
+    Espera la primera mat-row visible.
+
+    Si se da xpath_sin_datos (ej: mensaje 'No se encontró información'), vuelve
+    en cuanto aparezca en lugar de agotar el presupuesto.
+
+    Returns:
+        El WebElement de la fila, o None (sin datos / tiempo agotado)
+    """
+    def _fila_o_vacio(d):
+        filas = [f for f in d.find_elements(By.XPATH, xpath_fila) if f.is_displayed()]
+        if filas:
+            return filas[0]
+        if xpath_sin_datos and any(e.is_displayed() for e in d.find_elements(By.XPATH, xpath_sin_datos)):
+            return "sin_datos"
+        return False
+
+    try:
+        resultado = _espera(driver, "filas_tabla", timeout).until(_fila_o_vacio)
+    except TimeoutException:
+        return None
+    return None if resultado == "sin_datos" else resultado
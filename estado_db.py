@@ -0,0 +1,438 @@
+"""
+Estado compartido en SQLite para los bots RUNT
+==============================================
+Reemplaza los archivos JSON de estado de cada script:
+- Runt.py                       → proceso "runt"
+- Runt_Actualizar_Vigencias.py  → procesos "vigencias_soat" / "vigencias_tecnomecanica" / "vigencias"
+- Verificador_Fallos.py         → proceso "verificacion"
+
+Una sola base (estado_runt.db) en modo WAL: varios procesos pueden leer y
+escribir a la vez sin pisarse, y cada consulta por placa/cédula usa índices
+en lugar de recorrer un JSON completo.
+
+Tablas:
+- placas:          una fila por placa vista (cédulas asociadas)
+- intentos:        una fila por cada intento/consulta (historial)
+- resultados:      estado actual de cada placa por proceso (Exitoso, Pendiente, ...)
+- datos_extraidos: último SOAT / RTM / datos del vehículo extraídos por placa
+- metadatos:       contadores y valores sueltos por proceso (índice actual, ciclos...)
+- escrituras_sheets: cola de escrituras a Google Sheets aún no enviadas (escritor_sheets.py)
+- cursores_carga / filas_carga: copia local de las hojas de entrada (carga_incremental.py)
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# ═════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═════════════════════════════════════════════════════════════
+
+DB_FILE = Path(__file__).parent / "estado_runt.db"
+
+TIMEOUT_BLOQUEO_SEGUNDOS = 30  # Espera máxima si otro proceso tiene la base bloqueada
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS placas (
+    placa               TEXT PRIMARY KEY,
+    cedula_asociado     TEXT,
+    cedula_propietario  TEXT,
+    primera_vez         TEXT NOT NULL,
+    actualizado         TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_placas_cedula_asociado ON placas(cedula_asociado);
+CREATE INDEX IF NOT EXISTS idx_placas_cedula_propietario ON placas(cedula_propietario);
+
+CREATE TABLE IF NOT EXISTS intentos (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    proceso     TEXT NOT NULL,
+    placa       TEXT NOT NULL,
+    cedula      TEXT,
+    status      TEXT NOT NULL,
+    indice      INTEGER,
+    total       INTEGER,
+    timestamp   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_intentos_placa ON intentos(placa);
+CREATE INDEX IF NOT EXISTS idx_intentos_cedula ON intentos(cedula);
+CREATE INDEX IF NOT EXISTS idx_intentos_proceso ON intentos(proceso, id);
+
+CREATE TABLE IF NOT EXISTS resultados (
+    proceso     TEXT NOT NULL,
+    placa       TEXT NOT NULL,
+    cedula      TEXT,
+    estado      TEXT NOT NULL,
+    detalle     TEXT,
+    actualizado TEXT NOT NULL,
+    PRIMARY KEY (proceso, placa)
+);
+CREATE INDEX IF NOT EXISTS idx_resultados_estado ON resultados(proceso, estado);
+CREATE INDEX IF NOT EXISTS idx_resultados_cedula ON resultados(cedula);
+
+CREATE TABLE IF NOT EXISTS datos_extraidos (
+    placa       TEXT NOT NULL,
+    tipo        TEXT NOT NULL,  -- "vehiculo", "soat" o "rtm"
+    cedula      TEXT,
+    datos       TEXT NOT NULL,
+    actualizado TEXT NOT NULL,
+    PRIMARY KEY (placa, tipo)
+);
+CREATE INDEX IF NOT EXISTS idx_datos_cedula ON datos_extraidos(cedula);
+
+CREATE TABLE IF NOT EXISTS metadatos (
+    proceso TEXT NOT NULL,
+    clave   TEXT NOT NULL,
+    valor   TEXT,
+    PRIMARY KEY (proceso, clave)
+);
+
+CREATE TABLE IF NOT EXISTS escrituras_sheets (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    origen      TEXT NOT NULL,
+    sheet_id    TEXT NOT NULL,
+    hoja        TEXT NOT NULL,
+    rango       TEXT NOT NULL,
+    valores     TEXT NOT NULL,
+    intentos    INTEGER NOT NULL DEFAULT 0,
+    creado      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_escrituras_origen ON escrituras_sheets(origen, id);
+
+CREATE TABLE IF NOT EXISTS cursores_carga (
+    sheet_id    TEXT NOT NULL,
+    hoja        TEXT NOT NULL,
+    rango       TEXT NOT NULL,
+    version     TEXT,
+    modificado  TEXT,
+    actualizado TEXT NOT NULL,
+    PRIMARY KEY (sheet_id, hoja)
+);
+
+CREATE TABLE IF NOT EXISTS filas_carga (
+    sheet_id    TEXT NOT NULL,
+    hoja        TEXT NOT NULL,
+    fila        INTEGER NOT NULL,
+    hash        TEXT NOT NULL,
+    valores     TEXT NOT NULL,
+    PRIMARY KEY (sheet_id, hoja, fila)
+);
+"""
+
+_local = threading.local()
+
+# ═════════════════════════════════════════════════════════════
+# CONEXIÓN
+# ═════════════════════════════════════════════════════════════
+
+def conectar():
+    """Devuelve la conexión SQLite del hilo actual (una por hilo, reutilizada)"""
+    conexion = getattr(_local, "conexion", None)
+    if conexion is not None:
+        return conexion
+
+    conexion = sqlite3.connect(str(DB_FILE), timeout=TIMEOUT_BLOQUEO_SEGUNDOS, isolation_level=None)
+    conexion.row_factory = sqlite3.Row
+    conexion.execute("PRAGMA journal_mode=WAL")
+    conexion.execute("PRAGMA synchronous=NORMAL")
+    conexion.execute(f"PRAGMA busy_timeout={TIMEOUT_BLOQUEO_SEGUNDOS * 1000}")
+    conexion.executescript(ESQUEMA)
+
+    _local.conexion = conexion
+    logging.debug(f"🗄️  Base de estado abierta: {DB_FILE}")
+    return conexion
+
+def cerrar():
+    """Cierra la conexión del hilo actual"""
+    conexion = getattr(_local, "conexion", None)
+    if conexion is not None:
+        conexion.close()
+        _local.conexion = None
+
+class _Transaccion:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK sobre la conexión del hilo"""
+
+    def __enter__(self):
+        self.conexion = conectar()
+        self.conexion.execute("BEGIN IMMEDIATE")
+        return self.conexion
+
+    def __exit__(self, tipo_error, error, traza):
+        if tipo_error is None:
+            self.conexion.execute("COMMIT")
+        else:
+            self.conexion.execute("ROLLBACK")
+        return False
+
+def transaccion():
+    """Agrupa varias escrituras en una sola transacción"""
+    return _Transaccion()
+
+def _ahora():
+    return datetime.now().isoformat()
+
+# ═════════════════════════════════════════════════════════════
+# ESCRITURA
+# ═════════════════════════════════════════════════════════════
+
+def registrar_placa(conexion, placa, cedula_asociado=None, cedula_propietario=None):
+    """Inserta o actualiza la placa con sus cédulas (sin borrar las ya conocidas)"""
+    ahora = _ahora()
+    conexion.execute(
+        """
+        INSERT INTO placas (placa, cedula_asociado, cedula_propietario, primera_vez, actualizado)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(placa) DO UPDATE SET
+            cedula_asociado    = COALESCE(excluded.cedula_asociado, placas.cedula_asociado),
+            cedula_propietario = COALESCE(excluded.cedula_propietario, placas.cedula_propietario),
+            actualizado        = excluded.actualizado
+        """,
+        (placa, cedula_asociado, cedula_propietario, ahora, ahora)
+    )
+
+def guardar_datos_extraidos(conexion, placa, cedula, datos_vehiculo=None, datos_soat=None, datos_rtm=None):
+    """Guarda los últimos datos extraídos (vehículo / SOAT / RTM) de la placa"""
+    ahora = _ahora()
+    for tipo, datos in (("vehiculo", datos_vehiculo), ("soat", datos_soat), ("rtm", datos_rtm)):
+        if not datos:
+            continue
+        conexion.execute(
+            """
+            INSERT INTO datos_extraidos (placa, tipo, cedula, datos, actualizado)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(placa, tipo) DO UPDATE SET
+                cedula = excluded.cedula, datos = excluded.datos, actualizado = excluded.actualizado
+            """,
+            (placa, tipo, cedula, json.dumps(datos, ensure_ascii=False), ahora)
+        )
+
+def actualizar_resultado(proceso, placa, estado, cedula=None, detalle=None, conexion=None):
+    """Fija el estado actual de la placa para el proceso"""
+    conexion = conexion or conectar()
+    conexion.execute(
+        """
+        INSERT INTO resultados (proceso, placa, cedula, estado, detalle, actualizado)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(proceso, placa) DO UPDATE SET
+            cedula      = COALESCE(excluded.cedula, resultados.cedula),
+            estado      = excluded.estado,
+            detalle     = COALESCE(excluded.detalle, resultados.detalle),
+            actualizado = excluded.actualizado
+        """,
+        (proceso, placa, cedula, estado,
+         json.dumps(detalle, ensure_ascii=False) if detalle is not None else None, _ahora())
+    )
+
+def registrar_intento(proceso, cedula, placa, status, estado_resultado=None, indice=None, total=None,
+                      detalle=None, datos_vehiculo=None, datos_soat=None, datos_rtm=None,
+                      cedula_propietario=None):
+    """
+    Registra un intento completo en una sola transacción:
+    historial (intentos) + placa + estado actual (resultados) + datos extraídos
+    """
+    with transaccion() as conexion:
+        conexion.execute(
+            "INSERT INTO intentos (proceso, placa, cedula, status, indice, total, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (proceso, placa, cedula, status, indice, total, _ahora())
+        )
+        registrar_placa(conexion, placa, cedula, cedula_propietario)
+        if estado_resultado:
+            actualizar_resultado(proceso, placa, estado_resultado, cedula, detalle, conexion=conexion)
+        guardar_datos_extraidos(conexion, placa, cedula, datos_vehiculo, datos_soat, datos_rtm)
+
+def guardar_meta(proceso, clave, valor, conexion=None):
+    """Guarda un valor suelto (serializado en JSON) para el proceso"""
+    conexion = conexion or conectar()
+    conexion.execute(
+        "INSERT INTO metadatos (proceso, clave, valor) VALUES (?, ?, ?) "
+        "ON CONFLICT(proceso, clave) DO UPDATE SET valor = excluded.valor",
+        (proceso, clave, json.dumps(valor, ensure_ascii=False))
+    )
+
+def incrementar_meta(proceso, clave, cantidad=1):
+    """Suma `cantidad` a un contador numérico del proceso (atómico)"""
+    with transaccion() as conexion:
+        actual = obtener_meta(proceso, clave, 0, conexion=conexion) or 0
+        guardar_meta(proceso, clave, actual + cantidad, conexion=conexion)
+        return actual + cantidad
+
+def borrar_proceso(proceso):
+    """Elimina resultados, intentos y metadatos de un proceso (reinicio de estado)"""
+    with transaccion() as conexion:
+        conexion.execute("DELETE FROM resultados WHERE proceso = ?", (proceso,))
+        conexion.execute("DELETE FROM intentos WHERE proceso = ?", (proceso,))
+        conexion.execute("DELETE FROM metadatos WHERE proceso = ?", (proceso,))
+
+# ═════════════════════════════════════════════════════════════
+# COLA DE ESCRITURAS A GOOGLE SHEETS
+# ═════════════════════════════════════════════════════════════
+
+def encolar_escritura(origen, sheet_id, hoja, rango, valores):
+    """Guarda una escritura pendiente (rango A1 + filas) y devuelve su id"""
+    cursor = conectar().execute(
+        "INSERT INTO escrituras_sheets (origen, sheet_id, hoja, rango, valores, creado) VALUES (?, ?, ?, ?, ?, ?)",
+        (origen, sheet_id, hoja, rango, json.dumps(valores, ensure_ascii=False), _ahora())
+    )
+    return cursor.lastrowid
+
+def escrituras_pendientes(origen, sheet_id=None, hoja=None):
+    """Escrituras pendientes del origen en orden de llegada (opcionalmente de una hoja)"""
+    consulta = "SELECT * FROM escrituras_sheets WHERE origen = ?"
+    parametros = [origen]
+    if sheet_id is not None:
+        consulta += " AND sheet_id = ?"
+        parametros.append(sheet_id)
+    if hoja is not None:
+        consulta += " AND hoja = ?"
+        parametros.append(hoja)
+    filas = conectar().execute(consulta + " ORDER BY id", parametros).fetchall()
+
+    pendientes = []
+    for fila in filas:
+        escritura = dict(fila)
+        escritura["valores"] = json.loads(escritura["valores"])
+        pendientes.append(escritura)
+    return pendientes
+
+def borrar_escrituras(ids):
+    """Quita de la cola las escrituras ya enviadas"""
+    if not ids:
+        return
+    with transaccion() as conexion:
+        conexion.executemany("DELETE FROM escrituras_sheets WHERE id = ?", [(i,) for i in ids])
+
+def sumar_intento_escrituras(ids):
+    """Cuenta un envío fallido para esas escrituras"""
+    if not ids:
+        return
+    with transaccion() as conexion:
+        conexion.executemany("UPDATE escrituras_sheets SET intentos = intentos + 1 WHERE id = ?",
+                             [(i,) for i in ids])
+
+# ═════════════════════════════════════════════════════════════
+# COPIA LOCAL DE HOJAS DE ENTRADA (CARGA INCREMENTAL)
+# ═════════════════════════════════════════════════════════════
+
+def obtener_cursor_carga(sheet_id, hoja):
+    """
+    Cursor guardado de la hoja o None: rango descargado, version = hash de las
+    columnas clave leídas, modificado = modifiedTime de Drive (solo hojas de solo lectura)
+    """
+    fila = conectar().execute(
+        "SELECT * FROM cursores_carga WHERE sheet_id = ? AND hoja = ?", (sheet_id, hoja)
+    ).fetchone()
+    return dict(fila) if fila else None
+
+def filas_cargadas(sheet_id, hoja):
+    """{numero_fila: (hash, valores)} de la copia local de la hoja"""
+    filas = conectar().execute(
+        "SELECT fila, hash, valores FROM filas_carga WHERE sheet_id = ? AND hoja = ? ORDER BY fila",
+        (sheet_id, hoja)
+    ).fetchall()
+    return {fila["fila"]: (fila["hash"], json.loads(fila["valores"])) for fila in filas}
+
+def guardar_carga(sheet_id, hoja, rango, version, modificado, filas_cambiadas, total_filas):
+    """
+    Actualiza la copia local: escribe solo las filas cambiadas, borra las que
+    ya no existen (más allá de total_filas) y guarda el nuevo cursor.
+
+    filas_cambiadas: [(numero_fila, hash, valores), ...]
+    modificado: modifiedTime de Drive con el que se leyó (None si no se usa como sonda)
+    """
+    with transaccion() as conexion:
+        conexion.executemany(
+            """
+            INSERT INTO filas_carga (sheet_id, hoja, fila, hash, valores) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(sheet_id, hoja, fila) DO UPDATE SET hash = excluded.hash, valores = excluded.valores
+            """,
+            [(sheet_id, hoja, numero, hash_fila, json.dumps(valores, ensure_ascii=False))
+             for numero, hash_fila, valores in filas_cambiadas]
+        )
+        conexion.execute(
+            "DELETE FROM filas_carga WHERE sheet_id = ? AND hoja = ? AND fila > ?", (sheet_id, hoja, total_filas)
+        )
+        conexion.execute(
+            """
+            INSERT INTO cursores_carga (sheet_id, hoja, rango, version, modificado, actualizado)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(sheet_id, hoja) DO UPDATE SET
+                rango = excluded.rango, version = excluded.version,
+                modificado = excluded.modificado, actualizado = excluded.actualizado
+            """,
+            (sheet_id, hoja, rango, version, modificado, _ahora())
+        )
+
+# ═════════════════════════════════════════════════════════════
+# LECTURA (CONSULTAS INDEXADAS)
+# ═════════════════════════════════════════════════════════════
+
+def _fila_resultado(fila):
+    resultado = dict(fila)
+    resultado["detalle"] = json.loads(resultado["detalle"]) if resultado["detalle"] else {}
+    return resultado
+
+def obtener_resultado(proceso, placa):
+    """Estado actual de una placa en el proceso (dict) o None si nunca se procesó"""
+    fila = conectar().execute(
+        "SELECT * FROM resultados WHERE proceso = ? AND placa = ?", (proceso, placa)
+    ).fetchone()
+    return _fila_resultado(fila) if fila else None
+
+def estado_placa(proceso, placa):
+    """Solo el texto del estado ('Exitoso', 'Pendiente', ...) o None"""
+    fila = conectar().execute(
+        "SELECT estado FROM resultados WHERE proceso = ? AND placa = ?", (proceso, placa)
+    ).fetchone()
+    return fila["estado"] if fila else None
+
+def placas_con_estado(proceso, estado):
+    """Lista de placas del proceso con ese estado (usa idx_resultados_estado)"""
+    filas = conectar().execute(
+        "SELECT placa FROM resultados WHERE proceso = ? AND estado = ? ORDER BY placa", (proceso, estado)
+    ).fetchall()
+    return [fila["placa"] for fila in filas]
+
+def resumen_placas(proceso):
+    """{placa: estado} de todo el proceso"""
+    filas = conectar().execute(
+        "SELECT placa, estado FROM resultados WHERE proceso = ?", (proceso,)
+    ).fetchall()
+    return {fila["placa"]: fila["estado"] for fila in filas}
+
+def resultados_por_cedula(cedula):
+    """Todos los resultados (de cualquier proceso) asociados a una cédula"""
+    filas = conectar().execute(
+        "SELECT * FROM resultados WHERE cedula = ? ORDER BY actualizado", (cedula,)
+    ).fetchall()
+    return [_fila_resultado(fila) for fila in filas]
+
+def contar_intentos(proceso):
+    """Cantidad de intentos registrados por el proceso"""
+    return conectar().execute(
+        "SELECT COUNT(*) FROM intentos WHERE proceso = ?", (proceso,)
+    ).fetchone()[0]
+
+def obtener_datos_extraidos(placa, tipo):
+    """Últimos datos extraídos de la placa para 'vehiculo', 'soat' o 'rtm'"""
+    fila = conectar().execute(
+        "SELECT datos FROM datos_extraidos WHERE placa = ? AND tipo = ?", (placa, tipo)
+    ).fetchone()
+    return json.loads(fila["datos"]) if fila else None
+
+def obtener_meta(proceso, clave, defecto=None, conexion=None):
+    """Lee un valor suelto del proceso"""
+    conexion = conexion or conectar()
+    fila = conexion.execute(
+        "SELECT valor FROM metadatos WHERE proceso = ? AND clave = ?", (proceso, clave)
+    ).fetchone()
+    return json.loads(fila["valor"]) if fila and fila["valor"] is not None else defecto
+
+def proceso_vacio(proceso):
+    """True si el proceso todavía no tiene nada guardado (para migrar JSON antiguos)"""
+    conexion = conectar()
+    for tabla in ("resultados", "metadatos"):
+        if conexion.execute(f"SELECT 1 FROM {tabla} WHERE proceso = ? LIMIT 1", (proceso,)).fetchone():
+            return False
+    return True
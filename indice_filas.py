@@ -0,0 +1,149 @@
+"""
+Índice en memoria clave → número de fila para hojas de Google Sheets
+====================================================================
+Evita descargar la hoja completa (get_all_values) en cada upsert:
+
+- Se construye UNA vez por ejecución leyendo SOLO las columnas clave
+  (más la columna A para saber cuál es la última fila ocupada)
+- Se mantiene al día con cada fila agregada o actualizada por este proceso
+- Se revalida barato (misma lectura de columnas clave) cada
+  REVALIDAR_CADA_SEGUNDOS, por si otro proceso editó la hoja
+- Antes de releer se envía la cola de escritor_sheets; si no se pudo
+  enviar, la revalidación se posterga (las filas reservadas aún no están
+  en la hoja y se reasignarían)
+
+Claves usadas:
+- "Datos Runt":  placa (columna C)
+- "Resultados":  cédula asociado + placa (columnas A y C)
+"""
+
+import logging
+import threading
+import time
+
+import escritor_sheets
+import sheets_session
+
+# ═════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═════════════════════════════════════════════════════════════
+
+REVALIDAR_CADA_SEGUNDOS = 300  # Releer columnas clave cada 5 minutos
+
+_indices = {}  # {(sheet_id, nombre, columnas_clave): IndiceFilas}
+_lock = threading.Lock()
+
+
+def normalizar_clave(*valores):
+    """Normaliza los valores de la clave (sin espacios, en mayúsculas)"""
+    return tuple(str(valor).strip().upper() for valor in valores)
+
+# ═════════════════════════════════════════════════════════════
+# ÍNDICE
+# ═════════════════════════════════════════════════════════════
+
+class IndiceFilas:
+    """Mapa clave → fila (1-indexada) de una hoja, construido desde las columnas clave"""
+
+    def __init__(self, sheet_id, nombre, columnas_clave, primera_fila_datos=2, fila_minima_nueva=2):
+        """
+        Args:
+            columnas_clave: columnas (1-indexadas) que forman la clave, ej: (3,) o (1, 3)
+            primera_fila_datos: primera fila donde se busca (saltando encabezados)
+            fila_minima_nueva: nunca se crea una fila nueva antes de esta
+        """
+        self.sheet_id = sheet_id
+        self.nombre = nombre
+        self.columnas_clave = tuple(columnas_clave)
+        self.primera_fila_datos = primera_fila_datos
+        self.fila_minima_nueva = fila_minima_nueva
+
+        self._filas = {}
+        self._ultima_fila = 0
+        self._construido_en = None
+        self._lock = threading.RLock()
+
+    @property
+    def worksheet(self):
+        return sheets_session.obtener_worksheet(self.sheet_id, self.nombre)
+
+    def construir(self):
+        """Lee SOLO las columnas clave (+ columna A) en una sola llamada y arma el índice"""
+        with self._lock:
+            columnas = sorted(set(self.columnas_clave) | {1})
+            rangos = [f"{escritor_sheets.columna_a_letra(c)}:{escritor_sheets.columna_a_letra(c)}" for c in columnas]
+            respuesta = escritor_sheets.con_reintentos(self.worksheet.batch_get, rangos, major_dimension="COLUMNS")
+
+            valores_por_columna = {}
+            for columna, valor_rango in zip(columnas, respuesta):
+                valores_por_columna[columna] = list(valor_rango[0]) if valor_rango else []
+
+            self._ultima_fila = max((len(v) for v in valores_por_columna.values()), default=0)
+            self._filas = {}
+
+            for numero_fila in range(self.primera_fila_datos, self._ultima_fila + 1):
+                partes = []
+                for columna in self.columnas_clave:
+                    valores = valores_por_columna[columna]
+                    partes.append(valores[numero_fila - 1] if numero_fila - 1 < len(valores) else "")
+                if not all(str(p).strip() for p in partes):
+                    continue
+                # Si la clave está repetida, gana la PRIMERA fila (como el recorrido lineal original)
+                self._filas.setdefault(normalizar_clave(*partes), numero_fila)
+
+            self._construido_en = time.monotonic()
+            logging.info(f"🗂️  Índice '{self.nombre}': {len(self._filas)} claves, última fila {self._ultima_fila}")
+
+    def _asegurar_vigente(self):
+        vencido = (self._construido_en is None or
+                   time.monotonic() - self._construido_en >= REVALIDAR_CADA_SEGUNDOS)
+        if not vencido:
+            return
+
+        escritor_sheets.flush()
+        if self._construido_en is not None:
+            if escritor_sheets.hay_pendientes(self.sheet_id, self.nombre):
+                logging.warning(f"⚠️ Índice '{self.nombre}': escrituras sin enviar, revalidación postergada")
+                self._construido_en = time.monotonic()
+                return
+            logging.info(f"🔄 Revalidando índice '{self.nombre}' (columnas clave)")
+        self.construir()
+
+    def invalidar(self):
+        """Fuerza reconstrucción en el próximo uso (ej: tras un error de escritura)"""
+        with self._lock:
+            self._construido_en = None
+
+    def buscar(self, *clave):
+        """Número de fila donde está la clave, o None"""
+        with self._lock:
+            self._asegurar_vigente()
+            return self._filas.get(normalizar_clave(*clave))
+
+    def reservar_fila_nueva(self, *clave):
+        """Asigna la siguiente fila libre a la clave y la registra en el índice"""
+        with self._lock:
+            self._asegurar_vigente()
+            fila_nueva = max(self._ultima_fila + 1, self.fila_minima_nueva)
+            self._ultima_fila = fila_nueva
+            self._filas.setdefault(normalizar_clave(*clave), fila_nueva)
+            return fila_nueva
+
+    def buscar_o_reservar(self, *clave):
+        """(fila, existia): fila existente de la clave o una nueva reservada"""
+        with self._lock:
+            fila = self.buscar(*clave)
+            if fila:
+                return fila, True
+            return self.reservar_fila_nueva(*clave), False
+
+
+def obtener_indice(sheet_id, nombre, columnas_clave, primera_fila_datos=2, fila_minima_nueva=2):
+    """Devuelve el índice compartido del proceso para esa hoja y columnas clave"""
+    clave = (sheet_id, nombre, tuple(columnas_clave))
+    with _lock:
+        indice = _indices.get(clave)
+        if indice is None:
+            indice = IndiceFilas(sheet_id, nombre, columnas_clave, primera_fila_datos, fila_minima_nueva)
+            _indices[clave] = indice
+        return indice
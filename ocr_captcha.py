@@ -0,0 +1,275 @@
+"""
+Backends de OCR para el captcha
+===============================
+resolver_captcha llamaba dos veces a pytesseract.image_to_string con la
+misma imagen (una solo para el log). Cada llamada lanza tesseract.exe,
+escribe archivos temporales y vuelve a cargar el modelo.
+
+Aquí el OCR queda detrás de una interfaz común:
+
+- leer(imagen) → (texto, confianza)   confianza 0..1, o None si el motor no la da
+- leer_lote([imagenes]) → [(texto, confianza), ...]   varias variantes de
+  preprocesado en una sola pasada del motor
+
+Backends registrados (obtener_backend):
+- "tesserocr":   API C de Tesseract en proceso; el modelo se carga UNA vez
+                 por proceso y se reutiliza (requiere `pip install tesserocr`)
+- "pytesseract": respaldo por subproceso; el lote se arma apilando las
+                 imágenes en una sola y se lee con UNA llamada
+- "clasificador": modelo entrenado con los captchas aceptados
+                 (clasificador_glifos.py, se registra al importarlo);
+                 solo si se pide por nombre, hasta medirlo con benchmark_captchas.py
+- "auto":        el primero disponible de ORDEN_AUTO (Tesseract)
+
+resolver_texto() es el pipeline completo de resolver_captcha (OCR →
+REEMPLAZOS → mezcla con templates) sin logs ni efectos, para poder medirlo
+fuera de línea con benchmark_captchas.py. También da la confianza del
+captcha completo, con la que Runt.py decide si vale la pena enviarlo.
+"""
+
+import logging
+import threading
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+import ocr_templates
+
+# ═════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═════════════════════════════════════════════════════════════
+
+CARACTERES_CAPTCHA = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+IDIOMA = "eng"
+SEPARACION_LOTE = 40   # Píxeles en blanco entre imágenes apiladas (pytesseract)
+
+REEMPLAZOS = {         # Confusiones fijas de Tesseract
+    "O": "0",
+    "l": "1",
+    "I": "1",
+}
+
+# "auto": el primero que se pueda inicializar. "clasificador" no entra aquí:
+# es opt-in (BACKEND_OCR = "clasificador") hasta que el benchmark lo respalde
+ORDEN_AUTO = ["tesserocr", "pytesseract"]
+
+_ruta_tesseract = None
+_backends = {}         # {nombre: clase}
+_instancias = {}       # {nombre: backend ya inicializado en este proceso}
+_no_disponibles = set()
+_lock = threading.Lock()
+
+
+def configurar(ruta_tesseract):
+    """Ruta de tesseract.exe; de ahí salen tesseract_cmd y la carpeta tessdata"""
+    global _ruta_tesseract
+    _ruta_tesseract = Path(ruta_tesseract)
+    try:
+        import pytesseract
+        pytesseract.pytesseract.tesseract_cmd = str(_ruta_tesseract)
+    except ImportError:
+        pass
+
+def registrar_backend(nombre):
+    """Decorador: agrega una clase al registro de backends"""
+    def decorador(clase):
+        _backends[nombre] = clase
+        return clase
+    return decorador
+
+def _a_pil(imagen):
+    if isinstance(imagen, Image.Image):
+        return imagen
+    return Image.fromarray(np.asarray(imagen))
+
+# ═════════════════════════════════════════════════════════════
+# BACKENDS
+# ═════════════════════════════════════════════════════════════
+
+class BackendOCR:
+    """Interfaz común; los backends implementan leer_lote"""
+
+    nombre = ""
+    corregible = True   # Lectura genérica: pasa por REEMPLAZOS y se mezcla con templates
+
+    def leer(self, imagen):
+        return self.leer_lote([imagen])[0]
+
+    def leer_lote(self, imagenes):
+        raise NotImplementedError
+
+    def cerrar(self):
+        pass
+
+
+@registrar_backend("tesserocr")
+class BackendTesserocr(BackendOCR):
+    """Tesseract en proceso: una sola instancia de PyTessBaseAPI (modelo cargado una vez)"""
+
+    nombre = "tesserocr"
+
+    def __init__(self):
+        from tesserocr import OEM, PSM, PyTessBaseAPI
+
+        opciones = {"lang": IDIOMA, "psm": PSM.SINGLE_WORD, "oem": OEM.DEFAULT}
+        if _ruta_tesseract is not None and (_ruta_tesseract.parent / "tessdata").exists():
+            opciones["path"] = str(_ruta_tesseract.parent / "tessdata")
+
+        self._api = PyTessBaseAPI(**opciones)
+        self._api.SetVariable("tessedit_char_whitelist", CARACTERES_CAPTCHA)
+        self._lock = threading.Lock()  # La API no es reentrante
+
+    def leer_lote(self, imagenes):
+        lecturas = []
+        with self._lock:
+            for imagen in imagenes:
+                self._api.SetImage(_a_pil(imagen))
+                texto = self._api.GetUTF8Text().strip()
+                lecturas.append((texto, self._api.MeanTextConf() / 100.0))
+        return lecturas
+
+    def cerrar(self):
+        self._api.End()
+
+
+@registrar_backend("pytesseract")
+class BackendPytesseract(BackendOCR):
+    """Respaldo por subproceso: UNA llamada por lote (imágenes apiladas en vertical)"""
+
+    nombre = "pytesseract"
+
+    def __init__(self):
+        import pytesseract
+        self._pytesseract = pytesseract
+        self._config_palabra = f"--oem 3 --psm 8 -c tessedit_char_whitelist={CARACTERES_CAPTCHA}"
+        self._config_bloque = f"--oem 3 --psm 6 -c tessedit_char_whitelist={CARACTERES_CAPTCHA}"
+
+    def leer_lote(self, imagenes):
+        imagenes = [_a_pil(imagen).convert("L") for imagen in imagenes]
+        if len(imagenes) == 1:
+            texto = self._pytesseract.image_to_string(imagenes[0], lang=IDIOMA, config=self._config_palabra)
+            return [(texto.strip(), None)]
+
+        ancho = max(imagen.width for imagen in imagenes)
+        alto = sum(imagen.height for imagen in imagenes) + SEPARACION_LOTE * (len(imagenes) + 1)
+        lienzo = Image.new("L", (ancho + 2 * SEPARACION_LOTE, alto), 255)
+        y = SEPARACION_LOTE
+        for imagen in imagenes:
+            lienzo.paste(imagen, (SEPARACION_LOTE, y))
+            y += imagen.height + SEPARACION_LOTE
+
+        salida = self._pytesseract.image_to_string(lienzo, lang=IDIOMA, config=self._config_bloque)
+        lineas = [linea.strip() for linea in salida.splitlines() if linea.strip()]
+        if len(lineas) == len(imagenes):
+            return [(linea.replace(" ", ""), None) for linea in lineas]
+
+        # Tesseract unió o partió líneas: no hay forma segura de repartirlas
+        logging.warning(f"⚠️ Lote OCR devolvió {len(lineas)} líneas para {len(imagenes)} imágenes, leyendo una por una")
+        return [self.leer_lote([imagen])[0] for imagen in imagenes]
+
+# ═════════════════════════════════════════════════════════════
+# REGISTRO
+# ═════════════════════════════════════════════════════════════
+
+def obtener_backend(nombre="auto"):
+    """Backend inicializado (y reutilizado) de este proceso"""
+    with _lock:
+        candidatos = [c for c in ORDEN_AUTO if c in _backends] if nombre == "auto" else [nombre]
+        for candidato in candidatos:
+            if candidato in _instancias:
+                return _instancias[candidato]
+            if candidato in _no_disponibles:
+                continue
+            if candidato not in _backends:
+                raise ValueError(f"Backend OCR desconocido: {candidato} (disponibles: {sorted(_backends)})")
+            try:
+                _instancias[candidato] = _backends[candidato]()
+                logging.info(f"🔤 Backend OCR: {candidato}")
+                return _instancias[candidato]
+            except (ImportError, RuntimeError) as e:  # Sin el paquete o sin tessdata
+                logging.warning(f"⚠️ Backend OCR '{candidato}' no disponible: {e}")
+                _no_disponibles.add(candidato)
+        raise RuntimeError(f"Ningún backend OCR disponible para '{nombre}'")
+
+def cerrar_backends():
+    with _lock:
+        for backend in _instancias.values():
+            try:
+                backend.cerrar()
+            except Exception:
+                pass
+        _instancias.clear()
+
+# ═════════════════════════════════════════════════════════════
+# PIPELINE DEL CAPTCHA
+# ═════════════════════════════════════════════════════════════
+
+def lectura_valida(texto):
+    return bool(texto) and all(c.isalnum() for c in texto)
+
+def corregir_lectura(texto):
+    return "".join(REEMPLAZOS.get(c, c) for c in texto)
+
+def resolver_texto(imagen, backend, banco=None):
+    """
+    Lee el captcha UNA vez con el backend y mezcla por carácter con los templates.
+
+    Returns:
+        {"texto": texto final o None,
+         "origen": "ocr" (con correcciones de templates), "templates" o None,
+         "ocr": lectura cruda, "confianza_ocr": 0..1 o None,
+         "corregido": lectura tras REEMPLAZOS,
+         "templates": [(caracter, confianza), ...],
+         "detalle": [(caracter, confianza_template, "template" | "externo"), ...],
+         "confianza": 0..1 del captcha completo (ver confianza_lectura)}
+    """
+    lectura = _resolver_texto(imagen, backend, banco)
+    lectura["confianza"] = confianza_lectura(lectura)
+    return lectura
+
+def confianza_lectura(lectura):
+    """
+    Confianza del captcha completo = la de su carácter más dudoso.
+
+    - Carácter puesto por template → su correlación
+    - Carácter del backend → confianza_ocr (None si el motor no la da,
+      ej: pytesseract; entonces el captcha queda sin confianza = None)
+    - Sin texto → 0.0
+    """
+    if not lectura["texto"]:
+        return 0.0
+    if not lectura["detalle"]:
+        return lectura["confianza_ocr"]
+
+    confianzas = [confianza if origen == "template" else lectura["confianza_ocr"]
+                  for _, confianza, origen in lectura["detalle"]]
+    if any(confianza is None for confianza in confianzas):
+        return None
+    return max(0.0, min(confianzas))
+
+def _resolver_texto(imagen, backend, banco):
+    texto_ocr, confianza_ocr = backend.leer(imagen) if backend is not None else ("", None)
+    corregible = backend is None or backend.corregible
+    reconocidos = banco.reconocer(np.asarray(imagen)) if banco is not None and corregible else []
+
+    lectura = {"texto": None, "origen": None, "ocr": texto_ocr, "confianza_ocr": confianza_ocr,
+               "corregido": "", "templates": reconocidos, "detalle": []}
+
+    if not corregible:
+        if lectura_valida(texto_ocr):
+            lectura["texto"] = lectura["corregido"] = texto_ocr
+            lectura["origen"] = "ocr"
+        return lectura
+
+    if lectura_valida(texto_ocr):
+        lectura["corregido"] = corregir_lectura(texto_ocr)
+        lectura["texto"], lectura["detalle"] = ocr_templates.combinar_con_texto(lectura["corregido"], reconocidos)
+        lectura["origen"] = "ocr"
+        return lectura
+
+    # El OCR no sirvió, pero los templates reconocieron todo con confianza
+    texto_templates, detalle = ocr_templates.combinar_con_texto("", reconocidos)
+    if texto_templates:
+        lectura["texto"], lectura["detalle"], lectura["origen"] = texto_templates, detalle, "templates"
+    return lectura
@@ -0,0 +1,224 @@
+"""
+Reconocimiento del captcha por templates
+========================================
+Runt.py cargaba cada PNG de templates/ con cv2.imread pero solo usaba los
+nombres (diccionario_caracteres); las imágenes nunca se comparaban.
+
+Aquí sí se usan:
+1. segmentar(): separa los glifos del captcha binarizado por proyección de
+   columnas; si dos letras quedaron pegadas se corta el segmento más ancho en
+   su mínimo de tinta hasta llegar a LONGITUD_CAPTCHA
+2. Cada glifo y cada template se recortan a su caja y se normalizan a
+   TAMANO_GLIFO x TAMANO_GLIFO (manteniendo proporción)
+3. Los templates van en UNA tira horizontal: un solo cv2.matchTemplate
+   (TM_CCOEFF_NORMED) por glifo compara contra todo el banco, tolerando
+   MARGEN_DESPLAZAMIENTO píxeles de corrimiento
+4. Se devuelve (carácter, confianza) por glifo; confianza = correlación
+   normalizada del mejor template (-1..1)
+
+Todo en proceso, unos milisegundos por captcha (sin lanzar tesseract.exe).
+El banco solo cubre los caracteres que tienen template: por debajo de
+UMBRAL_CONFIANZA el carácter no se considera reconocido.
+"""
+
+import logging
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# ═════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═════════════════════════════════════════════════════════════
+
+LONGITUD_CAPTCHA = 5        # El portal siempre muestra 5 caracteres
+TAMANO_GLIFO = 32           # Lado del glifo normalizado (píxeles)
+MARGEN_DESPLAZAMIENTO = 2   # Corrimiento tolerado al comparar (píxeles por lado)
+UMBRAL_CONFIANZA = 0.82     # Correlación mínima para dar un carácter por reconocido
+
+MIN_TINTA_COLUMNA = 2       # Píxeles de tinta para que una columna cuente como parte de un glifo
+MIN_ANCHO_GLIFO = 4         # Segmentos más angostos se descartan como ruido
+
+
+def caracter_de_archivo(nombre_archivo):
+    """'A_1.png' → 'A', 'a.png' → 'a' (el sufijo distingue mayúsculas en Windows)"""
+    return Path(nombre_archivo).stem.split("_")[0]
+
+# ═════════════════════════════════════════════════════════════
+# SEGMENTACIÓN Y NORMALIZACIÓN
+# ═════════════════════════════════════════════════════════════
+
+def mascara_tinta(img):
+    """Imagen en grises / binarizada (texto oscuro) → máscara booleana de tinta sin motas"""
+    gris = np.asarray(img)
+    if gris.ndim == 3:
+        gris = cv2.cvtColor(gris, cv2.COLOR_RGB2GRAY)
+    tinta = (gris < 128).astype(np.uint8) * 255
+    return cv2.medianBlur(tinta, 3) > 0
+
+def _ajustar_segmentos(segmentos, proyeccion, longitud):
+    segmentos = list(segmentos)
+
+    # Sobran: se descartan los de menos tinta (motas, puntos sueltos)
+    while len(segmentos) > longitud:
+        tintas = [proyeccion[inicio:fin].sum() for inicio, fin in segmentos]
+        segmentos.pop(int(np.argmin(tintas)))
+
+    # Faltan: letras pegadas → cortar el más ancho en su mínimo de tinta central
+    while segmentos and len(segmentos) < longitud:
+        k = max(range(len(segmentos)), key=lambda i: segmentos[i][1] - segmentos[i][0])
+        inicio, fin = segmentos[k]
+        ancho = fin - inicio
+        if ancho < 2 * MIN_ANCHO_GLIFO:
+            break
+        desde, hasta = inicio + ancho // 4, fin - ancho // 4
+        corte = desde + int(np.argmin(proyeccion[desde:hasta]))
+        segmentos[k:k + 1] = [(inicio, corte), (corte, fin)]
+
+    return segmentos
+
+def segmentar(img, longitud=LONGITUD_CAPTCHA):
+    """
+    Returns:
+        (mascara, [(x_inicio, x_fin), ...]) con los glifos de izquierda a derecha
+        (longitud=None → sin forzar la cantidad de glifos)
+    """
+    mascara = mascara_tinta(img)
+    proyeccion = mascara.sum(axis=0)
+    columnas = proyeccion >= MIN_TINTA_COLUMNA
+
+    segmentos = []
+    inicio = None
+    for x, con_tinta in enumerate(columnas):
+        if con_tinta and inicio is None:
+            inicio = x
+        elif not con_tinta and inicio is not None:
+            if x - inicio >= MIN_ANCHO_GLIFO:
+                segmentos.append((inicio, x))
+            inicio = None
+    if inicio is not None and len(columnas) - inicio >= MIN_ANCHO_GLIFO:
+        segmentos.append((inicio, len(columnas)))
+
+    if longitud:
+        segmentos = _ajustar_segmentos(segmentos, proyeccion, longitud)
+    return mascara, segmentos
+
+def normalizar_glifo(mascara, tamano=TAMANO_GLIFO):
+    """Recorta la máscara a su caja y la centra en tamano x tamano (float32 0..1)"""
+    salida = np.zeros((tamano, tamano), np.float32)
+    filas, columnas = np.nonzero(mascara)
+    if not len(filas):
+        return salida
+
+    recorte = mascara[filas.min():filas.max() + 1, columnas.min():columnas.max() + 1].astype(np.float32)
+    alto, ancho = recorte.shape
+    escala = tamano / max(alto, ancho)
+    nuevo_alto, nuevo_ancho = max(1, round(alto * escala)), max(1, round(ancho * escala))
+    recorte = cv2.resize(recorte, (nuevo_ancho, nuevo_alto), interpolation=cv2.INTER_AREA)
+
+    y0, x0 = (tamano - nuevo_alto) // 2, (tamano - nuevo_ancho) // 2
+    salida[y0:y0 + nuevo_alto, x0:x0 + nuevo_ancho] = recorte
+    return salida
+
+def glifos_normalizados(img, longitud=LONGITUD_CAPTCHA):
+    """Lista de glifos normalizados del captcha (en orden)"""
+    mascara, segmentos = segmentar(img, longitud)
+    return [normalizar_glifo(mascara[:, inicio:fin]) for inicio, fin in segmentos]
+
+# ═════════════════════════════════════════════════════════════
+# BANCO DE TEMPLATES
+# ═════════════════════════════════════════════════════════════
+
+class BancoTemplates:
+    """Templates normalizados en una tira horizontal para compararlos todos de una vez"""
+
+    def __init__(self, templates):
+        """
+        Args:
+            templates: iterable de (caracter, imagen_gris) — ej: los valores del
+                       dict `templates` de Runt.py
+        """
+        self.caracteres = []
+        glifos = []
+        for caracter, imagen in templates:
+            glifo = normalizar_glifo(mascara_tinta(imagen))
+            if glifo.any():
+                self.caracteres.append(caracter)
+                glifos.append(glifo)
+
+        celda = TAMANO_GLIFO + 2 * MARGEN_DESPLAZAMIENTO
+        self._celda = celda
+        self._tira = np.zeros((celda, celda * len(glifos)), np.float32)
+        for k, glifo in enumerate(glifos):
+            x0 = k * celda + MARGEN_DESPLAZAMIENTO
+            self._tira[MARGEN_DESPLAZAMIENTO:MARGEN_DESPLAZAMIENTO + TAMANO_GLIFO,
+                       x0:x0 + TAMANO_GLIFO] = glifo
+
+    @classmethod
+    def desde_carpeta(cls, carpeta):
+        templates = []
+        for ruta in sorted(Path(carpeta).glob("*.png")):
+            imagen = cv2.imread(str(ruta), 0)
+            if imagen is not None:
+                templates.append((caracter_de_archivo(ruta.name), imagen))
+        return cls(templates)
+
+    def __len__(self):
+        return len(self.caracteres)
+
+    def puntajes(self, glifo):
+        """Correlación normalizada del glifo contra cada template (un solo matchTemplate)"""
+        if not len(self) or not glifo.any():
+            return np.full(len(self), -1.0, np.float32)
+
+        mapa = cv2.matchTemplate(self._tira, glifo, cv2.TM_CCOEFF_NORMED)
+        # mapa: (2M+1) filas x (ancho_tira - TAMANO_GLIFO + 1) columnas; las
+        # posiciones válidas del template k son las 2M+1 primeras de su celda
+        ancho_total = self._celda * len(self)
+        mapa = np.pad(mapa, ((0, 0), (0, ancho_total - mapa.shape[1])), constant_values=-1)
+        mapa = mapa.reshape(mapa.shape[0], len(self), self._celda)[:, :, :2 * MARGEN_DESPLAZAMIENTO + 1]
+        return np.nan_to_num(mapa.max(axis=(0, 2)), nan=-1.0)
+
+    def reconocer_glifos(self, glifos):
+        """[(caracter, confianza), ...] para glifos ya normalizados"""
+        resultado = []
+        for glifo in glifos:
+            puntajes = self.puntajes(glifo)
+            if not len(puntajes):
+                resultado.append(("", 0.0))
+                continue
+            mejor = int(np.argmax(puntajes))
+            resultado.append((self.caracteres[mejor], float(puntajes[mejor])))
+        return resultado
+
+    def reconocer(self, img, longitud=LONGITUD_CAPTCHA):
+        """[(caracter, confianza), ...] por glifo del captcha, de izquierda a derecha"""
+        return self.reconocer_glifos(glifos_normalizados(img, longitud))
+
+
+def combinar_con_texto(texto, reconocidos, umbral=UMBRAL_CONFIANZA):
+    """
+    Mezcla una lectura externa (ej: Tesseract) con la de templates.
+
+    En cada posición gana el template si su confianza supera el umbral. Si la
+    lectura externa no tiene la misma cantidad de caracteres, solo se usa la
+    de templates cuando TODOS sus caracteres superan el umbral.
+
+    Returns:
+        (texto_final, [(caracter, confianza, origen), ...])
+    """
+    texto = texto or ""
+    if len(texto) == len(reconocidos):
+        detalle = []
+        for externo, (caracter, confianza) in zip(texto, reconocidos):
+            if confianza >= umbral:
+                detalle.append((caracter, confianza, "template"))
+            else:
+                detalle.append((externo, confianza, "externo"))
+        return "".join(c for c, _, _ in detalle), detalle
+
+    if reconocidos and all(confianza >= umbral for _, confianza in reconocidos):
+        logging.info(f"🧩 Lectura externa '{texto}' descartada: templates reconocieron los {len(reconocidos)} caracteres")
+        return "".join(c for c, _ in reconocidos), [(c, conf, "template") for c, conf in reconocidos]
+
+    return texto, [(c, 0.0, "externo") for c in texto]
@@ -0,0 +1,153 @@
+"""
+Pool de navegadores para las consultas RUNT
+===========================================
+Cada placa pasa la mayor parte del tiempo esperando (cargas, captcha, modales),
+así que varias sesiones de Chrome en paralelo escalan casi linealmente.
+
+- N procesos worker, cada uno con su propio WebDriver, toman placas de una
+  cola compartida
+- Los workers NO escriben en Sheets ni en el estado: devuelven el resultado y
+  sus escrituras pendientes al proceso principal, que es el único escritor
+- Límite de consultas por minuto por worker y tope global de consultas
+  simultáneas (semáforo compartido)
+
+Las funciones de navegador (iniciar / consultar / cerrar) las pone el script
+que usa el pool, así este módulo no depende de Runt.py.
+"""
+
+import logging
+import multiprocessing
+import queue
+import time
+
+ESPERA_COLA_SEGUNDOS = 5  # Cada cuánto se revisa si los workers siguen vivos
+
+
+def _bucle_worker(numero, cola_tareas, cola_resultados, semaforo, intervalo_minimo,
+                  iniciar, consultar, cerrar, reciclar=None, inicializar_proceso=None, args_inicializar=()):
+    """Proceso worker: abre su navegador y consume tareas hasta recibir None"""
+    recurso = None
+    try:
+        if inicializar_proceso is not None:
+            inicializar_proceso(numero, *args_inicializar)
+        recurso = iniciar(numero)
+        if recurso is None:
+            logging.error(f"❌ Worker {numero}: no se pudo iniciar el navegador")
+            return
+
+        logging.info(f"🧵 Worker {numero} listo")
+        contador = 0
+        ultima_consulta = 0.0
+
+        while True:
+            tarea = cola_tareas.get()
+            if tarea is None:
+                break
+            indice, datos = tarea
+
+            # Límite de velocidad propio del worker
+            espera = intervalo_minimo - (time.monotonic() - ultima_consulta)
+            if espera > 0:
+                time.sleep(espera)
+            ultima_consulta = time.monotonic()
+
+            with semaforo:
+                try:
+                    resultado, escrituras = consultar(recurso, datos, contador)
+                except Exception as e:
+                    logging.error(f"❌ Worker {numero}: error procesando tarea {indice}: {e}")
+                    resultado, escrituras = None, []
+            contador += 1
+
+            cola_resultados.put({"tipo": "resultado", "worker": numero, "indice": indice,
+                                 "resultado": resultado, "escrituras": escrituras})
+
+            # Ej: navegador que superó su presupuesto de memoria → uno nuevo
+            if reciclar is not None:
+                recurso = reciclar(numero, recurso)
+                if recurso is None:
+                    logging.error(f"❌ Worker {numero}: no se pudo reciclar el navegador")
+                    return
+    finally:
+        if recurso is not None:
+            cerrar(recurso)
+        cola_resultados.put({"tipo": "fin", "worker": numero})
+
+
+def procesar_en_paralelo(tareas, iniciar, consultar, cerrar, aplicar_escrituras,
+                         num_workers, consultas_por_minuto=0, max_simultaneas=None, reciclar=None,
+                         inicializar_proceso=None, args_inicializar=()):
+    """
+    Reparte `tareas` entre `num_workers` procesos y va devolviendo resultados.
+
+    Args:
+        tareas: lista de tuplas con los datos de cada consulta
+        iniciar(numero): crea el navegador del worker (None si falla)
+        consultar(navegador, tarea, contador) -> (resultado, escrituras)
+        cerrar(navegador)
+        aplicar_escrituras(escrituras): se ejecuta en ESTE proceso (único escritor)
+        consultas_por_minuto: límite por worker (0 = sin límite)
+        max_simultaneas: tope global de consultas en curso (None = num_workers)
+        reciclar(numero, navegador) -> navegador: tras cada tarea (ej: presupuesto de memoria)
+        inicializar_proceso(numero, *args_inicializar): al arrancar cada worker, antes
+            de iniciar (ej: conectarlo al pool OCR). Los args viajan al crear el
+            proceso, así que pueden incluir colas de multiprocessing
+
+    Yields:
+        (indice, tarea, resultado) en orden de llegada. Las tareas que quedaron
+        sin respuesta (worker caído) se devuelven al final con resultado None.
+    """
+    contexto = multiprocessing.get_context("spawn")  # Igual en Windows y Linux
+    cola_tareas = contexto.Queue()
+    cola_resultados = contexto.Queue()
+    semaforo = contexto.Semaphore(max_simultaneas or num_workers)
+    intervalo_minimo = 60.0 / consultas_por_minuto if consultas_por_minuto else 0.0
+
+    for indice, tarea in enumerate(tareas):
+        cola_tareas.put((indice, tarea))
+    for _ in range(num_workers):
+        cola_tareas.put(None)
+
+    procesos = []
+    for numero in range(1, num_workers + 1):
+        proceso = contexto.Process(
+            target=_bucle_worker, name=f"worker_runt_{numero}",
+            args=(numero, cola_tareas, cola_resultados, semaforo, intervalo_minimo,
+                  iniciar, consultar, cerrar, reciclar, inicializar_proceso, args_inicializar)
+        )
+        proceso.start()
+        procesos.append(proceso)
+
+    logging.info(f"🚀 Pool iniciado: {num_workers} navegadores, {len(tareas)} tareas, "
+                 f"máx. {max_simultaneas or num_workers} simultáneas")
+
+    pendientes = set(range(len(tareas)))
+    activos = num_workers
+
+    try:
+        while activos and pendientes:
+            try:
+                mensaje = cola_resultados.get(timeout=ESPERA_COLA_SEGUNDOS)
+            except queue.Empty:
+                if not any(proceso.is_alive() for proceso in procesos):
+                    logging.error("❌ Todos los workers terminaron con tareas sin responder")
+                    break
+                continue
+
+            if mensaje["tipo"] == "fin":
+                activos -= 1
+                continue
+
+            indice = mensaje["indice"]
+            pendientes.discard(indice)
+            aplicar_escrituras(mensaje["escrituras"])
+            yield indice, tareas[indice], mensaje["resultado"]
+
+        for indice in sorted(pendientes):
+            yield indice, tareas[indice], None
+    finally:
+        for proceso in procesos:
+            proceso.join(timeout=30)
+            if proceso.is_alive():
+                proceso.terminate()
+        logging.info("🏁 Pool de navegadores cerrado")
@@ -0,0 +1,197 @@
+"""
+Pool de procesos para el OCR del captcha
+========================================
+La binarización Otsu y el OCR corrían en el mismo hilo que maneja el
+navegador: Chrome quedaba quieto mientras Tesseract leía. Aquí el OCR es una
+etapa aparte:
+
+- ServicioOCR arranca `tamano` procesos OCR (independiente de cuántos
+  navegadores haya) que toman trabajos de UNA cola compartida
+- Cada navegador tiene su ClienteOCR: enviar(png) devuelve un
+  concurrent.futures.Future de inmediato, y mientras tanto el navegador sigue
+  (ej: llenar placa y cédula). Si deja de esperarlo, futuro.cancel() lo saca
+  de los pendientes y la respuesta tardía se descarta
+- Cada proceso OCR inicializa su backend y su banco de templates UNA vez
+  (inicializar_ocr) y luego solo lee (leer_captcha)
+- ClienteLocal: misma interfaz pero en proceso (tamano 0, o scripts como
+  Runt_Actualizar_Vigencias.py que no arrancan el servicio)
+
+Las colas se crean antes de lanzar los procesos (contexto "spawn", igual que
+pool_consultas), así que un cliente se puede pasar a un worker de navegador
+como argumento de su proceso.
+"""
+
+import itertools
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import clasificador_glifos
+import ocr_captcha
+import ocr_templates
+
+# ═════════════════════════════════════════════════════════════
+# TRABAJO DE OCR (corre en los procesos del pool)
+# ═════════════════════════════════════════════════════════════
+
+def inicializar_ocr(ruta_tesseract, ruta_modelo, carpeta_templates, backend):
+    """Estado del proceso OCR: backend y banco de templates cargados una sola vez"""
+    ocr_captcha.configurar(ruta_tesseract)
+    clasificador_glifos.configurar(ruta_modelo)
+    return {
+        "backend": ocr_captcha.obtener_backend(backend),
+        "banco": ocr_templates.BancoTemplates.desde_carpeta(carpeta_templates),
+    }
+
+def binarizar(png):
+    """Captura PNG del <img> → captcha en grises binarizado con Otsu (uint8)"""
+    img = cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_GRAYSCALE)
+    _, img_bin = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return img_bin
+
+def leer_captcha(estado, png):
+    """(imagen binarizada, lectura de ocr_captcha.resolver_texto)"""
+    img_bin = binarizar(png)
+    return img_bin, ocr_captcha.resolver_texto(Image.fromarray(img_bin), estado["backend"], estado["banco"])
+
+def _bucle_ocr(numero, cola_trabajos, colas_respuesta, inicializar, args_inicializar, procesar):
+    """Proceso OCR: inicializa una vez y atiende trabajos hasta recibir None"""
+    try:
+        estado = inicializar(*args_inicializar)
+    except Exception as e:
+        logging.error(f"❌ OCR {numero}: no se pudo inicializar: {e}")
+        estado, error_inicio = None, e
+    else:
+        error_inicio = None
+        logging.info(f"🔤 Proceso OCR {numero} listo")
+
+    while True:
+        trabajo = cola_trabajos.get()
+        if trabajo is None:
+            break
+        cliente, identificador, datos = trabajo
+        try:
+            if error_inicio is not None:
+                raise RuntimeError(f"proceso OCR sin inicializar: {error_inicio}")
+            colas_respuesta[cliente].put((identificador, True, procesar(estado, datos)))
+        except Exception as e:
+            colas_respuesta[cliente].put((identificador, False, repr(e)))
+
+# ═════════════════════════════════════════════════════════════
+# CLIENTES
+# ═════════════════════════════════════════════════════════════
+
+class ClienteOCR:
+    """Lado del navegador: envía trabajos y resuelve sus Future con las respuestas"""
+
+    def __init__(self, numero, cola_trabajos, cola_respuesta):
+        self.numero = numero
+        self._cola_trabajos = cola_trabajos
+        self._cola_respuesta = cola_respuesta
+        self._iniciar_estado()
+
+    def _iniciar_estado(self):
+        self._pendientes = {}
+        self._contador = itertools.count()
+        self._lock = threading.Lock()
+        self._lector = None
+
+    def __getstate__(self):  # Se pasa a otro proceso: solo viajan las colas
+        return {"numero": self.numero, "_cola_trabajos": self._cola_trabajos,
+                "_cola_respuesta": self._cola_respuesta}
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._iniciar_estado()
+
+    def _leer_respuestas(self):
+        while True:
+            identificador, ok, valor = self._cola_respuesta.get()
+            with self._lock:
+                futuro = self._pendientes.pop(identificador, None)
+            # set_running_or_notify_cancel: False si el llamador ya lo canceló (y así ya no se puede cancelar)
+            if futuro is None or not futuro.set_running_or_notify_cancel():
+                continue
+            if ok:
+                futuro.set_result(valor)
+            else:
+                futuro.set_exception(RuntimeError(f"Error en el proceso OCR: {valor}"))
+
+    def enviar(self, datos):
+        """Encola un trabajo y devuelve su Future"""
+        futuro = Future()
+        with self._lock:
+            if self._lector is None:
+                self._lector = threading.Thread(target=self._leer_respuestas, name=f"ocr_cliente_{self.numero}",
+                                                daemon=True)
+                self._lector.start()
+            identificador = next(self._contador)
+            self._pendientes[identificador] = futuro
+        futuro.add_done_callback(lambda _: self._olvidar(identificador))
+        self._cola_trabajos.put((self.numero, identificador, datos))
+        return futuro
+
+    def _olvidar(self, identificador):
+        """Al resolverse o cancelarse el Future (timeout del llamador): no retenerlo en _pendientes"""
+        with self._lock:
+            self._pendientes.pop(identificador, None)
+
+
+class ClienteLocal:
+    """Misma interfaz que ClienteOCR pero en este proceso (el Future ya vuelve resuelto)"""
+
+    def __init__(self, inicializar, args_inicializar, procesar=leer_captcha):
+        self._inicializar = inicializar
+        self._args_inicializar = args_inicializar
+        self._procesar = procesar
+        self._estado = None
+
+    def enviar(self, datos):
+        futuro = Future()
+        try:
+            if self._estado is None:
+                self._estado = self._inicializar(*self._args_inicializar)
+            futuro.set_result(self._procesar(self._estado, datos))
+        except Exception as e:
+            futuro.set_exception(e)
+        return futuro
+
+# ═════════════════════════════════════════════════════════════
+# SERVICIO
+# ═════════════════════════════════════════════════════════════
+
+class ServicioOCR:
+    """`tamano` procesos OCR compartidos por `num_clientes` navegadores"""
+
+    def __init__(self, tamano, inicializar, args_inicializar, num_clientes=1, procesar=leer_captcha):
+        contexto = multiprocessing.get_context("spawn")  # Igual en Windows y Linux
+        self.tamano = tamano
+        self._cola_trabajos = contexto.Queue()
+        self._colas_respuesta = [contexto.Queue() for _ in range(num_clientes)]
+        self._procesos = []
+        for numero in range(1, tamano + 1):
+            proceso = contexto.Process(
+                target=_bucle_ocr, name=f"ocr_runt_{numero}", daemon=True,
+                args=(numero, self._cola_trabajos, self._colas_respuesta, inicializar, args_inicializar, procesar)
+            )
+            proceso.start()
+            self._procesos.append(proceso)
+        logging.info(f"🔤 Pool OCR iniciado: {tamano} procesos para {num_clientes} navegadores")
+
+    def cliente(self, numero=0):
+        """Cliente del navegador `numero` (0 = proceso principal, 1..N = workers del pool)"""
+        return ClienteOCR(numero, self._cola_trabajos, self._colas_respuesta[numero])
+
+    def cerrar(self):
+        for _ in self._procesos:
+            self._cola_trabajos.put(None)
+        for proceso in self._procesos:
+            proceso.join(timeout=10)
+            if proceso.is_alive():
+                proceso.terminate()
+        logging.info("🏁 Pool OCR cerrado")
@@ -0,0 +1,98 @@
+"""
+Higiene de sesión del portal RUNT
+=================================
+Antes la sesión se "reiniciaba" cada 5 placas a ciegas: 10s de pausa, ir a
+google.com, volver al RUNT y esperar (~20s por reinicio).
+
+Ahora:
+- El reinicio es en el mismo sitio: se borran cookies / storage del origen del
+  portal por CDP (Storage.clearDataForOrigin) y se recarga la ruta de la SPA
+- Se dispara por señales medidas (MonitorSesion): racha de captchas
+  rechazados, modales de error frecuentes o recargas forzadas; el conteo de
+  consultas queda solo como tope duro
+"""
+
+import logging
+from collections import deque
+
+ORIGEN_PORTAL = "https://portalpublico.runt.gov.co"
+TIPOS_ALMACENAMIENTO = "cookies,local_storage,session_storage,indexeddb,cache_storage,service_workers"
+
+
+class MonitorSesion:
+    """Lleva las señales de salud de la sesión y decide cuándo reiniciarla"""
+
+    def __init__(self, max_consultas, racha_captchas, ventana_modales, max_modales):
+        """
+        Args:
+            max_consultas: tope duro de consultas entre reinicios
+            racha_captchas: captchas rechazados seguidos que disparan el reinicio
+            ventana_modales: últimas N consultas observadas
+            max_modales: consultas con modal de error (dentro de la ventana) que disparan el reinicio
+        """
+        self.max_consultas = max_consultas
+        self.racha_captchas = racha_captchas
+        self.max_modales = max_modales
+
+        self.consultas = 0
+        self.captchas_rechazados_seguidos = 0
+        self.recargas = 0
+        self._modales = deque(maxlen=ventana_modales)
+        self._modal_en_consulta = False
+
+    def registrar_captcha_rechazado(self):
+        self.captchas_rechazados_seguidos += 1
+        self._modal_en_consulta = True
+
+    def registrar_captcha_aceptado(self):
+        self.captchas_rechazados_seguidos = 0
+
+    def registrar_modal(self):
+        self._modal_en_consulta = True
+
+    def registrar_recarga(self):
+        """La página se tuvo que recargar porque un modal no cerraba"""
+        self.recargas += 1
+        self._modal_en_consulta = True
+
+    def fin_consulta(self):
+        self.consultas += 1
+        self._modales.append(self._modal_en_consulta)
+        self._modal_en_consulta = False
+
+    def motivo_reinicio(self):
+        """Texto con el motivo si hay que reiniciar, None si la sesión está sana"""
+        if self.captchas_rechazados_seguidos >= self.racha_captchas:
+            return f"{self.captchas_rechazados_seguidos} captchas rechazados seguidos"
+        if sum(self._modales) >= self.max_modales:
+            return f"{sum(self._modales)} modales de error en las últimas {len(self._modales)} consultas"
+        if self.recargas:
+            return "recarga forzada por un modal que no cerraba"
+        if self.consultas >= self.max_consultas:
+            return f"tope de {self.max_consultas} consultas"
+        return None
+
+    def reiniciada(self):
+        self.consultas = 0
+        self.captchas_rechazados_seguidos = 0
+        self.recargas = 0
+        self._modales.clear()
+        self._modal_en_consulta = False
+
+
+def limpiar_datos_origen(driver, origen=ORIGEN_PORTAL):
+    """Borra cookies y almacenamiento del portal sin salir de la página"""
+    try:
+        driver.execute_cdp_cmd("Storage.clearDataForOrigin",
+                               {"origin": origen, "storageTypes": TIPOS_ALMACENAMIENTO})
+        return True
+    except Exception as e:
+        logging.warning(f"⚠️ CDP no disponible para limpiar el origen ({e}), limpiando por WebDriver")
+
+    try:
+        driver.delete_all_cookies()
+        driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        return True
+    except Exception as e:
+        logging.error(f"❌ No se pudo limpiar la sesión del portal: {e}")
+        return False
@@ -0,0 +1,184 @@
+"""
+Sesión compartida de Google Sheets
+==================================
+Un solo cliente gspread autorizado por proceso, reutilizado por Runt.py,
+Runt_Actualizar_Vigencias.py, Verificador_Fallos.py y Duplicados.py.
+
+- Las credenciales se leen del disco UNA vez
+- El token se refresca solo (AuthorizedSession renueva antes de vencer / ante un 401)
+- Todas las llamadas viajan por la misma sesión HTTP (keep-alive, pool de conexiones)
+- Los spreadsheets abiertos se guardan por ID y las hojas por (ID, nombre),
+  así no se repite la lectura de metadatos en cada escritura
+"""
+
+import logging
+import threading
+
+import gspread
+from gspread.utils import absolute_range_name
+from google.auth.transport.requests import AuthorizedSession
+from google.oauth2.service_account import Credentials
+from requests.adapters import HTTPAdapter
+
+# ═════════════════════════════════════════════════════════════
+# CONFIGURACIÓN
+# ═════════════════════════════════════════════════════════════
+
+SCOPES = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+
+CONEXIONES_POR_HOST = 10  # Tamaño del pool de conexiones HTTP keep-alive
+DRIVE_ARCHIVOS = "https://www.googleapis.com/drive/v3/files/"
+
+_lock = threading.RLock()
+_ruta_credenciales = None
+_credenciales = None
+_cliente = None
+_sesion = None       # AuthorizedSession del cliente (también para la API de Drive)
+_spreadsheets = {}   # {sheet_id: gspread.Spreadsheet}
+_worksheets = {}     # {(sheet_id, nombre): gspread.Worksheet}
+_titulos = {}        # {sheet_id: set(nombres de hojas)}
+
+# ═════════════════════════════════════════════════════════════
+# CLIENTE
+# ═════════════════════════════════════════════════════════════
+
+def configurar(ruta_credenciales):
+    """Define el archivo de cuenta de servicio a usar (llamar una vez al inicio)"""
+    global _ruta_credenciales
+
+    with _lock:
+        if _ruta_credenciales is not None and str(_ruta_credenciales) != str(ruta_credenciales):
+            reiniciar_sesion()
+        _ruta_credenciales = ruta_credenciales
+
+def obtener_cliente():
+    """Devuelve el cliente gspread autorizado del proceso (lo crea la primera vez)"""
+    global _credenciales, _cliente, _sesion
+
+    with _lock:
+        if _cliente is not None:
+            return _cliente
+
+        if _ruta_credenciales is None:
+            raise RuntimeError("sheets_session.configurar(ruta_credenciales) no fue llamado")
+
+        _credenciales = Credentials.from_service_account_file(str(_ruta_credenciales), scopes=SCOPES)
+
+        sesion = AuthorizedSession(_credenciales)
+        adaptador = HTTPAdapter(pool_connections=CONEXIONES_POR_HOST, pool_maxsize=CONEXIONES_POR_HOST)
+        sesion.mount("https://", adaptador)
+
+        _cliente = gspread.Client(auth=_credenciales, session=sesion)
+        _sesion = sesion
+        logging.info("✅ Sesión de Google Sheets creada (se reutiliza en todo el proceso)")
+        return _cliente
+
+def reiniciar_sesion():
+    """Descarta cliente y cachés (usar tras errores de red persistentes)"""
+    global _credenciales, _cliente, _sesion
+
+    with _lock:
+        _credenciales = None
+        _cliente = None
+        _sesion = None
+        _spreadsheets.clear()
+        _worksheets.clear()
+        _titulos.clear()
+        logging.info("🔄 Sesión de Google Sheets reiniciada")
+
+# ═════════════════════════════════════════════════════════════
+# SPREADSHEETS Y HOJAS (CACHEADOS)
+# ═════════════════════════════════════════════════════════════
+
+def abrir_spreadsheet(sheet_id):
+    """Abre (o devuelve de caché) el spreadsheet por su ID"""
+    with _lock:
+        spreadsheet = _spreadsheets.get(sheet_id)
+        if spreadsheet is None:
+            spreadsheet = obtener_cliente().open_by_key(sheet_id)
+            _spreadsheets[sheet_id] = spreadsheet
+        return spreadsheet
+
+def obtener_worksheet(sheet_id, nombre, crear_si_no_existe=False, rows=1000, cols=40):
+    """
+    Devuelve la hoja `nombre` del spreadsheet (cacheada).
+
+    Lanza gspread.WorksheetNotFound si no existe y crear_si_no_existe=False.
+    """
+    clave = (sheet_id, nombre)
+
+    with _lock:
+        worksheet = _worksheets.get(clave)
+        if worksheet is not None:
+            return worksheet
+
+        spreadsheet = abrir_spreadsheet(sheet_id)
+        try:
+            worksheet = spreadsheet.worksheet(nombre)
+        except gspread.WorksheetNotFound:
+            if not crear_si_no_existe:
+                raise
+            worksheet = spreadsheet.add_worksheet(title=nombre, rows=rows, cols=cols)
+            logging.info(f"📝 Hoja '{nombre}' creada")
+
+        _worksheets[clave] = worksheet
+        return worksheet
+
+def invalidar_worksheet(sheet_id, nombre):
+    """Saca una hoja de la caché (ej: si fue borrada o renombrada)"""
+    with _lock:
+        _worksheets.pop((sheet_id, nombre), None)
+        _titulos.pop(sheet_id, None)
+
+def titulos_hojas(sheet_id, refrescar=False):
+    """Nombres de las hojas del spreadsheet (cacheados; una lectura de metadatos)"""
+    with _lock:
+        if refrescar or sheet_id not in _titulos:
+            hojas = abrir_spreadsheet(sheet_id).worksheets()
+            _titulos[sheet_id] = {hoja.title for hoja in hojas}
+        return _titulos[sheet_id]
+
+def fecha_modificacion(sheet_id):
+    """modifiedTime del spreadsheet en Drive (solo metadatos, no descarga celdas)"""
+    with _lock:
+        obtener_cliente()
+        sesion = _sesion
+    respuesta = sesion.get(DRIVE_ARCHIVOS + sheet_id,
+                            params={"fields": "modifiedTime", "supportsAllDrives": "true"})
+    respuesta.raise_for_status()
+    return respuesta.json()["modifiedTime"]
+
+# ═════════════════════════════════════════════════════════════
+# LECTURA EN LOTE
+# ═════════════════════════════════════════════════════════════
+
+def leer_rangos(sheet_id, rangos_por_hoja):
+    """
+    Lee varias hojas en UNA sola llamada values_batch_get.
+
+    Args:
+        rangos_por_hoja: {nombre_hoja: "A:F", ...}
+
+    Returns:
+        {nombre_hoja: [[fila], ...]} — las hojas que no existen no aparecen
+    """
+    existentes = titulos_hojas(sheet_id)
+    nombres = [nombre for nombre in rangos_por_hoja if nombre in existentes]
+    for nombre in rangos_por_hoja:
+        if nombre not in existentes:
+            logging.warning(f"⚠️  Sheet '{nombre}' no encontrada")
+
+    if not nombres:
+        return {}
+
+    rangos = [absolute_range_name(nombre, rangos_por_hoja[nombre]) for nombre in nombres]
+    respuesta = abrir_spreadsheet(sheet_id).values_batch_get(rangos)
+
+    resultado = {}
+    for nombre, rango in zip(nombres, respuesta.get("valueRanges", [])):
+        resultado[nombre] = rango.get("values", [])
+    return resultado
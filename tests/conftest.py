@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+# Los módulos del bot viven en la raíz del repo (scripts planos, sin paquete)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import estado_db  # noqa: E402
+
+
+@pytest.fixture
+def base_estado(tmp_path, monkeypatch):
+    """estado_db apuntando a una base vacía en tmp_path (conexión del hilo cerrada al final)"""
+    estado_db.cerrar()
+    monkeypatch.setattr(estado_db, "DB_FILE", tmp_path / "estado_runt.db")
+    yield estado_db
+    estado_db.cerrar()
+
+
+def _dibujar_captcha(texto, escala=1.4, grosor=3, dy=0, separacion=40):
+    """Texto oscuro sobre blanco, un carácter cada `separacion` píxeles (glifos sin solaparse)"""
+    imagen = np.full((60, 20 + separacion * len(texto)), 255, np.uint8)
+    for i, caracter in enumerate(texto):
+        cv2.putText(imagen, caracter, (10 + i * separacion, 45 + dy), cv2.FONT_HERSHEY_SIMPLEX, escala, 0, grosor)
+    return imagen
+
+
+@pytest.fixture(scope="session")
+def dibujar_captcha():
+    """Captcha sintético: dibujar_captcha(texto, escala=1.4, grosor=3, dy=0, separacion=40)"""
+    return _dibujar_captcha
@@ -0,0 +1,200 @@
+import os
+import queue
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import archivo_captchas
+
+
+@pytest.fixture
+def archivo(tmp_path, monkeypatch):
+    """Módulo con estado propio (cola, hilo, shard) y carpetas en tmp_path"""
+    monkeypatch.setattr(archivo_captchas, "_carpetas", {})
+    monkeypatch.setattr(archivo_captchas, "_cola", queue.Queue())
+    monkeypatch.setattr(archivo_captchas, "_hilo", None)
+    monkeypatch.setattr(archivo_captchas, "_detener", threading.Event())
+    monkeypatch.setattr(archivo_captchas, "_pendientes", {})
+    monkeypatch.setattr(archivo_captchas, "_shards", {})
+    archivo_captchas.configurar(tmp_path / "captchas", tmp_path / "captchas_leidos", tmp_path / "archivo")
+    yield archivo_captchas
+    archivo_captchas.cerrar()
+
+
+def _imagen(valor):
+    imagen = np.zeros((20, 60), dtype=np.uint8)
+    imagen[5:15, 10:50] = valor
+    return imagen
+
+
+def _lectura(texto):
+    return {"ocr": texto.upper(), "texto": texto, "confianza": 0.75, "origen": "ocr"}
+
+
+def test_registro_completo_con_veredicto(archivo):
+    id_aceptado = archivo.guardar_intento(_imagen(255), "ABC12D", captura=b"png-crudo", lectura=_lectura("k7Px2"))
+    archivo.registrar_veredicto(id_aceptado, "aceptado")
+    assert archivo.flush(timeout=10)
+
+    registros = list(archivo.iterar_registros())
+    assert len(registros) == 1
+    meta = registros[0]
+    assert meta["id"] == id_aceptado
+    assert (meta["placa"], meta["texto"], meta["ocr"], meta["veredicto"]) == ("ABC12D", "k7Px2", "K7PX2", "aceptado")
+    assert meta["confianza"] == pytest.approx(0.75)
+    assert meta["captura"] == b"png-crudo"
+    assert np.array_equal(meta["imagen"], _imagen(255))
+
+
+def test_sin_veredicto_se_archiva_al_cerrar(archivo):
+    id_rechazado = archivo.guardar_intento(_imagen(200), "ABC12D", lectura=_lectura("aaaaa"))
+    id_descartado = archivo.guardar_intento(_imagen(150), "ABC12D", lectura=_lectura("bbbbb"))
+    id_pendiente = archivo.guardar_intento(_imagen(100), "XYZ98F")
+    archivo.registrar_veredicto(id_rechazado, "rechazado")
+    archivo.registrar_veredicto(id_descartado, "descartado")
+    archivo.flush(timeout=10)
+    assert {m["id"] for m in archivo.iterar_registros(imagenes=False)} == {id_rechazado, id_descartado}
+
+    archivo.cerrar()
+    veredictos = {m["id"]: m["veredicto"] for m in archivo.iterar_registros(imagenes=False)}
+    assert veredictos == {id_rechazado: "rechazado", id_descartado: "descartado", id_pendiente: None}
+
+    solo_pendientes = list(archivo.iterar_registros(veredictos=(None,)))
+    assert [m["id"] for m in solo_pendientes] == [id_pendiente]
+    assert solo_pendientes[0]["captura"] is None
+    assert solo_pendientes[0]["texto"] is None
+
+
+def test_veredicto_desconocido(archivo):
+    with pytest.raises(ValueError):
+        archivo.registrar_veredicto("id", "quizas")
+
+
+def test_rotacion_de_shards(archivo, monkeypatch, tmp_path):
+    monkeypatch.setattr(archivo, "MAX_REGISTROS_SHARD", 2)
+    for valor in (50, 60, 70):
+        archivo.registrar_veredicto(archivo.guardar_intento(_imagen(valor), "ABC12D"), "error")
+        archivo.flush(timeout=10)
+
+    assert len(list((tmp_path / "archivo").glob("captchas_*.rec"))) == 2
+    assert len(list(archivo.iterar_registros(imagenes=False))) == 3
+
+
+def test_shard_ilegible_se_salta(archivo, tmp_path):
+    (tmp_path / "archivo" / "captchas_20240101_1_001.zip").write_bytes(b"no es un zip")
+    assert list(archivo.iterar_registros()) == []
+
+
+def test_registro_cortado_solo_pierde_el_ultimo(archivo, tmp_path):
+    # Un proceso que muere a mitad de escritura deja el final del shard cortado
+    for valor in (50, 60, 70):
+        archivo.registrar_veredicto(archivo.guardar_intento(_imagen(valor), "ABC12D"), "error")
+    archivo.flush(timeout=10)
+    (shard,) = (tmp_path / "archivo").glob("captchas_*.rec")
+    shard.write_bytes(shard.read_bytes()[:-10])
+
+    assert len(list(archivo.iterar_registros(imagenes=False))) == 2
+    assert [m["imagen"].shape for m in archivo.iterar_registros()] == [_imagen(0).shape] * 2
+
+
+def test_tanda_fallida_no_deja_basura(archivo, monkeypatch):
+    archivo._anexar([{"meta": {"id": "a", "veredicto": "error"}, "img_bin": _imagen(50)}])
+
+    fsync, lleno = archivo.os.fsync, [True]
+
+    def disco_lleno(descriptor):
+        if lleno.pop():
+            raise OSError("disco lleno")
+        fsync(descriptor)
+    monkeypatch.setattr(archivo.os, "fsync", disco_lleno)
+    with pytest.raises(OSError):
+        archivo._anexar([{"meta": {"id": "b", "veredicto": "error"}, "img_bin": _imagen(60)}])
+    lleno.append(False)
+    archivo._anexar([{"meta": {"id": "c", "veredicto": "error"}, "img_bin": _imagen(70)}])
+
+    assert [m["id"] for m in archivo.iterar_registros(imagenes=False)] == ["a", "c"]
+
+
+def test_ingerir_pngs(archivo, tmp_path):
+    leidos, crudos, destino = tmp_path / "leidos", tmp_path / "crudos", tmp_path / "archivo"
+    leidos.mkdir()
+    crudos.mkdir()
+    Image.fromarray(_imagen(255)).save(leidos / "exitoso_ABC12D_k7Px2_101112.png")
+    Image.fromarray(_imagen(255)).save(crudos / "captcha_ABC12D_101110.png")   # El mismo captcha
+    Image.fromarray(_imagen(90)).save(crudos / "captcha_XYZ98F_121314.png")
+    (crudos / "captcha_roto_000000.png").write_bytes(b"no es png")
+
+    conteo = archivo.ingerir_pngs(leidos, crudos, destino)
+    assert (conteo["ingeridos"], conteo["duplicados"], conteo["invalidos"]) == (2, 1, 1)
+
+    registros = {m["placa"]: m for m in archivo.iterar_registros(destino)}
+    assert registros["ABC12D"]["veredicto"] == "aceptado"
+    assert registros["ABC12D"]["texto"] == "k7Px2"
+    assert registros["XYZ98F"]["veredicto"] is None
+
+    # Idempotente: la segunda pasada no duplica
+    conteo = archivo.ingerir_pngs(leidos, crudos, destino, borrar=True)
+    assert (conteo["ingeridos"], conteo["ya_archivados"]) == (0, 2)
+    assert conteo["borrados"] == 3
+    assert len(list(archivo.iterar_registros(destino, imagenes=False))) == 2
+
+
+def test_aplicar_retencion(tmp_path):
+    for i in range(4):
+        ruta = tmp_path / f"captcha_{i}.png"
+        ruta.write_bytes(b"x" * 1024)
+        os.utime(ruta, (1_000_000 + i, 1_000_000 + i))
+    (tmp_path / "otro.txt").write_bytes(b"x" * 4096)
+
+    assert archivo_captchas.aplicar_retencion(tmp_path, max_mb=2.5 / 1024) == 2
+    assert sorted(p.name for p in tmp_path.glob("*.png")) == ["captcha_2.png", "captcha_3.png"]
+    assert archivo_captchas.aplicar_retencion(tmp_path, max_dias=1) == 2
+    assert (tmp_path / "otro.txt").exists()
+
+
+def test_aceptados_van_a_sus_shards(archivo, tmp_path):
+    archivo.registrar_veredicto(archivo.guardar_intento(_imagen(50), "ABC12D"), "aceptado")
+    archivo.registrar_veredicto(archivo.guardar_intento(_imagen(60), "XYZ98F"), "rechazado")
+    archivo.flush(timeout=10)
+
+    assert len(list((tmp_path / "archivo").glob("aceptados_*.rec"))) == 1
+    assert len(list((tmp_path / "archivo").glob("captchas_*.rec"))) == 1
+    assert {m["placa"]: m["veredicto"] for m in archivo.iterar_registros(imagenes=False)} == {
+        "ABC12D": "aceptado", "XYZ98F": "rechazado"}
+
+
+def test_retencion_del_archivo(archivo, monkeypatch, tmp_path):
+    carpeta = tmp_path / "archivo"
+    for nombre in ("captchas_20240101_1_001.rec", "captchas_20240102_1_001.rec",
+                   "aceptados_20240101_1_001.rec", "aceptados_20240102_1_001.rec"):
+        (carpeta / nombre).write_bytes(b"x" * 1024)
+        os.utime(carpeta / nombre, (1_000_000, 1_000_000))
+    archivo._anexar([{"meta": {"id": "nuevo", "veredicto": "error"}, "img_bin": _imagen(50)}])
+    (en_uso,) = (r for r in carpeta.glob("captchas_*.rec") if r.stat().st_mtime > 1_000_000)
+    os.utime(en_uso, (1_000_000, 1_000_000))   # Vencido, pero es el que se está escribiendo
+
+    monkeypatch.setattr(archivo, "RETENCION_ARCHIVO", {"captchas": (None, 30), "aceptados": (None, None)})
+    archivo._retencion()
+    assert sorted(r.name for r in carpeta.glob("captchas_*")) == [en_uso.name]
+    assert len(list(carpeta.glob("aceptados_*"))) == 2   # Las etiquetas no vencen por edad
+
+    # El tope de tamaño sí aplica a los aceptados: se borran shards enteros, los más viejos
+    monkeypatch.setattr(archivo, "RETENCION_ARCHIVO", {"captchas": (None, 30), "aceptados": (0, None)})
+    archivo._retencion()
+    assert list(carpeta.glob("aceptados_*")) == []
+    assert [m["id"] for m in archivo.iterar_registros(imagenes=False)] == ["nuevo"]
+
+
+def test_shard_viejo_rescata_aceptados_antes_de_vencer(archivo, monkeypatch, tmp_path):
+    carpeta = tmp_path / "archivo"
+    viejo = carpeta / "captchas_20240101_1_001.rec"
+    viejo.write_bytes(b"".join(archivo._serializar({"meta": {"id": i, "veredicto": v}, "img_bin": _imagen(50)})
+                               for i, v in (("a", "aceptado"), ("b", "rechazado"))))
+    os.utime(viejo, (1_000_000, 1_000_000))
+
+    monkeypatch.setattr(archivo, "RETENCION_ARCHIVO", {"captchas": (None, 30), "aceptados": (None, None)})
+    archivo._retencion()
+    assert not viejo.exists()
+    assert [(m["id"], m["veredicto"]) for m in archivo.iterar_registros()] == [("a", "aceptado")]
@@ -0,0 +1,109 @@
+import json
+
+import captura_red
+
+MAPEO = [
+    ("PLACA DEL VEHÍCULO:", "PLACA"),
+    ("NRO. DE LICENCIA DE TRÁNSITO:", "NRO_LICENCIA_TRANSITO"),
+    ("ESTADO DEL VEHÍCULO:", "ESTADO_VEHICULO"),
+    ("TIPO DE SERVICIO:", "TIPO_SERVICIO"),
+    ("CLASE DE VEHÍCULO:", "CLASE_VEHICULO"),
+    ("MARCA:", "MARCA"),
+    ("FECHA DE MATRICULA INICIAL(dd/mm/aaaa):", "FECHA_MATRICULA_INICIAL"),
+    ("GRAVÁMENES A LA PROPIEDAD:", "GRAVAMENES_PROPIEDAD"),
+]
+
+PAYLOAD_VEHICULO = {
+    "ok": True,
+    "data": [{
+        "informacionGeneral": {
+            "noPlaca": "abc12d",
+            "noLicenciaTransito": "10023456789",
+            "estadoAutomotor": "ACTIVO",
+            "tipoServicio": "Particular",
+            "claseVehiculo": "MOTOCICLETA",
+            "marca": "YAMAHA",
+            "fechaMatricula": "2019-03-07T00:00:00Z",
+            "tieneGravamenes": False,
+        },
+    }],
+}
+
+PAYLOAD_SOAT = {
+    "data": {
+        "polizas": [
+            {"noPoliza": "AT-1", "fechaExpedicion": "2024-01-02", "fechaInicioVigencia": "2024-01-03",
+             "fechaFinVigencia": "2025-01-02", "estado": True, "nombreAseguradora": "SEGUROS X",
+             "tarifa": 540, "detalle": {"ignorado": 1}},
+            {"noPoliza": "AT-0", "fechaExpedicion": "2023-01-02"},
+        ],
+    },
+}
+
+PAYLOAD_RTM = {"revisiones": [{"tipoRevision": "RTM", "fechaExpedicion": "2024-05-06", "fechaVigencia": "2025-05-06",
+                               "nombreCda": "CDA UNO", "vigente": False, "nroCertificado": "77"}]}
+
+
+def test_mapear_vehiculo():
+    datos = captura_red.mapear_vehiculo([{"otro": 1}, PAYLOAD_VEHICULO], MAPEO)
+
+    assert datos["PLACA"] == "abc12d"
+    assert datos["NRO_LICENCIA_TRANSITO"] == "10023456789"
+    assert datos["ESTADO_VEHICULO"] == "ACTIVO"
+    assert datos["MARCA"] == "YAMAHA"
+    assert datos["FECHA_MATRICULA_INICIAL"] == "07/03/2019"
+    assert datos["GRAVAMENES_PROPIEDAD"] == "NO"
+
+
+def test_mapear_vehiculo_exige_un_minimo_de_campos():
+    poco = {"placa": "ABC12D", "marca": "YAMAHA"}
+    assert captura_red.mapear_vehiculo([poco], MAPEO) is None
+    assert captura_red.mapear_vehiculo([], MAPEO) is None
+
+
+def test_mapear_tabla_soat_toma_el_primer_registro():
+    celdas = captura_red.mapear_tabla([PAYLOAD_VEHICULO, PAYLOAD_SOAT],
+                                      captura_red.COLUMNAS_SOAT, captura_red.IDENTIFICADOR_SOAT)
+    assert celdas == ["AT-1", "02/01/2024", "03/01/2024", "02/01/2025", "VIGENTE", "SEGUROS X", "540"]
+
+
+def test_mapear_tabla_rtm():
+    celdas = captura_red.mapear_tabla([PAYLOAD_RTM], captura_red.COLUMNAS_RTM, captura_red.IDENTIFICADOR_RTM)
+    assert celdas == ["RTM", "06/05/2024", "06/05/2025", "CDA UNO", "NO VIGENTE", "77", "No disponible"]
+
+
+def test_mapear_tabla_sin_registros_reconocibles():
+    assert captura_red.mapear_tabla([PAYLOAD_VEHICULO], captura_red.COLUMNAS_RTM,
+                                    captura_red.IDENTIFICADOR_RTM) is None
+
+
+class DriverFalso:
+    """get_log("performance") + Network.getResponseBody con payloads fijos"""
+
+    def __init__(self, payloads):
+        self.payloads = payloads
+
+    def get_log(self, tipo):
+        eventos = []
+        for i, _ in enumerate(self.payloads):
+            mensaje = {"method": "Network.responseReceived",
+                       "params": {"requestId": str(i), "type": "XHR",
+                                  "response": {"url": f"https://runt/api/{i}", "mimeType": "application/json"}}}
+            eventos.append({"message": json.dumps({"message": mensaje})})
+        return eventos
+
+    def execute_cdp_cmd(self, comando, parametros):
+        return {"body": json.dumps(self.payloads[int(parametros["requestId"])]), "base64Encoded": False}
+
+
+def test_leer_consulta():
+    resultado = captura_red.leer_consulta(DriverFalso([PAYLOAD_VEHICULO, PAYLOAD_SOAT, PAYLOAD_RTM]), "ABC12D", MAPEO)
+
+    assert resultado["vehiculo"]["PLACA"] == "abc12d"
+    assert resultado["soat"][0] == "AT-1"
+    assert resultado["rtm"][0] == "RTM"
+
+
+def test_leer_consulta_ignora_otra_placa():
+    resultado = captura_red.leer_consulta(DriverFalso([PAYLOAD_VEHICULO, PAYLOAD_SOAT]), "XYZ98F", MAPEO)
+    assert resultado == {"vehiculo": None, "soat": None, "rtm": None}
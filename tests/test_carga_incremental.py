@@ -0,0 +1,97 @@
+import pytest
+
+pytest.importorskip("gspread")
+
+import carga_incremental
+import sheets_session
+
+
+class HojasFalsas:
+    """leer_rangos / fecha_modificacion sobre hojas en memoria; registra qué se leyó"""
+
+    def __init__(self, hojas):
+        self.hojas = hojas
+        self.modificado = "2024-01-01T00:00:00Z"
+        self.lecturas = []
+
+    def leer_rangos(self, sheet_id, rangos_por_hoja):
+        self.lecturas.append(dict(rangos_por_hoja))
+        resultado = {}
+        for nombre, rango in rangos_por_hoja.items():
+            if nombre not in self.hojas:
+                continue
+            inicio, fin = (ord(letra) - ord("A") for letra in rango.split(":"))
+            filas = [fila[inicio:fin + 1] for fila in self.hojas[nombre]]
+            while filas and not any(filas[-1]):
+                filas.pop()
+            resultado[nombre] = filas
+        return resultado
+
+    def fecha_modificacion(self, sheet_id):
+        return self.modificado
+
+
+@pytest.fixture
+def hojas(base_estado, monkeypatch):
+    falsas = HojasFalsas({"Vigencias": [
+        ["fecha", "x", "asociado", "placa", "propietario", "estado"],
+        ["d1", "", "111", "ABC12D", "222", "No vigente"],
+        ["d2", "", "333", "XYZ98F", "444", "VIGENTE"],
+    ]})
+    monkeypatch.setattr(sheets_session, "leer_rangos", falsas.leer_rangos)
+    monkeypatch.setattr(sheets_session, "fecha_modificacion", falsas.fecha_modificacion)
+    return falsas
+
+
+def _cargar():
+    return carga_incremental.cargar_hojas("sheet", {"Vigencias": "A:F"}, {"Vigencias": "C:E"})["Vigencias"]
+
+
+def test_sonda_de_columnas_clave_evita_la_descarga(hojas):
+    primera = _cargar()
+    assert (primera["sin_cambios"], primera["cambiadas"]) == (False, [1, 2, 3])
+    assert hojas.lecturas == [{"Vigencias": "C:E"}, {"Vigencias": "A:F"}]
+
+    # El estado (columna F) cambia solo: no cuenta como cambio ni dispara la descarga
+    hojas.hojas["Vigencias"][2][5] = "SE VENCE HOY"
+    hojas.lecturas.clear()
+    segunda = _cargar()
+    assert (segunda["sin_cambios"], segunda["cambiadas"]) == (True, [])
+    assert hojas.lecturas == [{"Vigencias": "C:E"}]
+    assert segunda["filas"] == primera["filas"]   # De la copia local
+
+
+def test_solo_filas_con_clave_modificada(hojas):
+    _cargar()
+    hojas.hojas["Vigencias"][1][5] = "SE VENCE PRONTO"
+    hojas.hojas["Vigencias"][2][3] = "XYZ98G"
+    hojas.hojas["Vigencias"].append(["d3", "", "555", "JKL45M", "", "No vigente"])
+
+    carga = _cargar()
+    assert (carga["sin_cambios"], carga["cambiadas"]) == (False, [3, 4])
+    assert carga["filas"][1][5] == "SE VENCE PRONTO"
+
+    # La copia local quedó con el estado nuevo aunque la fila no cuente como cambiada
+    hojas.lecturas.clear()
+    assert _cargar()["filas"][1][5] == "SE VENCE PRONTO"
+    assert hojas.lecturas == [{"Vigencias": "C:E"}]
+
+
+def test_solo_lectura_usa_la_fecha_de_drive(hojas, base_estado):
+    cargar = lambda: carga_incremental.cargar_hojas("sheet", {"Vigencias": "A:F"}, solo_lectura=True)["Vigencias"]
+    assert cargar()["cambiadas"] == [1, 2, 3]
+    assert base_estado.obtener_cursor_carga("sheet", "Vigencias")["modificado"] == hojas.modificado
+
+    hojas.lecturas.clear()
+    assert cargar()["sin_cambios"] is True
+    assert hojas.lecturas == []   # Ni una lectura de celdas
+
+    hojas.modificado = "2024-01-02T00:00:00Z"
+    hojas.hojas["Vigencias"][2][5] = "SE VENCE HOY"
+    carga = cargar()
+    assert (carga["sin_cambios"], carga["cambiadas"]) == (False, [3])
+    assert base_estado.obtener_cursor_carga("sheet", "Vigencias")["modificado"] == hojas.modificado
+
+
+def test_hoja_inexistente_no_aparece(hojas):
+    assert carga_incremental.cargar_hojas("sheet", {"Otra": "A:F"}, {"Otra": "C:E"}) == {}
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+import clasificador_glifos
+import ocr_captcha
+import ocr_templates
+
+CARACTERES = "A7kPx"
+
+
+@pytest.fixture(scope="module")
+def entrenamiento(dibujar_captcha):
+    glifos, etiquetas = [], []
+    for escala in (1.2, 1.4, 1.6):
+        for grosor in (2, 3, 4):
+            for dy in (-3, 0, 3):
+                glifos.extend(ocr_templates.glifos_normalizados(dibujar_captcha(CARACTERES, escala, grosor, dy)))
+                etiquetas.extend(CARACTERES)
+    return np.array(glifos, dtype=np.float32), etiquetas
+
+
+@pytest.mark.parametrize("tipo", ["lineal", "knn"])
+def test_entrenar_y_predecir(entrenamiento, tipo, dibujar_captcha):
+    modelo = clasificador_glifos.ClasificadorGlifos.entrenar(*entrenamiento, tipo=tipo)
+    glifos = ocr_templates.glifos_normalizados(dibujar_captcha("kPA7x", escala=1.5, grosor=3))
+
+    caracteres, confianzas = modelo.predecir(np.array(glifos, dtype=np.float32))
+    assert "".join(caracteres) == "kPA7x"
+    assert ((confianzas > 0) & (confianzas <= 1)).all()
+
+
+def test_tipo_desconocido(entrenamiento):
+    with pytest.raises(ValueError):
+        clasificador_glifos.ClasificadorGlifos.entrenar(*entrenamiento, tipo="arbol")
+
+
+def test_guardar_cargar_y_backend(entrenamiento, tmp_path, monkeypatch, dibujar_captcha):
+    ruta = tmp_path / "modelo_glifos.npz"
+    clasificador_glifos.ClasificadorGlifos.entrenar(*entrenamiento).guardar(ruta)
+    monkeypatch.setattr(clasificador_glifos, "_ruta_modelo", ruta)
+
+    backend = clasificador_glifos.BackendClasificador()
+    (texto, confianza), (vacio, confianza_vacio) = backend.leer_lote(
+        [dibujar_captcha("xPk7A"), np.full((60, 220), 255, np.uint8)])
+    assert texto == "xPk7A"
+    assert 0 < confianza <= 1
+    assert (vacio, confianza_vacio) == ("", 0.0)
+
+
+def test_backend_sin_modelo(tmp_path, monkeypatch):
+    monkeypatch.setattr(clasificador_glifos, "_ruta_modelo", tmp_path / "no_existe.npz")
+    with pytest.raises(RuntimeError):
+        clasificador_glifos.BackendClasificador()
+
+
+def test_auto_no_elige_el_clasificador():
+    # Opt-in: solo con BACKEND_OCR = "clasificador"
+    assert "clasificador" not in ocr_captcha.ORDEN_AUTO
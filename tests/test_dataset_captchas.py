@@ -0,0 +1,31 @@
+import hashlib
+
+import numpy as np
+
+import dataset_captchas
+
+
+def test_particion_de_hash_es_estable():
+    # Valores fijos: si cambian, los captchas de evaluación pasarían a entrenamiento entre versiones
+    assert dataset_captchas.particion_de_hash("00000000" + "f" * 32) == "eval"
+    assert dataset_captchas.particion_de_hash("00000013" + "0" * 32) == "eval"    # 19 % 100
+    assert dataset_captchas.particion_de_hash("00000014" + "0" * 32) == "train"   # 20 % 100
+    assert dataset_captchas.particion_de_hash("00000063", porcentaje_eval=0) == "train"
+    assert dataset_captchas.particion_de_hash("00000063", porcentaje_eval=100) == "eval"
+
+
+def test_particion_de_hash_respeta_el_porcentaje():
+    hashes = [hashlib.sha1(str(i).encode()).hexdigest() for i in range(5000)]
+    en_eval = sum(dataset_captchas.particion_de_hash(h) == "eval" for h in hashes)
+    assert abs(en_eval / len(hashes) - dataset_captchas.PORCENTAJE_EVAL / 100) < 0.03
+
+
+def test_hash_imagen_depende_de_los_pixeles_y_la_forma():
+    imagen = np.arange(60, dtype=np.uint8).reshape(6, 10)
+    assert dataset_captchas.hash_imagen(imagen) == dataset_captchas.hash_imagen(imagen.copy())
+    assert dataset_captchas.hash_imagen(imagen[:, ::2]) == dataset_captchas.hash_imagen(imagen[:, ::2].copy())
+    assert dataset_captchas.hash_imagen(imagen) != dataset_captchas.hash_imagen(imagen.reshape(10, 6))
+
+    cambiada = imagen.copy()
+    cambiada[0, 0] = 255
+    assert dataset_captchas.hash_imagen(imagen) != dataset_captchas.hash_imagen(cambiada)
@@ -0,0 +1,92 @@
+import atexit
+
+import pytest
+
+pytest.importorskip("gspread")
+
+import escritor_sheets  # noqa: E402
+import sheets_session  # noqa: E402
+
+
+class SpreadsheetFalso:
+    def __init__(self, falla=False):
+        self.falla = falla
+        self.cuerpos = []
+
+    def values_batch_update(self, cuerpo):
+        if self.falla:
+            raise RuntimeError("sin red")
+        self.cuerpos.append(cuerpo)
+
+
+@pytest.fixture
+def escritor(base_estado, monkeypatch):
+    """Cola sobre la base temporal, sin hilo periódico ni flush al salir del intérprete"""
+    atexit.unregister(escritor_sheets.cerrar)
+    monkeypatch.setattr(escritor_sheets, "_origen", "prueba")
+    monkeypatch.setattr(escritor_sheets, "_pendientes_en_memoria", 0)
+    monkeypatch.setattr(escritor_sheets, "_iniciar_hilo", lambda: None)
+    return escritor_sheets
+
+
+def _abrir(monkeypatch, spreadsheets):
+    monkeypatch.setattr(sheets_session, "abrir_spreadsheet", lambda sheet_id: spreadsheets[sheet_id])
+
+
+def test_rango_fila():
+    assert escritor_sheets.columna_a_letra(26) == "Z"
+    assert escritor_sheets.columna_a_letra(27) == "AA"
+    assert escritor_sheets.rango_fila(5, 19) == "A5:S5"
+    assert escritor_sheets.rango_fila(3, 2, columna_inicial=27) == "AA3:AB3"
+
+
+def test_flush_envia_un_lote_por_spreadsheet(escritor, monkeypatch):
+    hoja_a, hoja_b = SpreadsheetFalso(), SpreadsheetFalso()
+    _abrir(monkeypatch, {"a": hoja_a, "b": hoja_b})
+
+    escritor.encolar_fila("a", "Datos Runt", 2, ["ABC12D", "Exitoso"])
+    escritor.encolar_fila("a", "Resultados", 7, ["ABC12D"])
+    escritor.encolar_fila("b", "Datos Vehiculo", 4, ["ABC12D", "MOTO", "2020"])
+    assert escritor.hay_pendientes("a", "Datos Runt")
+
+    assert escritor.flush() == 3
+    assert len(hoja_a.cuerpos) == 1 and len(hoja_b.cuerpos) == 1
+    rangos = [d["range"] for d in hoja_a.cuerpos[0]["data"]]
+    assert rangos == ["'Datos Runt'!A2:B2", "'Resultados'!A7:A7"]
+    assert hoja_b.cuerpos[0]["data"][0]["values"] == [["ABC12D", "MOTO", "2020"]]
+    assert not escritor.hay_pendientes("a", "Datos Runt")
+
+
+def test_encolar_envia_al_llenar_la_cola(escritor, monkeypatch):
+    hoja = SpreadsheetFalso()
+    _abrir(monkeypatch, {"a": hoja})
+    monkeypatch.setattr(escritor, "MAX_ESCRITURAS_PENDIENTES", 2)
+
+    escritor.encolar_fila("a", "Datos Runt", 2, ["x"])
+    assert hoja.cuerpos == []
+    escritor.encolar_fila("a", "Datos Runt", 3, ["y"])
+    assert len(hoja.cuerpos) == 1
+    assert escritor.estado_db.escrituras_pendientes("prueba") == []
+
+
+def test_flush_fallido_conserva_y_luego_descarta(escritor, monkeypatch):
+    _abrir(monkeypatch, {"a": SpreadsheetFalso(falla=True)})
+    monkeypatch.setattr(escritor, "MAX_INTENTOS_ENVIO", 2)
+    escritor.encolar_fila("a", "Datos Runt", 2, ["x"])
+
+    assert escritor.flush() == 0
+    pendientes = escritor.estado_db.escrituras_pendientes("prueba")
+    assert [p["intentos"] for p in pendientes] == [1]
+
+    assert escritor.flush() == 0
+    assert escritor.estado_db.escrituras_pendientes("prueba") == []
+
+
+def test_flush_solo_envia_el_origen_propio(escritor, monkeypatch):
+    hoja = SpreadsheetFalso()
+    _abrir(monkeypatch, {"a": hoja})
+    escritor.estado_db.encolar_escritura("worker_1", "a", "Datos Runt", "A2:A2", [["ajeno"]])
+
+    assert escritor.flush() == 0
+    assert hoja.cuerpos == []
+    assert len(escritor.estado_db.escrituras_pendientes("worker_1")) == 1
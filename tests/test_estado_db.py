@@ -0,0 +1,69 @@
+def test_registrar_intento_guarda_historial_resultado_y_datos(base_estado):
+    base_estado.registrar_intento("runt", "123", "ABC12D", "Exitoso", estado_resultado="Exitoso",
+                                  indice=1, total=10, datos_soat={"estado": "VIGENTE"})
+    base_estado.registrar_intento("runt", "123", "ABC12D", "Reintento", indice=2, total=10)
+
+    assert base_estado.contar_intentos("runt") == 2
+    assert base_estado.estado_placa("runt", "ABC12D") == "Exitoso"
+    assert base_estado.obtener_datos_extraidos("ABC12D", "soat") == {"estado": "VIGENTE"}
+    assert base_estado.obtener_datos_extraidos("ABC12D", "rtm") is None
+
+
+def test_actualizar_resultado_conserva_cedula_y_detalle(base_estado):
+    base_estado.actualizar_resultado("vigencias", "XYZ98F", "Pendiente", cedula="456", detalle={"motivo": "modal"})
+    base_estado.actualizar_resultado("vigencias", "XYZ98F", "Exitoso")
+
+    resultado = base_estado.obtener_resultado("vigencias", "XYZ98F")
+    assert resultado["estado"] == "Exitoso"
+    assert resultado["cedula"] == "456"
+    assert resultado["detalle"] == {"motivo": "modal"}
+    assert base_estado.resumen_placas("vigencias") == {"XYZ98F": "Exitoso"}
+    assert base_estado.placas_con_estado("vigencias", "Exitoso") == ["XYZ98F"]
+
+
+def test_meta_y_borrar_proceso(base_estado):
+    assert base_estado.proceso_vacio("runt")
+    base_estado.guardar_meta("runt", "current_index", 7)
+    assert base_estado.incrementar_meta("runt", "current_index", 3) == 10
+    assert base_estado.obtener_meta("runt", "current_index") == 10
+    assert base_estado.obtener_meta("runt", "no_existe", "defecto") == "defecto"
+
+    base_estado.borrar_proceso("runt")
+    assert base_estado.proceso_vacio("runt")
+
+
+def test_transaccion_revierte_si_hay_error(base_estado):
+    try:
+        with base_estado.transaccion() as conexion:
+            base_estado.guardar_meta("runt", "clave", 1, conexion=conexion)
+            raise RuntimeError("fallo a mitad")
+    except RuntimeError:
+        pass
+    assert base_estado.obtener_meta("runt", "clave") is None
+
+
+def test_cola_de_escrituras_por_origen(base_estado):
+    primera = base_estado.encolar_escritura("runt", "sheet", "Datos Runt", "A2:C2", [["a", "b", "c"]])
+    segunda = base_estado.encolar_escritura("runt", "sheet", "Resultados", "A5:B5", [["x", 1]])
+    base_estado.encolar_escritura("worker_1", "sheet", "Datos Runt", "A3:C3", [["d", "e", "f"]])
+
+    pendientes = base_estado.escrituras_pendientes("runt")
+    assert [p["id"] for p in pendientes] == [primera, segunda]
+    assert pendientes[1]["valores"] == [["x", 1]]
+    assert len(base_estado.escrituras_pendientes("runt", hoja="Datos Runt")) == 1
+
+    base_estado.sumar_intento_escrituras([segunda])
+    base_estado.borrar_escrituras([primera])
+    restantes = base_estado.escrituras_pendientes("runt")
+    assert [(p["id"], p["intentos"]) for p in restantes] == [(segunda, 1)]
+    assert len(base_estado.escrituras_pendientes("worker_1")) == 1
+
+
+def test_guardar_carga_reemplaza_filas_y_recorta(base_estado):
+    base_estado.guardar_carga("sheet", "Motos 0_5", "A:F", "sha1:v1", None,
+                              [(2, "h2", ["a"]), (3, "h3", ["b"]), (4, "h4", ["c"])], 4)
+    base_estado.guardar_carga("sheet", "Motos 0_5", "A:F", "sha1:v2", None, [(3, "h3b", ["B"])], 3)
+
+    assert base_estado.filas_cargadas("sheet", "Motos 0_5") == {2: ("h2", ["a"]), 3: ("h3b", ["B"])}
+    assert base_estado.obtener_cursor_carga("sheet", "Motos 0_5")["version"] == "sha1:v2"
+    assert base_estado.obtener_cursor_carga("sheet", "otra") is None
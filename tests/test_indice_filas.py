@@ -0,0 +1,126 @@
+import pytest
+
+pytest.importorskip("gspread")
+
+import indice_filas  # noqa: E402
+import sheets_session  # noqa: E402
+
+
+class WorksheetFalso:
+    """batch_get por columnas completas ("C:C") sobre filas en memoria, como la API (sin vacíos al final)"""
+
+    def __init__(self, filas):
+        self.filas = filas
+        self.lecturas = 0
+
+    def batch_get(self, rangos, major_dimension="ROWS"):
+        assert major_dimension == "COLUMNS"
+        self.lecturas += 1
+        respuesta = []
+        for rango in rangos:
+            columna = ord(rango.split(":")[0]) - ord("A")
+            valores = [fila[columna] if columna < len(fila) else "" for fila in self.filas]
+            while valores and not valores[-1]:
+                valores.pop()
+            respuesta.append([valores] if valores else [])
+        return respuesta
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def monotonic(self):
+        return self.ahora
+
+
+@pytest.fixture
+def hoja(monkeypatch):
+    hoja = WorksheetFalso([
+        ["Cédula", "Fecha", "Placa"],
+        ["111", "2024-01-01", "abc12d "],
+        ["222", "2024-01-02", "XYZ98F"],
+        ["333", "2024-01-03", ""],          # Sin placa: no entra al índice
+        ["444", "2024-01-04", "ABC12D"],    # Repetida: gana la primera fila
+    ])
+    monkeypatch.setattr(sheets_session, "obtener_worksheet", lambda sheet_id, nombre: hoja)
+    monkeypatch.setattr(indice_filas.escritor_sheets, "flush", lambda: 0)
+    monkeypatch.setattr(indice_filas.escritor_sheets, "hay_pendientes", lambda sheet_id, nombre: False)
+    return hoja
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(indice_filas.time, "monotonic", reloj.monotonic)
+    return reloj
+
+
+def test_buscar_por_clave_normalizada(hoja, reloj):
+    indice = indice_filas.IndiceFilas("sheet", "Datos Runt", (3,))
+
+    assert indice.buscar(" ABC12D") == 2
+    assert indice.buscar("xyz98f") == 3
+    assert indice.buscar("NOEXISTE") is None
+    assert hoja.lecturas == 1
+
+
+def test_clave_compuesta(hoja, reloj):
+    indice = indice_filas.IndiceFilas("sheet", "Resultados", (1, 3))
+
+    assert indice.buscar("444", "abc12d") == 5
+    assert indice.buscar("111", "XYZ98F") is None
+
+
+def test_reservar_filas_nuevas(hoja, reloj):
+    indice = indice_filas.IndiceFilas("sheet", "Datos Runt", (3,))
+
+    assert indice.buscar_o_reservar("NUE01A") == (6, False)
+    assert indice.buscar_o_reservar("nue01a") == (6, True)
+    assert indice.buscar_o_reservar("NUE02B") == (7, False)
+    assert indice.buscar_o_reservar("XYZ98F") == (3, True)
+    assert hoja.lecturas == 1
+
+
+def test_fila_minima_nueva(monkeypatch, reloj):
+    monkeypatch.setattr(sheets_session, "obtener_worksheet", lambda sheet_id, nombre: WorksheetFalso([]))
+    monkeypatch.setattr(indice_filas.escritor_sheets, "flush", lambda: 0)
+    indice = indice_filas.IndiceFilas("sheet", "Datos Vehiculo", (1,), fila_minima_nueva=5)
+
+    assert indice.reservar_fila_nueva("ABC12D") == 5
+    assert indice.reservar_fila_nueva("XYZ98F") == 6
+
+
+def test_revalida_cada_intervalo(hoja, reloj):
+    indice = indice_filas.IndiceFilas("sheet", "Datos Runt", (3,))
+    indice.buscar("ABC12D")
+
+    hoja.filas.append(["555", "2024-01-05", "OTR55E"])  # Otro proceso agrega una fila
+    reloj.ahora += indice_filas.REVALIDAR_CADA_SEGUNDOS - 1
+    assert indice.buscar("OTR55E") is None
+    assert hoja.lecturas == 1
+
+    reloj.ahora += 1
+    assert indice.buscar("OTR55E") == 6
+    assert hoja.lecturas == 2
+
+
+def test_revalidacion_postergada_con_escrituras_pendientes(hoja, reloj, monkeypatch):
+    indice = indice_filas.IndiceFilas("sheet", "Datos Runt", (3,))
+    assert indice.buscar_o_reservar("NUE01A") == (6, False)  # Reservada, aún sin escribir
+
+    monkeypatch.setattr(indice_filas.escritor_sheets, "hay_pendientes", lambda sheet_id, nombre: True)
+    reloj.ahora += indice_filas.REVALIDAR_CADA_SEGUNDOS
+    assert indice.buscar("NUE01A") == 6  # Releer la perdería (la hoja todavía no la tiene)
+    assert hoja.lecturas == 1
+
+
+def test_invalidar_y_obtener_indice(hoja, reloj, monkeypatch):
+    monkeypatch.setattr(indice_filas, "_indices", {})
+    indice = indice_filas.obtener_indice("sheet_prueba", "Datos Runt", (3,))
+    assert indice_filas.obtener_indice("sheet_prueba", "Datos Runt", [3]) is indice
+
+    indice.buscar("ABC12D")
+    indice.invalidar()
+    indice.buscar("ABC12D")
+    assert hoja.lecturas == 2
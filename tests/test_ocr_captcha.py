@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import ocr_captcha
+
+
+class BackendFalso(ocr_captcha.BackendOCR):
+    """Devuelve siempre la misma lectura (texto, confianza)"""
+
+    def __init__(self, texto, confianza, corregible=True):
+        self.lectura = (texto, confianza)
+        self.corregible = corregible
+
+    def leer_lote(self, imagenes):
+        return [self.lectura for _ in imagenes]
+
+
+class BancoFalso:
+    def __init__(self, reconocidos):
+        self.reconocidos = reconocidos
+
+    def reconocer(self, imagen):
+        return list(self.reconocidos)
+
+
+@pytest.fixture
+def imagen():
+    return Image.fromarray(np.full((40, 120), 255, dtype=np.uint8))
+
+
+def test_ocr_corregido_por_templates(imagen):
+    banco = BancoFalso([("A", 0.9), ("h", 0.5), ("0", 0.95), ("1", 0.3), ("Z", 0.85)])
+    lectura = ocr_captcha.resolver_texto(imagen, BackendFalso("AbO12", 0.7), banco)
+
+    assert lectura["corregido"] == "Ab012"
+    assert lectura["texto"] == "Ab01Z"
+    assert lectura["origen"] == "ocr"
+    assert lectura["ocr"] == "AbO12"
+    # El carácter más dudoso es uno del OCR (0.7), no un template
+    assert lectura["confianza"] == pytest.approx(0.7)
+
+
+def test_solo_templates_si_el_ocr_no_sirve(imagen):
+    banco = BancoFalso([("k", 0.9), ("7", 0.88), ("P", 0.95), ("x", 0.83), ("2", 0.99)])
+    lectura = ocr_captcha.resolver_texto(imagen, BackendFalso("", 0.0), banco)
+
+    assert lectura["texto"] == "k7Px2"
+    assert lectura["origen"] == "templates"
+    assert lectura["confianza"] == pytest.approx(0.83)
+
+
+def test_sin_lectura_valida(imagen):
+    banco = BancoFalso([("k", 0.4), ("7", 0.9)])
+    lectura = ocr_captcha.resolver_texto(imagen, BackendFalso("#?", 0.9), banco)
+
+    assert lectura["texto"] is None
+    assert lectura["origen"] is None
+    assert lectura["confianza"] == 0.0
+
+
+def test_backend_no_corregible_no_usa_templates(imagen):
+    banco = BancoFalso([("Z", 0.99)] * 5)
+    lectura = ocr_captcha.resolver_texto(imagen, BackendFalso("AbO12", 0.6, corregible=False), banco)
+
+    assert lectura["texto"] == "AbO12"  # Sin REEMPLAZOS ni templates
+    assert lectura["templates"] == []
+    assert lectura["confianza"] == pytest.approx(0.6)
+
+
+def test_motor_sin_confianza(imagen):
+    banco = BancoFalso([("A", 0.9), ("b", 0.2), ("c", 0.2), ("d", 0.2), ("e", 0.2)])
+    lectura = ocr_captcha.resolver_texto(imagen, BackendFalso("Abcde", None), banco)
+
+    assert lectura["texto"] == "Abcde"
+    assert lectura["confianza"] is None
+
+
+def test_confianza_lectura():
+    base = {"texto": "ab", "confianza_ocr": 0.5, "detalle": []}
+    assert ocr_captcha.confianza_lectura(base) == 0.5
+    assert ocr_captcha.confianza_lectura({**base, "texto": None}) == 0.0
+    detalle = [("a", 0.9, "template"), ("b", 0.95, "template")]
+    assert ocr_captcha.confianza_lectura({**base, "detalle": detalle}) == pytest.approx(0.9)
+    detalle = [("a", 0.9, "template"), ("b", 0.1, "externo")]
+    assert ocr_captcha.confianza_lectura({**base, "detalle": detalle}) == pytest.approx(0.5)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+import ocr_templates
+
+CARACTERES = "A7kPx"
+
+
+@pytest.fixture(scope="module")
+def banco(dibujar_captcha):
+    return ocr_templates.BancoTemplates([(c, dibujar_captcha(c)) for c in CARACTERES])
+
+
+def test_caracter_de_archivo():
+    assert ocr_templates.caracter_de_archivo("A_1.png") == "A"
+    assert ocr_templates.caracter_de_archivo("a.png") == "a"
+
+
+def test_segmentar_separa_los_glifos(dibujar_captcha):
+    _, segmentos = ocr_templates.segmentar(dibujar_captcha("kPA7x"))
+    assert len(segmentos) == 5
+    assert all(fin <= siguiente for (_, fin), (siguiente, _) in zip(segmentos, segmentos[1:]))
+
+
+def test_reconocer_captcha_sintetico(banco, dibujar_captcha):
+    assert len(banco) == len(CARACTERES)
+    reconocidos = banco.reconocer(dibujar_captcha("kPA7x"))
+
+    assert "".join(c for c, _ in reconocidos) == "kPA7x"
+    assert all(confianza >= ocr_templates.UMBRAL_CONFIANZA for _, confianza in reconocidos)
+
+
+def test_glifo_vacio_no_coincide(banco):
+    vacio = np.zeros((ocr_templates.TAMANO_GLIFO, ocr_templates.TAMANO_GLIFO), np.float32)
+    assert (banco.puntajes(vacio) == -1.0).all()
+
+
+def test_combinar_con_texto():
+    reconocidos = [("A", 0.95), ("b", 0.4), ("0", 0.9), ("1", 0.2), ("Z", 0.85)]
+    texto, detalle = ocr_templates.combinar_con_texto("AhO1z", reconocidos)
+    assert texto == "Ah01Z"
+    assert [origen for _, _, origen in detalle] == ["template", "externo", "template", "externo", "template"]
+
+    # Distinta longitud: los templates solo ganan si reconocieron todo
+    seguros = [(c, 0.9) for c in "kPA7x"]
+    assert ocr_templates.combinar_con_texto("kPA7", seguros)[0] == "kPA7x"
+    assert ocr_templates.combinar_con_texto("kPA7", reconocidos)[0] == "kPA7"
@@ -0,0 +1,85 @@
+import concurrent.futures
+import multiprocessing
+import time
+
+import pytest
+
+import pool_ocr
+
+
+def _sin_estado():
+    return None
+
+
+def _procesar(estado, datos):
+    """Trabajo trivial: duerme lo pedido y devuelve el valor (o falla)"""
+    espera, valor = datos
+    time.sleep(espera)
+    if valor == "fallar":
+        raise ValueError("fallo pedido")
+    return valor
+
+
+def _usar_cliente(cliente, salida):
+    """En otro proceso (spawn): el cliente llega solo con sus colas"""
+    salida.put((cliente._pendientes, cliente._lector, cliente.enviar((0, "desde_worker")).result(timeout=30)))
+
+
+@pytest.fixture(scope="module")
+def servicio():
+    servicio = pool_ocr.ServicioOCR(1, _sin_estado, (), num_clientes=2, procesar=_procesar)
+    yield servicio
+    servicio.cerrar()
+
+
+@pytest.fixture(scope="module")
+def cliente(servicio):
+    # Un solo cliente por número, como en Runt: dos lectores sobre la misma cola se roban las respuestas
+    return servicio.cliente(0)
+
+
+def test_resuelve_y_limpia_pendientes(cliente):
+    assert cliente.enviar((0, "a")).result(timeout=30) == "a"
+    assert cliente._pendientes == {}
+
+
+def test_error_del_proceso_ocr(cliente):
+    futuro = cliente.enviar((0, "fallar"))
+    with pytest.raises(RuntimeError, match="fallo pedido"):
+        futuro.result(timeout=30)
+
+
+def test_cancelado_tras_timeout_y_respuesta_tardia(cliente):
+    cliente.enviar((0, "calentar")).result(timeout=30)
+
+    lento = cliente.enviar((1.0, "tarde"))
+    with pytest.raises(concurrent.futures.TimeoutError):
+        lento.result(timeout=0.1)
+    assert lento.cancel()
+    assert cliente._pendientes == {}
+
+    time.sleep(1.5)  # Llega la respuesta del trabajo cancelado
+    assert cliente._lector.is_alive()
+    assert cliente.enviar((0, "siguiente")).result(timeout=30) == "siguiente"
+    assert lento.cancelled()
+    assert cliente._pendientes == {}
+
+
+def test_cliente_en_proceso_spawn(servicio):
+    cliente = servicio.cliente(1)
+    cliente._pendientes[99] = concurrent.futures.Future()  # Estado de este proceso: no debe viajar
+
+    contexto = multiprocessing.get_context("spawn")
+    salida = contexto.Queue()
+    proceso = contexto.Process(target=_usar_cliente, args=(cliente, salida))
+    proceso.start()
+    pendientes, lector, resultado = salida.get(timeout=60)
+    proceso.join(timeout=30)
+
+    assert (pendientes, lector, resultado) == ({}, None, "desde_worker")
+
+
+def test_cliente_local():
+    cliente = pool_ocr.ClienteLocal(_sin_estado, (), procesar=_procesar)
+    assert cliente.enviar((0, "x")).result() == "x"
+    assert isinstance(cliente.enviar((0, "fallar")).exception(), ValueError)
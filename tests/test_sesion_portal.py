@@ -0,0 +1,70 @@
+import sesion_portal
+
+
+def _monitor():
+    return sesion_portal.MonitorSesion(max_consultas=25, racha_captchas=3, ventana_modales=5, max_modales=3)
+
+
+def test_sesion_sana():
+    monitor = _monitor()
+    for _ in range(24):
+        monitor.registrar_captcha_aceptado()
+        monitor.fin_consulta()
+    assert monitor.motivo_reinicio() is None
+
+
+def test_tope_de_consultas():
+    monitor = _monitor()
+    for _ in range(25):
+        monitor.fin_consulta()
+    assert "tope de 25" in monitor.motivo_reinicio()
+
+
+def test_racha_de_captchas_rechazados():
+    monitor = _monitor()
+    monitor.registrar_captcha_rechazado()
+    monitor.registrar_captcha_rechazado()
+    monitor.registrar_captcha_aceptado()  # Corta la racha
+    monitor.registrar_captcha_rechazado()
+    monitor.registrar_captcha_rechazado()
+    assert monitor.motivo_reinicio() is None
+
+    monitor.registrar_captcha_rechazado()
+    assert "3 captchas rechazados" in monitor.motivo_reinicio()
+
+
+def test_modales_en_la_ventana():
+    monitor = _monitor()
+    for modal in (True, False, True):
+        if modal:
+            monitor.registrar_modal()
+            monitor.registrar_modal()  # Varios modales en una consulta cuentan una vez
+        monitor.fin_consulta()
+    assert monitor.motivo_reinicio() is None
+
+    monitor.registrar_modal()
+    monitor.fin_consulta()
+    assert "3 modales" in monitor.motivo_reinicio()
+
+
+def test_modales_fuera_de_la_ventana_no_cuentan():
+    monitor = _monitor()
+    for _ in range(2):
+        monitor.registrar_modal()
+        monitor.fin_consulta()
+    for _ in range(4):
+        monitor.fin_consulta()
+    monitor.registrar_modal()
+    monitor.fin_consulta()
+    assert monitor.motivo_reinicio() is None  # Solo 1 modal en las últimas 5
+
+
+def test_recarga_forzada_y_reinicio():
+    monitor = _monitor()
+    monitor.registrar_recarga()
+    monitor.fin_consulta()
+    assert "recarga forzada" in monitor.motivo_reinicio()
+
+    monitor.reiniciada()
+    assert monitor.motivo_reinicio() is None
+    assert (monitor.consultas, monitor.recargas, monitor.captchas_rechazados_seguidos) == (0, 0, 0)